@@ -38,12 +38,6 @@ import textwrap
 from iniparse.compat import ConfigParser
 from six.moves import configparser
 from six.moves import input
-try:
-    import dnf
-except ImportError:  # pragma: no cover
-    # dnf is not available on EL 7.
-    dnf = None  # pragma: no cover
-import koji
 import six
 
 from fedora.client import AuthError, OpenIdBaseClient, FedoraClientError
@@ -527,7 +521,10 @@ class BodhiClient(OpenIdBaseClient):
         Raises:
             RuntimeError: If the dnf Python bindings are not installed.
         """
-        if dnf is None:
+        try:
+            import dnf
+        except ImportError:
+            # dnf is not available on EL 7.
             raise RuntimeError('dnf is required by this method and is not installed.')
 
         base = dnf.Base()
@@ -718,6 +715,8 @@ class BodhiClient(OpenIdBaseClient):
         Returns:
             koji.ClientSession: An intialized authenticated koji client.
         """
+        import koji
+
         config = ConfigParser()
         if os.path.exists(os.path.join(os.path.expanduser('~'), '.koji', 'config')):
             config.readfp(open(os.path.join(os.path.expanduser('~'), '.koji', 'config')))
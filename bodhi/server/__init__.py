@@ -19,9 +19,9 @@
 """Initialize the Bodhi server."""
 from collections import defaultdict
 import logging
+import threading
 
 from cornice.validators import DEFAULT_FILTERS
-from dogpile.cache import make_region
 from munch import munchify
 from pyramid.authentication import AuthTktAuthenticationPolicy
 from pyramid.authorization import ACLAuthorizationPolicy
@@ -32,17 +32,13 @@ from sqlalchemy import engine_from_config, event
 from sqlalchemy.orm import scoped_session, sessionmaker
 import six
 
-from bodhi.server import bugs, buildsys, ffmarkdown
+from bodhi.server import bugs, buildsys, slow_queries
 from bodhi.server.config import config as bodhi_config
 
 
 log = logging.getLogger(__name__)
 
 
-# TODO -- someday move this externally to "fedora_flavored_markdown"
-ffmarkdown.inject()
-
-
 #
 # Request methods
 #
@@ -83,18 +79,34 @@ def get_db_session_for_request(request=None):
     return session
 
 
+_cache_region = None
+_cache_region_lock = threading.Lock()
+
+
 def get_cacheregion(request):
     """
-    Return a CacheRegion to be used to cache results.
+    Return the process-wide CacheRegion to be used to cache results.
+
+    The region is configured from the ``dogpile.cache.`` settings the first time it is needed, and
+    then shared by every request served by this process. dogpile.cache is only imported then, so
+    that the scripts that don't serve requests don't load it.
 
     Args:
         request (pyramid.request.Request): The current web request. Unused.
     Returns:
         dogpile.cache.region.CacheRegion: A configured CacheRegion.
     """
-    region = make_region()
-    region.configure_from_config(bodhi_config, "dogpile.cache.")
-    return region
+    global _cache_region
+    if _cache_region is None:
+        with _cache_region_lock:
+            if _cache_region is None:
+                from dogpile.cache import make_region
+                # Register the bodhi.server.mmap backend, in case the settings use it.
+                from bodhi.server import mmap_cache  # noqa: F401
+                region = make_region()
+                region.configure_from_config(bodhi_config, "dogpile.cache.")
+                _cache_region = region
+    return _cache_region
 
 
 def get_user(request):
@@ -198,6 +210,8 @@ def exception_filter(response, request):
     return response
 
 
+# Cornice copies the default filters into each Service as it is created, so this must happen before
+# any of the services are imported.
 DEFAULT_FILTERS.insert(0, exception_filter)
 
 
@@ -234,6 +248,11 @@ def initialize_db(config):
             'connect',
             lambda db_con, con_record: db_con.execute('PRAGMA foreign_keys=ON')
         )
+    if bodhi_config.get('slow_queries.threshold') is not None:
+        slow_queries.listen(engine)
+    # Every process that changes updates gets here, so this keeps release_stats up to date.
+    from bodhi.server import stats
+    stats.listen()
     Session.configure(bind=engine)
     return engine
 
@@ -328,6 +347,7 @@ def main(global_config, testing=None, session=None, **settings):
 
     # Metrics
     config.add_route('metrics', '/metrics')
+    config.add_route('prometheus', '/metrics/prometheus')
     config.add_route('masher_status', '/masher/')
 
     # Auto-completion search
@@ -355,4 +375,7 @@ def main(global_config, testing=None, session=None, **settings):
     config.scan('bodhi.server.services')
     config.scan('bodhi.server.captcha')
 
+    if bodhi_config.get('instrumentation.enabled'):
+        config.add_tween('bodhi.server.instrumentation.tween_factory')
+
     return config.make_wsgi_app()
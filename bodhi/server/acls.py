@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+A cache of the commit ACLs of packages, so that Pagure or pkgdb don't block editing updates.
+
+The ACLs read from the configured ``acl_system`` are stored in the ``package_acls`` table (see
+:class:`bodhi.server.models.PackageAcl`), keyed by package and, for pkgdb, branch. Since packages
+are unique per name and type, the package also determines the Pagure namespace.
+
+ACLs that were read less than ``acl_cache.ttl`` seconds ago are used as they are. Older ACLs are
+still used for up to ``acl_cache.max_stale`` more seconds, while a background thread reads them
+again. ACLs are also used, however old they are, when the ACL system can't be reached. Only packages
+that have no cached ACLs at all have to wait for the ACL system.
+
+:func:`refresh` (exposed as ``bodhi-refresh-acls``) reads the ACLs of all the recently active
+packages, so that they are rarely stale when they are needed.
+"""
+from datetime import datetime, timedelta
+from multiprocessing.pool import ThreadPool
+import json
+import threading
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from bodhi.server import log
+from bodhi.server.config import config
+from bodhi.server.models import Build, Package, PackageAcl, Release, Update, UpdateStatus
+from bodhi.server.util import transactional_session_maker
+
+
+_lock = threading.Lock()
+_refreshing = set()
+
+
+def _fetch(name, content_type, branch):
+    """
+    Read the ACLs of the given package from the ACL system.
+
+    The ACLs are read through a transient :class:`Package <bodhi.server.models.Package>` that isn't
+    bound to any session, so that this can safely run in a worker thread.
+
+    Args:
+        name (basestring): The name of the package to read the ACLs of.
+        content_type (bodhi.server.models.ContentType): The type of the package.
+        branch (basestring or None): The pkgdb branch to read the ACLs of, or None for Pagure.
+    Returns:
+        tuple: The return value of :meth:`Package.get_pkg_pushers
+            <bodhi.server.models.Package.get_pkg_pushers>` if a branch is given, else the return
+            value of :meth:`Package.get_pkg_committers_from_pagure
+            <bodhi.server.models.Package.get_pkg_committers_from_pagure>`.
+    """
+    package = Package(name=name, type=content_type)
+    if branch:
+        return package.get_pkg_pushers(branch, config)
+    return package.get_pkg_committers_from_pagure()
+
+
+def _store(db, package_id, branch, acls, fetched=None):
+    """
+    Store the given ACLs in the cache.
+
+    The ACLs are written in a savepoint, so that a concurrent transaction storing the same ACLs
+    first doesn't fail the current one.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        package_id (int): The primary key of the package.
+        branch (basestring or None): The pkgdb branch of the ACLs, or None for Pagure.
+        acls (tuple): The ACLs, as returned by :func:`_fetch`.
+        fetched (datetime or None): When the ACLs were read. Defaults to now.
+    """
+    try:
+        with db.begin_nested():
+            row = db.query(PackageAcl).get((package_id, branch or u''))
+            if row is None:
+                row = PackageAcl(package_id=package_id, branch=branch or u'')
+                db.add(row)
+            row.acls = json.dumps(acls)
+            row.fetched = fetched or datetime.utcnow()
+    except IntegrityError:
+        log.debug('The ACLs of package %d were stored by another transaction', package_id)
+
+
+def _refresh_in_background(package_id, branch):
+    """
+    Read the ACLs of the given package again, and store them in their own transaction.
+
+    Args:
+        package_id (int): The primary key of the package.
+        branch (basestring or None): The pkgdb branch to read the ACLs of, or None for Pagure.
+    """
+    try:
+        with transactional_session_maker()() as db:
+            package = db.query(Package).get(package_id)
+            _store(db, package_id, branch, _fetch(package.name, package.type, branch))
+    except Exception:
+        log.exception('Unable to refresh the ACLs of package %d', package_id)
+    finally:
+        with _lock:
+            _refreshing.discard((package_id, branch))
+
+
+def _schedule_refresh(package_id, branch):
+    """
+    Refresh the ACLs of the given package in a background thread, unless that is already happening.
+
+    Args:
+        package_id (int): The primary key of the package.
+        branch (basestring or None): The pkgdb branch to read the ACLs of, or None for Pagure.
+    """
+    with _lock:
+        if (package_id, branch) in _refreshing:
+            return
+        _refreshing.add((package_id, branch))
+    thread = threading.Thread(target=_refresh_in_background, args=(package_id, branch))
+    thread.daemon = True
+    thread.start()
+
+
+def get_acls(db, package, branch=None):
+    """
+    Return the ACLs of the given package, from the cache if possible.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        package (bodhi.server.models.Package): The package to return the ACLs of.
+        branch (basestring or None): The pkgdb branch to return the ACLs of, or None for Pagure.
+    Returns:
+        tuple: The ACLs, as returned by :meth:`Package.get_pkg_pushers
+            <bodhi.server.models.Package.get_pkg_pushers>` if a branch is given, else as returned by
+            :meth:`Package.get_pkg_committers_from_pagure
+            <bodhi.server.models.Package.get_pkg_committers_from_pagure>`. Cached ACLs have lists
+            instead of tuples.
+    Raises:
+        Exception: If the ACL system can't be reached and there are no cached ACLs.
+    """
+    ttl = config.get('acl_cache.ttl')
+    if not ttl:
+        return _fetch(package.name, package.type, branch)
+
+    row = db.query(PackageAcl).get((package.id, branch or u''))
+    if row is not None:
+        age = (datetime.utcnow() - row.fetched).total_seconds()
+        if age < ttl:
+            return json.loads(row.acls)
+        if age < ttl + config.get('acl_cache.max_stale'):
+            _schedule_refresh(package.id, branch)
+            return json.loads(row.acls)
+
+    try:
+        acls = _fetch(package.name, package.type, branch)
+    except Exception:
+        if row is None:
+            raise
+        log.exception('Unable to read the ACLs of %s, using the ones read on %s',
+                      package.name, row.fetched)
+        return json.loads(row.acls)
+
+    _store(db, package.id, branch, acls)
+    return acls
+
+
+def _try_fetch(key):
+    """
+    Read the ACLs of a package, logging failures.
+
+    Args:
+        key (tuple): A 4-tuple of the package's primary key, name, type, and branch. The last three
+            are passed to :func:`_fetch`.
+    Returns:
+        tuple or None: The ACLs, or None if they couldn't be read.
+    """
+    package_id, name, content_type, branch = key
+    try:
+        return _fetch(name, content_type, branch)
+    except Exception:
+        log.exception('Unable to read the ACLs of %s', name)
+
+
+def refresh(db, days=7, workers=8):
+    """
+    Read the ACLs of the recently active packages, and store them in the cache.
+
+    A package is recently active if one of its updates is pending or in testing, or was submitted
+    or modified in the last ``days`` days. The ACLs are read by ``workers`` concurrent threads.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        days (int): How many days back to look for activity.
+        workers (int): How many ACLs to read concurrently.
+    Returns:
+        int: The number of packages whose ACLs were refreshed.
+    """
+    acl_system = config.get('acl_system')
+    if acl_system not in ('pagure', 'pkgdb'):
+        log.info('The %s ACL system is not cached', acl_system)
+        return 0
+
+    since = datetime.utcnow() - timedelta(days=days)
+    query = db.query(Package.id, Package.name, Package.type, Release.branch)\
+        .join(Package.builds).join(Build.update).join(Update.release)\
+        .filter(or_(Update.status.in_([UpdateStatus.pending, UpdateStatus.testing]),
+                    Update.date_submitted >= since, Update.date_modified >= since))\
+        .distinct()
+    keys = set((package_id, name, content_type, branch if acl_system == 'pkgdb' else None)
+               for package_id, name, content_type, branch in query)
+    keys = sorted(keys, key=lambda key: (key[0], key[3]))
+    if not keys:
+        return 0
+
+    pool = ThreadPool(min(workers, len(keys)))
+    try:
+        results = pool.map(_try_fetch, keys)
+    finally:
+        pool.close()
+
+    fetched = datetime.utcnow()
+    count = 0
+    for (package_id, name, content_type, branch), acls in zip(keys, results):
+        if acls is not None:
+            _store(db, package_id, branch, acls, fetched)
+            count += 1
+    return count
@@ -22,10 +22,10 @@ import logging
 
 from collections import namedtuple
 from kitchen.text.converters import to_unicode
-import bugzilla
 import six
 from six.moves import xmlrpc_client
 
+from bodhi.server import instrumentation
 from bodhi.server.config import config
 
 
@@ -87,8 +87,11 @@ class Bugzilla(BugTracker):
         """Initialize self._bz as None."""
         self._bz = None
 
+    @instrumentation.timed('bugzilla')
     def _connect(self):
         """Create a Bugzilla client instance and store it on self._bz."""
+        import bugzilla
+
         user = config.get('bodhi_email')
         password = config.get('bodhi_password')
         url = config.get("bz_server")
@@ -124,6 +127,7 @@ class Bugzilla(BugTracker):
         """
         return "%s/show_bug.cgi?id=%s" % (config['bz_baseurl'], bug_id)
 
+    @instrumentation.timed('bugzilla')
     def getbug(self, bug_id):
         """
         Retrieve a bug from Bugzilla.
@@ -135,6 +139,7 @@ class Bugzilla(BugTracker):
         """
         return self.bz.getbug(bug_id)
 
+    @instrumentation.timed('bugzilla')
     def comment(self, bug_id, comment):
         """
         Add a comment to the given bug.
@@ -163,6 +168,7 @@ class Bugzilla(BugTracker):
         except Exception:
             log.exception("Unable to add comment to bug #%d" % bug_id)
 
+    @instrumentation.timed('bugzilla')
     def on_qa(self, bug_id, comment):
         """
         Change the status of this bug to ON_QA if it is not already ON_QA, VERIFIED, or CLOSED.
@@ -184,6 +190,7 @@ class Bugzilla(BugTracker):
         except Exception:
             log.exception("Unable to alter bug #%d" % bug_id)
 
+    @instrumentation.timed('bugzilla')
     def close(self, bug_id, versions, comment):
         """
         Close the bug given by bug_id, mark it as fixed in the given versions, and add a comment.
@@ -221,6 +228,7 @@ class Bugzilla(BugTracker):
         except xmlrpc_client.Fault:
             log.exception("Unable to close bug #%d" % bug_id)
 
+    @instrumentation.timed('bugzilla')
     def update_details(self, bug, bug_entity):
         """
         Update the details on bug_entity to match what is found in Bugzilla.
@@ -251,6 +259,7 @@ class Bugzilla(BugTracker):
         if 'security' in [keyword.lower() for keyword in keywords]:
             bug_entity.security = True
 
+    @instrumentation.timed('bugzilla')
     def modified(self, bug_id):
         """
         Mark the given bug as MODIFIED.
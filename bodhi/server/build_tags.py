@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+The local mirror of the Koji tags of the builds Bodhi knows about.
+
+The tags of every :class:`Build <bodhi.server.models.Build>` are mirrored in the ``build_tags``
+table (see :class:`bodhi.server.models.BuildTag`), so that tag lookups made while handling requests
+don't need to ask Koji. The mirror of a build is populated the first time its tags are looked up,
+and is then kept up to date by the signed handler as ``buildsys.tag`` and ``buildsys.untag``
+messages arrive, and as Bodhi tags and untags builds itself.
+
+Messages can be missed, so :func:`reconcile` (exposed as ``bodhi-sync-build-tags``) periodically
+reads the tags of the builds of all the releases that aren't archived back from Koji. Mirrors that
+were not synced for ``build_tags.max_age`` seconds are not used, and the tags are read from Koji
+instead.
+"""
+from datetime import datetime
+
+from sqlalchemy.orm import joinedload
+
+from bodhi.server import buildsys, log
+from bodhi.server.models import Build, Release, ReleaseState
+
+
+def sync(builds, koji=None):
+    """
+    Read the tags of the given builds from Koji, and replace their mirrors with them.
+
+    The tags are read with as few multicalls as possible. Builds whose tags can't be read keep their
+    current mirror.
+
+    Args:
+        builds (list): The :class:`Builds <bodhi.server.models.Build>` to sync.
+        koji (koji.ClientSession or None): The koji session to use. Defaults to using sessions from
+            :func:`bodhi.server.buildsys.get_session`.
+    Returns:
+        int: The number of builds that were synced.
+    """
+    builds = dict((build.nvr, build) for build in builds)
+    if not builds:
+        return 0
+
+    synced = datetime.utcnow()
+    calls = [(nvr, 'listTags', (nvr,), {}) for nvr in builds]
+    count = 0
+    for nvr, response in buildsys.multicall_map(calls, session=koji).items():
+        if not isinstance(response, list):
+            log.warning('Unable to read the tags of %s: %r', nvr, response)
+            continue
+        builds[nvr].set_tags([tag['name'] for tag in response[0]], synced)
+        count += 1
+    return count
+
+
+def lookup(db, nvrs):
+    """
+    Return the mirrored tags of the given builds, if they can be used.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        nvrs (list): The NVRs of the builds to look up.
+    Returns:
+        dict: Maps the NVRs of the builds that have a usable mirror to the sorted names of their
+            tags. Unknown builds and builds whose mirror is stale are left out.
+    """
+    if not nvrs:
+        return {}
+    query = db.query(Build).filter(Build.nvr.in_(nvrs)).filter(Build.tags_synced.isnot(None))\
+        .options(joinedload(Build.mirrored_tags))
+    return dict((build.nvr, build.get_tags()) for build in query if build.tags_fresh)
+
+
+def reconcile(db, chunk_size=1000):
+    """
+    Sync the mirrored tags of the builds of all the releases that aren't archived with Koji.
+
+    The builds are synced, and the session is committed, in chunks of ``chunk_size`` builds.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        chunk_size (int): How many builds to sync per transaction.
+    Returns:
+        int: The number of builds that were synced.
+    """
+    ids = [build_id for build_id, in db.query(Build.id).join(Build.release)
+           .filter(Release.state != ReleaseState.archived).order_by(Build.id)]
+    count = 0
+    for i in range(0, len(ids), chunk_size):
+        builds = db.query(Build).filter(Build.id.in_(ids[i:i + chunk_size]))\
+            .options(joinedload(Build.mirrored_tags)).all()
+        count += sync(builds)
+        db.commit()
+        log.info('Synced the tags of %d of %d builds', count, len(ids))
+    return count
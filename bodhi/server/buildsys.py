@@ -18,25 +18,40 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Define tools for interacting with the build system and a fake build system for development."""
 
+from collections import OrderedDict
 from threading import Lock
+import copy
 import logging
+import threading
 import time
-from functools import wraps
+import weakref
+from functools import partial, wraps
+from multiprocessing.pool import ThreadPool
 
 import koji
+import six
 
+from bodhi.server import instrumentation
 
 log = logging.getLogger('bodhi')
 _buildsystem = None
 # URL of the koji hub
 _koji_hub = None
+# The pool of koji sessions, which get_session() wraps in CachingSessions
+_pool = None
+# The state of the synthetic buildsystem, if it is used
+_synthetic = None
+# How multicall_map() splits, runs and retries multicalls
+_multicall_settings = {'chunk_size': 100, 'workers': 4, 'retries': 2}
+_multicall_pool = None
+_multicall_pool_lock = Lock()
 
 
 def multicall_enabled(func):
     """
     Decorate the given callable to enable multicall handling.
 
-    This is used by DevBuildsys methods.
+    This is used by DevBuildsys and SyntheticBuildsys methods.
 
     Args:
         func (callable): The function to wrap.
@@ -56,9 +71,14 @@ def multicall_enabled(func):
         # disable multicall during execution, so that inner func calls to other
         # methods don't append their results as well
         self._multicall = False
-        result = func(self, *args, **kwargs)
-        self.multicall_result.append([result])
-        self._multicall = True
+        try:
+            result = [func(self, *args, **kwargs)]
+        except koji.GenericError as e:
+            # Koji reports the errors of the calls in a multicall as faults.
+            result = {'faultCode': 1000, 'faultString': str(e)}
+        finally:
+            self._multicall = True
+        self.multicall_result.append(result)
     return wrapper
 
 
@@ -170,16 +190,19 @@ class DevBuildsys(Buildsystem):
         self.multicall = False
         return result
 
+    @multicall_enabled
     def moveBuild(self, from_tag, to_tag, build, *args, **kw):
         """Emulate Koji's moveBuild."""
         log.debug("moveBuild(%s, %s, %s)" % (from_tag, to_tag, build))
         DevBuildsys.__moved__.append((from_tag, to_tag, build))
 
+    @multicall_enabled
     def tagBuild(self, tag, build, *args, **kw):
         """Emulate Koji's tagBuild."""
         log.debug("tagBuild(%s, %s)" % (tag, build))
         DevBuildsys.__added__.append((tag, build))
 
+    @multicall_enabled
     def untagBuild(self, tag, build, *args, **kw):
         """Emulate Koji's untagBuild."""
         log.debug("untagBuild(%s, %s)" % (tag, build))
@@ -189,10 +212,12 @@ class DevBuildsys(Buildsystem):
         """Emulate Koji's ssl_login."""
         log.debug("ssl_login(%s, %s)" % (args, kw))
 
+    @multicall_enabled
     def taskFinished(self, task):
         """Emulate Koji's taskFinished."""
         return True
 
+    @multicall_enabled
     def getTaskInfo(self, task):
         """Emulate Koji's getTaskInfo."""
         return {'state': koji.TASK_STATES['CLOSED']}
@@ -203,6 +228,7 @@ class DevBuildsys(Buildsystem):
             u'git://pkgs.fedoraproject.org/rpms/bodhi?#2e994ca8b3296e62e8b0aadee1c5c0649559625a',
             'f17-candidate', {}]
 
+    @multicall_enabled
     def listPackages(self):
         """Emulate Koji's listPackages."""
         return [
@@ -285,6 +311,7 @@ class DevBuildsys(Buildsystem):
 
         return data
 
+    @multicall_enabled
     def listBuildRPMs(self, id, *args, **kw):
         """Emulate Koji's listBuildRPMs."""
         rpms = [{'arch': 'src',
@@ -318,6 +345,7 @@ class DevBuildsys(Buildsystem):
         rpms += DevBuildsys.__rpms__
         return rpms
 
+    @multicall_enabled
     def listTags(self, build, *args, **kw):
         """Emulate Koji's listTags."""
         if 'el5' in build or 'el6' in build:
@@ -392,6 +420,7 @@ class DevBuildsys(Buildsystem):
         log.debug(builds)
         return builds
 
+    @multicall_enabled
     def getLatestBuilds(self, *args, **kw):
         """
         Return a list of the output from self.getBuild().
@@ -401,6 +430,7 @@ class DevBuildsys(Buildsystem):
         """
         return [self.getBuild()]
 
+    @multicall_enabled
     def getTag(self, taginfo, **kw):
         """
         Retrieve the given tag from koji.
@@ -428,6 +458,7 @@ class DevBuildsys(Buildsystem):
                 'perm': None, 'id': 246, 'arches': None,
                 'maven_include_all': False, 'perm_id': None}
 
+    @multicall_enabled
     def getRPMHeaders(self, rpmID, headers):
         """
         Return headers for the given RPM.
@@ -482,6 +513,576 @@ class DevBuildsys(Buildsystem):
             }
 
 
+class _KojiCache(object):
+    """
+    A thread-safe LRU cache of Koji responses, with an optional time to live.
+
+    Attributes:
+        size (int): The maximum number of responses to keep.
+        ttl (int or None): How many seconds responses are kept for, or None to keep them until they
+            are evicted.
+        hits (int): How many lookups found a response.
+        misses (int): How many lookups didn't find a response.
+    """
+
+    def __init__(self, size, ttl=None):
+        """
+        Initialize the cache.
+
+        Args:
+            size (int): See the class attributes.
+            ttl (int or None): See the class attributes.
+        """
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """
+        Look up the response cached with the given key.
+
+        Args:
+            key (tuple): The key of the call, as returned by :func:`_cache_key`.
+        Returns:
+            tuple: A 2-tuple of a bool telling whether a response was found, and a copy of it.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and (self.ttl is None or entry[0] > time.time()):
+                self._entries[key] = entry
+                self.hits += 1
+                return True, copy.deepcopy(entry[1])
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        """
+        Cache a response, evicting the least recently used ones if the cache is full.
+
+        Args:
+            key (tuple): The key of the call, as returned by :func:`_cache_key`.
+            value (object): The response to cache.
+        """
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, copy.deepcopy(value))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """
+        Forget the cached responses whose key matches the given predicate.
+
+        Args:
+            predicate (callable or None): Called with each key. If None, all the responses are
+                forgotten.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if predicate is None or predicate(key):
+                    del self._entries[key]
+
+
+def _complete_build(build):
+    """
+    Return whether the given getBuild() response describes a completed build.
+
+    Args:
+        build (dict or None): A getBuild() response.
+    Returns:
+        bool: True if the build is complete, and thus will not change anymore.
+    """
+    return bool(build) and build.get('state') == koji.BUILD_STATES['COMPLETE']
+
+
+# The Koji calls whose responses are cached, and which responses are worth caching. The responses of
+# the first three never change once the build they are about is complete, while the tags of a build
+# change as it moves through Bodhi and are only cached for a short time.
+_CACHED_CALLS = {
+    'getBuild': _complete_build,
+    'listBuildRPMs': bool,
+    'getRPMHeaders': lambda headers: headers is not None,
+    'listTags': lambda tags: True,
+    'listTagged': lambda builds: True,
+}
+_TAG_CALLS = ('listTags', 'listTagged')
+_caches = {}
+# The Koji calls that change the tags of builds: the names of their positional parameters, in the
+# order of Koji's signatures, and the names of the parameters that are tags.
+_TAG_CHANGES = {
+    'moveBuild': (('tag1', 'tag2', 'build', 'force'), ('tag1', 'tag2')),
+    'tagBuild': (('tag', 'build', 'force', 'fromtag'), ('tag', 'fromtag')),
+    'untagBuild': (('tag', 'build', 'strict', 'force'), ('tag',)),
+}
+# The tagging tasks that haven't been seen completing, mapped to the (build, tags) they change and
+# when they were created. The tags of those builds and the builds of those tags aren't cached
+# meanwhile, in case the caller doesn't wait for the task.
+_tag_tasks = {}
+_tag_tasks_lock = Lock()
+# How many seconds a tagging task is assumed to run at most, should nobody see it complete.
+_TAG_TASK_TIMEOUT = 3600
+_FINISHED_TASK_STATES = (koji.TASK_STATES['CLOSED'], koji.TASK_STATES['CANCELED'],
+                         koji.TASK_STATES['FAILED'])
+
+
+def _cache_key(name, args, kwargs):
+    """
+    Return a hashable key describing a Koji call.
+
+    Args:
+        name (basestring): The name of the Koji method.
+        args (tuple): The positional arguments of the call.
+        kwargs (dict): The keyword arguments of the call.
+    Returns:
+        tuple: The key of the call.
+    """
+    def freeze(value):
+        if isinstance(value, (list, tuple)):
+            return tuple(freeze(v) for v in value)
+        if isinstance(value, dict):
+            return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+        return value
+    return name, freeze(args), freeze(kwargs)
+
+
+def configure_cache(size, tags_ttl):
+    """
+    Create the caches shared by the CachingSessions of this process, dropping any previous ones.
+
+    Args:
+        size (int): The number of responses cached for each Koji method.
+        tags_ttl (int): How many seconds the listTags() and listTagged() responses are cached for.
+    """
+    _caches.clear()
+    for name in _CACHED_CALLS:
+        _caches[name] = _KojiCache(size, tags_ttl if name in _TAG_CALLS else None)
+
+
+def invalidate_tags(build=None, tag=None):
+    """
+    Forget the cached listTags() and listTagged() responses affected by a change to a build's tags.
+
+    This is called when Bodhi tags builds, and when it is notified that a build has been tagged.
+
+    Args:
+        build (basestring or None): The NVR of the build that was tagged or untagged.
+        tag (basestring or None): The tag the build was added to or removed from. If neither the
+            build nor the tag are given, all the cached tags are forgotten.
+    """
+    for name, first_arg in (('listTags', build), ('listTagged', tag)):
+        if name not in _caches:
+            continue
+        if build is None and tag is None:
+            _caches[name].invalidate()
+        elif first_arg is not None:
+            _caches[name].invalidate(lambda key: key[1][:1] == (first_arg,))
+
+
+def _tag_change(name, args, kwargs):
+    """
+    Return the build and the tags whose cached tags a Koji call changes.
+
+    Args:
+        name (basestring): The name of a Koji method in _TAG_CHANGES.
+        args (tuple): The positional arguments of the call.
+        kwargs (dict): The keyword arguments of the call.
+    Returns:
+        tuple or None: A 2-tuple of the build and the list of tags, or None if they can't be told
+            from the arguments.
+    """
+    params, tag_params = _TAG_CHANGES[name]
+    values = dict(zip(params, args))
+    values.update((key, value) for key, value in kwargs.items() if key in params)
+    tags = [values[param] for param in tag_params if values.get(param) is not None]
+    if values.get('build') is None or values.get(tag_params[0]) is None:
+        return None
+    return values['build'], tags
+
+
+def _invalidate_change(change):
+    """
+    Forget the cached tags a Koji call changed.
+
+    Args:
+        change (tuple or None): The return value of :func:`_tag_change`. If None, all the cached
+            tags are forgotten.
+    """
+    if change is None:
+        invalidate_tags()
+        return
+    build, tags = change
+    invalidate_tags(build=build, tag=tags[0])
+    for tag in tags[1:]:
+        invalidate_tags(tag=tag)
+
+
+def _tag_task_started(task, change):
+    """
+    Remember a tagging task, so that the tags it changes aren't cached until it completes.
+
+    Args:
+        task (int): The id of the task.
+        change (tuple or None): The return value of :func:`_tag_change`.
+    """
+    with _tag_tasks_lock:
+        _tag_tasks[task] = (change, time.time())
+
+
+def _tag_task_finished(task):
+    """
+    Forget the cached tags a tagging task changed, now that it is complete.
+
+    Args:
+        task (int): The id of the task.
+    """
+    with _tag_tasks_lock:
+        found = _tag_tasks.pop(task, None)
+    if found is not None:
+        _invalidate_change(found[0])
+
+
+def _tags_changing(name, args, kwargs):
+    """
+    Return whether a listTags() or listTagged() call is about a build or a tag being changed.
+
+    Args:
+        name (basestring): listTags or listTagged.
+        args (tuple): The positional arguments of the call.
+        kwargs (dict): The keyword arguments of the call.
+    Returns:
+        bool: True if a tagging task that hasn't completed yet changes the build or the tag.
+    """
+    if not _tag_tasks:
+        return False
+    subject = args[0] if args else kwargs.get('build' if name == 'listTags' else 'tag')
+    now = time.time()
+    with _tag_tasks_lock:
+        for task, (change, started) in list(_tag_tasks.items()):
+            if now - started > _TAG_TASK_TIMEOUT:
+                del _tag_tasks[task]
+            elif change is None or subject in ((change[0],) if name == 'listTags' else change[1]):
+                return True
+    return False
+
+
+def cache_stats():
+    """
+    Return the number of hits and misses of the Koji response caches.
+
+    Returns:
+        dict: Maps the names of the cached Koji methods to dictionaries with ``hits``, ``misses``
+            and ``size`` keys.
+    """
+    return dict(
+        (name, {'hits': cache.hits, 'misses': cache.misses, 'size': len(cache._entries)})
+        for name, cache in _caches.items())
+
+
+class CachingSession(object):
+    """
+    Wrap a Koji session to serve the responses of some calls from the caches of this process.
+
+    The wrapped session is only created once a call has to be sent to Koji, so callers that only
+    need cached data never log in. Multicalls are supported: the cached calls are answered locally
+    and only the others are sent to Koji. Calls that change the tags of builds invalidate the
+    cached tags, and so do the tasks they start once they are seen completing. The tags they change
+    aren't cached until then.
+    """
+
+    def __init__(self, factory):
+        """
+        Initialize the CachingSession.
+
+        Args:
+            factory (callable): Called without arguments to create the wrapped session.
+        """
+        self._factory = factory
+        self._session = None
+        self._multicall = False
+        self._queue = []
+
+    @property
+    def session(self):
+        """
+        Return the wrapped session, creating it if needed.
+
+        Returns:
+            koji.ClientSession or DevBuildsys: The wrapped session.
+        """
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    @property
+    def multicall(self):
+        """
+        Return whether calls are being queued for a multicall.
+
+        Returns:
+            bool: True if calls are being queued.
+        """
+        return self._multicall
+
+    @multicall.setter
+    def multicall(self, value):
+        """
+        Start or cancel queuing calls for a multicall.
+
+        Args:
+            value (bool): True to start queuing calls.
+        """
+        self._multicall = value
+        self._queue = []
+        if self._session is not None:
+            self._session.multicall = value
+
+    def __getattr__(self, name):
+        """
+        Return the named attribute of the wrapped session, routing method calls through the caches.
+
+        Args:
+            name (basestring): The name of the attribute.
+        Returns:
+            object: The attribute.
+        """
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in _CACHED_CALLS:
+            attribute = getattr(self.session, name)
+            if not callable(attribute):
+                return attribute
+        return partial(self._call, name)
+
+    def _call(self, name, *args, **kwargs):
+        """
+        Make a Koji call, or answer it from the cache.
+
+        Args:
+            name (basestring): The name of the Koji method to call.
+            args (tuple): The positional arguments of the call.
+            kwargs (dict): The keyword arguments of the call.
+        Returns:
+            object: The response of the call, or None if it was queued for a multicall.
+        """
+        change = None
+        if name in _TAG_CHANGES:
+            change = _tag_change(name, args, kwargs)
+            _invalidate_change(change)
+
+        cache = _caches.get(name)
+        if name in _TAG_CALLS and _tags_changing(name, args, kwargs):
+            cache = None
+        key = _cache_key(name, args, kwargs) if cache is not None else None
+        if cache is not None:
+            found, response = cache.get(key)
+            if found:
+                if not self._multicall:
+                    return response
+                self._queue.append((None, [response]))
+                return
+
+        if self._multicall:
+            if not any(pending for pending, response in self._queue):
+                self.session.multicall = True
+            self._queue.append((True, (name, args, key, change)))
+            getattr(self.session, name)(*args, **kwargs)
+            return
+
+        with instrumentation.timed('koji'):
+            response = getattr(self.session, name)(*args, **kwargs)
+        if cache is not None and _CACHED_CALLS[name](response):
+            cache.put(key, response)
+        self._track_task(name, args, change, response)
+        return response
+
+    @staticmethod
+    def _track_task(name, args, change, response):
+        """
+        Keep track of the tagging tasks started and completed by a call.
+
+        Args:
+            name (basestring): The name of the Koji method that was called.
+            args (tuple): The positional arguments of the call.
+            change (tuple or None): What the call changes, if it is in _TAG_CHANGES.
+            response (object): The response of the call.
+        """
+        if name in ('tagBuild', 'moveBuild') and isinstance(response, six.integer_types):
+            _tag_task_started(response, change)
+        elif name == 'taskFinished' and args and response:
+            _tag_task_finished(args[0])
+        elif name == 'getTaskInfo' and args and isinstance(response, dict) and \
+                response.get('state') in _FINISHED_TASK_STATES:
+            _tag_task_finished(args[0])
+
+    def multiCall(self, *args, **kwargs):
+        """
+        Make the queued calls, sending the ones that aren't cached to Koji in one multicall.
+
+        Args:
+            args (tuple): Positional arguments for Koji's multiCall().
+            kwargs (dict): Keyword arguments for Koji's multiCall().
+        Returns:
+            list: The responses of the queued calls, in the format of Koji's multiCall().
+        """
+        queue = self._queue
+        self._queue = []
+        self._multicall = False
+        responses = iter([])
+        if any(pending for pending, item in queue):
+            with instrumentation.timed('koji_multicall'):
+                responses = iter(self.session.multiCall(*args, **kwargs) or [])
+        elif self._session is not None:
+            self._session.multicall = False
+
+        results = []
+        for pending, item in queue:
+            if not pending:
+                results.append(item)
+                continue
+            name, call_args, key, change = item
+            response = next(responses, None)
+            if isinstance(response, list):
+                if key is not None and _CACHED_CALLS[name](response[0]):
+                    _caches[name].put(key, response[0])
+                self._track_task(name, call_args, change, response[0])
+            results.append(response)
+        return results
+
+
+class SessionPool(object):
+    """
+    Hand out logged in Koji sessions, reusing them rather than logging in for every call.
+
+    Koji sessions are not thread safe, so each thread gets its own sessions. A thread is handed the
+    first of its sessions that isn't in the middle of a multicall, which in practice means each
+    thread logs in once. Sessions that haven't been used for ``check_interval`` seconds are checked
+    before being handed out, and are replaced if Koji doesn't answer or if their login expired.
+    Sessions older than ``max_age`` seconds are replaced as well.
+
+    Attributes:
+        authenticate (bool): Whether the sessions are authenticated.
+        check_interval (int): See above.
+        max_age (int): See above. 0 means sessions never get too old.
+        stats (dict): Counts how many times sessions were ``created``, ``reused``, ``checked`` and
+            replaced because they ``failed`` their check or ``expired``.
+    """
+
+    def __init__(self, factory, authenticate, check_interval=60, max_age=0):
+        """
+        Initialize the pool.
+
+        Args:
+            factory (callable): Called without arguments to create and log in a new session.
+            authenticate (bool): See the class attributes.
+            check_interval (int): See the class attributes.
+            max_age (int): See the class attributes.
+        """
+        self.factory = factory
+        self.authenticate = authenticate
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.stats = dict.fromkeys(('created', 'reused', 'checked', 'failed', 'expired'), 0)
+        self._local = threading.local()
+        self._sessions = weakref.WeakKeyDictionary()
+        self._lock = Lock()
+
+    def _count(self, stat):
+        """
+        Increment one of the statistics.
+
+        Args:
+            stat (basestring): The name of the statistic.
+        """
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _healthy(self, session, now):
+        """
+        Return whether the given session can still be used, checking it with Koji if needed.
+
+        Args:
+            session (koji.ClientSession): The session to check.
+            now (float): The current time.
+        Returns:
+            bool: True if the session can be used.
+        """
+        with self._lock:
+            created, checked = self._sessions[session]
+        if self.max_age and now - created >= self.max_age:
+            self._count('expired')
+            return False
+        if now - checked < self.check_interval:
+            return True
+
+        self._count('checked')
+        try:
+            healthy = bool(session.getLoggedInUser() if self.authenticate
+                           else session.getAPIVersion())
+        except Exception as e:
+            log.warning('Koji session failed its health check: %r', e)
+            healthy = False
+        if healthy:
+            with self._lock:
+                self._sessions[session] = (created, now)
+        else:
+            self._count('failed')
+        return healthy
+
+    def checkout(self):
+        """
+        Return a logged in session that the current thread can use.
+
+        Returns:
+            koji.ClientSession: A Koji session.
+        """
+        sessions = getattr(self._local, 'sessions', None)
+        if sessions is None:
+            sessions = self._local.sessions = []
+
+        now = time.time()
+        for session in list(sessions):
+            if session.multicall:
+                continue
+            if self._healthy(session, now):
+                self._count('reused')
+                return session
+            sessions.remove(session)
+
+        session = self.factory()
+        sessions.append(session)
+        with self._lock:
+            self._sessions[session] = (now, now)
+            self.stats['created'] += 1
+        return session
+
+    def get_stats(self):
+        """
+        Return the statistics of the pool.
+
+        Returns:
+            dict: The counters described in the class attributes, and the number of live
+                ``sessions``.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['sessions'] = len(self._sessions)
+        return stats
+
+
+def pool_stats():
+    """
+    Return the statistics of the Koji session pool.
+
+    Returns:
+        dict or None: See :meth:`SessionPool.get_stats`, or None if Koji isn't used.
+    """
+    return _pool.get_stats() if _pool is not None else None
+
+
 def koji_login(config, authenticate):
     """
     Login to Koji and return the session.
@@ -534,24 +1135,43 @@ def get_krb_conf(config):
 
 def get_session():
     """
-    Get a new buildsystem instance.
+    Get a buildsystem instance.
+
+    Koji sessions are checked out of the session pool the first time a call isn't answered from the
+    caches, and are shared with the other callers of the same thread.
 
     Returns:
-        koji.ClientSession or DevBuildsys: A buildsystem client instance.
+        CachingSession or DevBuildsys: A buildsystem client instance.
     Raises:
         RuntimeError: If the build system has not been initialized. See setup_buildsystem().
     """
     global _buildsystem, _buildsystem_login_lock
     if _buildsystem is None:
         raise RuntimeError('Buildsys needs to be setup')
+    if _pool is not None:
+        return CachingSession(_pool.checkout)
+    return _login()
+
+
+def _login():
+    """
+    Create a new buildsystem instance, one at a time.
+
+    Returns:
+        koji.ClientSession or DevBuildsys: A buildsystem client instance.
+    """
     with _buildsystem_login_lock:
         return _buildsystem()
 
 
 def teardown_buildsystem():
     """Tear down the build system."""
-    global _buildsystem
+    global _buildsystem, _pool, _synthetic
     _buildsystem = None
+    _pool = None
+    _synthetic = None
+    _caches.clear()
+    _tag_tasks.clear()
     DevBuildsys.clear()
 
 
@@ -565,12 +1185,16 @@ def setup_buildsystem(settings, authenticate=True):
     Raises:
         ValueError: If the buildsystem is configured to an invalid value.
     """
-    global _buildsystem, _koji_hub, _buildsystem_login_lock
+    global _buildsystem, _koji_hub, _buildsystem_login_lock, _pool, _synthetic
     if _buildsystem:
         return
 
     _buildsystem_login_lock = Lock()
     _koji_hub = settings.get('koji_hub')
+    _multicall_settings.update(
+        chunk_size=settings.get('koji_multicall_chunk_size', 100),
+        workers=settings.get('koji_multicall_workers', 4),
+        retries=settings.get('koji_multicall_retries', 2))
     buildsys = settings.get('buildsystem')
 
     if buildsys == 'koji':
@@ -581,12 +1205,115 @@ def setup_buildsystem(settings, authenticate=True):
             return koji_login(config=settings, authenticate=authenticate)
 
         _buildsystem = get_koji_login
+    elif buildsys == 'synthetic':
+        log.debug('Using the synthetic Buildsystem')
+        from bodhi.server.synthetic_buildsys import SyntheticBuildsys, SyntheticKoji
+        _synthetic = SyntheticKoji(
+            seed=settings.get('synthetic_buildsys.seed', 0),
+            builds=settings.get('synthetic_buildsys.builds', 100000),
+            packages=settings.get('synthetic_buildsys.packages', 20000),
+            releases=settings.get('synthetic_buildsys.releases', ['26', '27', '28']),
+            arches=settings.get('synthetic_buildsys.arches',
+                                ['aarch64', 'ppc64le', 's390x', 'x86_64']),
+            latency=settings.get('synthetic_buildsys.latency', 0.0),
+            call_latency=settings.get('synthetic_buildsys.call_latency', 0.0),
+            failure_rate=settings.get('synthetic_buildsys.failure_rate', 0.0),
+            failing_methods=settings.get('synthetic_buildsys.failing_methods', []))
+        _buildsystem = partial(SyntheticBuildsys, _synthetic)
     elif buildsys in ('dev', 'dummy', None):
         log.debug('Using DevBuildsys')
         _buildsystem = DevBuildsys
+        # The DevBuildsys is neither pooled nor cached, as the tests change its state between calls.
+        _pool = None
+        return
     else:
         raise ValueError('Buildsys %s not known' % buildsys)
 
+    # The synthetic buildsystem is pooled and cached like koji, so that it can be used to measure
+    # the pool and the caches too.
+    _pool = SessionPool(_login, authenticate,
+                        settings.get('koji_pool.check_interval', 60),
+                        settings.get('koji_pool.max_age', 0))
+    configure_cache(settings.get('koji_cache.size', 10000),
+                    settings.get('koji_cache.tags_ttl', 30))
+
+
+def _multicall_chunk(calls, session, retries):
+    """
+    Make the given calls in a single multicall, retrying it if it fails.
+
+    Args:
+        calls (list): (key, method name, args, kwargs) 4-tuples.
+        session (koji.ClientSession or DevBuildsys or None): The session to use. If None, one is
+            acquired with :func:`get_session` for each attempt.
+        retries (int): How many times to retry the multicall if it raises an Exception.
+    Returns:
+        list: (key, response) 2-tuples, in the order of the calls.
+    Raises:
+        Exception: The exception of the last attempt, if they all failed.
+    """
+    attempt = 0
+    while True:
+        koji_session = session if session is not None else get_session()
+        koji_session.multicall = True
+        try:
+            for key, method, args, kwargs in calls:
+                getattr(koji_session, method)(*args, **kwargs)
+            responses = koji_session.multiCall() or []
+        except Exception as e:
+            koji_session.multicall = False
+            if attempt >= retries:
+                raise
+            attempt += 1
+            log.warning('Koji multicall failed, retrying (%d/%d): %r', attempt, retries, e)
+            continue
+        return [(call[0], response) for call, response in zip(calls, responses)]
+
+
+def multicall_map(calls, session=None, chunk_size=None, retries=None):
+    """
+    Make any number of Koji calls in multicalls, and map their responses to the given keys.
+
+    The calls are split into multicalls of at most ``chunk_size`` calls. When no session is given
+    and there is more than one multicall to make, they are run concurrently by up to
+    ``koji_multicall_workers`` threads, each using its own session. A multicall that raises an
+    Exception, for example because the connection to Koji was lost, is retried.
+
+    Args:
+        calls (iterable): (key, method name, args, kwargs) 4-tuples describing the calls to make.
+            The keys must be hashable and unique.
+        session (koji.ClientSession or DevBuildsys or None): The session to make the calls with. If
+            None, sessions are acquired with :func:`get_session`.
+        chunk_size (int or None): The maximum number of calls per multicall. Defaults to the
+            ``koji_multicall_chunk_size`` setting.
+        retries (int or None): How many times a failed multicall is retried. Calls that aren't
+            idempotent, like tagging builds, should pass 0. Defaults to the
+            ``koji_multicall_retries`` setting.
+    Returns:
+        collections.OrderedDict: Maps the keys of the calls to their responses, in the order of the
+            calls. As with Koji's multiCall(), the response to a successful call is a list holding
+            its result, and the response to a failed call is a dict describing the fault.
+    Raises:
+        Exception: If a multicall still fails after being retried.
+    """
+    global _multicall_pool
+    calls = list(calls)
+    chunk_size = chunk_size or _multicall_settings['chunk_size']
+    if retries is None:
+        retries = _multicall_settings['retries']
+    chunks = [calls[i:i + chunk_size] for i in range(0, len(calls), chunk_size)]
+
+    if session is None and len(chunks) > 1 and _multicall_settings['workers'] > 1:
+        with _multicall_pool_lock:
+            if _multicall_pool is None:
+                _multicall_pool = ThreadPool(_multicall_settings['workers'])
+        results = _multicall_pool.map(
+            lambda chunk: _multicall_chunk(chunk, None, retries), chunks)
+    else:
+        results = [_multicall_chunk(chunk, session, retries) for chunk in chunks]
+
+    return OrderedDict(response for result in results for response in result)
+
 
 def wait_for_tasks(tasks, session=None, sleep=300):
     """
@@ -616,4 +1343,6 @@ def wait_for_tasks(tasks, session=None, sleep=300):
             failed_tasks.append(task)
     log.debug("%d tasks completed successfully, %d tasks failed." % (
         len(tasks) - len(failed_tasks), len(failed_tasks)))
+    # The tasks may have changed the tags of any build.
+    invalidate_tags()
     return failed_tasks
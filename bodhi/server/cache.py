@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Tag based invalidation for the process-wide cache region.
+
+Cached values are associated with tags, such as ``updates``, that name the data they were derived
+from. Every tag has a random token stored in the region itself, and the tokens of a value's tags
+are part of its cache key. Invalidating a tag replaces its token, so the values derived from the
+tagged data are never served again and simply expire. Since the tokens live in the region's
+backend, invalidations are seen by every process that shares that backend.
+
+Commits that write updates, comments or buildroot overrides invalidate the matching tags. Data that
+changes outside of Bodhi, such as koji tags, is only refreshed when the cached value expires.
+"""
+import functools
+import uuid
+
+from dogpile.cache.api import NO_VALUE
+from dogpile.cache.util import function_key_generator
+from sqlalchemy import event
+
+from bodhi.server import get_cacheregion, log, Session
+
+
+#: Maps the tables that are written to the tags that such writes invalidate.
+TABLE_TAGS = {
+    'buildroot_overrides': 'overrides',
+    'comments': 'comments',
+    'updates': 'updates',
+}
+
+
+def _tag_key(tag):
+    """
+    Return the cache key that stores the token of the given tag.
+
+    Args:
+        tag (basestring): The name of a tag.
+    Returns:
+        str: The cache key.
+    """
+    return 'bodhi.server.cache.tag:%s' % tag
+
+
+def get_tokens(region, tags):
+    """
+    Return the current tokens of the given tags, creating the missing ones.
+
+    Args:
+        region (dogpile.cache.region.CacheRegion): The region the tokens are stored in.
+        tags (list): The names of the tags.
+    Returns:
+        list: The tokens, in the same order as the tags.
+    """
+    keys = [_tag_key(tag) for tag in tags]
+    tokens = region.get_multi(keys, ignore_expiration=True)
+    missing = {}
+    for i, token in enumerate(tokens):
+        if token is NO_VALUE:
+            tokens[i] = missing[keys[i]] = uuid.uuid4().hex
+    if missing:
+        region.set_multi(missing)
+    return tokens
+
+
+def invalidate_tags(*tags):
+    """
+    Invalidate every cached value that is associated with one of the given tags.
+
+    Args:
+        tags (list): The names of the tags to invalidate.
+    """
+    if tags:
+        log.debug('Invalidating the cache tags %r', sorted(tags))
+        get_cacheregion(None).set_multi(dict((_tag_key(tag), uuid.uuid4().hex) for tag in tags))
+
+
+def cache_on_tags(tags, namespace=None):
+    """
+    Return a decorator that caches the results of a function in the process-wide region.
+
+    This works like :meth:`dogpile.cache.region.CacheRegion.cache_on_arguments`, except the cached
+    results are discarded as soon as one of the given tags is invalidated.
+
+    Args:
+        tags (list): The names of the tags the function's results depend on.
+        namespace (basestring or None): Distinguishes functions that share a module and a name.
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(fn):
+        key_generator = function_key_generator(namespace, fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            region = get_cacheregion(None)
+            key = '|'.join([key_generator(*args)] + get_tokens(region, tags))
+            return region.get_or_create(key, lambda: fn(*args))
+
+        return wrapper
+
+    return decorator
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_tags(session, flush_context, instances):
+    """
+    Remember which tags the objects being flushed belong to.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session being flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+        instances (list): Unused.
+    """
+    tags = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tag = TABLE_TAGS.get(getattr(obj, '__tablename__', None))
+        if tag is not None:
+            tags.add(tag)
+    if tags:
+        session.info.setdefault('cache_tags', set()).update(tags)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_tags(session):
+    """
+    Invalidate the tags of the objects written by the transaction that was just committed.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that was committed.
+    """
+    invalidate_tags(*session.info.pop('cache_tags', ()))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_tags(session, previous_transaction):
+    """
+    Forget the tags collected for a transaction that was rolled back.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that was rolled back.
+        previous_transaction (sqlalchemy.orm.session.SessionTransaction): Unused.
+    """
+    session.info.pop('cache_tags', None)
@@ -26,7 +26,6 @@ import base64
 import math
 import random
 
-from PIL import Image, ImageDraw, ImageFont
 from pyramid.httpexceptions import HTTPGone, HTTPNotFound
 from pyramid.view import view_config
 import cryptography.fernet
@@ -75,6 +74,8 @@ def jpeg_generator(plainkey, settings):
     Returns:
         PIL.Image.Image: An image containing the given text.
     """
+    from PIL import Image, ImageDraw, ImageFont
+
     image_size = image_width, image_height = (
         settings.get('captcha.image_width'),
         settings.get('captcha.image_height'),
@@ -114,6 +115,8 @@ def warp_image(image):
     Returns:
         PIL.Image.Image: A warped transformation of the given image.
     """
+    from PIL import Image
+
     r = 10  # individually warp a bunch of 10x10 tiles.
     mesh_x = (image.size[0] // r) + 2
     mesh_y = (image.size[1] // r) + 2
@@ -280,6 +280,12 @@ class BodhiConfig(dict):
     loaded = False
 
     _defaults = {
+        'acl_cache.max_stale': {
+            'value': 86400,
+            'validator': int},
+        'acl_cache.ttl': {
+            'value': 300,
+            'validator': int},
         'acl_system': {
             'value': 'dummy',
             'validator': six.text_type},
@@ -316,6 +322,9 @@ class BodhiConfig(dict):
         'bugtracker': {
             'value': None,
             'validator': _validate_none_or(six.text_type)},
+        'build_tags.max_age': {
+            'value': 86400,
+            'validator': int},
         'buildroot_limit': {
             'value': 31,
             'validator': int},
@@ -367,9 +376,18 @@ class BodhiConfig(dict):
         'cors_origins_rw': {
             'value': 'https://bodhi.fedoraproject.org',
             'validator': six.text_type},
+        'count_cache.estimate': {
+            'value': False,
+            'validator': _validate_bool},
+        'count_cache.ttl': {
+            'value': 60,
+            'validator': int},
         'critpath_pkgs': {
             'value': [],
             'validator': _generate_list_validator()},
+        'critpath.cache_ttl': {
+            'value': 3600,
+            'validator': int},
         'critpath.min_karma': {
             'value': 2,
             'validator': int},
@@ -414,6 +432,21 @@ class BodhiConfig(dict):
         'fedmsg_enabled': {
             'value': False,
             'validator': _validate_bool},
+        'fedmsg_publisher.batch_size': {
+            'value': 100,
+            'validator': int},
+        'fedmsg_publisher.block_timeout': {
+            'value': 10,
+            'validator': float},
+        'fedmsg_publisher.drop_when_full': {
+            'value': False,
+            'validator': _validate_bool},
+        'fedmsg_publisher.flush_timeout': {
+            'value': 30,
+            'validator': float},
+        'fedmsg_publisher.queue_size': {
+            'value': 0,
+            'validator': int},
         'file_url': {
             'value': 'https://download.fedoraproject.org/pub/fedora/linux/updates',
             'validator': six.text_type},
@@ -427,6 +460,12 @@ class BodhiConfig(dict):
         'initial_bug_msg': {
             'value': '%s has been submitted as an update to %s. %s',
             'validator': six.text_type},
+        'instrumentation.enabled': {
+            'value': False,
+            'validator': _validate_bool},
+        'instrumentation.server_timing': {
+            'value': False,
+            'validator': _validate_bool},
         'greenwave_api_url': {
             'value': 'https://greenwave-web-greenwave.app.os.fedoraproject.org/api/v1.0',
             'validator': _validate_rstripped_str},
@@ -436,9 +475,30 @@ class BodhiConfig(dict):
         'waiverdb.access_token': {
             'value': None,
             'validator': _validate_none_or(six.text_type)},
+        'koji_cache.size': {
+            'value': 10000,
+            'validator': int},
+        'koji_cache.tags_ttl': {
+            'value': 30,
+            'validator': int},
         'koji_hub': {
             'value': 'https://koji.stg.fedoraproject.org/kojihub',
             'validator': str},
+        'koji_multicall_chunk_size': {
+            'value': 100,
+            'validator': int},
+        'koji_multicall_retries': {
+            'value': 2,
+            'validator': int},
+        'koji_multicall_workers': {
+            'value': 4,
+            'validator': int},
+        'koji_pool.check_interval': {
+            'value': 60,
+            'validator': int},
+        'koji_pool.max_age': {
+            'value': 0,
+            'validator': int},
         'krb_ccache': {
             'value': None,
             'validator': _validate_none_or(str)},
@@ -454,6 +514,18 @@ class BodhiConfig(dict):
         'libravatar_enabled': {
             'value': True,
             'validator': _validate_bool},
+        'mail.max_attempts': {
+            'value': 10,
+            'validator': int},
+        'mail.max_messages_per_connection': {
+            'value': 100,
+            'validator': int},
+        'mail.retry_delay': {
+            'value': 60,
+            'validator': int},
+        'mail.spool_dir': {
+            'value': None,
+            'validator': _validate_none_or(six.text_type)},
         'mako.directories': {
             'value': 'bodhi:server/templates',
             'validator': six.text_type},
@@ -475,6 +547,15 @@ class BodhiConfig(dict):
         'message_id_email_domain': {
             'value': 'admin.fedoraproject.org',
             'validator': six.text_type},
+        'monitoring.address': {
+            'value': '127.0.0.1',
+            'validator': str},
+        'monitoring.enabled': {
+            'value': False,
+            'validator': _validate_bool},
+        'monitoring.port': {
+            'value': None,
+            'validator': _validate_none_or(int)},
         'not_yet_tested_epel_msg': {
             'value': (
                 'This update has not yet met the minimum testing requirements defined in the '
@@ -535,6 +616,12 @@ class BodhiConfig(dict):
         'query_wiki_test_cases': {
             'value': False,
             'validator': _validate_bool},
+        'release_registry.check_interval': {
+            'value': 10,
+            'validator': int},
+        'release_stats.ttl': {
+            'value': 60,
+            'validator': int},
         'release_team_address': {
             'value': 'bodhiadmin-members@fedoraproject.org',
             'validator': six.text_type},
@@ -547,6 +634,21 @@ class BodhiConfig(dict):
         'site_requirements': {
             'value': 'dist.rpmdeplint dist.upgradepath',
             'validator': six.text_type},
+        'slow_queries.backup_count': {
+            'value': 5,
+            'validator': int},
+        'slow_queries.explain': {
+            'value': True,
+            'validator': _validate_bool},
+        'slow_queries.max_bytes': {
+            'value': 10485760,
+            'validator': int},
+        'slow_queries.path': {
+            'value': None,
+            'validator': _validate_none_or(six.text_type)},
+        'slow_queries.threshold': {
+            'value': None,
+            'validator': _validate_none_or(float)},
         'smtp_server': {
             'value': None,
             'validator': _validate_none_or(six.text_type)},
@@ -566,6 +668,33 @@ class BodhiConfig(dict):
         'stats_blacklist': {
             'value': ['bodhi', 'anonymous', 'autoqa', 'taskotron'],
             'validator': _generate_list_validator()},
+        'synthetic_buildsys.arches': {
+            'value': ['aarch64', 'ppc64le', 's390x', 'x86_64'],
+            'validator': _generate_list_validator()},
+        'synthetic_buildsys.builds': {
+            'value': 100000,
+            'validator': int},
+        'synthetic_buildsys.call_latency': {
+            'value': 0.0,
+            'validator': float},
+        'synthetic_buildsys.failing_methods': {
+            'value': [],
+            'validator': _generate_list_validator()},
+        'synthetic_buildsys.failure_rate': {
+            'value': 0.0,
+            'validator': float},
+        'synthetic_buildsys.latency': {
+            'value': 0.0,
+            'validator': float},
+        'synthetic_buildsys.packages': {
+            'value': 20000,
+            'validator': int},
+        'synthetic_buildsys.releases': {
+            'value': ['26', '27', '28'],
+            'validator': _generate_list_validator()},
+        'synthetic_buildsys.seed': {
+            'value': 0,
+            'validator': int},
         'system_users': {
             'value': ['bodhi', 'autoqa', 'taskotron'],
             'validator': _generate_list_validator()},
@@ -41,7 +41,8 @@ import jinja2
 from six.moves import zip
 import six
 
-from bodhi.server import bugs, initialize_db, log, buildsys, notifications, mail
+from bodhi.server import (bugs, build_tags, initialize_db, log, buildsys, notifications, mail,
+                          monitoring)
 from bodhi.server.config import config
 from bodhi.server.exceptions import BodhiException
 from bodhi.server.metadata import UpdateInfoMetadata
@@ -79,6 +80,20 @@ def checkpoint(method):
     return wrapper
 
 
+def phase(method):
+    """
+    Decorate a method of a compose thread to record how long it takes in the masher metrics.
+
+    Checkpointed methods must be decorated by this first, so that skipped phases aren't recorded.
+
+    Args:
+        method (callable): The method to time. Its name is used as the ``phase`` label.
+    Returns:
+        callable: The timed method.
+    """
+    return monitoring.masher_phase_duration.time(phase=method.__name__)(method)
+
+
 def request_order_key(compose):
     """
     Generate a sort key for the updates documents in generate_batches.
@@ -184,8 +199,12 @@ class Masher(fedmsg.consumers.FedmsgConsumer):
                      'Cert validation disabled')
         self.max_mashes_sem = threading.BoundedSemaphore(config.get('max_concurrent_mashes'))
         super(Masher, self).__init__(hub, *args, **kw)
+        if config.get('monitoring.port'):
+            monitoring.start_http_server(config['monitoring.port'],
+                                         config['monitoring.address'])
         log.info('Bodhi masher listening on topic: %s' % self.topic)
 
+    @monitoring.consumer('masher')
     def consume(self, msg):
         """
         Receive a fedmsg and call work() with it.
@@ -464,6 +483,7 @@ class ComposerThread(threading.Thread):
         finally:
             self.finish(self.success)
 
+    @phase
     def check_all_karma_thresholds(self):
         """Run check_karma_thresholds() on testing Updates."""
         if self.compose.request is UpdateRequest.testing:
@@ -475,12 +495,14 @@ class ComposerThread(threading.Thread):
                 except BodhiException:
                     self.log.exception('Problem checking karma thresholds')
 
+    @phase
     def obsolete_older_updates(self):
         """Obsolete any older updates that may still be lying around."""
         self.log.info('Checking for obsolete updates')
         for update in self.compose.updates:
             update.obsolete_older_updates(self.db)
 
+    @phase
     def perform_gating(self):
         """Look for Updates that don't meet testing requirements, and eject them from the mash."""
         self.log.debug('Performing gating.')
@@ -563,6 +585,7 @@ class ComposerThread(threading.Thread):
             force=True,
         )
 
+    @phase
     def update_security_bugs(self):
         """Update the bug titles for security updates."""
         self.log.info('Updating bug titles for security updates')
@@ -572,6 +595,7 @@ class ComposerThread(threading.Thread):
                     bug.update_details()
 
     @checkpoint
+    @phase
     def determine_and_perform_tag_actions(self):
         """Call _determine_tag_actions() and _perform_tag_actions()."""
         self._determine_tag_actions()
@@ -579,6 +603,9 @@ class ComposerThread(threading.Thread):
 
     def _determine_tag_actions(self):
         tag_types, tag_rels = Release.get_tags(self.db)
+        # The builds are about to be moved out of their current tags, so read those from koji in a
+        # few multicalls rather than trusting the mirror.
+        build_tags.sync([build for update in self.compose.updates for build in update.builds])
         # sync & async tagging batches
         for i, batch in enumerate(sorted_updates(self.compose.updates)):
             for update in batch:
@@ -616,32 +643,59 @@ class ComposerThread(threading.Thread):
                         self.add_tags_async.extend(add_tags)
                         self.move_tags_async.extend(move_tags)
 
+    def _mirror_tag_action(self, builds, action):
+        """
+        Record a tag action that was performed in the tags mirrored for its build.
+
+        Args:
+            builds (dict): Maps the NVRs of the builds of the compose to the builds.
+            action (tuple): A (tag, nvr) 2-tuple for a build that was added to a tag, or a
+                (from_tag, to_tag, nvr) 3-tuple for a build that was moved between tags.
+        """
+        build = builds.get(action[-1])
+        if build is None:
+            return
+        if len(action) == 3:
+            build.mirror_tag(action[0], tagged=False)
+        build.mirror_tag(action[-2])
+
     def _perform_tag_actions(self):
         koji = buildsys.get_session()
-        for i, batches in enumerate([(self.add_tags_sync, self.move_tags_sync),
-                                     (self.add_tags_async, self.move_tags_async)]):
-            add, move = batches
-            if i == 0:
-                koji.multicall = False
-            else:
-                koji.multicall = True
-            for action in add:
-                tag, build = action
-                self.log.info("Adding tag %s to %s" % (tag, build))
-                koji.tagBuild(tag, build, force=True)
-            for action in move:
-                from_tag, to_tag, build = action
-                self.log.info('Moving %s from %s to %s' % (
-                              build, from_tag, to_tag))
-                koji.moveBuild(from_tag, to_tag, build, force=True)
-
-            if i != 0:
-                results = koji.multiCall()
-                failed_tasks = buildsys.wait_for_tasks([task[0] for task in results],
-                                                       koji, sleep=15)
-                if failed_tasks:
-                    raise Exception("Failed to move builds: %s" % failed_tasks)
-
+        builds = dict((build.nvr, build) for update in self.compose.updates
+                      for build in update.builds)
+        for tag, build in self.add_tags_sync:
+            self.log.info("Adding tag %s to %s" % (tag, build))
+            koji.tagBuild(tag, build, force=True)
+            self._mirror_tag_action(builds, (tag, build))
+        for from_tag, to_tag, build in self.move_tags_sync:
+            self.log.info('Moving %s from %s to %s' % (build, from_tag, to_tag))
+            koji.moveBuild(from_tag, to_tag, build, force=True)
+            self._mirror_tag_action(builds, (from_tag, to_tag, build))
+
+        calls = []
+        for tag, build in self.add_tags_async:
+            self.log.info("Adding tag %s to %s" % (tag, build))
+            calls.append(((tag, build), 'tagBuild', (tag, build), {'force': True}))
+        for from_tag, to_tag, build in self.move_tags_async:
+            self.log.info('Moving %s from %s to %s' % (build, from_tag, to_tag))
+            calls.append(((from_tag, to_tag, build), 'moveBuild', (from_tag, to_tag, build),
+                          {'force': True}))
+        # Tagging is not idempotent, so the multicalls must not be retried.
+        results = buildsys.multicall_map(calls, retries=0)
+        faults = [(action, response) for action, response in results.items()
+                  if not isinstance(response, list)]
+        # The tasks that were queued run in Koji regardless of the faults, so they are waited for
+        # and mirrored before failing, to leave the mirror in the state Koji is in.
+        queued = [(action, response[0]) for action, response in results.items()
+                  if isinstance(response, list)]
+        failed_tasks = buildsys.wait_for_tasks([task for action, task in queued], koji, sleep=15)
+        for action, task in queued:
+            if task not in failed_tasks:
+                self._mirror_tag_action(builds, action)
+        if faults or failed_tasks:
+            raise Exception("Failed to move builds: %s" % (faults + failed_tasks))
+
+    @phase
     def expire_buildroot_overrides(self):
         """Expire any buildroot overrides that are in this push."""
         for update in self.compose.updates:
@@ -653,22 +707,33 @@ class ComposerThread(threading.Thread):
                         except Exception:
                             log.exception('Problem expiring override')
 
+    @phase
     def remove_pending_tags(self):
         """Remove all pending tags from the updates."""
         self.log.debug("Removing pending tags from builds")
-        koji = buildsys.get_session()
-        koji.multicall = True
+        builds = {}
+        calls = []
         for update in self.compose.updates:
             if update.request is UpdateRequest.stable:
-                update.remove_tag(update.release.pending_stable_tag,
-                                  koji=koji)
+                tag = update.release.pending_stable_tag
             elif update.request is UpdateRequest.testing:
-                update.remove_tag(update.release.pending_testing_tag,
-                                  koji=koji)
-        result = koji.multiCall()
+                tag = update.release.pending_testing_tag
+            else:
+                continue
+            if not tag:
+                self.log.warn("Not removing builds of %s from empty tag" % update.title)
+                continue
+            for build in update.builds:
+                builds[build.nvr] = build
+                calls.append(((tag, build.nvr), 'untagBuild', (tag, build.nvr), {'force': True}))
+        result = buildsys.multicall_map(calls, retries=0)
         self.log.debug('remove_pending_tags koji.multiCall result = %r',
                        result)
+        for (tag, nvr), response in result.items():
+            if isinstance(response, list):
+                builds[nvr].mirror_tag(tag, tagged=False)
 
+    @phase
     def _mark_status_changes(self):
         """Mark each update's status as fulfilling its request."""
         self.log.info('Updating update statuses.')
@@ -713,6 +778,7 @@ class ComposerThread(threading.Thread):
                 self.add_to_digest(update)
         self.log.info('Testing digest generation for %s complete' % self.compose.release.name)
 
+    @phase
     def send_notifications(self):
         """Send fedmsgs to announce completion of mashing for each update."""
         self.log.info('Sending notifications')
@@ -729,6 +795,7 @@ class ComposerThread(threading.Thread):
             )
 
     @checkpoint
+    @phase
     def modify_bugs(self):
         """Mark bugs on each Update as modified."""
         self.log.info('Updating bugs')
@@ -737,6 +804,7 @@ class ComposerThread(threading.Thread):
             update.modify_bugs()
 
     @checkpoint
+    @phase
     def status_comments(self):
         """Add bodhi system comments to each update."""
         self.log.info('Commenting on updates')
@@ -744,6 +812,7 @@ class ComposerThread(threading.Thread):
             update.status_comment(self.db)
 
     @checkpoint
+    @phase
     def send_stable_announcements(self):
         """Send the stable announcement e-mails out."""
         self.log.info('Sending stable update announcements')
@@ -752,6 +821,7 @@ class ComposerThread(threading.Thread):
                 update.send_update_notice()
 
     @checkpoint
+    @phase
     def send_testing_digest(self):
         """Send digest mail to mailing lists."""
         self.log.info('Sending updates-testing digest')
@@ -760,7 +830,7 @@ class ComposerThread(threading.Thread):
         testhead = u'The following builds have been pushed to %s updates-testing\n\n'
 
         for prefix, content in six.iteritems(self.testing_digest):
-            release = self.db.query(Release).filter_by(long_name=prefix).one()
+            release = self._get_release(prefix)
             test_list_key = '%s_test_announce_list' % (
                 release.id_prefix.lower().replace('-', '_'))
             test_list = config.get(test_list_key)
@@ -802,6 +872,25 @@ class ComposerThread(threading.Thread):
             mail.send_mail(config.get('bodhi_email'), test_list,
                            '%s updates-testing report' % prefix, maildata)
 
+    def _get_release(self, long_name):
+        """
+        Return the Release with the given long name.
+
+        The release registry is consulted first, falling back to the database if the registry does
+        not know the release yet.
+
+        Args:
+            long_name (basestring): The long_name of the Release to be returned.
+        Returns:
+            bodhi.server.models.Release: The Release with the given long name.
+        Raises:
+            sqlalchemy.orm.exc.NoResultFound: If there is no Release with the given long name.
+        """
+        release = Release.from_long_name(long_name, self.db)
+        if release is None:
+            release = self.db.query(Release).filter_by(long_name=long_name).one()
+        return release
+
     def get_security_updates(self, release):
         """
         Return an iterable of security updates in the given release.
@@ -812,7 +901,7 @@ class ComposerThread(threading.Thread):
         Returns:
             iterable: An iterable of security Update objects from the given release.
         """
-        release = self.db.query(Release).filter_by(long_name=release).one()
+        release = self._get_release(release)
         updates = self.db.query(Update).filter(
             Update.type == UpdateType.security,
             Update.status == UpdateStatus.testing,
@@ -835,7 +924,7 @@ class ComposerThread(threading.Thread):
         Return:
             list: The list of unapproved critical path updates for the given release.
         """
-        release = self.db.query(Release).filter_by(long_name=release).one()
+        release = self._get_release(release)
         updates = self.db.query(Update).filter_by(
             critpath=True,
             status=UpdateStatus.testing,
@@ -909,6 +998,7 @@ class PungiComposerThread(ComposerThread):
             return
         self.log.info('Resuming push without any completed repos')
 
+    @phase
     def _compose_updates(self):
         """Start pungi, generate updateinfo, wait for pungi, and wait for the mirrors."""
         if not os.path.exists(self.mash_dir):
@@ -975,6 +1065,7 @@ class PungiComposerThread(ComposerThread):
 
         self._copy_additional_pungi_files(self._pungi_conf_dir, env)
 
+    @phase
     def _generate_updateinfo(self):
         """
         Create the updateinfo.xml file for this repository.
@@ -1030,6 +1121,7 @@ class PungiComposerThread(ComposerThread):
                 return val % (version, arch)
         raise ValueError("Could not find any of %s in the config file" % ','.join(keys))
 
+    @phase
     def _punge(self):
         """
         Launch the Pungi child process to "punge" the repository.
@@ -1085,6 +1177,7 @@ class PungiComposerThread(ComposerThread):
 
         return mash_process
 
+    @phase
     def _sanity_check_repo(self):
         """Sanity check our repo.
 
@@ -1147,6 +1240,7 @@ class PungiComposerThread(ComposerThread):
 
         return True
 
+    @phase
     def _stage_repo(self):
         """Symlink our updates repository into the staging directory."""
         stage_dir = config.get('mash_stage_dir')
@@ -1159,6 +1253,7 @@ class PungiComposerThread(ComposerThread):
         self.log.info("Creating symlink: %s => %s" % (link, self.path))
         os.symlink(self.path, link)
 
+    @phase
     def _wait_for_pungi(self, pungi_process):
         """
         Wait for the pungi process to exit and find the path of the repository that it produced.
@@ -1197,6 +1292,7 @@ class PungiComposerThread(ComposerThread):
         self.log.debug('Path: %s', self.path)
         self._checkpoints['completed_repo'] = self.path
 
+    @phase
     def _wait_for_sync(self):
         """
         Block until our repomd.xml hits the master mirror.
@@ -1375,32 +1471,28 @@ class ModuleComposerThread(PungiComposerThread):
         # impossible to distinguish between name and version from "nvr". We
         # therefore have to ask for Koji build here and get that information
         # from there.
-        koji = buildsys.get_session()
-        koji.multicall = True
-        for build in self.compose.release.builds:
-            koji.getBuild(build.nvr)
-        results = koji.multiCall()
+        release_builds = self.compose.release.builds
+        results = buildsys.multicall_map(
+            (build.nvr, 'getBuild', (build.nvr,), {}) for build in release_builds)
 
         # we loop through builds so we get rid of older builds and get only
         # a dict with the newest builds
         newest_builds = {}
-        for result, build in zip(results, self.compose.release.builds):
+        for build in release_builds:
+            result = results.get(build.nvr)
             self._raise_on_get_build_multicall_error(result, build)
             koji_build = result[0]
             self._add_build_to_newest_builds(newest_builds, koji_build)
 
         # make sure that the modules we want to update get their correct versions
-        for update in self.compose.updates:
-            # We need to get the Koji builds also for the updates.
-            koji.multicall = True
-            for update in self.compose.updates:
-                for build in update.builds:
-                    koji.getBuild(build.nvr)
-            results = koji.multiCall()
-            for result, build in zip(results, update.builds):
-                self._raise_on_get_build_multicall_error(result, build)
-                koji_build = result[0]
-                self._add_build_to_newest_builds(newest_builds, koji_build, True)
+        update_builds = [build for update in self.compose.updates for build in update.builds]
+        results = buildsys.multicall_map(
+            (build.nvr, 'getBuild', (build.nvr,), {}) for build in update_builds)
+        for build in update_builds:
+            result = results.get(build.nvr)
+            self._raise_on_get_build_multicall_error(result, build)
+            koji_build = result[0]
+            self._add_build_to_newest_builds(newest_builds, koji_build, True)
 
         # The keys are just used for easy name-stream finding. The name and stream are already in
         # the module definitions.
@@ -20,7 +20,8 @@
 The "signed handler".
 
 This module is responsible for marking builds as "signed" when they get moved
-from the pending-signing to pending-updates-testing tag by RoboSignatory.
+from the pending-signing to pending-updates-testing tag by RoboSignatory. It also
+keeps the local mirror of the tags of the builds Bodhi knows about up to date.
 """
 
 import logging
@@ -28,9 +29,9 @@ import pprint
 
 import fedmsg.consumers
 
-from bodhi.server import initialize_db
+from bodhi.server import buildsys, initialize_db, monitoring
 from bodhi.server.config import config
-from bodhi.server.models import Build
+from bodhi.server.models import Build, Release
 from bodhi.server.util import transactional_session_maker
 
 
@@ -41,7 +42,7 @@ class SignedHandler(fedmsg.consumers.FedmsgConsumer):
     """
     The Bodhi Signed Handler.
 
-    A fedmsg listener waiting for messages from koji about builds being tagged.
+    A fedmsg listener waiting for messages from koji about builds being tagged and untagged.
     """
 
     config_key = 'signed_handler'
@@ -60,18 +61,24 @@ class SignedHandler(fedmsg.consumers.FedmsgConsumer):
         prefix = hub.config.get('topic_prefix')
         env = hub.config.get('environment')
         self.topic = [
-            prefix + '.' + env + '.buildsys.tag'
+            prefix + '.' + env + '.buildsys.tag',
+            prefix + '.' + env + '.buildsys.untag',
         ]
 
         super(SignedHandler, self).__init__(hub, *args, **kwargs)
+        if config.get('monitoring.port'):
+            monitoring.start_http_server(config['monitoring.port'],
+                                         config['monitoring.address'])
         log.info('Bodhi signed handler listening on:\n'
                  '%s' % pprint.pformat(self.topic))
 
+    @monitoring.consumer('signed')
     def consume(self, message):
         """
         Handle fedmsgs arriving with the configured topic.
 
-        This marks a build as signed if it is assigned to the pending testing release tag.
+        This records the change in the mirrored tags of the build, and marks a build as signed if
+        it is assigned to the pending testing release tag.
 
         Example message format::
             {
@@ -96,24 +103,39 @@ class SignedHandler(fedmsg.consumers.FedmsgConsumer):
                 },
             }
 
-        The message can contain additional keys.
+        The message can contain additional keys. ``buildsys.untag`` messages have the same format.
 
         Args:
             message (dict): The incoming fedmsg in the format described above.
         """
         msg = message['body']['msg']
+        tagged = not message['body']['topic'].endswith('.buildsys.untag')
 
         build_nvr = '%(name)s-%(version)s-%(release)s' % msg
         tag = msg['tag']
 
-        log.info("%s tagged into %s" % (build_nvr, tag))
+        log.info("%s %s %s" % (build_nvr, 'tagged into' if tagged else 'untagged from', tag))
+        buildsys.invalidate_tags(build_nvr, tag)
 
         with self.db_factory() as session:
+            # Most tagging messages are about tags Bodhi doesn't use, so skip them without looking
+            # the build up.
+            tag_types, tag_rels = Release.get_tags(session)
+            if tag not in tag_rels:
+                log.info("Tag is not used by Bodhi, skipping")
+                return
+
             build = Build.get(build_nvr, session)
             if not build:
                 log.info("Build was not submitted, skipping")
                 return
 
+            build.mirror_tag(tag, tagged)
+
+            if not tagged or tag not in tag_types['pending_testing']:
+                log.info("Tag is not pending_testing tag, skipping")
+                return
+
             if not build.release:
                 log.info('Build is not assigned to release, skipping')
                 return
@@ -41,7 +41,7 @@ import time
 
 import fedmsg.consumers
 
-from bodhi.server import initialize_db, util, bugs as bug_module
+from bodhi.server import initialize_db, monitoring, util, bugs as bug_module
 from bodhi.server.config import config
 from bodhi.server.exceptions import BodhiException
 from bodhi.server.models import Bug, Update, UpdateType
@@ -92,9 +92,13 @@ class UpdatesHandler(fedmsg.consumers.FedmsgConsumer):
             bug_module.set_bugtracker()
 
         super(UpdatesHandler, self).__init__(hub, *args, **kwargs)
+        if config.get('monitoring.port'):
+            monitoring.start_http_server(config['monitoring.port'],
+                                         config['monitoring.address'])
         log.info('Bodhi updates handler listening on:\n'
                  '%s' % pprint.pformat(self.topic))
 
+    @monitoring.consumer('updates')
     def consume(self, message):
         """
         Process the given message, updating relevant bugs and test cases.
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Cache the total number of results reported by the paginated list services.
+
+Computing ``count(distinct(id))`` over a heavily joined query is often more expensive than
+fetching the page itself, and the total only changes when the underlying tables are written to.
+The totals computed here are cached per service and normalized filter set, and every cached total
+is tagged with a generation number for each of the tables it depends on. Any flush or commit that
+touches one of those tables bumps its generation, which invalidates all of the totals derived from
+it.
+
+Since the generations are kept in process memory, writes made by other processes are only noticed
+once the ``count_cache.ttl`` expires.
+"""
+from datetime import datetime
+import collections
+import itertools
+import math
+import threading
+import time
+
+from sqlalchemy import distinct, event, func
+from sqlalchemy.sql import text
+import six
+
+from bodhi.server import log, Session
+from bodhi.server.config import config
+
+
+#: Query parameters that only change which page is returned or how it is rendered.
+PRESENTATION_KEYS = frozenset(['chrome', 'display_request', 'display_user', 'page',
+                               'rows_per_page'])
+
+#: The maximum number of totals that will be kept in the cache.
+MAX_ENTRIES = 2048
+
+_lock = threading.Lock()
+_cache = collections.OrderedDict()
+_generations = collections.defaultdict(int)
+
+
+def _normalize(value):
+    """
+    Return a hashable, order independent representation of a validated query parameter.
+
+    Args:
+        value (object): A value found in ``request.validated``.
+    Returns:
+        object: A hashable representation of value.
+    """
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted((_normalize(v) for v in value), key=repr))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, '__tablename__'):
+        # Validators replace names and ids with model instances.
+        return (value.__tablename__, getattr(value, 'id', None))
+    if hasattr(value, 'value') and hasattr(value, 'description'):
+        # An EnumSymbol.
+        return value.value
+    if isinstance(value, (bool, six.integer_types, float, six.string_types)):
+        return value
+    return six.text_type(value)
+
+
+def normalize_filters(data):
+    """
+    Reduce the given query parameters to the ones that determine the size of the result set.
+
+    Args:
+        data (dict): The validated query parameters of a list service.
+    Returns:
+        tuple: A sorted tuple of (key, value) 2-tuples, suitable for use as a cache key. Parameters
+            that are None or only affect pagination or presentation are left out.
+    """
+    return tuple(sorted(
+        (k, _normalize(v)) for k, v in data.items()
+        if v is not None and k not in PRESENTATION_KEYS and not k.startswith('csrf')))
+
+
+def invalidate(*tables):
+    """
+    Invalidate every cached total that depends on any of the given tables.
+
+    Args:
+        tables (list): Names of tables that have been written to. If no table is given, the whole
+            cache is emptied.
+    """
+    with _lock:
+        if not tables:
+            _cache.clear()
+        for table in tables:
+            _generations[table] += 1
+
+
+def clear():
+    """Empty the cache and reset all generations."""
+    with _lock:
+        _cache.clear()
+        _generations.clear()
+
+
+def estimate_rows(db, table):
+    """
+    Return the query planner's estimate of the number of rows in the given table.
+
+    Only PostgreSQL keeps such statistics, so this returns None on every other database, and when
+    the table has never been analyzed.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        table (basestring): The name of the table to estimate.
+    Returns:
+        int or None: The estimated number of rows, or None if no estimate is available.
+    """
+    if db.bind is None or db.bind.dialect.name != 'postgresql':
+        return None
+    estimate = db.execute(
+        text('SELECT reltuples::bigint FROM pg_class WHERE relname = :table'),
+        {'table': table}).scalar()
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+def get_total(db, query, column, namespace, tables, filters):
+    """
+    Return the total number of distinct rows matched by the given list query.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        query (sqlalchemy.orm.query.Query): The filtered (but not yet paginated) query.
+        column (sqlalchemy.Column): The column whose distinct values are counted.
+        namespace (basestring): A name that is unique to the calling service.
+        tables (tuple): The names of the tables whose content determines the total. The first one
+            must be the table of the listed model.
+        filters (dict): The validated query parameters that were used to build the query.
+    Returns:
+        tuple: A 2-tuple of the total, and a boolean that is False if the total is an estimate.
+    """
+    normalized = normalize_filters(filters)
+    key = (namespace, normalized)
+    ttl = config.get('count_cache.ttl')
+
+    with _lock:
+        generation = tuple(_generations[t] for t in tables)
+        cached = _cache.get(key) if ttl else None
+    if cached is not None:
+        total, exact, cached_generation, timestamp = cached
+        if cached_generation == generation and time.time() - timestamp < ttl:
+            return total, exact
+
+    total = None
+    if not normalized and config.get('count_cache.estimate'):
+        total = estimate_rows(db, tables[0])
+    exact = total is None
+    if exact:
+        # We can't use ``query.count()`` here because it is naive with respect to
+        # all the joins that the services do.
+        count_query = query.with_labels().statement\
+            .with_only_columns([func.count(distinct(column))])\
+            .order_by(None)
+        total = db.execute(count_query).scalar()
+
+    if ttl:
+        with _lock:
+            # Re-insert the key so the least recently computed totals are evicted first.
+            _cache.pop(key, None)
+            _cache[key] = (total, exact, generation, time.time())
+            while len(_cache) > MAX_ENTRIES:
+                _cache.popitem(last=False)
+    return total, exact
+
+
+def paginate(request, query, column, namespace, tables, filters=None):
+    """
+    Count and paginate the given list query using the page parameters found in the request.
+
+    Args:
+        request (pyramid.request): The current request.
+        query (sqlalchemy.orm.query.Query): The filtered query.
+        column (sqlalchemy.Column): The column whose distinct values are counted.
+        namespace (basestring): A name that is unique to the calling service.
+        tables (tuple): The names of the tables whose content determines the total.
+        filters (dict or None): The query parameters used to build the query. Defaults to
+            ``request.validated``.
+    Returns:
+        dict: A dictionary with the keys ``query`` (the query limited to the requested page),
+            ``page``, ``pages``, ``rows_per_page``, ``total``, and ``total_exact``.
+    """
+    data = request.validated
+    if filters is None:
+        filters = data
+    total, exact = get_total(request.db, query, column, namespace, tables, filters)
+
+    page = data.get('page')
+    rows_per_page = data.get('rows_per_page')
+    pages = int(math.ceil(total / float(rows_per_page)))
+    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+
+    return dict(query=query, page=page, pages=pages, rows_per_page=rows_per_page, total=total,
+                total_exact=exact)
+
+
+@event.listens_for(Session, 'before_flush')
+def invalidate_flushed_tables(session, flush_context, instances):
+    """
+    Invalidate the totals that depend on tables that are about to be written to.
+
+    The tables are also remembered in the session's ``info`` dictionary, so they can be invalidated
+    again once the transaction ends.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that is being flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+        instances (list): Unused.
+    """
+    tables = set(
+        getattr(obj, '__tablename__', None)
+        for obj in itertools.chain(session.new, session.dirty, session.deleted))
+    tables.discard(None)
+    if tables:
+        invalidate(*tables)
+        session.info.setdefault('count_cache_tables', set()).update(tables)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_soft_rollback')
+def invalidate_transaction_tables(session, *args):
+    """
+    Invalidate the tables written to by a transaction that was just committed or rolled back.
+
+    Other sessions may have cached totals computed after our flush, but before our transaction
+    ended, so those totals have to be thrown away as well.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session whose transaction ended.
+        args (list): Unused.
+    """
+    tables = session.info.pop('count_cache_tables', None)
+    if tables:
+        log.debug('Invalidating cached totals for %s', ', '.join(sorted(tables)))
+        invalidate(*tables)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def invalidate_bulk_table(context):
+    """
+    Invalidate the totals that depend on the table of a ``Query.update()`` or ``Query.delete()``.
+
+    Bulk operations bypass the flush, so they need to be handled separately.
+
+    Args:
+        context (sqlalchemy.orm.persistence.BulkUD): The context of the bulk operation.
+    """
+    table = context.primary_table.name
+    invalidate(table)
+    context.session.info.setdefault('count_cache_tables', set()).add(table)
@@ -23,12 +23,18 @@ Fedora-flavored Markdown.
 Author: Ralph Bean <rbean@redhat.com>
 """
 
+import threading
+
 import markdown.inlinepatterns
 import markdown.postprocessors
 import markdown.util
 import pyramid.threadlocal
 
 
+_injected = False
+_inject_lock = threading.Lock()
+
+
 def user_url(name):
     """
     Return a URL to the given username.
@@ -73,7 +79,20 @@ def bug_url(tracker, idx):
 
 
 def inject():
-    """Hack out python-markdown to do the autolinking that we want."""
+    """
+    Hack out python-markdown to do the autolinking that we want.
+
+    This is called before markdown is first rendered, and does nothing after the first call.
+    """
+    global _injected
+    with _inject_lock:
+        if not _injected:
+            _inject()
+            _injected = True
+
+
+def _inject():
+    """Insert the Fedora-flavored patterns and postprocessors in python-markdown."""
     # build some Pattern objects for @mentions, #bugs, etc...
     class MentionPattern(markdown.inlinepatterns.Pattern):
         def handleMatch(self, m):
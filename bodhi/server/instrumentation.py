@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Account for the time web requests spend in the database and in the services Bodhi calls.
+
+The :func:`tween_factory` tween gives every request a :class:`RequestTimings`, local to the thread
+handling it. SQL statements are timed through SQLAlchemy's engine events, and the calls Bodhi
+makes to Koji, Bugzilla, other HTTP services and the SMTP server are timed with :class:`timed`.
+Work done by other threads on behalf of the request, like the chunks of
+:func:`bodhi.server.buildsys.multicall_map`, isn't accounted for.
+
+Once a request is handled, its timings are logged as a JSON line, and are added to the per-route
+aggregates returned by :func:`route_stats` and to the request latency histogram of
+:mod:`bodhi.server.monitoring`. They are also sent to the client in a ``Server-Timing`` header if
+``instrumentation.server_timing`` is True. Cornice services are routes named after the service.
+"""
+from functools import wraps
+import collections
+import json
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from bodhi.server import monitoring
+
+
+#: The categories of the timed operations, in the order they are reported in.
+CATEGORIES = ('sql', 'koji', 'koji_multicall', 'http', 'bugzilla', 'smtp')
+
+log = logging.getLogger(__name__)
+_local = threading.local()
+_lock = threading.Lock()
+_routes = {}
+
+
+class RequestTimings(object):
+    """
+    How many operations of each category a request made, and how long they took.
+
+    Attributes:
+        start (float): When the request started.
+        counts (collections.defaultdict): Maps categories to the number of operations.
+        durations (collections.defaultdict): Maps categories to the time spent in seconds.
+    """
+
+    def __init__(self):
+        """Initialize the timings."""
+        self.start = time.time()
+        self.counts = collections.defaultdict(int)
+        self.durations = collections.defaultdict(float)
+        self._active = set()
+
+    def add(self, category, duration):
+        """
+        Record an operation.
+
+        Args:
+            category (basestring): The category of the operation.
+            duration (float): How many seconds the operation took.
+        """
+        self.counts[category] += 1
+        self.durations[category] += duration
+
+    def server_timing(self, total):
+        """
+        Format the timings as the value of a ``Server-Timing`` header.
+
+        Args:
+            total (float): How many seconds the request took.
+        Returns:
+            str: The header value.
+        """
+        metrics = ['%s;dur=%.1f;desc="%d calls"' % (c, self.durations[c] * 1000, self.counts[c])
+                   for c in CATEGORIES if self.counts[c]]
+        metrics.append('total;dur=%.1f' % (total * 1000))
+        return ', '.join(metrics)
+
+
+def current():
+    """
+    Return the timings of the request the current thread is handling.
+
+    Returns:
+        RequestTimings or None: The timings, or None if the thread isn't handling a request.
+    """
+    return getattr(_local, 'timings', None)
+
+
+class timed(object):
+    """
+    Time an operation of the given category, as a context manager or a decorator.
+
+    Nothing is recorded outside of requests, and operations nested in an operation of the same
+    category, like a Bugzilla call made by another, are only accounted for once.
+    """
+
+    def __init__(self, category):
+        """
+        Initialize the timer.
+
+        Args:
+            category (basestring): The category of the operation. See :data:`CATEGORIES`.
+        """
+        self.category = category
+        self._starts = threading.local()
+
+    def __enter__(self):
+        """Start timing, unless the operation is nested in another of the same category."""
+        timings = current()
+        start = None
+        if timings is not None and self.category not in timings._active:
+            timings._active.add(self.category)
+            start = time.time()
+        self._starts.__dict__.setdefault('stack', []).append((timings, start))
+
+    def __exit__(self, *exc_info):
+        """
+        Record the operation.
+
+        Args:
+            exc_info (tuple): The exception raised by the operation, if any. Unused.
+        """
+        timings, start = self._starts.stack.pop()
+        if start is not None:
+            timings._active.discard(self.category)
+            timings.add(self.category, time.time() - start)
+
+    def __call__(self, func):
+        """
+        Time every call of the given function.
+
+        Args:
+            func (callable): The function to decorate.
+        Returns:
+            callable: The decorated function.
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return wrapper
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Remember when a SQL statement started, if it is executed for a request.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): The connection. Unused.
+        cursor (object): The DBAPI cursor. Unused.
+        statement (basestring): The statement. Unused.
+        parameters (object): The parameters of the statement. Unused.
+        context (sqlalchemy.engine.default.DefaultExecutionContext): The execution context.
+        executemany (bool): Whether the statement is executed with several sets of parameters.
+            Unused.
+    """
+    if context is not None and current() is not None:
+        context._bodhi_timing_start = time.time()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Record a SQL statement executed for a request.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): The connection. Unused.
+        cursor (object): The DBAPI cursor. Unused.
+        statement (basestring): The statement. Unused.
+        parameters (object): The parameters of the statement. Unused.
+        context (sqlalchemy.engine.default.DefaultExecutionContext): The execution context.
+        executemany (bool): Whether the statement is executed with several sets of parameters.
+            Unused.
+    """
+    start = getattr(context, '_bodhi_timing_start', None)
+    timings = current()
+    if start is not None and timings is not None:
+        timings.add('sql', time.time() - start)
+
+
+def _aggregate(route, timings, total):
+    """
+    Add the timings of a request to the aggregates of its route.
+
+    Args:
+        route (basestring): The name of the route.
+        timings (RequestTimings): The timings of the request.
+        total (float): How many seconds the request took.
+    """
+    with _lock:
+        stats = _routes.get(route)
+        if stats is None:
+            stats = _routes[route] = {'requests': 0, 'duration': 0.0, 'max_duration': 0.0}
+            for category in CATEGORIES:
+                stats['%s_count' % category] = 0
+                stats['%s_duration' % category] = 0.0
+        stats['requests'] += 1
+        stats['duration'] += total
+        stats['max_duration'] = max(stats['max_duration'], total)
+        for category in CATEGORIES:
+            stats['%s_count' % category] += timings.counts[category]
+            stats['%s_duration' % category] += timings.durations[category]
+
+
+def route_stats():
+    """
+    Return the aggregated timings of the requests handled by this process, per route.
+
+    Returns:
+        dict: Maps route names to dictionaries with the number of ``requests``, their total and
+            maximum ``duration`` and ``max_duration``, and for each category the total number of
+            operations (``sql_count``, ...) and the time spent in them (``sql_duration``, ...).
+            Durations are in seconds.
+    """
+    with _lock:
+        return dict((route, dict(stats)) for route, stats in _routes.items())
+
+
+def reset():
+    """Forget the aggregated timings."""
+    with _lock:
+        _routes.clear()
+
+
+def tween_factory(handler, registry):
+    """
+    Return a tween that accounts for the time spent handling each request.
+
+    Args:
+        handler (callable): The next handler in the chain.
+        registry (pyramid.registry.Registry): The application registry, whose settings say whether
+            the timings are sent to the clients.
+    Returns:
+        callable: The tween.
+    """
+    server_timing = registry.settings.get('instrumentation.server_timing')
+
+    def instrumentation_tween(request):
+        """
+        Handle the request, then report its timings.
+
+        Args:
+            request (pyramid.request.Request): The request.
+        Returns:
+            pyramid.response.Response: The response, with a Server-Timing header if they are sent to
+                the clients.
+        """
+        timings = _local.timings = RequestTimings()
+        try:
+            response = handler(request)
+        finally:
+            _local.timings = None
+        total = time.time() - timings.start
+
+        matched_route = getattr(request, 'matched_route', None)
+        route = matched_route.name if matched_route is not None else None
+        _aggregate(route, timings, total)
+        monitoring.request_duration.observe(total, service=route or '', method=request.method)
+        if server_timing:
+            response.headers['Server-Timing'] = timings.server_timing(total)
+
+        summary = {'route': route, 'method': request.method, 'status': response.status_int,
+                   'duration_ms': round(total * 1000, 1)}
+        for category in CATEGORIES:
+            if timings.counts[category]:
+                summary['%s_count' % category] = timings.counts[category]
+                summary['%s_ms' % category] = round(timings.durations[category] * 1000, 1)
+        log.info('Request timings: %s', json.dumps(summary, sort_keys=True))
+        return response
+
+    return instrumentation_tween
@@ -17,15 +17,28 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
 # 02110-1301, USA.
-"""A collection of utilities for sending e-mail to Bodhi users."""
+"""
+A collection of utilities for sending e-mail to Bodhi users.
+
+By default e-mails are sent synchronously, over a new SMTP connection each. If the
+``mail.spool_dir`` setting is set, they are instead written to a :class:`MailSpool` in that
+directory, and the ``bodhi-send-mail`` worker delivers them in batches over a reused connection,
+retrying the ones that could not be delivered.
+"""
 from textwrap import wrap
+import errno
+import json
+import os
 import smtplib
+import threading
+import time
+import uuid
 
 from kitchen.iterutils import iterate
 from kitchen.text.converters import to_unicode, to_bytes
 import six
 
-from bodhi.server import log
+from bodhi.server import instrumentation, log
 from bodhi.server.config import config
 from bodhi.server.util import get_rpm_header
 
@@ -457,9 +470,10 @@ def _send_mail(from_addr, to_addr, body):
         return
     smtp = None
     try:
-        log.debug('Connecting to %s', smtp_server)
-        smtp = smtplib.SMTP(smtp_server)
-        smtp.sendmail(from_addr, [to_addr], body)
+        with instrumentation.timed('smtp'):
+            log.debug('Connecting to %s', smtp_server)
+            smtp = smtplib.SMTP(smtp_server)
+            smtp.sendmail(from_addr, [to_addr], body)
     except smtplib.SMTPRecipientsRefused as e:
         log.warn('"recipient refused" for %r, %r' % (to_addr, e))
     except Exception:
@@ -469,6 +483,292 @@ def _send_mail(from_addr, to_addr, body):
             smtp.quit()
 
 
+class MailSpool(object):
+    """
+    A durable queue of e-mails waiting to be sent, stored as files in a directory.
+
+    Like in a maildir, messages are written to the ``tmp`` subdirectory and atomically renamed into
+    ``new`` once complete. A sender claims a message by renaming it into ``cur``, so several senders
+    may share a spool without sending a message twice. The file names start with the time the
+    message is due, so that messages are claimed in order and retries can be delayed. Messages that
+    failed ``mail.max_attempts`` times are moved to ``failed``, where an administrator can inspect
+    them and move them back to ``new``.
+    """
+
+    def __init__(self, path):
+        """
+        Create the subdirectories of the spool if needed.
+
+        Args:
+            path (basestring): The directory of the spool.
+        """
+        self.path = path
+        for directory in ('tmp', 'new', 'cur', 'failed'):
+            try:
+                os.makedirs(os.path.join(path, directory))
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def _path(self, directory, name):
+        """
+        Return the path of a message in one of the subdirectories of the spool.
+
+        Args:
+            directory (basestring): The subdirectory.
+            name (basestring): The file name of the message.
+        Returns:
+            basestring: The path to the message.
+        """
+        return os.path.join(self.path, directory, name)
+
+    def _write(self, directory, message, due=None):
+        """
+        Atomically write a message to the given subdirectory of the spool.
+
+        Args:
+            directory (basestring): The subdirectory to write the message to.
+            message (dict): The message, as described in :meth:`put`.
+            due (float or None): When the message should be sent. Defaults to now.
+        Returns:
+            basestring: The file name of the message.
+        """
+        name = '%017.6f-%s.json' % (due or time.time(), uuid.uuid4().hex)
+        with open(self._path('tmp', name), 'w') as f:
+            json.dump(message, f)
+        os.rename(self._path('tmp', name), self._path(directory, name))
+        return name
+
+    def put(self, from_addr, to_addrs, body):
+        """
+        Queue an e-mail.
+
+        Args:
+            from_addr (str): The e-mail address to use in the envelope from field.
+            to_addrs (list): The e-mail addresses to use in the envelope to field.
+            body (str): The e-mail, including its headers.
+        Returns:
+            basestring: The file name of the message in the spool.
+        """
+        message = {'from': to_unicode(from_addr), 'to': [to_unicode(a) for a in to_addrs],
+                   'body': to_unicode(body), 'attempts': 0}
+        return self._write('new', message)
+
+    def claim(self, limit=None):
+        """
+        Claim the messages that are due, in order.
+
+        Messages that another sender claimed first are skipped. The caller must pass every claimed
+        message to either :meth:`done` or :meth:`retry`.
+
+        Args:
+            limit (int or None): The maximum number of messages to claim.
+        Yields:
+            tuple: 2-tuples of the file name of the message and the message, as described in
+                :meth:`put`.
+        """
+        now = time.time()
+        claimed = 0
+        for name in sorted(os.listdir(os.path.join(self.path, 'new'))):
+            if float(name.split('-', 1)[0]) > now or (limit is not None and claimed >= limit):
+                break
+            try:
+                os.rename(self._path('new', name), self._path('cur', name))
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                continue
+            # The claim time tells recover() whether the sender that claimed the message died.
+            os.utime(self._path('cur', name), None)
+            with open(self._path('cur', name)) as f:
+                message = json.load(f)
+            claimed += 1
+            yield name, message
+
+    def done(self, name):
+        """
+        Remove a claimed message from the spool, once it has been sent.
+
+        Args:
+            name (basestring): The file name of the message.
+        """
+        os.unlink(self._path('cur', name))
+
+    def retry(self, name, message, to_addrs):
+        """
+        Queue a claimed message again for the recipients it could not be sent to.
+
+        The message is delayed by ``mail.retry_delay`` seconds, doubled after every attempt, or
+        moved to the ``failed`` subdirectory after ``mail.max_attempts`` attempts.
+
+        Args:
+            name (basestring): The file name of the message.
+            message (dict): The message, as returned by :meth:`claim`.
+            to_addrs (list): The addresses the message could not be sent to.
+        """
+        message = dict(message, to=to_addrs, attempts=message['attempts'] + 1)
+        if message['attempts'] >= config.get('mail.max_attempts'):
+            log.error('Giving up on sending mail to %s', ', '.join(to_addrs))
+            self._write('failed', message)
+        else:
+            delay = config.get('mail.retry_delay') * 2 ** (message['attempts'] - 1)
+            self._write('new', message, due=time.time() + delay)
+        os.unlink(self._path('cur', name))
+
+    def recover(self, age=3600):
+        """
+        Queue again the messages that were claimed by a sender that died before sending them.
+
+        Args:
+            age (int): How many seconds ago a message must have been claimed to be recovered.
+        Returns:
+            int: The number of recovered messages.
+        """
+        recovered = 0
+        for name in os.listdir(os.path.join(self.path, 'cur')):
+            try:
+                if time.time() - os.path.getmtime(self._path('cur', name)) < age:
+                    continue
+                os.rename(self._path('cur', name), self._path('new', name))
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                continue
+            recovered += 1
+        return recovered
+
+    def __len__(self):
+        """
+        Return the number of messages waiting to be sent.
+
+        Returns:
+            int: The number of messages in the ``new`` subdirectory.
+        """
+        return len(os.listdir(os.path.join(self.path, 'new')))
+
+
+_spools = {}
+
+
+def get_spool(path):
+    """
+    Return the :class:`MailSpool` in the given directory.
+
+    Args:
+        path (basestring): The directory of the spool.
+    Returns:
+        MailSpool: The spool.
+    """
+    if path not in _spools:
+        _spools[path] = MailSpool(path)
+    return _spools[path]
+
+
+class SMTPPool(object):
+    """
+    Send e-mails over SMTP connections that are reused from one message to the next.
+
+    Each thread gets its own connection. Connections are closed after an error, and after having
+    sent ``max_messages`` messages so that servers limiting the number of messages per connection
+    don't reject the next one.
+    """
+
+    def __init__(self, server, max_messages=100):
+        """
+        Initialize the pool.
+
+        Args:
+            server (basestring): The SMTP server to connect to.
+            max_messages (int): How many messages to send over a connection before closing it.
+        """
+        self.server = server
+        self.max_messages = max_messages
+        self._local = threading.local()
+
+    def sendmail(self, from_addr, to_addrs, body):
+        """
+        Send an e-mail, connecting to the server if needed.
+
+        Args:
+            from_addr (str): The e-mail address to use in the envelope from field.
+            to_addrs (list): The e-mail addresses to use in the envelope to field.
+            body (str): The e-mail, including its headers.
+        Returns:
+            dict: The recipients that were refused, as returned by ``smtplib.SMTP.sendmail()``.
+        Raises:
+            smtplib.SMTPRecipientsRefused: If all the recipients were refused. The connection is
+                kept open in that case.
+            Exception: If the e-mail could not be sent for any other reason.
+        """
+        if getattr(self._local, 'smtp', None) is None:
+            log.debug('Connecting to %s', self.server)
+            self._local.smtp = smtplib.SMTP(self.server)
+            self._local.sent = 0
+        try:
+            with instrumentation.timed('smtp'):
+                refused = self._local.smtp.sendmail(from_addr, to_addrs, body)
+        except smtplib.SMTPRecipientsRefused:
+            raise
+        except Exception:
+            self.close()
+            raise
+        self._local.sent += 1
+        if self._local.sent >= self.max_messages:
+            self.close()
+        return refused
+
+    def close(self):
+        """Close the connection of the current thread, if it has one."""
+        smtp = getattr(self._local, 'smtp', None)
+        self._local.smtp = None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                # The connection was probably already broken, which is why we are closing it.
+                smtp.close()
+
+
+def deliver(spool, pool, limit=None):
+    """
+    Send the messages that are due in the given spool.
+
+    If the server can't be reached, the rest of the claimed messages are queued again right away
+    rather than each waiting for its own connection attempt to fail.
+
+    Args:
+        spool (MailSpool): The spool to send messages from.
+        pool (SMTPPool): The pool to send the messages with.
+        limit (int or None): The maximum number of messages to send.
+    Returns:
+        tuple: A 2-tuple of the number of messages that were sent and that will be retried.
+    """
+    sent = retried = 0
+    error = None
+    for name, message in spool.claim(limit):
+        if error is not None:
+            spool.retry(name, message, message['to'])
+            retried += 1
+            continue
+        from_addr = to_bytes(message['from'])
+        to_addrs = [to_bytes(a) for a in message['to']]
+        try:
+            pool.sendmail(from_addr, to_addrs, to_bytes(message['body']))
+        except smtplib.SMTPRecipientsRefused as e:
+            log.warn('"recipient refused" for %r, %r' % (to_addrs, e))
+        except Exception as e:
+            log.exception('Unable to send mail')
+            if isinstance(e, (smtplib.SMTPConnectError, smtplib.SMTPServerDisconnected,
+                              EnvironmentError)):
+                error = e
+            spool.retry(name, message, message['to'])
+            retried += 1
+            continue
+        spool.done(name)
+        sent += 1
+    return sent, retried
+
+
 def send_mail(from_addr, to_addr, subject, body_text, headers=None):
     """
     Send an e-mail.
@@ -503,7 +803,11 @@ def send_mail(from_addr, to_addr, subject, body_text, headers=None):
     body = to_bytes('\r\n'.join(msg))
 
     log.info('Sending mail to %s: %s', to_addr, subject)
-    _send_mail(from_addr, to_addr, body)
+    spool_dir = config.get('mail.spool_dir')
+    if spool_dir:
+        get_spool(spool_dir).put(from_addr, [to_addr], body)
+    else:
+        _send_mail(from_addr, to_addr, body)
 
 
 def send(to, msg_type, update, sender=None, agent=None):
@@ -547,10 +851,10 @@ def send(to, msg_type, update, sender=None, agent=None):
             headers["In-Reply-To"] = initial_message_id
 
     subject_template = u'[Fedora Update] %s[%s] %s'
+    subject = subject_template % (critpath, msg_type, update.beautify_title(nvr=True))
+    fields = MESSAGES[msg_type]['fields'](agent, update)
+    body = MESSAGES[msg_type]['body'] % fields
     for person in iterate(to):
-        subject = subject_template % (critpath, msg_type, update.beautify_title(nvr=True))
-        fields = MESSAGES[msg_type]['fields'](agent, update)
-        body = MESSAGES[msg_type]['body'] % fields
         send_mail(sender, person, subject, body, headers=headers)
 
 
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add the package_acls table.
+
+Revision ID: 0f61ad3835aa
+Revises: f32aceac5ff9
+Create Date: 2018-03-13 09:47:12.904215
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0f61ad3835aa'
+down_revision = 'f32aceac5ff9'
+
+
+def upgrade():
+    """Create the package_acls table."""
+    op.create_table(
+        'package_acls',
+        sa.Column('package_id', sa.Integer(), nullable=False),
+        sa.Column('branch', sa.Unicode(length=64), nullable=False),
+        sa.Column('acls', sa.UnicodeText(), nullable=False),
+        sa.Column('fetched', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['package_id'], ['packages.id'], ),
+        sa.PrimaryKeyConstraint('package_id', 'branch'))
+
+
+def downgrade():
+    """Drop the package_acls table."""
+    op.drop_table('package_acls')
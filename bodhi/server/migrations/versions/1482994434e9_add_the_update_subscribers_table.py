@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add the update_subscribers table.
+
+Users are subscribed to the updates they already commented on, except for anonymous users and bodhi.
+
+Revision ID: 1482994434e9
+Revises: 0f61ad3835aa
+Create Date: 2018-03-15 14:21:37.530918
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1482994434e9'
+down_revision = '0f61ad3835aa'
+
+
+def upgrade():
+    """Create the update_subscribers table, and subscribe the commenters of updates."""
+    op.create_table(
+        'update_subscribers',
+        sa.Column('update_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('subscribed', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['update_id'], ['updates.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('update_id', 'user_id'))
+    op.execute(
+        "INSERT INTO update_subscribers (update_id, user_id, subscribed) "
+        "SELECT DISTINCT comments.update_id, comments.user_id, TRUE FROM comments "
+        "JOIN users ON users.id = comments.user_id "
+        "WHERE comments.update_id IS NOT NULL AND users.name NOT IN ('anonymous', 'bodhi')")
+
+
+def downgrade():
+    """Drop the update_subscribers table."""
+    op.drop_table('update_subscribers')
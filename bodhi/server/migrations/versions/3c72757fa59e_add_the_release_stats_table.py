@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add the release_stats table.
+
+Revision ID: 3c72757fa59e
+Revises: 9c0a34961768
+Create Date: 2018-03-08 10:41:17.230914
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3c72757fa59e'
+down_revision = '9c0a34961768'
+
+
+def upgrade():
+    """Create the release_stats table and fill it from the updates table."""
+    op.create_table(
+        'release_stats',
+        sa.Column('release_id', sa.Integer(), nullable=False),
+        sa.Column(
+            'status',
+            postgresql.ENUM('pending', 'testing', 'stable', 'unpushed', 'obsolete', 'processing',
+                            name='ck_update_status', create_type=False),
+            nullable=False),
+        sa.Column(
+            'type',
+            postgresql.ENUM('bugfix', 'security', 'newpackage', 'enhancement',
+                            name='ck_update_type', create_type=False),
+            nullable=False),
+        sa.Column('month', sa.Unicode(length=7), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['release_id'], ['releases.id'], ),
+        sa.PrimaryKeyConstraint('release_id', 'status', 'type', 'month'))
+    op.execute(
+        "INSERT INTO release_stats (release_id, status, type, month, count) "
+        "SELECT release_id, status, type, coalesce(to_char(date_submitted, 'YYYY/MM'), ''), "
+        "count(id) FROM updates "
+        "GROUP BY release_id, status, type, coalesce(to_char(date_submitted, 'YYYY/MM'), '')")
+
+
+def downgrade():
+    """Drop the release_stats table."""
+    op.drop_table('release_stats')
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add the cache_versions table.
+
+Revision ID: 8e9dc57e082d
+Revises: 3c72757fa59e
+Create Date: 2018-03-09 16:02:51.108734
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e9dc57e082d'
+down_revision = '3c72757fa59e'
+
+
+def upgrade():
+    """Create the cache_versions table, with a counter for the releases."""
+    op.create_table(
+        'cache_versions',
+        sa.Column('name', sa.Unicode(length=64), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name'))
+    op.execute("INSERT INTO cache_versions (name, version) VALUES ('releases', 0)")
+
+
+def downgrade():
+    """Drop the cache_versions table."""
+    op.drop_table('cache_versions')
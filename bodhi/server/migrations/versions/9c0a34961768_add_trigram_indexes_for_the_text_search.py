@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add trigram indexes for the text search.
+
+Revision ID: 9c0a34961768
+Revises: 2616c86d8ac6
+Create Date: 2018-03-05 14:12:48.310372
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9c0a34961768'
+down_revision = '2616c86d8ac6'
+
+
+# These need to match bodhi.server.models.TRIGRAM_INDEXED_COLUMNS.
+COLUMNS = (
+    ('buildroot_overrides', 'notes'),
+    ('builds', 'nvr'),
+    ('cves', 'cve_id'),
+    ('packages', 'name'),
+    ('stacks', 'description'),
+    ('stacks', 'name'),
+    ('updates', 'alias'),
+    ('updates', 'notes'),
+    ('updates', 'title'),
+    ('users', 'name'),
+)
+
+
+def upgrade():
+    """Enable pg_trgm and add a trigram GIN index to each searched column."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in COLUMNS:
+        op.execute('CREATE INDEX ix_{0}_{1}_trgm ON {0} USING gin ({1} gin_trgm_ops)'.format(
+            table, column))
+
+
+def downgrade():
+    """Drop the trigram indexes. The pg_trgm extension is left in place."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, column in COLUMNS:
+        op.execute('DROP INDEX ix_{0}_{1}_trgm'.format(table, column))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add the build_tags table and the builds.tags_synced column.
+
+Revision ID: f32aceac5ff9
+Revises: 8e9dc57e082d
+Create Date: 2018-03-12 11:20:37.562941
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f32aceac5ff9'
+down_revision = '8e9dc57e082d'
+
+
+def upgrade():
+    """Create the build_tags table, and add the tags_synced column to the builds table."""
+    op.create_table(
+        'build_tags',
+        sa.Column('build_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.Unicode(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['build_id'], ['builds.id'], ),
+        sa.PrimaryKeyConstraint('build_id', 'name'))
+    op.add_column('builds', sa.Column('tags_synced', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    """Drop the build_tags table and the builds.tags_synced column."""
+    op.drop_column('builds', 'tags_synced')
+    op.drop_table('build_tags')
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+A dogpile.cache backend that shares cached values between the processes of a host.
+
+The values are stored in a memory-mapped file that is divided into fixed-size slots, which are
+grouped into sets of :data:`WAYS` slots. A key can only be stored in the set its hash points to,
+and when that set is full the least recently used slot is reused. Values that don't fit in a slot
+are not cached.
+
+Reads don't take any lock. Every slot carries a sequence number that writers make odd while they
+change the slot and even again once they are done, and readers retry or give up if the number was
+odd or changed while they copied the slot. Writers to the same set are serialized with a lock on
+the set's byte range of the file, so writes to different sets don't contend.
+
+The backend also provides dogpile's creation mutex across processes, with byte-range locks on a
+separate lock file, so a value is only created by one process of the host at a time.
+
+Configure it with::
+
+    dogpile.cache.backend = bodhi.server.mmap
+    dogpile.cache.arguments.filename = /var/cache/bodhi/dogpile-cache.mmap
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from dogpile.cache import register_backend
+from dogpile.cache.api import CacheBackend, NO_VALUE
+from six.moves import cPickle as pickle
+import six
+
+
+#: The number of slots in each set.
+WAYS = 8
+#: The number of byte-range locks the creation mutexes are spread over.
+MUTEXES = 1024
+#: Identifies the layout of the file, and the parameters it was created with.
+_FILE_HEADER = struct.Struct('<8sQQ')
+_MAGIC = b'BODHIMC1'
+#: sequence number, key digest, key length, value length, last access time.
+_SLOT_HEADER = struct.Struct('<Q16sIId')
+_SEQUENCE = struct.Struct('<Q')
+_ATIME = struct.Struct('<d')
+_ATIME_OFFSET = _SLOT_HEADER.size - _ATIME.size
+#: How many times a read is attempted while the slot is being written.
+_READ_ATTEMPTS = 3
+
+
+def _digest(key):
+    """
+    Return the digest of the given key.
+
+    Args:
+        key (basestring): A cache key.
+    Returns:
+        tuple: A 2-tuple of the key encoded as bytes and its 16 byte digest.
+    """
+    if isinstance(key, six.text_type):
+        key = key.encode('utf-8')
+    return key, hashlib.md5(key).digest()
+
+
+class _Mutex(object):
+    """A lock that is exclusive across the threads and the processes of the host."""
+
+    def __init__(self, fd, index, thread_lock):
+        """
+        Initialize the mutex.
+
+        Args:
+            fd (int): The file descriptor of the lock file.
+            index (int): The offset of the byte to lock in the lock file.
+            thread_lock (threading.Lock): Serializes the threads of this process, since byte-range
+                locks are owned by processes and don't exclude threads of the same process.
+        """
+        self._fd = fd
+        self._index = index
+        self._thread_lock = thread_lock
+
+    def acquire(self, wait=True):
+        """
+        Acquire the lock.
+
+        Args:
+            wait (bool): If False, return immediately if the lock is held elsewhere.
+        Returns:
+            bool: Whether the lock was acquired.
+        """
+        if not self._thread_lock.acquire(wait):
+            return False
+        flags = fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.lockf(self._fd, flags, 1, self._index)
+        except (IOError, OSError):
+            self._thread_lock.release()
+            if wait:
+                raise
+            return False
+        return True
+
+    def release(self):
+        """Release the lock."""
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._index)
+        self._thread_lock.release()
+
+
+class MmapBackend(CacheBackend):
+    """
+    A cache backend that stores pickled values in a memory-mapped file shared by processes.
+
+    The arguments are:
+
+    filename: The path of the file to store the values in. Required.
+    lock_filename: The path of the file used for the creation mutexes. Defaults to ``filename``
+        with a ``.lock`` suffix.
+    size: The size of the file in bytes. Defaults to 64 MiB.
+    slot_size: The size of a slot in bytes, which bounds the size of a cached key and value.
+        Defaults to 128 KiB.
+
+    The file is recreated if it was created with other sizes.
+    """
+
+    def __init__(self, arguments):
+        """
+        Open, and create if needed, the cache file.
+
+        Args:
+            arguments (dict): The arguments described in the class docstring.
+        """
+        self.filename = arguments['filename']
+        self.lock_filename = arguments.get('lock_filename', self.filename + '.lock')
+        self.slot_size = int(arguments.get('slot_size', 128 * 1024))
+        size = int(arguments.get('size', 64 * 1024 * 1024))
+        self.sets = max((size - mmap.PAGESIZE) // (self.slot_size * WAYS), 1)
+        self.size = mmap.PAGESIZE + self.sets * WAYS * self.slot_size
+        self.capacity = self.slot_size - _SLOT_HEADER.size
+
+        self._fd = self._open()
+        self._lock_fd = os.open(self.lock_filename, os.O_RDWR | os.O_CREAT, 0o600)
+        self._map = mmap.mmap(self._fd, self.size)
+        self._set_locks = [threading.Lock() for i in range(min(self.sets, MUTEXES))]
+        self._mutex_locks = [threading.Lock() for i in range(MUTEXES)]
+
+    def _open(self):
+        """
+        Open the cache file, creating it unless another process already did with the same sizes.
+
+        Returns:
+            int: A file descriptor of the cache file.
+        """
+        expected = _FILE_HEADER.pack(_MAGIC, self.sets, self.slot_size)
+        while True:
+            fd = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.lockf(fd, fcntl.LOCK_EX, mmap.PAGESIZE, 0)
+            try:
+                if os.fstat(fd).st_ino != os.stat(self.filename).st_ino:
+                    # Another process replaced the file while we waited for the lock.
+                    os.close(fd)
+                    continue
+                os.lseek(fd, 0, os.SEEK_SET)
+                if os.read(fd, _FILE_HEADER.size) == expected and \
+                        os.fstat(fd).st_size == self.size:
+                    fcntl.lockf(fd, fcntl.LOCK_UN, mmap.PAGESIZE, 0)
+                    return fd
+
+                # The file is new, or was made with other sizes. Other processes may still have it
+                # mapped, so it is replaced rather than truncated under their feet. A new file is
+                # filled with zeroes, which marks every slot as empty.
+                temporary = '%s.%d.tmp' % (self.filename, os.getpid())
+                new_fd = os.open(temporary, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+                os.ftruncate(new_fd, self.size)
+                os.write(new_fd, expected)
+                os.rename(temporary, self.filename)
+                os.close(fd)
+                return new_fd
+            except Exception:
+                os.close(fd)
+                raise
+
+    def _set_of(self, digest):
+        """
+        Return the index of the set the given key digest is stored in.
+
+        Args:
+            digest (bytes): The digest of a key.
+        Returns:
+            int: The index of the set.
+        """
+        return struct.unpack('<Q', digest[:8])[0] % self.sets
+
+    def _offsets(self, set_index):
+        """
+        Return the offsets of the slots of the given set.
+
+        Args:
+            set_index (int): The index of the set.
+        Returns:
+            list: The offsets of the slots in the file.
+        """
+        first = mmap.PAGESIZE + set_index * WAYS * self.slot_size
+        return [first + i * self.slot_size for i in range(WAYS)]
+
+    def _read(self, offset, key, digest):
+        """
+        Read the value stored in a slot for the given key, without locking.
+
+        Args:
+            offset (int): The offset of the slot.
+            key (bytes): The key.
+            digest (bytes): The digest of the key.
+        Returns:
+            bytes or None: The pickled value, or None if the slot doesn't hold the key.
+        """
+        for attempt in range(_READ_ATTEMPTS):
+            sequence, slot_digest, key_length, value_length, atime = \
+                _SLOT_HEADER.unpack_from(self._map, offset)
+            if sequence % 2:
+                continue
+            if slot_digest != digest:
+                return None
+            start = offset + _SLOT_HEADER.size
+            data = self._map[start:start + min(key_length + value_length, self.capacity)]
+            if _SEQUENCE.unpack_from(self._map, offset)[0] != sequence:
+                continue
+            if data[:key_length] != key:
+                return None
+            # The access time is only a hint for the eviction, so it is updated without a lock.
+            _ATIME.pack_into(self._map, offset + _ATIME_OFFSET, time.time())
+            return data[key_length:]
+        return None
+
+    def _write(self, offset, digest, key, payload):
+        """
+        Write a slot. The caller must hold the lock of the slot's set.
+
+        Args:
+            offset (int): The offset of the slot.
+            digest (bytes): The digest of the key, or empty bytes to mark the slot as empty.
+            key (bytes): The key.
+            payload (bytes): The pickled value.
+        """
+        sequence = _SEQUENCE.unpack_from(self._map, offset)[0]
+        _SEQUENCE.pack_into(self._map, offset, sequence + 1)
+        start = offset + _SLOT_HEADER.size
+        self._map[start:start + len(key) + len(payload)] = key + payload
+        _SLOT_HEADER.pack_into(self._map, offset, sequence + 1, digest, len(key), len(payload),
+                               time.time())
+        _SEQUENCE.pack_into(self._map, offset, sequence + 2)
+
+    def _locked_set(self, set_index):
+        """
+        Return the lock that serializes the writers of the given set.
+
+        Args:
+            set_index (int): The index of the set.
+        Returns:
+            _Mutex: The lock, which must be acquired and released by the caller.
+        """
+        offset = self._offsets(set_index)[0]
+        return _Mutex(self._fd, offset, self._set_locks[set_index % len(self._set_locks)])
+
+    def get(self, key):
+        """
+        Return the value stored for the given key.
+
+        Args:
+            key (basestring): The key.
+        Returns:
+            dogpile.cache.api.CachedValue or NO_VALUE: The value, or NO_VALUE if it isn't cached.
+        """
+        key, digest = _digest(key)
+        for offset in self._offsets(self._set_of(digest)):
+            payload = self._read(offset, key, digest)
+            if payload is not None:
+                return pickle.loads(payload)
+        return NO_VALUE
+
+    def get_multi(self, keys):
+        """
+        Return the values stored for the given keys.
+
+        Args:
+            keys (list): The keys.
+        Returns:
+            list: The values, or NO_VALUE for the keys that aren't cached.
+        """
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used value of its set if needed.
+
+        Args:
+            key (basestring): The key.
+            value (dogpile.cache.api.CachedValue): The value to store.
+        """
+        key, digest = _digest(key)
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(key) + len(payload) > self.capacity:
+            return
+
+        set_index = self._set_of(digest)
+        lock = self._locked_set(set_index)
+        lock.acquire()
+        try:
+            victim = None
+            oldest = None
+            for offset in self._offsets(set_index):
+                sequence, slot_digest, key_length, value_length, atime = \
+                    _SLOT_HEADER.unpack_from(self._map, offset)
+                if slot_digest == digest:
+                    victim = offset
+                    break
+                if oldest is None or atime < oldest:
+                    victim, oldest = offset, atime
+            self._write(victim, digest, key, payload)
+        finally:
+            lock.release()
+
+    def set_multi(self, mapping):
+        """
+        Store several values.
+
+        Args:
+            mapping (dict): Maps the keys to the values to store.
+        """
+        for key, value in mapping.items():
+            self.set(key, value)
+
+    def delete(self, key):
+        """
+        Delete the value stored for the given key.
+
+        Args:
+            key (basestring): The key.
+        """
+        key, digest = _digest(key)
+        set_index = self._set_of(digest)
+        lock = self._locked_set(set_index)
+        lock.acquire()
+        try:
+            for offset in self._offsets(set_index):
+                if _SLOT_HEADER.unpack_from(self._map, offset)[1] == digest:
+                    self._write(offset, b'\0' * 16, b'', b'')
+        finally:
+            lock.release()
+
+    def delete_multi(self, keys):
+        """
+        Delete the values stored for the given keys.
+
+        Args:
+            keys (list): The keys.
+        """
+        for key in keys:
+            self.delete(key)
+
+    def get_mutex(self, key):
+        """
+        Return the mutex that serializes the creation of the given key's value on this host.
+
+        Args:
+            key (basestring): The key.
+        Returns:
+            _Mutex: The mutex.
+        """
+        index = self._set_of(_digest(key)[1]) % MUTEXES
+        return _Mutex(self._lock_fd, index, self._mutex_locks[index])
+
+
+register_backend('bodhi.server.mmap', __name__, 'MmapBackend')
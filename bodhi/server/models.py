@@ -20,20 +20,19 @@
 
 from collections import defaultdict
 from datetime import datetime
+from itertools import chain
 from textwrap import wrap
 import copy
 import hashlib
 import json
 import os
 import re
-import rpm
+import threading
 import time
 import uuid
 
-from pkgdb2client import PkgDB
-from simplemediawiki import MediaWiki
 from six.moves.urllib.parse import quote
-from sqlalchemy import (and_, Boolean, Column, DateTime, event, ForeignKey,
+from sqlalchemy import (and_, Boolean, Column, DateTime, DDL, event, ForeignKey,
                         Integer, or_, Table, Unicode, UnicodeText, UniqueConstraint)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import class_mapper, relationship, backref, validates
@@ -857,14 +856,7 @@ class Release(Base):
             defaultdict: Mapping strings of :class:`ReleaseState` names to lists of dictionaries
             that describe the releases in those states.
         """
-        if cls._all_releases:
-            return cls._all_releases
-        releases = defaultdict(list)
-        for release in session.query(cls).order_by(cls.name.desc()).all():
-            releases[release.state.value].append(release.__json__())
-        cls._all_releases = releases
-        return cls._all_releases
-    _all_releases = None
+        return release_registry.snapshot(session).by_state
 
     @classmethod
     def get_tags(cls, session):
@@ -879,19 +871,8 @@ class Release(Base):
             releases that correspond to those tag semantics. The second element maps each koji tag
             to the release's name that uses it.
         """
-        if cls._tag_cache:
-            return cls._tag_cache
-        data = {'candidate': [], 'testing': [], 'stable': [], 'override': [],
-                'pending_testing': [], 'pending_stable': []}
-        tags = {}  # tag -> release lookup
-        for release in session.query(cls).all():
-            for key in data:
-                tag = getattr(release, '%s_tag' % key)
-                data[key].append(tag)
-                tags[tag] = release.name
-        cls._tag_cache = (data, tags)
-        return cls._tag_cache
-    _tag_cache = None
+        snapshot = release_registry.snapshot(session)
+        return snapshot.tag_types, snapshot.tags
 
     @classmethod
     def from_tags(cls, tags, session):
@@ -904,13 +885,232 @@ class Release(Base):
         Returns:
             Release or None: The first release found that matches the first tag. If no release is
                 found, ``None`` is returned.
+        Raises:
+            KeyError: If one of the tags that is checked is not used by any release.
         """
-        tag_types, tag_rels = cls.get_tags(session)
+        snapshot = release_registry.snapshot(session)
         for tag in tags:
-            release = session.query(cls).filter_by(name=tag_rels[tag]).first()
+            # Query.get() only emits SQL if the release isn't in the session's identity map yet.
+            release = session.query(cls).get(snapshot.ids[snapshot.tags[tag]])
             if release:
                 return release
 
+    @classmethod
+    def from_name(cls, name, session):
+        """
+        Return the release with the given name, upper-cased name or version.
+
+        Args:
+            name (basestring): The name of the release, such as 'F27' or 'f27', or its version, such
+                as '27'.
+            session (sqlalchemy.orm.session.Session): A database session.
+        Returns:
+            Release or None: The release, or ``None`` if there is no matching release.
+        """
+        snapshot = release_registry.snapshot(session)
+        for release_id in (snapshot.ids.get(name), snapshot.ids.get(name.upper()),
+                           snapshot.versions.get(name)):
+            if release_id is not None:
+                # Query.get() only emits SQL if the release isn't in the session's identity map yet.
+                return session.query(cls).get(release_id)
+
+    @classmethod
+    def from_long_name(cls, long_name, session):
+        """
+        Return the release with the given long name.
+
+        Args:
+            long_name (basestring): The long name of the release, such as 'Fedora 27'.
+            session (sqlalchemy.orm.session.Session): A database session.
+        Returns:
+            Release or None: The release, or ``None`` if there is no release with that long name.
+        """
+        release_id = release_registry.snapshot(session).long_names.get(long_name)
+        if release_id is not None:
+            return session.query(cls).get(release_id)
+
+
+class CacheVersion(Base):
+    """
+    A counter that is incremented whenever the data behind a process-wide cache changes.
+
+    Processes compare the version they cached data at against the current one to find out whether
+    another process changed that data.
+
+    Attributes:
+        __tablename__ (str): The name of the table in the database.
+        id (None): We don't want the superclass's primary key since we will use a natural primary
+            key for this model.
+        name (unicode): The name of the cache.
+        version (int): The current version of the cached data.
+    """
+
+    __tablename__ = 'cache_versions'
+
+    id = None
+    name = Column(Unicode(64), primary_key=True, nullable=False)
+    version = Column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls, name, session):
+        """
+        Return the current version of the given cache.
+
+        Args:
+            name (unicode): The name of the cache.
+            session (sqlalchemy.orm.session.Session): A database session.
+        Returns:
+            int: The version, which is 0 if the cache was never bumped.
+        """
+        version = session.execute(
+            cls.__table__.select().with_only_columns([cls.__table__.c.version]).where(
+                cls.__table__.c.name == name)).scalar()
+        return version or 0
+
+    @classmethod
+    def bump(cls, name, session):
+        """
+        Increment the version of the given cache, as part of the session's transaction.
+
+        Args:
+            name (unicode): The name of the cache.
+            session (sqlalchemy.orm.session.Session): A database session.
+        """
+        table = cls.__table__
+        result = session.execute(
+            table.update().where(table.c.name == name).values(version=table.c.version + 1))
+        if not result.rowcount:
+            session.execute(table.insert().values(name=name, version=1))
+
+
+class _ReleaseSnapshot(object):
+    """
+    A view of the releases, as held by the :class:`ReleaseRegistry`.
+
+    Attributes:
+        version (int): The :class:`CacheVersion` of the releases this snapshot was loaded at.
+        timestamp (float): When the version was last checked against the database.
+        by_state (defaultdict): The value returned by :meth:`Release.all_releases`.
+        tag_types (dict): The first element of the tuple returned by :meth:`Release.get_tags`.
+        tags (dict): Maps each koji tag to the name of the release that uses it.
+        ids (dict): Maps each release name to its primary key.
+        versions (dict): Maps each release version to the primary key of the first release with
+            that version.
+        long_names (dict): Maps each release long name to its primary key.
+    """
+
+    def __init__(self, version, releases):
+        """
+        Build the snapshot.
+
+        Args:
+            version (int): See the class attributes.
+            releases (list): All of the :class:`Releases <Release>`.
+        """
+        self.version = version
+        self.timestamp = time.time()
+        self.by_state = defaultdict(list)
+        self.tag_types = {'candidate': [], 'testing': [], 'stable': [], 'override': [],
+                          'pending_testing': [], 'pending_stable': []}
+        self.tags = {}
+        self.ids = {}
+        self.versions = {}
+        self.long_names = {}
+        for release in sorted(releases, key=lambda r: r.id):
+            self.ids[release.name] = release.id
+            self.versions.setdefault(release.version, release.id)
+            self.long_names[release.long_name] = release.id
+            for key in self.tag_types:
+                tag = getattr(release, '%s_tag' % key)
+                self.tag_types[key].append(tag)
+                self.tags[tag] = release.name
+        for release in sorted(releases, key=lambda r: r.name, reverse=True):
+            self.by_state[release.state.value].append(release.__json__())
+
+
+class ReleaseRegistry(object):
+    """
+    A process-wide cache of the releases and the koji tags they use.
+
+    The releases are loaded once, and reloaded when the ``releases`` :class:`CacheVersion` changes.
+    The version is checked at most every ``release_registry.check_interval`` seconds. Changes made
+    to releases in this process invalidate the registry right away, and bump the version so other
+    processes notice as well.
+    """
+
+    name = u'releases'
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        """Forget the loaded releases, so they are reloaded the next time they are needed."""
+        with self._lock:
+            self._snapshot = None
+
+    def snapshot(self, session):
+        """
+        Return the current snapshot of the releases, loading it if needed.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+        Returns:
+            _ReleaseSnapshot: The releases.
+        """
+        snapshot = self._snapshot
+        now = time.time()
+        if snapshot is not None and \
+                now - snapshot.timestamp < config.get('release_registry.check_interval'):
+            return snapshot
+
+        version = CacheVersion.current(self.name, session)
+        if snapshot is not None and snapshot.version == version:
+            snapshot.timestamp = now
+            return snapshot
+
+        snapshot = _ReleaseSnapshot(version, session.query(Release).all())
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+
+release_registry = ReleaseRegistry()
+
+
+@event.listens_for(Session, 'after_flush')
+def _releases_flushed(session, flush_context):
+    """
+    Invalidate the release registry if releases were changed, and bump their version.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that was flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+    """
+    added_or_deleted = any(isinstance(r, Release) for r in chain(session.new, session.deleted))
+    modified = any(isinstance(r, Release) and session.is_modified(r) for r in session.dirty)
+    if added_or_deleted or modified:
+        CacheVersion.bump(ReleaseRegistry.name, session)
+        session.info['release_registry_changed'] = True
+        release_registry.invalidate()
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_soft_rollback')
+def _releases_transaction_ended(session, *args):
+    """
+    Invalidate the release registry once a transaction that changed releases ends.
+
+    Other requests may have reloaded the registry while the transaction was in progress.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session whose transaction ended.
+        args (list): Unused.
+    """
+    if session.info.pop('release_registry_changed', None):
+        release_registry.invalidate()
+
 
 class TestCase(Base):
     """
@@ -989,6 +1189,8 @@ class Package(Base):
         watchergroups = []
         committergroups = []
 
+        from pkgdb2client import PkgDB
+
         pkgdb = PkgDB(settings.get('pkgdb_url'))
         acls = pkgdb.get_package(self.name, branches=branch)
 
@@ -1061,6 +1263,8 @@ class Package(Base):
         start = datetime.utcnow()
         log.debug('Querying the wiki for test cases')
 
+        from simplemediawiki import MediaWiki
+
         wiki = MediaWiki(config.get('wiki_url'))
         cat_page = 'Category:Package %s test cases' % self.name
 
@@ -1195,11 +1399,15 @@ class Build(Base):
             of.
         type (int): The polymorphic identify of the row. This is used by sqlalchemy to identify
             which subclass of Build to use.
+        tags_synced (DateTime): When the local mirror of the build's Koji tags was last read from
+            Koji, or None if it has never been populated.
+        mirrored_tags (sqlalchemy.orm.relationship): The :class:`BuildTags <BuildTag>` mirroring
+            the build's Koji tags.
     """
 
     __tablename__ = 'builds'
     __exclude_columns__ = ('id', 'package', 'package_id', 'release',
-                           'update_id', 'update', 'override')
+                           'update_id', 'update', 'override', 'tags_synced', 'mirrored_tags')
     __get_by__ = ('nvr',)
 
     nvr = Column(Unicode(100), unique=True, nullable=False)
@@ -1208,8 +1416,10 @@ class Build(Base):
     signed = Column(Boolean, default=False, nullable=False)
     update_id = Column(Integer, ForeignKey('updates.id'))
     ci_url = Column(UnicodeText, default=None, nullable=True)
+    tags_synced = Column(DateTime, default=None, nullable=True)
 
     release = relationship('Release', backref='builds', lazy=False)
+    mirrored_tags = relationship('BuildTag', cascade='all, delete-orphan')
 
     type = Column(ContentType.db_type(), nullable=False)
     __mapper_args__ = {
@@ -1232,15 +1442,70 @@ class Build(Base):
         """
         Return a list of koji tags for this build.
 
+        The tags are served from the local mirror if it was synced less than ``build_tags.max_age``
+        seconds ago. Otherwise they are read from Koji, and the mirror is refreshed.
+
         Args:
-            koji (bodhi.server.buildsys.Buildsysem or koji.ClientSession): A koji client. Defaults
-                to calling bodhi.server.buildsys.get_session().
+            koji (bodhi.server.buildsys.Buildsysem or koji.ClientSession): A koji client. If given,
+                the tags are always read from Koji. Defaults to calling
+                bodhi.server.buildsys.get_session() if the mirror can't be used.
         Return:
             list: A list of strings of the Koji tags on this Build.
         """
+        if koji is None and self.tags_fresh:
+            return sorted(tag.name for tag in self.mirrored_tags)
         if not koji:
             koji = buildsys.get_session()
-        return [tag['name'] for tag in koji.listTags(self.nvr)]
+        tags = [tag['name'] for tag in koji.listTags(self.nvr)]
+        self.set_tags(tags)
+        return tags
+
+    @property
+    def tags_fresh(self):
+        """
+        Return whether the local mirror of this build's tags can be used.
+
+        Returns:
+            bool: True if the mirror was synced less than ``build_tags.max_age`` seconds ago.
+        """
+        max_age = config.get('build_tags.max_age')
+        return bool(max_age and self.tags_synced and
+                    (datetime.utcnow() - self.tags_synced).total_seconds() < max_age)
+
+    def set_tags(self, tags, synced=None):
+        """
+        Replace the mirror of this build's tags with the given tags, as read from Koji.
+
+        Args:
+            tags (list): The names of all the tags of the build.
+            synced (datetime or None): When the tags were read. Defaults to now.
+        """
+        current = dict((tag.name, tag) for tag in self.mirrored_tags)
+        for name in set(current) - set(tags):
+            self.mirrored_tags.remove(current[name])
+        for name in set(tags) - set(current):
+            self.mirrored_tags.append(BuildTag(name=name))
+        self.tags_synced = synced or datetime.utcnow()
+
+    def mirror_tag(self, tag, tagged=True):
+        """
+        Record that this build was added to or removed from the given tag.
+
+        Nothing is recorded if the mirror was never populated, since the next :meth:`get_tags` call
+        will read all the tags from Koji anyway.
+
+        Args:
+            tag (basestring): The name of the tag.
+            tagged (bool): True if the build was added to the tag, False if it was removed from it.
+        """
+        if self.tags_synced is None:
+            return
+        current = [t for t in self.mirrored_tags if t.name == tag]
+        if tagged and not current:
+            self.mirrored_tags.append(BuildTag(name=tag))
+        elif not tagged:
+            for t in current:
+                self.mirrored_tags.remove(t)
 
     def untag(self, koji, db):
         """
@@ -1255,6 +1520,7 @@ class Build(Base):
             if tag in tag_rels:
                 log.info('Removing %s tag from %s' % (tag, self.nvr))
                 koji.untagBuild(tag, self.nvr)
+                self.mirror_tag(tag, tagged=False)
 
     def unpush(self, koji):
         """
@@ -1280,6 +1546,8 @@ class Build(Base):
                     'Moving %s from %s to %s' % (
                         self.nvr, tag, release.candidate_tag))
                 koji.moveBuild(tag, release.candidate_tag, self.nvr)
+        # The next lookup will read the resulting tags from Koji.
+        self.tags_synced = None
 
 
 class ContainerBuild(Build):
@@ -1355,6 +1623,8 @@ class RpmBuild(Build):
             basestring or None: An nvr string, formatted like RpmBuild.nvr. If there is no other
                 Build, returns ``None``.
         """
+        import rpm
+
         koji_session = buildsys.get_session()
 
         # Grab a list of builds tagged with ``Release.stable_tag`` release
@@ -1492,10 +1762,12 @@ class Update(Base):
             (e.g. 2 of 32 required tests failed).
         compose (Compose): The :class:`Compose` that this update is currently being mashed in. The
             update is locked if this is defined.
+        subscriptions (sqlalchemy.orm.dynamic.AppenderQuery): The :class:`UpdateSubscribers
+            <UpdateSubscriber>` recording who subscribed to or unsubscribed from the update.
     """
 
     __tablename__ = 'updates'
-    __exclude_columns__ = ('id', 'user_id', 'release_id', 'cves')
+    __exclude_columns__ = ('id', 'user_id', 'release_id', 'cves', 'subscriptions')
     __include_extras__ = ('meets_testing_requirements', 'url',)
     __get_by__ = ('title', 'alias')
 
@@ -1550,6 +1822,8 @@ class Update(Base):
                             order_by='Comment.timestamp')
     builds = relationship('Build', backref=backref('update', lazy='joined'), lazy='joined',
                           order_by='Build.nvr')
+    subscriptions = relationship('UpdateSubscriber', cascade='all, delete-orphan',
+                                 lazy='dynamic')
     # If the update is locked and a Compose exists for the same release and request, this will be
     # set to that Compose.
     compose = relationship(
@@ -2031,6 +2305,8 @@ class Update(Base):
         If a build is associated with multiple updates, make sure that
         all updates are safe to obsolete, or else just skip it.
         """
+        import rpm
+
         caveats = []
         for build in self.builds:
             for oldBuild in db.query(Build).join(Update).filter(
@@ -2469,6 +2745,7 @@ class Update(Base):
         koji.multicall = True
         for build in self.builds:
             koji.tagBuild(tag, build.nvr, force=True)
+            build.mirror_tag(tag)
         return koji.multiCall()
 
     def remove_tag(self, tag, koji=None):
@@ -2495,6 +2772,7 @@ class Update(Base):
             koji.multicall = True
         for build in self.builds:
             koji.untagBuild(tag, build.nvr, force=True)
+            build.mirror_tag(tag, tagged=False)
         if return_multicall:
             return koji.multiCall()
 
@@ -2834,20 +3112,10 @@ class Update(Base):
                 agent=author,
             ))
 
-        # Send a notification to everyone that has commented on this update
-        people = set()
-        for person in self.get_maintainers():
-            if person.email:
-                people.add(person.email)
-            else:
-                people.add(person.name)
-        for comment in self.comments:
-            if comment.anonymous or comment.user.name == u'bodhi':
-                continue
-            if comment.user.email:
-                people.add(comment.user.email)
-            else:
-                people.add(comment.user.name)
+        # Subscribe the author to the update, and notify everyone that is subscribed to it
+        if not anonymous and author != u'bodhi':
+            self.subscribe(session, user, explicit=False)
+        people = set(person.email or person.name for person in self.get_subscribers(session))
         mail.send(people, 'comment', self, sender=None, agent=author)
         return comment, caveats
 
@@ -2966,6 +3234,54 @@ class Update(Base):
                     people.add(committer)
         return list(people)
 
+    def subscribe(self, session, user, subscribed=True, explicit=True):
+        """
+        Subscribe a user to, or unsubscribe them from, the e-mail notifications about this update.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+            user (User): The user to subscribe or unsubscribe.
+            subscribed (bool): False to unsubscribe the user.
+            explicit (bool): If False, the subscription is implied by something the user did, such
+                as commenting, and does not override an earlier choice of the user.
+        Returns:
+            UpdateSubscriber: The user's subscription.
+        """
+        subscription = session.query(UpdateSubscriber).get((self.id, user.id))
+        if subscription is None:
+            subscription = UpdateSubscriber(update_id=self.id, user_id=user.id)
+            session.add(subscription)
+        elif not explicit:
+            return subscription
+        subscription.subscribed = subscribed
+        session.flush()
+        return subscription
+
+    def get_subscribers(self, session):
+        """
+        Return the users who should be notified about this update, with a single query.
+
+        They are the submitter of the update, the committers of its packages, and the users who
+        subscribed to it, minus the ones who unsubscribed from it.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+        Returns:
+            list: The subscribed :class:`Users <User>`, sorted by name.
+        """
+        subscriptions = session.query(UpdateSubscriber.user_id)\
+            .filter(UpdateSubscriber.update_id == self.id)
+        subscribed = subscriptions.filter(UpdateSubscriber.subscribed == True)  # noqa: E712
+        unsubscribed = subscriptions.filter(UpdateSubscriber.subscribed == False)  # noqa: E712
+        committers = session.query(user_package_table.c.user_id)\
+            .join(Build, Build.package_id == user_package_table.c.package_id)\
+            .filter(Build.update_id == self.id)
+        return session.query(User)\
+            .filter(or_(User.id == self.user_id, User.id.in_(subscribed),
+                        User.id.in_(committers)))\
+            .filter(~User.id.in_(unsubscribed))\
+            .order_by(User.name).all()
+
     @property
     def product_version(self):
         """
@@ -3012,14 +3328,11 @@ class Update(Base):
 
             # query results for each build
             # retrieve timestamp for each build so that queries can be optimized
-            koji = buildsys.get_session()
-            koji.multicall = True
-            for build in self.builds:
-                koji.getBuild(build.nvr)
-            buildinfos = koji.multiCall()
+            buildinfos = buildsys.multicall_map(
+                (build.nvr, 'getBuild', (build.nvr,), {}) for build in self.builds)
 
-            for index, build in enumerate(self.builds):
-                multicall_response = buildinfos[index]
+            for build in self.builds:
+                multicall_response = buildinfos.get(build.nvr)
                 if (not isinstance(multicall_response, list) or
                         not isinstance(multicall_response[0], dict)):
                     msg = ("Error retrieving data from Koji for %r: %r" %
@@ -3594,6 +3907,118 @@ class Compose(Base):
 event.listen(Compose.state, 'set', Compose.update_state_date, active_history=True)
 
 
+class ReleaseStat(Base):
+    """
+    The number of updates in a release with a given status and type, submitted in a given month.
+
+    These rows are a materialized summary of the updates table, which :mod:`bodhi.server.stats`
+    keeps up to date as updates change and uses to display the release statistics.
+
+    Attributes:
+        __tablename__ (str): The name of the table in the database.
+        id (None): We don't want the superclass's primary key since we will use a natural primary
+            key for this model.
+        release_id (int): The primary key of the :class:`Release` the updates belong to.
+        status (UpdateStatus): The status of the updates.
+        type (UpdateType): The type of the updates.
+        month (unicode): The month the updates were submitted in, formatted as ``YYYY/MM``.
+        count (int): The number of matching updates.
+    """
+
+    __tablename__ = 'release_stats'
+
+    # These together form the primary key.
+    release_id = Column(Integer, ForeignKey('releases.id'), primary_key=True, nullable=False)
+    status = Column(UpdateStatus.db_type(), primary_key=True, nullable=False)
+    type = Column(UpdateType.db_type(), primary_key=True, nullable=False)
+    month = Column(Unicode(7), primary_key=True, nullable=False)
+
+    id = None
+    count = Column(Integer, nullable=False, default=0)
+
+
+class PackageAcl(Base):
+    """
+    The commit ACLs of a :class:`Package`, as last read from the ACL system.
+
+    :mod:`bodhi.server.acls` caches the ACLs of the packages in these rows, so that checking whether
+    a user can edit an update doesn't have to wait for Pagure or pkgdb.
+
+    Attributes:
+        __tablename__ (str): The name of the table in the database.
+        id (None): We don't want the superclass's primary key since we will use a natural primary
+            key for this model.
+        package_id (int): The primary key of the :class:`Package`. Since packages are unique per
+            name and type, this identifies the repository's namespace as well.
+        branch (unicode): The branch the ACLs apply to for pkgdb, or an empty string for Pagure.
+        acls (unicode): The JSON-encoded ACLs, as returned by
+            :meth:`Package.get_pkg_committers_from_pagure` or :meth:`Package.get_pkg_pushers`.
+        fetched (DateTime): When the ACLs were read from the ACL system.
+    """
+
+    __tablename__ = 'package_acls'
+
+    # These together form the primary key.
+    package_id = Column(Integer, ForeignKey('packages.id'), primary_key=True, nullable=False)
+    branch = Column(Unicode(64), primary_key=True, nullable=False, default=u'')
+
+    id = None
+    acls = Column(UnicodeText, nullable=False)
+    fetched = Column(DateTime, nullable=False)
+
+
+class BuildTag(Base):
+    """
+    A Koji tag of a :class:`Build`.
+
+    These rows mirror the tags of the builds Bodhi knows about, so that tag lookups don't need to
+    ask Koji. :class:`bodhi.server.consumers.signed.SignedHandler` keeps them up to date as builds
+    are tagged and untagged, and :mod:`bodhi.server.build_tags` reconciles them with Koji.
+
+    Attributes:
+        __tablename__ (str): The name of the table in the database.
+        id (None): We don't want the superclass's primary key since we will use a natural primary
+            key for this model.
+        build_id (int): The primary key of the :class:`Build` that is tagged.
+        name (unicode): The name of the Koji tag.
+    """
+
+    __tablename__ = 'build_tags'
+
+    # These together form the primary key.
+    build_id = Column(Integer, ForeignKey('builds.id'), primary_key=True, nullable=False)
+    name = Column(Unicode(255), primary_key=True, nullable=False)
+
+    id = None
+
+
+class UpdateSubscriber(Base):
+    """
+    A user's subscription to the e-mail notifications about an :class:`Update`.
+
+    Users are subscribed to the updates they comment on, and can subscribe to or unsubscribe from
+    any update. The submitter of an update and the committers of its packages are notified without
+    needing a row, unless they unsubscribed. See :meth:`Update.get_subscribers`.
+
+    Attributes:
+        __tablename__ (str): The name of the table in the database.
+        id (None): We don't want the superclass's primary key since we will use a natural primary
+            key for this model.
+        update_id (int): The primary key of the :class:`Update`.
+        user_id (int): The primary key of the :class:`User`.
+        subscribed (bool): False if the user opted out of the notifications about the update.
+    """
+
+    __tablename__ = 'update_subscribers'
+
+    # These together form the primary key.
+    update_id = Column(Integer, ForeignKey('updates.id'), primary_key=True, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True, nullable=False)
+
+    id = None
+    subscribed = Column(Boolean, default=True, nullable=False)
+
+
 # Used for many-to-many relationships between karma and a bug
 class BugKarma(Base):
     """
@@ -4201,3 +4626,28 @@ class Stack(Base):
     # Many-to-many relationships
     groups = relationship("Group", secondary=stack_group_table, backref='stacks')
     users = relationship("User", secondary=stack_user_table, backref='stacks')
+
+
+#: Columns that are searched by :mod:`bodhi.server.search`. On PostgreSQL, each of them gets a
+#: ``pg_trgm`` GIN index so that ``ILIKE '%term%'`` searches don't need to scan the tables.
+TRIGRAM_INDEXED_COLUMNS = (
+    ('buildroot_overrides', 'notes'),
+    ('builds', 'nvr'),
+    ('cves', 'cve_id'),
+    ('packages', 'name'),
+    ('stacks', 'description'),
+    ('stacks', 'name'),
+    ('updates', 'alias'),
+    ('updates', 'notes'),
+    ('updates', 'title'),
+    ('users', 'name'),
+)
+
+event.listen(
+    metadata, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+for _table, _column in TRIGRAM_INDEXED_COLUMNS:
+    event.listen(
+        metadata.tables[_table], 'after_create',
+        DDL('CREATE INDEX ix_{0}_{1}_trgm ON {0} USING gin ({1} gin_trgm_ops)'.format(
+            _table, _column)).execute_if(dialect='postgresql'))
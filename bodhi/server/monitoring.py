@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+A registry of runtime metrics, exposed in the Prometheus text format.
+
+Metrics are kept in the memory of each process. The web application serves them on the
+``/metrics/prometheus`` route (see :mod:`bodhi.server.views.metrics`) if ``monitoring.enabled`` is
+True, and the fedmsg-hub process that runs the consumers serves them on the ``monitoring.port``
+port, if it is set, with :func:`start_http_server`. Values that other modules already keep track
+of, like the hit rates of the Koji caches, are read by collectors when the metrics are rendered.
+"""
+from functools import wraps
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+import collections
+import logging
+import threading
+import time
+
+import six
+
+
+#: The content type of the Prometheus text format.
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+#: The default histogram buckets, in seconds, suitable for web requests.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+#: Histogram buckets, in seconds, suitable for the phases of composes.
+LONG_BUCKETS = (1, 5, 15, 60, 300, 900, 1800, 3600, 7200, 14400)
+#: Histogram buckets, in seconds, suitable for the handling of fedmsgs.
+CONSUMER_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600, 14400)
+
+log = logging.getLogger(__name__)
+
+
+def _format_value(value):
+    """
+    Format a sample value.
+
+    Args:
+        value (float): The value.
+    Returns:
+        str: The formatted value.
+    """
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(names, values):
+    """
+    Format the labels of a sample.
+
+    Args:
+        names (tuple): The names of the labels.
+        values (tuple): The values of the labels.
+    Returns:
+        str: The labels between braces, or an empty string if there are none.
+    """
+    if not names:
+        return ''
+    escaped = (six.text_type(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for v in values)
+    return '{%s}' % ','.join('%s="%s"' % (n, v) for n, v in zip(names, escaped))
+
+
+class Metric(object):
+    """
+    A metric, with one value per combination of label values.
+
+    Attributes:
+        name (str): The name of the metric.
+        documentation (str): A description of the metric.
+        labelnames (tuple): The names of the labels of the metric.
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Initialize the metric.
+
+        Args:
+            name (str): See the class attributes.
+            documentation (str): See the class attributes.
+            labelnames (tuple): See the class attributes.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        """
+        Return the label values of a sample, in the order of the label names.
+
+        Args:
+            labels (dict): Maps the label names to their values.
+        Returns:
+            tuple: The label values.
+        Raises:
+            ValueError: If the labels don't match the label names of the metric.
+        """
+        if set(labels) != set(self.labelnames):
+            raise ValueError('%s expects the labels %r, not %r' % (
+                self.name, self.labelnames, tuple(sorted(labels))))
+        return tuple(labels[n] for n in self.labelnames)
+
+    def set(self, value, **labels):
+        """
+        Set the value of the metric.
+
+        Args:
+            value (float): The value.
+            labels (dict): The label values of the sample.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def clear(self):
+        """Forget all the values of the metric."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """
+        Return the samples of the metric.
+
+        Returns:
+            list: (name suffix, label names, label values, value) 4-tuples.
+        """
+        with self._lock:
+            return [('', self.labelnames, key, value)
+                    for key, value in sorted(self._values.items())]
+
+    def render(self):
+        """
+        Render the metric in the Prometheus text format.
+
+        Returns:
+            list: The lines of the rendered metric.
+        """
+        lines = ['# HELP %s %s' % (self.name, self.documentation.replace('\n', ' ')),
+                 '# TYPE %s %s' % (self.name, self.type)]
+        for suffix, names, values, value in self.samples():
+            lines.append('%s%s%s %s' % (self.name, suffix, _format_labels(names, values),
+                                        _format_value(value)))
+        return lines
+
+
+class Gauge(Metric):
+    """A value that can go up and down."""
+
+    type = 'gauge'
+
+
+class Counter(Metric):
+    """
+    A total that only goes up.
+
+    Totals kept elsewhere can be exposed with :meth:`Metric.set`.
+    """
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        Increment the total.
+
+        Args:
+            amount (float): How much to increment the total by.
+            labels (dict): The label values of the sample.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """A distribution of observed values, in cumulative buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            name (str): The name of the metric.
+            documentation (str): A description of the metric.
+            labelnames (tuple): The names of the labels of the metric.
+            buckets (tuple): The upper bounds of the buckets, in increasing order. An infinite
+                bucket is added.
+        """
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        """
+        Record an observation.
+
+        Args:
+            value (float): The observed value.
+            labels (dict): The label values of the sample.
+        """
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """
+        Return a decorator that observes how many seconds each call of a function takes.
+
+        Args:
+            labels (dict): The label values of the samples.
+        Returns:
+            callable: The decorator.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.time()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.time() - start, **labels)
+            return wrapper
+        return decorator
+
+    def samples(self):
+        """
+        Return the samples of the histogram.
+
+        Returns:
+            list: (name suffix, label names, label values, value) 4-tuples.
+        """
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append(('_bucket', self.labelnames + ('le',),
+                                    key + (_format_value(bound),), count))
+                samples.append(('_sum', self.labelnames, key, total))
+                samples.append(('_count', self.labelnames, key, counts[-1]))
+        return samples
+
+
+class Registry(object):
+    """A collection of metrics, and of collectors that update some of them before rendering."""
+
+    def __init__(self):
+        """Initialize the registry."""
+        self._metrics = collections.OrderedDict()
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Add a metric to the registry.
+
+        Args:
+            metric (Metric): The metric.
+        Returns:
+            Metric: The metric.
+        Raises:
+            ValueError: If another metric with the same name is registered.
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError('A metric named %s is already registered' % metric.name)
+            self._metrics[metric.name] = metric
+        return metric
+
+    def collector(self, func):
+        """
+        Register a function to be called before the metrics are rendered.
+
+        Args:
+            func (callable): Called without arguments. Exceptions it raises are logged.
+        Returns:
+            callable: The function.
+        """
+        with self._lock:
+            self._collectors.append(func)
+        return func
+
+    def render(self):
+        """
+        Run the collectors, and render the metrics in the Prometheus text format.
+
+        Returns:
+            str: The rendered metrics.
+        """
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception:
+                log.exception('Unable to collect metrics with %r', collector)
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    'bodhi_request_duration_seconds', 'How long web requests took, per service.',
+    ('service', 'method')))
+db_pool_connections = registry.register(Gauge(
+    'bodhi_db_pool_connections', 'The connections of the database pool, by state.', ('state',)))
+koji_cache_hits = registry.register(Counter(
+    'bodhi_koji_cache_hits_total', 'Koji calls answered from the cache.', ('method',)))
+koji_cache_misses = registry.register(Counter(
+    'bodhi_koji_cache_misses_total', 'Koji calls that were not cached.', ('method',)))
+koji_cache_entries = registry.register(Gauge(
+    'bodhi_koji_cache_entries', 'The number of cached Koji responses.', ('method',)))
+koji_pool_events = registry.register(Counter(
+    'bodhi_koji_pool_events_total', 'The events of the Koji session pool.', ('event',)))
+koji_pool_sessions = registry.register(Gauge(
+    'bodhi_koji_pool_sessions', 'The number of live Koji sessions in the pool.'))
+masher_phase_duration = registry.register(Histogram(
+    'bodhi_masher_phase_duration_seconds', 'How long the phases of composes took.', ('phase',),
+    buckets=LONG_BUCKETS))
+composes = registry.register(Gauge(
+    'bodhi_composes', 'The number of composes, by state.', ('state',)))
+consumer_lag = registry.register(Histogram(
+    'bodhi_consumer_lag_seconds',
+    'The time between the publication of the messages and their handling, per consumer.',
+    ('consumer',), buckets=CONSUMER_BUCKETS))
+consumer_duration = registry.register(Histogram(
+    'bodhi_consumer_duration_seconds', 'How long the consumers took to handle messages.',
+    ('consumer',), buckets=CONSUMER_BUCKETS))
+consumer_errors = registry.register(Counter(
+    'bodhi_consumer_errors_total', 'The messages the consumers failed to handle.', ('consumer',)))
+mail_queue_depth = registry.register(Gauge(
+    'bodhi_mail_queue_depth', 'The number of e-mails waiting in the mail spool.'))
+fedmsg_queue_depth = registry.register(Gauge(
+    'bodhi_fedmsg_queue_depth', 'The number of fedmsgs waiting for the publisher thread.'))
+fedmsg_messages = registry.register(Counter(
+    'bodhi_fedmsg_messages_total', 'The messages handled by the publisher thread, by outcome.',
+    ('outcome',)))
+fedmsg_latency = registry.register(Counter(
+    'bodhi_fedmsg_latency_seconds_total',
+    'The total time messages waited for the publisher thread.'))
+
+
+def consumer(name):
+    """
+    Return a decorator for the consume() method of a fedmsg consumer, recording its metrics.
+
+    Args:
+        name (str): The name of the consumer, used as the ``consumer`` label.
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(consume):
+        @wraps(consume)
+        def wrapper(self, message, *args, **kwargs):
+            start = time.time()
+            try:
+                sent = message['body']['timestamp']
+            except (KeyError, TypeError):
+                sent = None
+            if isinstance(sent, (int, float)):
+                consumer_lag.observe(max(start - sent, 0), consumer=name)
+            try:
+                return consume(self, message, *args, **kwargs)
+            except Exception:
+                consumer_errors.inc(consumer=name)
+                raise
+            finally:
+                consumer_duration.observe(time.time() - start, consumer=name)
+        return wrapper
+    return decorator
+
+
+@registry.collector
+def _collect_buildsys():
+    """Read the statistics of the Koji caches and session pool."""
+    from bodhi.server import buildsys
+
+    for method, stats in buildsys.cache_stats().items():
+        koji_cache_hits.set(stats['hits'], method=method)
+        koji_cache_misses.set(stats['misses'], method=method)
+        koji_cache_entries.set(stats['size'], method=method)
+    pool_stats = buildsys.pool_stats()
+    if pool_stats is not None:
+        koji_pool_sessions.set(pool_stats.pop('sessions'))
+        for event, count in pool_stats.items():
+            koji_pool_events.set(count, event=event)
+
+
+@registry.collector
+def _collect_queues():
+    """Read the depth of the mail and fedmsg queues."""
+    from bodhi.server import mail, notifications
+    from bodhi.server.config import config
+
+    if config.get('mail.spool_dir'):
+        mail_queue_depth.set(len(mail.get_spool(config['mail.spool_dir'])))
+    stats = notifications.publisher_stats()
+    if stats is not None:
+        fedmsg_queue_depth.set(stats['depth'])
+        for outcome in ('published', 'dropped', 'errors'):
+            fedmsg_messages.set(stats[outcome], outcome=outcome)
+        fedmsg_latency.set(stats['latency_sum'])
+
+
+def collect_db(db):
+    """
+    Read the metrics that come from the database: the connection pool and the composes.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+    """
+    from sqlalchemy import func
+    from bodhi.server.models import Compose, ComposeState
+
+    pool = db.get_bind().pool
+    for state, method in (('size', 'size'), ('checked_out', 'checkedout'),
+                          ('overflow', 'overflow'), ('checked_in', 'checkedin')):
+        if hasattr(pool, method):
+            db_pool_connections.set(getattr(pool, method)(), state=state)
+
+    counts = dict(db.query(Compose.state, func.count(Compose.release_id)).group_by(Compose.state))
+    for state in ComposeState.values():
+        composes.set(counts.get(ComposeState.from_string(state), 0), state=state)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    """A request handler that logs requests at the debug level rather than to stderr."""
+
+    def log_message(self, format, *args):
+        """
+        Log a request.
+
+        Args:
+            format (str): The format of the message.
+            args (tuple): The arguments of the format.
+        """
+        log.debug(format, *args)
+
+
+def _app(environ, start_response):
+    """
+    Serve the metrics.
+
+    Args:
+        environ (dict): The WSGI environment. Unused.
+        start_response (callable): The WSGI start_response callable.
+    Returns:
+        list: The body of the response.
+    """
+    start_response('200 OK', [('Content-Type', CONTENT_TYPE)])
+    return [registry.render().encode('utf-8')]
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port, address='127.0.0.1'):
+    """
+    Serve the metrics of this process over HTTP from a daemon thread, unless it is already done.
+
+    Args:
+        port (int): The port to listen on.
+        address (str): The address to listen on.
+    Returns:
+        wsgiref.simple_server.WSGIServer: The server.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = make_server(address, port, _app, handler_class=_QuietHandler)
+            thread = threading.Thread(target=_server.serve_forever, name='metrics-server')
+            thread.daemon = True
+            thread.start()
+            log.info('Serving metrics on %s:%d', address, port)
+        return _server
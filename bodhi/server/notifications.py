@@ -16,13 +16,23 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
-"""A collection of fedmsg publishing utilities."""
+"""
+A collection of fedmsg publishing utilities.
+
+By default messages are sent by the thread that publishes them. If the
+``fedmsg_publisher.queue_size`` setting is not 0, they are instead handed to a :class:`Publisher`
+thread through a bounded queue, so that slow endpoints don't delay web requests and composes.
+"""
+import atexit
 import collections
 import json
 import logging
 import socket
+import threading
+import time
 
-from sqlalchemy import event
+from six.moves import queue
+from sqlalchemy import event, inspect
 import fedmsg
 import fedmsg.config
 import fedmsg.encoding
@@ -34,6 +44,11 @@ import bodhi.server.config
 
 _log = logging.getLogger(__name__)
 
+# The arguments of the last explicit call to init(), which the Publisher thread initializes with.
+_init_kwargs = {}
+_publisher = None
+_publisher_lock = threading.Lock()
+
 
 def init(active=None, cert_prefix=None):
     """
@@ -48,6 +63,9 @@ def init(active=None, cert_prefix=None):
         bodhi.server.log.warn("fedmsg disabled.  not initializing.")
         return
 
+    if active is not None or cert_prefix is not None:
+        _init_kwargs.update(active=active, cert_prefix=cert_prefix)
+
     fedmsg_config = fedmsg.config.load_config()
 
     # Only override config from disk if explicitly argued.
@@ -79,16 +97,24 @@ def send_fedmsgs_after_commit(session):
     """
     if 'fedmsg' in session.info:
         _log.debug('Emitting all queued fedmsgs for %r', session)
+        publisher = get_publisher()
         # Initialize right before we try to publish, but only if we haven't
         # initialized for this thread already.
-        if not fedmsg_is_initialized():
+        if publisher is None and not fedmsg_is_initialized():
             init()
 
         for topic, messages in session.info['fedmsg'].items():
             _log.debug('emitting %d fedmsgs to the "%s" topic queued by %r',
                        len(messages), topic, session)
-            for msg in messages:
-                fedmsg.publish(topic=topic, msg=msg)
+            for json_msg in messages:
+                # The fedmsg API doesn't state it accepts strings, see publish().
+                msg = json.loads(json_msg)
+                if publisher is None:
+                    fedmsg.publish(topic=topic, msg=msg)
+                elif not publisher.put(topic, msg):
+                    _log.debug('Dropped a fedmsg, %r, on the "%s" topic, queued by %r',
+                               msg, topic, session)
+                    continue
                 _log.debug('Emitted a fedmsg, %r, on the "%s" topic, queued by %r',
                            msg, topic, session)
             # Tidy up after ourselves so a second call to commit on this session won't
@@ -116,29 +142,272 @@ def publish(topic, msg, force=False):
         _log.warn("fedmsg disabled.  not sending %r" % topic)
         return
 
+    publisher = get_publisher()
     # Initialize right before we try to publish, but only if we haven't
     # initialized for this thread already.
-    if not fedmsg_is_initialized():
+    if publisher is None and not fedmsg_is_initialized():
         init()
 
     if force:
         _log.debug("fedmsg skipping transaction and sending %r" % topic)
-        fedmsg.publish(topic=topic, msg=msg)
+        if publisher is None:
+            fedmsg.publish(topic=topic, msg=msg)
+        else:
+            # The publisher thread must not touch the database objects of the message, since they
+            # belong to the session of this thread, so they are turned into JSON here.
+            publisher.put(topic, json.loads(fedmsg.encoding.dumps(_serialize_models(msg))))
     else:
         # We need to do this to ensure all the SQLAlchemy objects that could be in the messages
         # are turned into JSON before the session is removed and expires the objects loaded with
-        # it. The JSON is decoded again because the fedmsg API doesn't state it accepts strings.
-        # An issue has been filed about this: https://github.com/fedora-infra/fedmsg/issues/407.
-        json_msg = fedmsg.encoding.dumps(msg)
-        msg_dict = json.loads(json_msg)
+        # it. The message is kept encoded until it is sent, but is decoded again then because the
+        # fedmsg API doesn't state it accepts strings. An issue has been filed about this:
+        # https://github.com/fedora-infra/fedmsg/issues/407.
+        json_msg = fedmsg.encoding.dumps(_serialize_models(msg))
         # This gives us the thread-local session which we'll use to stash the fedmsg.
         # When commit is called on it, the :func:`send_fedmsgs_after_commit` is triggered.
         session = Session()
         if 'fedmsg' not in session.info:
             _log.debug('Adding a dictionary for fedmsg storage to %r', session)
             session.info['fedmsg'] = collections.defaultdict(list)
-        session.info['fedmsg'][topic].append(msg_dict)
-        _log.debug('Enqueuing a fedmsg, %r, for topic "%s" on %r', msg_dict, topic, session)
+        session.info['fedmsg'][topic].append(json_msg)
+        _log.debug('Enqueuing a fedmsg, %r, for topic "%s" on %r', json_msg, topic, session)
+
+
+def _serialize_models(value):
+    """
+    Replace the database objects found in a message with their JSON representation.
+
+    The representation of an object is remembered until its session is flushed, committed or rolled
+    back, so that an object appearing in several messages of a transaction, like an update that is
+    commented on and then pushed, is only serialized once. Objects are not remembered while their
+    session has pending changes, since those could affect their representation.
+
+    Args:
+        value (object): The message, or a value found in it.
+    Returns:
+        object: The value, with the database objects it contains replaced by their representation.
+    """
+    if isinstance(value, dict):
+        return dict((k, _serialize_models(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_serialize_models(v) for v in value]
+
+    state = inspect(value, raiseerr=False)
+    if state is None or not hasattr(value, '__json__'):
+        return value
+    session = state.session
+    if state.key is None or session is None or session.new or session.dirty or session.deleted:
+        return value.__json__()
+
+    serialized = session.info.setdefault('fedmsg_json', {})
+    if state.key not in serialized:
+        serialized[state.key] = value.__json__()
+    return serialized[state.key]
+
+
+@event.listens_for(Session, 'after_flush')
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_serialized_models(session, *args):
+    """
+    Forget the JSON representation of the objects of a session, since they may have changed.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that was flushed, committed or
+            rolled back.
+        args (list): Unused.
+    """
+    session.info.pop('fedmsg_json', None)
+
+
+class Publisher(object):
+    """
+    Publish fedmsgs from a background thread.
+
+    Messages are handed to the thread through a bounded queue. The thread takes them from the queue
+    in batches of up to ``batch_size`` messages, and publishes them back to back. When the queue is
+    full, :meth:`put` either drops the message right away, or waits up to ``timeout`` seconds for
+    room before dropping it.
+
+    Attributes:
+        stats (dict): Counts the ``published`` messages, the ``dropped`` ones, the ones that failed
+            to be published (``errors``) and the ``batches``. ``latency_sum`` and ``latency_max``
+            are the total and the maximum time in seconds between the queueing and the publication
+            of the messages.
+    """
+
+    _stop = object()
+
+    def __init__(self, queue_size, batch_size=100, drop=False, timeout=None, init_kwargs=None):
+        """
+        Initialize the Publisher. The thread is started when the first message is queued.
+
+        Args:
+            queue_size (int): How many messages the queue can hold.
+            batch_size (int): The maximum number of messages taken from the queue at once.
+            drop (bool): If True, drop the messages that don't fit in the queue instead of waiting.
+            timeout (float or None): How many seconds to wait for room in the queue before dropping
+                a message. None waits indefinitely.
+            init_kwargs (dict or None): The arguments to initialize fedmsg with in the thread.
+        """
+        self.batch_size = batch_size
+        self.drop = drop
+        self.timeout = timeout
+        self.init_kwargs = init_kwargs or {}
+        self.stats = {'published': 0, 'dropped': 0, 'errors': 0, 'batches': 0,
+                      'latency_sum': 0.0, 'latency_max': 0.0}
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def put(self, topic, msg):
+        """
+        Queue a message to be published.
+
+        Args:
+            topic (basestring): The topic of the message.
+            msg (dict): The message.
+        Returns:
+            bool: False if the message was dropped because the queue was full.
+        """
+        self._start()
+        try:
+            self._queue.put((time.time(), topic, msg), not self.drop, self.timeout)
+        except queue.Full:
+            with self._lock:
+                self.stats['dropped'] += 1
+            _log.warn('The fedmsg queue is full, dropping a message to the "%s" topic', topic)
+            return False
+        return True
+
+    def _start(self):
+        """Start the thread if it isn't running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='fedmsg-publisher')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):
+        """Publish the queued messages until :meth:`stop` is called."""
+        # fedmsg contexts are local to the thread that initializes them.
+        init(**self.init_kwargs)
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is self._stop:
+                    stopping = True
+                else:
+                    self._publish(*item)
+                self._queue.task_done()
+            with self._lock:
+                self.stats['batches'] += 1
+
+    def _publish(self, queued, topic, msg):
+        """
+        Publish a message and record how long it waited.
+
+        Args:
+            queued (float): When the message was queued.
+            topic (basestring): The topic of the message.
+            msg (dict): The message.
+        """
+        try:
+            fedmsg.publish(topic=topic, msg=msg)
+        except Exception:
+            _log.exception('Unable to publish a message to the "%s" topic', topic)
+            with self._lock:
+                self.stats['errors'] += 1
+            return
+        latency = time.time() - queued
+        with self._lock:
+            self.stats['published'] += 1
+            self.stats['latency_sum'] += latency
+            self.stats['latency_max'] = max(self.stats['latency_max'], latency)
+
+    def stop(self, timeout=None):
+        """
+        Publish the queued messages and stop the thread.
+
+        Args:
+            timeout (float or None): How many seconds to wait for the queued messages to be
+                published. None waits indefinitely.
+        Returns:
+            bool: True if every queued message was handled in time.
+        """
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return True
+        try:
+            self._queue.put(self._stop, True, timeout)
+        except queue.Full:
+            return False
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def get_stats(self):
+        """
+        Return the statistics of the publisher.
+
+        Returns:
+            dict: The counters described in the class attributes, and the number of messages
+                waiting in the queue (``depth``).
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        stats['depth'] = self._queue.qsize()
+        return stats
+
+
+def get_publisher():
+    """
+    Return the :class:`Publisher` of this process, creating it if needed.
+
+    Returns:
+        Publisher or None: The publisher, or None if the ``fedmsg_publisher.queue_size`` setting is
+            0 and messages should be sent by the threads that publish them.
+    """
+    global _publisher
+    config = bodhi.server.config.config
+    if not config.get('fedmsg_publisher.queue_size'):
+        return None
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = Publisher(
+                config['fedmsg_publisher.queue_size'], config.get('fedmsg_publisher.batch_size'),
+                config.get('fedmsg_publisher.drop_when_full'),
+                config.get('fedmsg_publisher.block_timeout') or None, dict(_init_kwargs))
+            atexit.register(stop_publisher)
+        return _publisher
+
+
+def stop_publisher():
+    """Publish the messages still queued for the :class:`Publisher`, and stop it."""
+    global _publisher
+    with _publisher_lock:
+        publisher, _publisher = _publisher, None
+    if publisher is not None:
+        timeout = bodhi.server.config.config.get('fedmsg_publisher.flush_timeout')
+        if not publisher.stop(timeout):
+            _log.warn('Gave up publishing %d queued fedmsgs', publisher.get_stats()['depth'])
+
+
+def publisher_stats():
+    """
+    Return the statistics of the :class:`Publisher`.
+
+    Returns:
+        dict or None: See :meth:`Publisher.get_stats`, or None if there is no publisher.
+    """
+    publisher = _publisher
+    return publisher.get_stats() if publisher is not None else None
 
 
 def fedmsg_is_initialized():
@@ -686,6 +686,15 @@ class UpdateRequestSchema(CSRFProtectedSchema, colander.MappingSchema):
     )
 
 
+class UpdateSubscriptionSchema(CSRFProtectedSchema, colander.MappingSchema):
+    """An API schema for bodhi.server.services.updates.set_subscription()."""
+
+    subscribed = colander.SchemaNode(
+        colander.Boolean(true_choices=('true', '1')),
+        missing=True,
+    )
+
+
 class ListCommentSchema(PaginatedSchema, SearchableSchema):
     """An API schema for bodhi.server.services.comments.query_comments()."""
 
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""Recompute the release_stats table from the updates table."""
+
+import sys
+
+import click
+
+from bodhi.server import config, initialize_db, Session, stats
+
+
+@click.command()
+@click.version_option(message='%(version)s')
+def rebuild_release_stats():
+    """Recompute the update statistics of every release."""
+    initialize_db(config.config)
+    db = Session()
+
+    try:
+        stats.rebuild(db)
+        db.commit()
+    except Exception as e:
+        print(str(e))
+        db.rollback()
+        sys.exit(1)
+    finally:
+        Session.remove()
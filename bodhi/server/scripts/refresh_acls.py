@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""Refresh the cached ACLs of the recently active packages."""
+
+import sys
+
+import click
+
+from bodhi.server import acls, config, initialize_db, Session
+
+
+@click.command()
+@click.option('--days', default=7, type=int,
+              help='Refresh the packages with updates modified in this many days (default: 7)')
+@click.option('--workers', default=8, type=int,
+              help='How many ACLs to read concurrently (default: 8)')
+@click.version_option(message='%(version)s')
+def refresh_acls(days, workers):
+    """Read the ACLs of the recently active packages from the ACL system."""
+    initialize_db(config.config)
+    db = Session()
+
+    try:
+        count = acls.refresh(db, days, workers)
+        db.commit()
+        click.echo('Refreshed the ACLs of {} packages'.format(count))
+    except Exception as e:
+        print(str(e))
+        db.rollback()
+        sys.exit(1)
+    finally:
+        Session.remove()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""Send the e-mails queued in the mail spool."""
+
+import sys
+import time
+
+import click
+
+from bodhi.server import mail
+from bodhi.server.config import config
+
+
+@click.command()
+@click.option('--once', is_flag=True, help='Send the queued e-mails and exit')
+@click.option('--interval', default=5.0, type=float,
+              help='How many seconds to wait for new e-mails when the spool is empty (default: 5)')
+@click.option('--batch-size', default=100, type=int,
+              help='How many e-mails to send between two reads of the spool (default: 100)')
+@click.version_option(message='%(version)s')
+def send_mail(once, interval, batch_size):
+    """Send the e-mails queued in the mail.spool_dir directory over SMTP."""
+    if not config.get('mail.spool_dir'):
+        click.echo('mail.spool_dir is not set, e-mails are sent as they are generated.')
+        sys.exit(1)
+    if not config.get('smtp_server'):
+        click.echo('smtp_server is not set.')
+        sys.exit(1)
+
+    spool = mail.get_spool(config['mail.spool_dir'])
+    pool = mail.SMTPPool(config['smtp_server'], config.get('mail.max_messages_per_connection'))
+    recovered = spool.recover()
+    if recovered:
+        click.echo('Recovered {} e-mails that were being sent'.format(recovered))
+
+    try:
+        while True:
+            sent, retried = mail.deliver(spool, pool, batch_size)
+            if sent or retried:
+                click.echo('Sent {} e-mails, {} will be retried'.format(sent, retried))
+            if once and sent + retried < batch_size:
+                break
+            if sent + retried < batch_size:
+                # The spool is drained, don't keep an idle connection open to the server.
+                pool.close()
+                time.sleep(interval)
+    finally:
+        pool.close()
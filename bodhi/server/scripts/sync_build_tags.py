@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""Sync the local mirror of the koji tags of the builds with koji."""
+
+import sys
+
+import click
+
+from bodhi.server import build_tags, buildsys, config, initialize_db, Session
+
+
+@click.command()
+@click.option('--chunk-size', default=1000, type=int,
+              help='How many builds to sync per transaction (default: 1000)')
+@click.version_option(message='%(version)s')
+def sync_build_tags(chunk_size):
+    """Read the koji tags of the builds of the releases that aren't archived."""
+    initialize_db(config.config)
+    buildsys.setup_buildsystem(config.config, authenticate=False)
+    db = Session()
+
+    try:
+        count = build_tags.reconcile(db, chunk_size)
+        click.echo('Synced the tags of {} builds'.format(count))
+    except Exception as e:
+        print(str(e))
+        db.rollback()
+        sys.exit(1)
+    finally:
+        Session.remove()
@@ -93,12 +93,15 @@ def main(argv=sys.argv):
                         if testing_tag in tags:
                             log.info('Removing %s from %s' % (testing_tag, build.nvr))
                             koji.untagBuild(testing_tag, build.nvr)
+                            build.mirror_tag(testing_tag, tagged=False)
                         if pending_signing_tag in tags:
                             log.info('Removing %s from %s' % (pending_signing_tag, build.nvr))
                             koji.untagBuild(pending_signing_tag, build.nvr)
+                            build.mirror_tag(pending_signing_tag, tagged=False)
                         if pending_testing_tag in tags:
                             log.info('Removing %s from %s' % (pending_testing_tag, build.nvr))
                             koji.untagBuild(pending_testing_tag, build.nvr)
+                            build.mirror_tag(pending_testing_tag, tagged=False)
         db.commit()
     except Exception as e:
         log.error(e)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Free text search of updates, buildroot overrides, stacks and users.
+
+The matching is done with case insensitive substring comparisons. On PostgreSQL, every searched
+text column carries a ``pg_trgm`` GIN index (see the ``9c0a34961768`` migration), which the planner
+uses for ``ILIKE '%term%'`` patterns of three or more characters, and results are ranked by trigram
+similarity. Other databases fall back to scanning the tables, and rank exact and prefix matches
+ahead of other matches.
+
+Related rows (builds, packages, bugs and CVEs) are searched with ``EXISTS`` subqueries instead of
+joins, so a match never duplicates rows or breaks pagination.
+"""
+from sqlalchemy import case, func, literal, or_, select
+
+from bodhi.server.models import (BuildrootOverride, Build, Bug, CVE, Package, Stack, Update,
+                                 User)
+
+
+def _contains(column, term):
+    """
+    Return a clause that matches rows where the given column contains term, ignoring case.
+
+    Args:
+        column (sqlalchemy.Column): The column to search.
+        term (basestring): The text to search for.
+    Returns:
+        sqlalchemy.sql.elements.BinaryExpression: The matching clause.
+    """
+    return column.ilike('%%%s%%' % term)
+
+
+def _rank(query, term, exact, prefix, similar):
+    """
+    Return an expression that ranks search results, higher ranks being better matches.
+
+    Args:
+        query (sqlalchemy.orm.query.Query): The query being searched, used to find the dialect.
+        term (basestring): The text that was searched for.
+        exact (list): Columns that make for the best results if they are equal to term.
+        prefix (list): Columns that make for good results if they start with term.
+        similar (sqlalchemy.Column): A column to compute trigram similarity with on PostgreSQL.
+    Returns:
+        sqlalchemy.sql.elements.ColumnElement: The ranking expression.
+    """
+    lowered = term.lower()
+    whens = [(func.lower(c) == lowered, literal(3.0)) for c in exact]
+    whens.extend((func.lower(c).like('%s%%' % lowered), literal(2.0)) for c in prefix)
+    rank = case(whens, else_=literal(0.0))
+    bind = query.session.bind if query.session is not None else None
+    if bind is not None and bind.dialect.name == 'postgresql':
+        rank = rank + func.similarity(similar, term)
+    return rank
+
+
+def search_updates(query, term):
+    """
+    Filter the given query of Updates by term, ordering the results by relevance.
+
+    The title, alias, notes, build NVRs, package names and CVE IDs are searched. If term is a
+    number, it is also matched against the bug IDs.
+
+    Args:
+        query (sqlalchemy.orm.query.Query): A query of Updates.
+        term (basestring): The text to search for.
+    Returns:
+        sqlalchemy.orm.query.Query: The filtered and ordered query.
+    """
+    clauses = [
+        _contains(Update.title, term),
+        _contains(Update.alias, term),
+        _contains(Update.notes, term),
+        Update.builds.any(_contains(Build.nvr, term)),
+        Update.builds.any(Build.package.has(_contains(Package.name, term))),
+        Update.cves.any(_contains(CVE.cve_id, term)),
+    ]
+    bug_id = term.strip()
+    if bug_id.isdigit():
+        clauses.append(Update.bugs.any(Bug.bug_id == int(bug_id)))
+
+    rank = _rank(query, term, exact=[Update.alias, Update.title], prefix=[Update.title],
+                 similar=Update.title)
+    return query.filter(or_(*clauses)).order_by(rank.desc())
+
+
+def search_overrides(query, term):
+    """
+    Filter the given query of BuildrootOverrides by term, ordering the results by relevance.
+
+    The build NVRs, package names and the override notes are searched.
+
+    Args:
+        query (sqlalchemy.orm.query.Query): A query of BuildrootOverrides.
+        term (basestring): The text to search for.
+    Returns:
+        sqlalchemy.orm.query.Query: The filtered and ordered query.
+    """
+    clauses = [
+        BuildrootOverride.build.has(_contains(Build.nvr, term)),
+        BuildrootOverride.build.has(Build.package.has(_contains(Package.name, term))),
+        _contains(BuildrootOverride.notes, term),
+    ]
+    nvr = select([Build.nvr]).where(
+        Build.id == BuildrootOverride.build_id).correlate(BuildrootOverride).as_scalar()
+    rank = _rank(query, term, exact=[nvr], prefix=[nvr], similar=nvr)
+    return query.filter(or_(*clauses)).order_by(rank.desc())
+
+
+def search_stacks(query, term):
+    """
+    Filter the given query of Stacks by term, ordering the results by relevance.
+
+    The stack names, descriptions and the names of their packages are searched.
+
+    Args:
+        query (sqlalchemy.orm.query.Query): A query of Stacks.
+        term (basestring): The text to search for.
+    Returns:
+        sqlalchemy.orm.query.Query: The filtered and ordered query.
+    """
+    clauses = [
+        _contains(Stack.name, term),
+        _contains(Stack.description, term),
+        Stack.packages.any(_contains(Package.name, term)),
+    ]
+    rank = _rank(query, term, exact=[Stack.name], prefix=[Stack.name], similar=Stack.name)
+    return query.filter(or_(*clauses)).order_by(rank.desc())
+
+
+def search_users(query, term):
+    """
+    Filter the given query of Users by term, ordering the results by relevance.
+
+    The user names are searched.
+
+    Args:
+        query (sqlalchemy.orm.query.Query): A query of Users.
+        term (basestring): The text to search for.
+    Returns:
+        sqlalchemy.orm.query.Query: The filtered and ordered query.
+    """
+    rank = _rank(query, term, exact=[User.name], prefix=[User.name], similar=User.name)
+    return query.filter(_contains(User.name, term)).order_by(rank.desc())
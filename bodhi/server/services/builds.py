@@ -17,16 +17,15 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Define service endpoint for retrieving Builds."""
-import math
 
 from cornice import Service
 from pyramid.exceptions import HTTPNotFound
-from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
 from bodhi.server.models import Update, Build, Package, Release
 from bodhi.server.validators import (colander_querystring_validator, validate_updates,
                                      validate_packages, validate_releases)
+import bodhi.server.counts
 import bodhi.server.schemas
 import bodhi.server.security
 import bodhi.server.services.errors
@@ -113,22 +112,15 @@ def query_builds(request):
         query = query.join(Build.release)
         query = query.filter(or_(*[Release.id == r.id for r in releases]))
 
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(Build.nvr))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    page = bodhi.server.counts.paginate(
+        request, query, Build.nvr, 'builds',
+        ('builds', 'updates', 'packages', 'releases'))
 
     return dict(
-        builds=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        builds=page['query'].all(),
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        total_exact=page['total_exact'],
     )
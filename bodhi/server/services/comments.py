@@ -18,12 +18,9 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Define the service endpoints that handle Comments."""
 
-import math
-
 from cornice import Service
 from cornice.validators import colander_body_validator
 from pyramid.httpexceptions import HTTPBadRequest
-from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
 from bodhi.server import log
@@ -42,6 +39,7 @@ from bodhi.server.validators import (
     validate_captcha,
 )
 import bodhi.server.captcha
+import bodhi.server.counts
 import bodhi.server.schemas
 import bodhi.server.security
 import bodhi.server.services.errors
@@ -168,24 +166,17 @@ def query_comments(request):
 
     query = query.order_by(Comment.timestamp.desc())
 
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(Comment.id))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    page = bodhi.server.counts.paginate(
+        request, query, Comment.id, 'comments',
+        ('comments', 'updates', 'builds', 'packages'))
 
     return dict(
-        comments=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        comments=page['query'].all(),
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        total_exact=page['total_exact'],
         chrome=data.get('chrome'),
     )
 
@@ -18,18 +18,17 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Define API endpoints for managing and searching buildroot overrides."""
 
-import math
-
 from cornice import Service
 from cornice.validators import colander_body_validator
 from pyramid.exceptions import HTTPNotFound
 
-from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
 from bodhi.server import log, security
 from bodhi.server.models import Build, BuildrootOverride, Package, Release, User
+import bodhi.server.counts
 import bodhi.server.schemas
+import bodhi.server.search
 import bodhi.server.services.errors
 from bodhi.server.validators import (
     colander_querystring_validator,
@@ -130,7 +129,8 @@ def query_overrides(request):
         like (basestring): Perform an SQL "like" query against build NVRs with the given string.
         packages (list): A list of package names to search overrides by.
         releases (list): A list of release names to limit the overrides search by.
-        search (basestring): Perform an SQL "ilike" query against build NVRs with the given string.
+        search (basestring): Search build NVRs, package names and notes for the given string,
+            ordering the results by relevance.
         submitter (basestring): Search for overrides submitted by the given username.
 
     Returns:
@@ -178,8 +178,7 @@ def query_overrides(request):
 
     search = data.get('search')
     if search is not None:
-        query = query.join(BuildrootOverride.build)
-        query = query.filter(Build.nvr.ilike('%%%s%%' % search))
+        query = bodhi.server.search.search_overrides(query, search)
 
     submitter = data.get('user')
     if submitter is not None:
@@ -187,24 +186,17 @@ def query_overrides(request):
 
     query = query.order_by(BuildrootOverride.submission_date.desc())
 
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(BuildrootOverride.id))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    page = bodhi.server.counts.paginate(
+        request, query, BuildrootOverride.id, 'overrides',
+        ('buildroot_overrides', 'builds', 'packages', 'releases'))
 
     return dict(
-        overrides=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        overrides=page['query'].all(),
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        total_exact=page['total_exact'],
         chrome=data.get('chrome'),
         display_user=data.get('display_user'),
     )
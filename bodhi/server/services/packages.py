@@ -17,14 +17,13 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Define a service endpoint for searching for packages."""
-import math
 
 from cornice import Service
-from sqlalchemy import func, distinct
 from sqlalchemy.sql.expression import case
 
 from bodhi.server import validators
 from bodhi.server.models import Package
+import bodhi.server.counts
 import bodhi.server.schemas
 import bodhi.server.security
 import bodhi.server.services.errors
@@ -77,22 +76,15 @@ def query_packages(request):
         query = query.filter(Package.name.ilike('%%%s%%' % search))
         query = query.order_by(case([(Package.name == search, Package.name)]))
 
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(Package.name))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    page = bodhi.server.counts.paginate(
+        request, query, Package.name, 'packages',
+        ('packages',))
 
     return dict(
-        packages=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        packages=page['query'].all(),
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        total_exact=page['total_exact'],
     )
@@ -18,12 +18,9 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Defines API endpoints related to Release objects."""
 
-import math
-
 from cornice import Service
 from cornice.validators import colander_body_validator
 from pyramid.exceptions import HTTPNotFound
-from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
 from bodhi.server import log, security
@@ -44,7 +41,9 @@ from bodhi.server.validators import (
     validate_packages,
     validate_release,
 )
+import bodhi.server.counts
 import bodhi.server.schemas
+import bodhi.server.stats
 import bodhi.server.services.errors
 
 
@@ -75,48 +74,12 @@ def get_release_html(request):
     if not release:
         request.errors.add('body', 'name', 'No such release')
         request.errors.status = HTTPNotFound.code
+        return
     updates = request.db.query(Update).filter(Update.release == release).order_by(
         Update.date_submitted.desc())
 
-    updates_count = request.db.query(Update.date_submitted, Update.type).filter(
-        Update.release == release).order_by(Update.date_submitted.desc())
-
-    date_commits = {}
-    dates = set()
-
-    for update in updates_count.all():
-        d = update.date_submitted
-        yearmonth = str(d.year) + '/' + str(d.month).zfill(2)
-        dates.add(yearmonth)
-        if update.type.description not in date_commits:
-            date_commits[update.type.description] = {}
-        if yearmonth in date_commits[update.type.description]:
-            date_commits[update.type.description][yearmonth] += 1
-        else:
-            date_commits[update.type.description][yearmonth] = 0
-
-    base_count_query = request.db.query(Update)\
-        .filter(Update.release == release)
-
-    num_updates_pending = base_count_query\
-        .filter(Update.status == UpdateStatus.pending).count()
-    num_updates_testing = base_count_query\
-        .filter(Update.status == UpdateStatus.testing).count()
-    num_updates_stable = base_count_query\
-        .filter(Update.status == UpdateStatus.stable).count()
-    num_updates_unpushed = base_count_query\
-        .filter(Update.status == UpdateStatus.unpushed).count()
-    num_updates_obsolete = base_count_query\
-        .filter(Update.status == UpdateStatus.obsolete).count()
-
-    num_updates_security = base_count_query\
-        .filter(Update.type == UpdateType.security).count()
-    num_updates_bugfix = base_count_query\
-        .filter(Update.type == UpdateType.bugfix).count()
-    num_updates_enhancement = base_count_query\
-        .filter(Update.type == UpdateType.enhancement).count()
-    num_updates_newpackage = base_count_query\
-        .filter(Update.type == UpdateType.newpackage).count()
+    release_stats = bodhi.server.stats.get_release_stats(request.db, release)
+    dates, date_commits = release_stats.by_month()
 
     num_active_overrides = request.db.query(
         BuildrootOverride
@@ -144,20 +107,20 @@ def get_release_html(request):
 
     return dict(release=release,
                 latest_updates=updates.limit(25).all(),
-                count=updates.count(),
+                count=release_stats.total,
                 date_commits=date_commits,
-                dates=sorted(dates),
+                dates=dates,
 
-                num_updates_pending=num_updates_pending,
-                num_updates_testing=num_updates_testing,
-                num_updates_stable=num_updates_stable,
-                num_updates_unpushed=num_updates_unpushed,
-                num_updates_obsolete=num_updates_obsolete,
+                num_updates_pending=release_stats.count(status=UpdateStatus.pending),
+                num_updates_testing=release_stats.count(status=UpdateStatus.testing),
+                num_updates_stable=release_stats.count(status=UpdateStatus.stable),
+                num_updates_unpushed=release_stats.count(status=UpdateStatus.unpushed),
+                num_updates_obsolete=release_stats.count(status=UpdateStatus.obsolete),
 
-                num_updates_security=num_updates_security,
-                num_updates_bugfix=num_updates_bugfix,
-                num_updates_enhancement=num_updates_enhancement,
-                num_updates_newpackage=num_updates_newpackage,
+                num_updates_security=release_stats.count(type=UpdateType.security),
+                num_updates_bugfix=release_stats.count(type=UpdateType.bugfix),
+                num_updates_enhancement=release_stats.count(type=UpdateType.enhancement),
+                num_updates_newpackage=release_stats.count(type=UpdateType.newpackage),
 
                 num_active_overrides=num_active_overrides,
                 num_expired_overrides=num_expired_overrides,
@@ -260,24 +223,17 @@ def query_releases_json(request):
         query = query.join(Release.builds).join(Build.package)
         query = query.filter(or_(*[Package.id == p.id for p in packages]))
 
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(Release.id))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    page = bodhi.server.counts.paginate(
+        request, query, Release.id, 'releases',
+        ('releases', 'builds', 'updates', 'packages'))
 
     return dict(
-        releases=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        releases=page['query'].all(),
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        total_exact=page['total_exact'],
     )
 
 
@@ -18,13 +18,10 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Define web services that pertain to Stacks."""
 
-import math
-
 from cornice import Service
 from cornice.validators import colander_body_validator
 from pyramid.exceptions import HTTPForbidden
 from pyramid.view import view_config
-from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
 from bodhi.server import log, notifications, security
@@ -33,7 +30,9 @@ from bodhi.server.models import Package, Stack, Group, User
 from bodhi.server.util import tokenize
 from bodhi.server.validators import (colander_querystring_validator, validate_packages,
                                      validate_stack, validate_requirements)
+import bodhi.server.counts
 import bodhi.server.schemas
+import bodhi.server.search
 import bodhi.server.services.errors
 
 
@@ -89,7 +88,7 @@ def query_stacks(request):
             number of matched Stacks.
     """
     data = request.validated
-    query = request.db.query(Stack).order_by(Stack.name.desc())
+    query = request.db.query(Stack)
 
     name = data.get('name')
     if name:
@@ -104,24 +103,23 @@ def query_stacks(request):
         query = query.join(Package.stack)
         query = query.filter(or_(*[Package.name == pkg.name for pkg in packages]))
 
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(Stack.id))])\
-        .order_by(None)
-    total = request.db.execute(count_query).scalar()
+    search = data.get('search')
+    if search:
+        query = bodhi.server.search.search_stacks(query, search)
+
+    query = query.order_by(Stack.name.desc())
 
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    page = bodhi.server.counts.paginate(
+        request, query, Stack.id, 'stacks',
+        ('stacks', 'packages'))
 
     return dict(
-        stacks=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        stacks=page['query'].all(),
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        total_exact=page['total_exact'],
     )
 
 
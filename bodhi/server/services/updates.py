@@ -19,11 +19,10 @@
 """Defines service endpoints pertaining to Updates."""
 
 import copy
-import math
 
 from cornice import Service
 from cornice.validators import colander_body_validator
-from sqlalchemy import func, distinct
+from pyramid.exceptions import HTTPForbidden
 from sqlalchemy.sql import or_
 
 from bodhi.server import log, security
@@ -39,7 +38,9 @@ from bodhi.server.models import (
     Build,
     Package,
 )
+import bodhi.server.counts
 import bodhi.server.schemas
+import bodhi.server.search
 import bodhi.server.services.errors
 import bodhi.server.util
 from bodhi.server.validators import (
@@ -86,6 +87,10 @@ update_request = Service(name='update_request', path='/updates/{id}/request',
                          factory=security.PackagerACLFactory,
                          cors_origins=bodhi.server.security.cors_origins_rw)
 
+update_subscription = Service(name='update_subscription', path='/updates/{id}/subscription',
+                              description='Update notification subscription service',
+                              cors_origins=bodhi.server.security.cors_origins_rw)
+
 update_waive_test_results = Service(
     name='update_waive_test_results',
     path='/updates/{id}/waive-test-results',
@@ -201,6 +206,29 @@ def set_request(request):
     return dict(update=update)
 
 
+@update_subscription.post(schema=bodhi.server.schemas.UpdateSubscriptionSchema,
+                          validators=(colander_body_validator, validate_update_id),
+                          renderer='json',
+                          error_handler=bodhi.server.services.errors.json_handler)
+def set_subscription(request):
+    """
+    Subscribe the current user to, or unsubscribe them from, the e-mail notifications of an update.
+
+    Args:
+        request (pyramid.request): The current request.
+    Returns:
+        dict: A dictionary mapping the key "subscribed" to whether the user is now subscribed.
+    """
+    if request.user is None:
+        request.errors.add('body', 'subscribed', 'You must be logged in to subscribe to updates')
+        request.errors.status = HTTPForbidden.code
+        return
+
+    update = request.validated['update']
+    subscription = update.subscribe(request.db, request.user, request.validated['subscribed'])
+    return dict(subscribed=subscription.subscribed)
+
+
 validators = (
     colander_querystring_validator,
     validate_release,
@@ -279,8 +307,7 @@ def query_updates(request):
 
     search = data.get('search')
     if search is not None:
-        query = query.filter(or_(Update.title.ilike('%%%s%%' % search),
-                                 Update.alias.ilike('%%%s%%' % search)))
+        query = bodhi.server.search.search_updates(query, search)
 
     locked = data.get('locked')
     if locked is not None:
@@ -383,24 +410,18 @@ def query_updates(request):
 
     query = query.order_by(Update.date_submitted.desc())
 
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(Update.id))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    page = bodhi.server.counts.paginate(
+        request, query, Update.id, 'updates',
+        ('updates', 'builds', 'packages', 'bugs', 'cves', 'releases'),
+        filters=dict(data, active_releases=active_releases or None))
 
     return dict(
-        updates=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        updates=page['query'].all(),
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        total_exact=page['total_exact'],
         chrome=data.get('chrome'),
         display_user=data.get('display_user', False),
         display_request=data.get('display_request', True),
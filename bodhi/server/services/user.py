@@ -17,17 +17,17 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Defines API services that pertain to users."""
-import math
 
 from cornice import Service
 from pyramid.exceptions import HTTPNotFound
-from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
 from bodhi.server.models import Group, Package, Update, User
 from bodhi.server.validators import (colander_querystring_validator, validate_updates,
                                      validate_packages, validate_groups)
+import bodhi.server.counts
 import bodhi.server.schemas
+import bodhi.server.search
 import bodhi.server.security
 import bodhi.server.services.errors
 import bodhi.server.services.updates
@@ -139,7 +139,7 @@ def query_users(request):
 
     search = data.get('search')
     if search is not None:
-        query = query.filter(User.name.ilike('%%%s%%' % search))
+        query = bodhi.server.search.search_users(query, search)
 
     name = data.get('name')
     if name is not None:
@@ -163,22 +163,15 @@ def query_users(request):
         query = query.join(User.packages)
         query = query.filter(or_(*[Package.id == p.id for p in packages]))
 
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(User.id))])\
-        .order_by(None)
-    total = request.db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    page = bodhi.server.counts.paginate(
+        request, query, User.id, 'users',
+        ('users', 'groups', 'updates', 'packages'))
 
     return dict(
-        users=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        users=page['query'].all(),
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        total_exact=page['total_exact'],
     )
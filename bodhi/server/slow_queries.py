@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+An opt-in log of the SQL statements that take longer than the ``slow_queries.threshold`` setting.
+
+:func:`listen` is called by :func:`bodhi.server.initialize_db` when the threshold is set. Every
+statement that runs longer than it is recorded with its parameters, the location of the Bodhi code
+that ran it, the service, view, validator or consumer it ran for, and the plan the database reports
+for it with ``EXPLAIN``. The records are written as JSON lines to ``slow_queries.path``, which is
+rotated once it reaches ``slow_queries.max_bytes``. :func:`top_offenders` aggregates them for the
+admin view.
+"""
+from logging.handlers import RotatingFileHandler
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+
+from sqlalchemy import event
+
+from bodhi.server.config import config
+
+
+#: The parts of the paths of the modules that handle requests and messages.
+ENTRY_POINTS = ('/bodhi/server/services/', '/bodhi/server/views/', '/bodhi/server/validators.py',
+                '/bodhi/server/consumers/', '/bodhi/server/scripts/')
+#: How many characters of the parameters of a statement are recorded.
+MAX_PARAMETERS_LENGTH = 2000
+
+log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_handlers = {}
+
+
+def listen(engine):
+    """
+    Record the slow statements executed by the given engine.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine.
+    """
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Remember when a SQL statement started.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): The connection.
+        cursor (object): The DBAPI cursor. Unused.
+        statement (basestring): The statement. Unused.
+        parameters (object): The parameters of the statement. Unused.
+        context (sqlalchemy.engine.default.DefaultExecutionContext): The execution context. Unused.
+        executemany (bool): Whether the statement is executed with several sets of parameters.
+            Unused.
+    """
+    conn.info.setdefault('slow_query_starts', []).append(time.time())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Record a SQL statement if it took longer than the threshold.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): The connection the statement was executed on.
+        cursor (object): The DBAPI cursor. Unused.
+        statement (basestring): The statement.
+        parameters (object): The parameters of the statement.
+        context (sqlalchemy.engine.default.DefaultExecutionContext): The execution context. Unused.
+        executemany (bool): Whether the statement is executed with several sets of parameters.
+    """
+    starts = conn.info.get('slow_query_starts')
+    if not starts:
+        # The engine started to be listened to while the statement was executed.
+        return
+    duration = time.time() - starts.pop()
+    threshold = config.get('slow_queries.threshold')
+    if threshold is None or duration < threshold:
+        return
+
+    caller, entry_point = _locate()
+    record = {
+        'timestamp': time.time(), 'duration': round(duration, 6), 'statement': statement,
+        'parameters': repr(parameters)[:MAX_PARAMETERS_LENGTH], 'executemany': executemany,
+        'caller': caller, 'entry_point': entry_point, 'explain': None}
+    if config.get('slow_queries.explain') and not executemany:
+        record['explain'] = explain(conn, statement, parameters)
+
+    log.warning('Slow query (%.3fs) from %s: %s', duration, caller, statement)
+    if config.get('slow_queries.path'):
+        _write(record)
+
+
+def _locate():
+    """
+    Find the Bodhi code that is executing a statement.
+
+    Returns:
+        tuple: A 2-tuple of the innermost Bodhi frame outside of this module and the innermost frame
+            of a service, view, validator, consumer or script, both formatted as
+            ``path:line (function)`` with paths relative to the bodhi package. Either is None if no
+            such frame is found.
+    """
+    caller = entry_point = None
+    for filename, lineno, function, text in reversed(traceback.extract_stack()):
+        filename = filename.replace(os.sep, '/')
+        if '/bodhi/' not in filename or filename.rstrip('c').endswith('/slow_queries.py'):
+            continue
+        location = '%s:%d (%s)' % (filename.rsplit('/bodhi/', 1)[1], lineno, function)
+        if caller is None:
+            caller = location
+        if any(p in filename for p in ENTRY_POINTS):
+            entry_point = location
+            break
+    return caller, entry_point
+
+
+def explain(conn, statement, parameters):
+    """
+    Return the plan the database reports for a statement.
+
+    The statement is explained on a new cursor of the same DBAPI connection, so it sees the same
+    transaction and doesn't trigger the engine events again. Only SELECT statements are explained.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): The connection the statement was executed on.
+        statement (basestring): The statement.
+        parameters (object): The parameters of the statement.
+    Returns:
+        list or None: The lines of the plan, or None if the statement couldn't be explained.
+    """
+    if not statement.lstrip().upper().startswith('SELECT'):
+        return None
+    postgresql = conn.dialect.name == 'postgresql'
+    cursor = conn.connection.cursor()
+    try:
+        if postgresql:
+            # A failed statement would abort the transaction the slow statement is part of.
+            cursor.execute('SAVEPOINT bodhi_explain')
+        try:
+            cursor.execute(('EXPLAIN ' if postgresql else 'EXPLAIN QUERY PLAN ') + statement,
+                           parameters)
+            # PostgreSQL returns one line per row, SQLite details the plan in the last column.
+            plan = ['%s' % row[-1] for row in cursor.fetchall()]
+        finally:
+            if postgresql:
+                cursor.execute('ROLLBACK TO SAVEPOINT bodhi_explain')
+                cursor.execute('RELEASE SAVEPOINT bodhi_explain')
+        return plan
+    except Exception as e:
+        log.debug('Unable to explain %s: %s', statement, e)
+        return None
+    finally:
+        cursor.close()
+
+
+def _get_handler(path):
+    """
+    Return the rotating file handler that writes to the given path, creating it if needed.
+
+    Args:
+        path (basestring): The path of the log.
+    Returns:
+        logging.handlers.RotatingFileHandler: The handler.
+    """
+    with _lock:
+        handler = _handlers.get(path)
+        if handler is None:
+            handler = _handlers[path] = RotatingFileHandler(
+                path, maxBytes=config['slow_queries.max_bytes'],
+                backupCount=config['slow_queries.backup_count'])
+        return handler
+
+
+def _write(record):
+    """
+    Append a record to the log, rotating it if it is full.
+
+    Args:
+        record (dict): The record.
+    """
+    try:
+        handler = _get_handler(config['slow_queries.path'])
+        handler.handle(logging.makeLogRecord({'msg': json.dumps(record, sort_keys=True)}))
+    except Exception:
+        log.exception('Unable to record a slow query')
+
+
+def read(path=None):
+    """
+    Return the records of the log and of its rotated files, oldest first.
+
+    Args:
+        path (basestring or None): The path of the log. Defaults to the ``slow_queries.path``
+            setting.
+    Returns:
+        list: The records, as dictionaries.
+    """
+    path = path or config.get('slow_queries.path')
+    if not path:
+        return []
+    paths = ['%s.%d' % (path, i) for i in range(config['slow_queries.backup_count'], 0, -1)]
+    records = []
+    for filename in paths + [path]:
+        if not os.path.exists(filename):
+            continue
+        with open(filename) as log_file:
+            for line in log_file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A line may be partially written, or truncated by a rotation.
+                    continue
+    return records
+
+
+def top_offenders(records, limit=20):
+    """
+    Aggregate slow query records per statement, slowest in total first.
+
+    Args:
+        records (list): The records, as returned by :func:`read`.
+        limit (int): How many statements to return.
+    Returns:
+        list: Dictionaries with the ``statement``, the number of times it was slow (``count``), its
+            ``total_duration`` and ``max_duration``, the ``callers`` and ``entry_points`` it was
+            executed from, and the ``slowest`` record.
+    """
+    statements = {}
+    for record in records:
+        stats = statements.get(record['statement'])
+        if stats is None:
+            stats = statements[record['statement']] = {
+                'statement': record['statement'], 'count': 0, 'total_duration': 0.0,
+                'max_duration': 0.0, 'callers': set(), 'entry_points': set(), 'slowest': None}
+        stats['count'] += 1
+        stats['total_duration'] += record['duration']
+        if record['duration'] >= stats['max_duration']:
+            stats['max_duration'] = record['duration']
+            stats['slowest'] = record
+        stats['callers'].add(record['caller'])
+        stats['entry_points'].add(record['entry_point'])
+
+    offenders = sorted(statements.values(), key=lambda s: s['total_duration'], reverse=True)
+    for stats in offenders:
+        stats['callers'] = sorted(c for c in stats['callers'] if c)
+        stats['entry_points'] = sorted(e for e in stats['entry_points'] if e)
+    return offenders[:limit]
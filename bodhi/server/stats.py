@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Per-release update statistics, as displayed by the home, release and metrics pages.
+
+The number of updates of each release by status, type and the month they were submitted in is
+materialized in the ``release_stats`` table (see :class:`bodhi.server.models.ReleaseStat`), so the
+pages read a few dozen rows instead of scanning the updates. Whenever the status, type, submission
+date or release of an update changes through the ORM, or an update is created or deleted, the
+counts of the rows it leaves and joins are decremented and incremented as part of the same flush,
+and thus of the same transaction. The listeners that do this are registered by :func:`listen`,
+which :func:`bodhi.server.initialize_db` calls. Bulk query updates bypass this, and :func:`rebuild`
+(exposed as ``bodhi-rebuild-release-stats``) recomputes the table from scratch.
+
+The rows are also kept in memory per release. That cache is invalidated whenever an update of the
+release changes in this process, and changes made by other processes are picked up once the cached
+statistics are older than ``release_stats.ttl`` seconds.
+"""
+import collections
+import threading
+import time
+
+from sqlalchemy import and_, event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.attributes import NEVER_SET, NO_VALUE
+
+from bodhi.server import log, Session
+from bodhi.server.config import config
+from bodhi.server.models import ReleaseStat, Update, UpdateStatus, UpdateType
+
+
+_lock = threading.Lock()
+_cache = {}
+#: Stands for the values an update had before a flush when they weren't loaded.
+_unknown = object()
+#: The attributes of an update that decide which release_stats row it is counted in.
+_TRACKED = frozenset(('release', 'release_id', 'status', 'type', 'date_submitted'))
+
+
+class ReleaseStats(object):
+    """
+    The number of updates in a release, broken down by status, type and month.
+
+    Attributes:
+        counts (dict): Maps (UpdateStatus, UpdateType, month) 3-tuples to the number of matching
+            updates. Months are formatted as ``YYYY/MM``.
+        timestamp (float): When the statistics were computed.
+    """
+
+    def __init__(self, counts=None):
+        """
+        Initialize the statistics.
+
+        Args:
+            counts (dict or None): See the class attributes.
+        """
+        self.counts = counts or {}
+        self.timestamp = time.time()
+
+    @property
+    def total(self):
+        """
+        Return the total number of updates in the release.
+
+        Returns:
+            int: The number of updates.
+        """
+        return sum(self.counts.values())
+
+    def count(self, status=None, type=None):
+        """
+        Return the number of updates with the given status and type.
+
+        Args:
+            status (UpdateStatus or None): If given, only count updates with this status.
+            type (UpdateType or None): If given, only count updates of this type.
+        Returns:
+            int: The number of matching updates.
+        """
+        return sum(
+            n for (s, t, month), n in self.counts.items()
+            if (status is None or s is status) and (type is None or t is type))
+
+    def status_counts(self, statuses=(UpdateStatus.pending, UpdateStatus.testing,
+                                      UpdateStatus.stable)):
+        """
+        Return the counts that are displayed on the home page.
+
+        The keys are named after the template ``{status}_{type}_total``, where type is either the
+        description of an :class:`UpdateType` or ``updates`` for all types.
+
+        Args:
+            statuses (iterable): The statuses to report counts for.
+        Returns:
+            dict: The counts, as described above.
+        """
+        counts = {}
+        for status in statuses:
+            counts['{}_updates_total'.format(status.description)] = self.count(status)
+            for type_ in map(UpdateType.from_string, UpdateType.values()):
+                counts['{}_{}_total'.format(status.description, type_.description)] = \
+                    self.count(status, type_)
+        return counts
+
+    def by_month(self):
+        """
+        Return the number of updates of each type that were submitted per month.
+
+        Returns:
+            tuple: A 2-tuple. The first element is the sorted list of months that had any update.
+                The second element maps UpdateType descriptions to OrderedDicts that map every one
+                of those months to the number of updates submitted in it.
+        """
+        months = sorted(set(month for s, t, month in self.counts if month))
+        by_month = {}
+        for (status, type_, month), n in self.counts.items():
+            if not month:
+                continue
+            if type_.description not in by_month:
+                by_month[type_.description] = collections.OrderedDict((m, 0) for m in months)
+            by_month[type_.description][month] += n
+        return months, by_month
+
+
+def _month(column, dialect):
+    """
+    Return an expression that formats the given date column as ``YYYY/MM``.
+
+    Args:
+        column (sqlalchemy.Column): The DateTime column to format.
+        dialect (basestring): The name of the database dialect in use.
+    Returns:
+        sqlalchemy.sql.functions.Function: The formatting expression.
+    """
+    if dialect == 'postgresql':
+        month = func.to_char(column, 'YYYY/MM')
+    else:
+        month = func.strftime('%Y/%m', column)
+    # Updates always get a submission date, but the column is nullable.
+    return func.coalesce(month, u'')
+
+
+def rebuild(db, release_ids=None):
+    """
+    Recompute the release_stats rows of the given releases from the updates table.
+
+    This scans all the updates of the releases, so it is only used to repair the table, and when the
+    values an update had before a flush are unknown.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        release_ids (iterable or None): The ids of the releases to recompute. If None, the whole
+            table is rebuilt.
+    """
+    table = ReleaseStat.__table__
+    month = _month(Update.date_submitted, db.bind.dialect.name)
+    aggregate = select([Update.release_id, Update.status, Update.type, month,
+                        func.count(Update.id)])\
+        .group_by(Update.release_id, Update.status, Update.type, month)
+    delete = table.delete()
+
+    if release_ids is not None:
+        release_ids = sorted(release_ids)
+        if not release_ids:
+            return
+        aggregate = aggregate.where(Update.release_id.in_(release_ids))
+        delete = delete.where(table.c.release_id.in_(release_ids))
+
+    db.execute(delete)
+    db.execute(table.insert().from_select(
+        ['release_id', 'status', 'type', 'month', 'count'], aggregate))
+    invalidate(*(release_ids or ()))
+
+
+def compute(db, release_ids):
+    """
+    Read the statistics of the given releases from the release_stats table.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        release_ids (list): The ids of the releases to read statistics for.
+    Returns:
+        dict: Maps each of the release ids to its :class:`ReleaseStats`.
+    """
+    query = db.query(ReleaseStat.release_id, ReleaseStat.status, ReleaseStat.type,
+                     ReleaseStat.month, ReleaseStat.count)\
+        .filter(ReleaseStat.release_id.in_(release_ids)).filter(ReleaseStat.count != 0)
+
+    counts = dict((release_id, {}) for release_id in release_ids)
+    for release_id, status, type_, month, n in query:
+        counts[release_id][(status, type_, month)] = n
+    return dict((release_id, ReleaseStats(c)) for release_id, c in counts.items())
+
+
+def get_stats(db, releases):
+    """
+    Return the statistics of the given releases, computing the ones that aren't cached.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        releases (list): The :class:`Releases <bodhi.server.models.Release>` to return statistics
+            for.
+    Returns:
+        dict: Maps each release name to its :class:`ReleaseStats`.
+    """
+    ttl = config.get('release_stats.ttl')
+    now = time.time()
+    stats = {}
+    with _lock:
+        for release in releases:
+            cached = _cache.get(release.id)
+            if cached is not None and now - cached.timestamp < ttl:
+                stats[release.id] = cached
+
+    missing = [r.id for r in releases if r.id not in stats]
+    if missing:
+        computed = compute(db, missing)
+        stats.update(computed)
+        if ttl:
+            with _lock:
+                _cache.update(computed)
+
+    return dict((release.name, stats[release.id]) for release in releases)
+
+
+def get_release_stats(db, release):
+    """
+    Return the statistics of a single release.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        release (bodhi.server.models.Release): The release to return statistics for.
+    Returns:
+        ReleaseStats: The statistics of the release.
+    """
+    return get_stats(db, [release])[release.name]
+
+
+def invalidate(*release_ids):
+    """
+    Forget the cached statistics of the given releases.
+
+    Args:
+        release_ids (list): The ids of the releases to invalidate. If none are given, the
+            statistics of all releases are forgotten.
+    """
+    with _lock:
+        if not release_ids:
+            _cache.clear()
+        for release_id in release_ids:
+            _cache.pop(release_id, None)
+
+
+def _remember(session, *release_ids):
+    """
+    Invalidate the given releases now, and again once the session's transaction ends.
+
+    Args:
+        session (sqlalchemy.orm.session.Session or None): The session the change was made in.
+        release_ids (list): The ids of the releases whose statistics changed. None values are
+            ignored.
+    """
+    release_ids = [r for r in release_ids if r is not None]
+    if not release_ids:
+        return
+    invalidate(*release_ids)
+    if session is not None:
+        session.info.setdefault('release_stats', set()).update(release_ids)
+
+
+def _update_changed(target, value, oldvalue, initiator):
+    """
+    Invalidate the statistics of the release of an update whose status, type or date changed.
+
+    Args:
+        target (bodhi.server.models.Update): The update that changed.
+        value (object): The new value. Unused.
+        oldvalue (object): The previous value. Unused.
+        initiator (sqlalchemy.orm.attributes.Event): Unused.
+    """
+    if value != oldvalue:
+        # Look the release up in __dict__ to avoid loading it from within an attribute event.
+        release = target.__dict__.get('release')
+        _remember(object_session(target), target.release_id, getattr(release, 'id', None))
+
+
+def _release_changed(target, value, oldvalue, initiator):
+    """
+    Invalidate the statistics of both the previous and the new release of an update.
+
+    Args:
+        target (bodhi.server.models.Update): The update that changed.
+        value (bodhi.server.models.Release): The new release.
+        oldvalue (bodhi.server.models.Release or symbol): The previous release.
+        initiator (sqlalchemy.orm.attributes.Event): Unused.
+    """
+    _remember(object_session(target), getattr(value, 'id', None), getattr(oldvalue, 'id', None),
+              target.release_id)
+
+
+def _updates_deleted(session, flush_context, instances):
+    """
+    Invalidate the statistics of the releases of deleted updates.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session being flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+        instances (list): Unused.
+    """
+    _remember(session, *[u.release_id for u in session.deleted if isinstance(u, Update)])
+
+
+def _month_of(date):
+    """
+    Format a submission date like :func:`_month` does.
+
+    Args:
+        date (datetime.datetime or None): The submission date of an update.
+    Returns:
+        unicode: The month formatted as ``YYYY/MM``, or an empty string if there is no date.
+    """
+    return u'%04d/%02d' % (date.year, date.month) if date else u''
+
+
+def _original(state, key):
+    """
+    Return the value an attribute of an update had before the current flush.
+
+    Args:
+        state (sqlalchemy.orm.state.InstanceState): The state of the update.
+        key (basestring): The name of the attribute.
+    Returns:
+        object: The value, or :data:`_unknown` if it changed and its previous value wasn't loaded.
+    """
+    if key not in state.committed_state:
+        return getattr(state.obj(), key)
+    value = state.committed_state[key]
+    if value is NO_VALUE or value is NEVER_SET:
+        return _unknown
+    return value
+
+
+def _old_key(state):
+    """
+    Return the release_stats row an update was counted in before the current flush.
+
+    Args:
+        state (sqlalchemy.orm.state.InstanceState): The state of the update.
+    Returns:
+        tuple or object: The (release_id, status, type, month) of the row, or :data:`_unknown`.
+    """
+    if 'release' in state.committed_state:
+        release = _original(state, 'release')
+        release_id = getattr(release, 'id', None) if release is not _unknown else _unknown
+    else:
+        release_id = _original(state, 'release_id')
+    key = (release_id, _original(state, 'status'), _original(state, 'type'),
+           _original(state, 'date_submitted'))
+    if any(value is _unknown for value in key):
+        return _unknown
+    return key[:3] + (_month_of(key[3]),)
+
+
+def _new_key(update):
+    """
+    Return the release_stats row an update is counted in after the current flush.
+
+    Args:
+        update (bodhi.server.models.Update): The update.
+    Returns:
+        tuple: The (release_id, status, type, month) of the row.
+    """
+    return update.release_id, update.status, update.type, _month_of(update.date_submitted)
+
+
+def _apply(db, deltas):
+    """
+    Add the given deltas to the counts of the release_stats rows.
+
+    The rows are changed in a consistent order, so that concurrent transactions don't deadlock.
+    Rows are created as they get their first update, in a savepoint so that a concurrent transaction
+    creating the same row first doesn't fail the current one. Rows are kept once their count drops
+    to 0, since updates tend to come back to them.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): A database session.
+        deltas (dict): Maps (release_id, status, type, month) 4-tuples to the number to add to the
+            count of the row.
+    """
+    table = ReleaseStat.__table__
+    connection = db.connection()
+    # Updates without a release, status or type aren't counted.
+    keys = sorted((k for k, n in deltas.items() if n and None not in k[:3]),
+                  key=lambda k: (k[0], k[1].value, k[2].value, k[3]))
+    for key in keys:
+        release_id, status, type_, month = key
+        update = table.update()\
+            .where(and_(table.c.release_id == release_id, table.c.status == status,
+                        table.c.type == type_, table.c.month == month))\
+            .values(count=table.c.count + deltas[key])
+        if connection.execute(update).rowcount:
+            continue
+        if deltas[key] < 0:
+            log.warn('The release_stats row %r is missing, run bodhi-rebuild-release-stats', key)
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(table.insert().values(
+                    release_id=release_id, status=status, type=type_, month=month,
+                    count=deltas[key]))
+        except IntegrityError:
+            log.debug('The release_stats row %r was created by another transaction', key)
+            connection.execute(update)
+
+
+def _refresh_table(session, flush_context):
+    """
+    Move the updates created, changed or deleted by the flush between the release_stats rows.
+
+    The attribute history of the updates still describes the flush at this point, so the rows an
+    update leaves are known from the values it had before the flush.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session being flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+    """
+    deltas = collections.Counter()
+    unknown = set()
+    for update in session.new:
+        if isinstance(update, Update):
+            deltas[_new_key(update)] += 1
+            # New updates may belong to releases that had no id yet when they were assigned.
+            _remember(session, update.release_id)
+    for update in session.dirty:
+        if not isinstance(update, Update):
+            continue
+        state = inspect(update)
+        if not _TRACKED.intersection(state.committed_state):
+            continue
+        old, new = _old_key(state), _new_key(update)
+        if old is _unknown:
+            unknown.add(update.release_id)
+        elif old != new:
+            deltas[old] -= 1
+            deltas[new] += 1
+    for update in session.deleted:
+        if isinstance(update, Update):
+            old = _old_key(inspect(update))
+            if old is _unknown:
+                unknown.add(update.release_id)
+            else:
+                deltas[old] -= 1
+
+    _apply(session, deltas)
+    if unknown:
+        # This should not happen, since the listeners load the previous values.
+        log.warn('Rebuilding the statistics of releases %r', sorted(unknown))
+        rebuild(session, unknown)
+
+
+def _transaction_ended(session, *args):
+    """
+    Invalidate the releases changed by the transaction that just ended.
+
+    Other requests may have computed statistics between our change and the end of our
+    transaction, without seeing the change.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session whose transaction ended.
+        args (list): Unused.
+    """
+    release_ids = session.info.pop('release_stats', None)
+    if release_ids:
+        log.debug('Invalidating the statistics of releases %r', sorted(release_ids))
+        invalidate(*release_ids)
+
+
+#: The (target, event, function, keyword arguments) of the listeners registered by :func:`listen`.
+#: The attribute listeners load the previous values, so that the flush knows which rows an update
+#: leaves.
+_LISTENERS = (
+    (Update.status, 'set', _update_changed, {'active_history': True}),
+    (Update.type, 'set', _update_changed, {'active_history': True}),
+    (Update.date_submitted, 'set', _update_changed, {'active_history': True}),
+    (Update.release, 'set', _release_changed, {'active_history': True}),
+    (Session, 'before_flush', _updates_deleted, {}),
+    (Session, 'after_flush', _refresh_table, {}),
+    (Session, 'after_commit', _transaction_ended, {}),
+    (Session, 'after_soft_rollback', _transaction_ended, {}),
+)
+
+
+def listen():
+    """Maintain the release_stats table and the cached statistics as updates change."""
+    for target, identifier, fn, kwargs in _LISTENERS:
+        if not event.contains(target, identifier, fn):
+            event.listen(target, identifier, fn, **kwargs)
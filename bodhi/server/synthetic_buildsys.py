@@ -0,0 +1,649 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+A synthetic Koji, used to load test Bodhi without a real Koji.
+
+:func:`bodhi.server.buildsys.setup_buildsystem` imports this module when the ``buildsystem`` setting
+is ``synthetic``. The ``synthetic_buildsys.*`` settings that describe the catalog and the latency
+and failures of the calls are documented in the developer documentation.
+"""
+from collections import Counter, OrderedDict
+from datetime import datetime
+from functools import wraps
+from threading import Lock
+import hashlib
+import random
+import time
+
+import koji
+
+from bodhi.server.buildsys import Buildsystem, multicall_enabled
+
+
+# The synthetic Koji starts its catalog at this time, and one build completes every minute.
+_SYNTHETIC_EPOCH = 1514764800
+# The ids of the tasks that built the builds of the synthetic Koji start here, so that they don't
+# collide with the ids of the tasks that tag builds.
+_SYNTHETIC_BUILD_TASKS = 10 ** 9
+# How the builds of the synthetic catalog are spread over the tags of their release.
+_SYNTHETIC_TAGS = ((0.6, 'f%s'), (0.85, 'f%s-updates'), (0.95, 'f%s-updates-testing'),
+                   (1.0, 'f%s-updates-candidate'))
+
+
+def _candidate_tag(release):
+    """
+    Return the candidate tag of the Fedora release named by the dist tag of a build's release.
+
+    Args:
+        release (basestring): The release of a build, such as ``1.fc28``.
+    Returns:
+        basestring or None: The candidate tag, such as ``f28-updates-candidate``, or None if the
+            release has no Fedora dist tag.
+    """
+    for token in release.split('.'):
+        if token.startswith('fc') and token[2:].isdigit():
+            return 'f%s-updates-candidate' % token[2:]
+    return None
+
+
+class SyntheticKoji(object):
+    """
+    The builds, RPMs and tags of a synthetic Koji, shared by the SyntheticBuildsys of a process.
+
+    The catalog of builds is generated from a seed, so that the same settings always describe the
+    same data. Each build is a new version of one of ``packages`` packages for one of the
+    ``releases``, and is tagged into the dist tag or the stable, testing or candidate tag of its
+    release. Builds that aren't in the catalog, such as the builds of the updates of a test
+    database, are added to the candidate tag of their release the first time they are looked up,
+    as long as their release names a Fedora dist tag. Tagging builds changes their tags for all the
+    sessions.
+
+    The calls can be slowed down and made to fail, to measure how Bodhi copes with a busy Koji.
+
+    Attributes:
+        seed (int): The seed of the catalog and of the failures.
+        arches (list): The architectures of the binary RPMs of the builds. One build out of five is
+            noarch instead.
+        latency (float): How many seconds each round trip to Koji takes. A multicall is a single
+            round trip.
+        call_latency (float): How many more seconds each call takes, including the calls of
+            multicalls.
+        failure_rate (float): The probability of each call to fail with a koji.GenericError.
+        failing_methods (set): The names of the methods that can fail. All of them can if it is
+            empty.
+        calls (collections.Counter): Counts the calls to each method.
+        round_trips (int): Counts the round trips.
+        lock (threading.Lock): Held by the sessions while they use the data.
+    """
+
+    def __init__(self, seed=0, builds=100000, packages=20000, releases=('26', '27', '28'),
+                 arches=('aarch64', 'ppc64le', 's390x', 'x86_64'), latency=0.0, call_latency=0.0,
+                 failure_rate=0.0, failing_methods=()):
+        """
+        Generate the catalog of builds.
+
+        Args:
+            seed (int): See the class attributes.
+            builds (int): The number of builds in the catalog.
+            packages (int): The number of packages the builds of the catalog are spread over.
+            releases (iterable): The versions of the Fedora releases the builds are spread over.
+            arches (iterable): See the class attributes.
+            latency (float): See the class attributes.
+            call_latency (float): See the class attributes.
+            failure_rate (float): See the class attributes.
+            failing_methods (iterable): See the class attributes.
+        """
+        self.seed = seed
+        self.arches = list(arches)
+        self.latency = latency
+        self.call_latency = call_latency
+        self.failure_rate = failure_rate
+        self.failing_methods = set(failing_methods)
+        self.calls = Counter()
+        self.round_trips = 0
+        self.lock = Lock()
+        self._failures = random.Random(seed)
+        # The (name, version, release) of each build, whose id is its index plus one
+        self._builds = []
+        self._ids = {}
+        # The names of the tags of each build, and the ids of the builds in each tag
+        self._build_tags = []
+        self._tagged = {}
+        self._tag_ids = {}
+        self._packages = OrderedDict()
+        # The (method, request) of the tasks that tagged builds, whose id is their index plus one
+        self._tasks = []
+
+        rng = random.Random(seed)
+        releases = list(releases)
+        versions = Counter()
+        for i in range(builds):
+            name = 'package%05d' % int(rng.random() * packages)
+            release = releases[int(rng.random() * len(releases))]
+            versions[name, release] += 1
+            draw = rng.random()
+            tag = next(tag for limit, tag in _SYNTHETIC_TAGS if draw < limit)
+            self.add('%s-0.%d-1.fc%s' % (name, versions[name, release], release), [tag % release])
+
+    def add(self, nvr, tags):
+        """
+        Add a build to the catalog.
+
+        The lock must be held while builds are added to a catalog that is in use.
+
+        Args:
+            nvr (basestring): The NVR of the build.
+            tags (list): The tags of the build.
+        Returns:
+            int: The id of the build.
+        """
+        name, version, release = nvr.rsplit('-', 2)
+        self._packages.setdefault(name, len(self._packages) + 1)
+        self._builds.append((name, version, release))
+        self._build_tags.append([])
+        build_id = self._ids[nvr] = len(self._builds)
+        for tag in tags:
+            self.tag(build_id, tag)
+        return build_id
+
+    def call(self, method):
+        """
+        Count a call, wait for it and decide whether it fails.
+
+        Args:
+            method (basestring): The name of the method that is called.
+        Raises:
+            koji.GenericError: If the call fails.
+        """
+        with self.lock:
+            self.calls[method] += 1
+            fails = self.failure_rate and (
+                not self.failing_methods or method in self.failing_methods) and \
+                self._failures.random() < self.failure_rate
+        if self.call_latency:
+            time.sleep(self.call_latency)
+        if fails:
+            raise koji.GenericError('Synthetic failure of %s()' % method)
+
+    def round_trip(self):
+        """Count a round trip to Koji and wait for it."""
+        with self.lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def lookup(self, build):
+        """
+        Return the id of the given build, adding it to the catalog if needed.
+
+        Args:
+            build (int or basestring): The id or the NVR of a build.
+        Returns:
+            int or None: The id of the build, or None if there is no such build.
+        """
+        if isinstance(build, int):
+            return build if 0 < build <= len(self._builds) else None
+        if build in self._ids:
+            return self._ids[build]
+        try:
+            release = build.rsplit('-', 2)[2]
+        except IndexError:
+            return None
+        tag = _candidate_tag(release)
+        return self.add(build, [tag]) if tag else None
+
+    def build_info(self, build_id):
+        """
+        Return the description of a build, as Koji's getBuild() does.
+
+        Args:
+            build_id (int): The id of the build.
+        Returns:
+            dict: The build.
+        """
+        name, version, release = self._builds[build_id - 1]
+        completed = _SYNTHETIC_EPOCH + build_id * 60
+        return {
+            'build_id': build_id, 'id': build_id, 'name': name, 'package_name': name,
+            'package_id': self._packages[name], 'version': version, 'release': release,
+            'nvr': '%s-%s-%s' % (name, version, release), 'epoch': None, 'extra': None,
+            'state': koji.BUILD_STATES['COMPLETE'], 'owner_id': build_id % 500 + 1,
+            'owner_name': 'packager%03d' % (build_id % 500),
+            'task_id': _SYNTHETIC_BUILD_TASKS + build_id, 'creation_event_id': build_id * 10,
+            'creation_ts': completed - 3600,
+            'creation_time': str(datetime.utcfromtimestamp(completed - 3600)),
+            'completion_ts': completed,
+            'completion_time': str(datetime.utcfromtimestamp(completed)),
+            'volume_id': 0, 'volume_name': 'DEFAULT'}
+
+    def build_rpms(self, build_id):
+        """
+        Return the RPMs of a build, as Koji's listBuildRPMs() does.
+
+        Args:
+            build_id (int): The id of the build.
+        Returns:
+            list: The source RPM, followed by the binary RPMs.
+        """
+        build = self.build_info(build_id)
+        arches = ['noarch'] if build_id % 5 == 0 else self.arches
+        rpms = []
+        for i, arch in enumerate(['src'] + arches):
+            rpms.append({
+                'id': build_id * 100 + i, 'build_id': build_id, 'buildroot_id': build_id,
+                'name': build['name'], 'version': build['version'], 'release': build['release'],
+                'nvr': build['nvr'], 'epoch': None, 'arch': arch,
+                'buildtime': build['completion_ts'],
+                'size': 100000 + (build_id * 7919 + i * 104729) % 5000000,
+                'payloadhash': hashlib.md5(
+                    ('%s.%s' % (build['nvr'], arch)).encode('utf-8')).hexdigest(),
+                'external_repo_id': 0, 'external_repo_name': 'INTERNAL', 'metadata_only': False,
+                'extra': None})
+        return rpms
+
+    def rpm_headers(self, rpm):
+        """
+        Return the headers of an RPM, as Koji's getRPMHeaders() does.
+
+        Args:
+            rpm (int or basestring): The id of the RPM, or its NVR followed by its arch.
+        Returns:
+            dict or None: The headers, or None if there is no such RPM.
+        """
+        if isinstance(rpm, int):
+            build_id = self.lookup(rpm // 100)
+        else:
+            build_id = self.lookup(rpm.rsplit('.', 1)[0])
+        if build_id is None:
+            return None
+        build = self.build_info(build_id)
+        evr = '%s-%s' % (build['version'], build['release'])
+        return {
+            'name': build['name'], 'version': build['version'], 'release': build['release'],
+            'summary': 'The %s package' % build['name'],
+            'description': 'A synthetic package, %s.' % build['name'],
+            'url': 'https://example.com/%s' % build['name'],
+            'changelogtime': [build['completion_ts'] - i * 86400 for i in range(3)],
+            'changelogname': ['%s <%s@example.com> - %s' % (
+                build['owner_name'], build['owner_name'], evr)] * 3,
+            'changelogtext': ['- Update to %s' % build['version'], '- Fix the tests',
+                              '- Rebuilt']}
+
+    def tag_info(self, tag):
+        """
+        Return the description of a tag, as Koji's getTag() does.
+
+        Args:
+            tag (int or basestring): The id or the name of the tag. Any name is a valid tag.
+        Returns:
+            dict or None: The tag, or None if there is no tag with the given id.
+        """
+        if isinstance(tag, int):
+            names = [name for name, tag_id in self._tag_ids.items() if tag_id == tag]
+            if not names:
+                return None
+            tag = names[0]
+        tag_id = self._tag_ids.setdefault(tag, len(self._tag_ids) + 1)
+        return {'id': tag_id, 'name': tag, 'arches': ' '.join(self.arches), 'locked': False,
+                'perm': None, 'perm_id': None, 'maven_support': False, 'maven_include_all': False}
+
+    def tags(self, build_id):
+        """
+        Return the names of the tags of a build.
+
+        Args:
+            build_id (int): The id of the build.
+        Returns:
+            list: The names of the tags, in the order the build was tagged in.
+        """
+        return list(self._build_tags[build_id - 1])
+
+    def tag(self, build_id, tag):
+        """
+        Tag a build.
+
+        Args:
+            build_id (int): The id of the build.
+            tag (basestring): The name of the tag.
+        """
+        self.tag_info(tag)
+        self._build_tags[build_id - 1].append(tag)
+        self._tagged.setdefault(tag, set()).add(build_id)
+
+    def untag(self, build_id, tag):
+        """
+        Remove a build from a tag it is in.
+
+        Args:
+            build_id (int): The id of the build.
+            tag (basestring): The name of the tag.
+        """
+        self._build_tags[build_id - 1].remove(tag)
+        self._tagged[tag].discard(build_id)
+
+    def tagged(self, tag, latest=False, package=None):
+        """
+        Return the ids of the builds of a tag.
+
+        Args:
+            tag (basestring): The name of the tag.
+            latest (bool): If True, only return the newest build of each package.
+            package (basestring or None): If given, only return the builds of this package.
+        Returns:
+            list: The ids of the builds, oldest first.
+        """
+        build_ids = sorted(self._tagged.get(tag, ()))
+        if package is not None:
+            build_ids = [i for i in build_ids if self._builds[i - 1][0] == package]
+        if latest:
+            newest = dict((self._builds[i - 1][0], i) for i in build_ids)
+            build_ids = sorted(newest.values())
+        return build_ids
+
+    def packages(self):
+        """
+        Return the packages, as Koji's listPackages() does.
+
+        Returns:
+            list: Dictionaries with the ``package_id`` and ``package_name`` of each package.
+        """
+        return [{'package_id': package_id, 'package_name': name}
+                for name, package_id in self._packages.items()]
+
+    def new_task(self, method, request):
+        """
+        Record a task that changed the tags of a build, and completed at once.
+
+        Args:
+            method (basestring): The method of the task.
+            request (list): The arguments of the task.
+        Returns:
+            int: The id of the task.
+        """
+        self._tasks.append((method, request))
+        return len(self._tasks)
+
+    def task_info(self, task_id):
+        """
+        Return the description of a task, as Koji's getTaskInfo() does.
+
+        Args:
+            task_id (int): The id of the task.
+        Returns:
+            dict or None: The task, or None if there is no such task.
+        """
+        if task_id > _SYNTHETIC_BUILD_TASKS and self.lookup(task_id - _SYNTHETIC_BUILD_TASKS):
+            build = self.build_info(task_id - _SYNTHETIC_BUILD_TASKS)
+            method = 'build'
+            request = ['git+https://src.example.com/rpms/%s.git#%s' % (
+                build['name'], hashlib.sha1(build['nvr'].encode('utf-8')).hexdigest()),
+                _candidate_tag(build['release']), {}]
+        elif 0 < task_id <= len(self._tasks):
+            method, request = self._tasks[task_id - 1]
+        else:
+            return None
+        return {'id': task_id, 'method': method, 'request': request,
+                'state': koji.TASK_STATES['CLOSED']}
+
+
+def _simulated(func):
+    """
+    Decorate a SyntheticBuildsys method to simulate the latency and the failures of Koji.
+
+    Calls made outside of a multicall are a round trip of their own, while the calls of a multicall
+    share the round trip of multiCall(). Failed calls raise a koji.GenericError, which becomes a
+    fault in multicalls.
+
+    Args:
+        func (callable): The method to wrap.
+    Returns:
+        callable: A wrapped version of func, which supports multicalls.
+    """
+    @wraps(func)
+    def call(self, *args, **kwargs):
+        self.hub.call(func.__name__)
+        return func(self, *args, **kwargs)
+
+    call = multicall_enabled(call)
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not self.multicall:
+            self.hub.round_trip()
+        return call(self, *args, **kwargs)
+    return wrapper
+
+
+class SyntheticBuildsys(Buildsystem):
+    """
+    A session of a :class:`SyntheticKoji`, which can stand in for Koji in load and compose tests.
+
+    Unlike the DevBuildsys, the responses are consistent with each other and with the changes made
+    to the tags, and the calls can be slow and fail like Koji's.
+    """
+
+    def __init__(self, hub):
+        """
+        Initialize the session.
+
+        Args:
+            hub (SyntheticKoji): The synthetic Koji this is a session of.
+        """
+        self.hub = hub
+        self._multicall = False
+        self.multicall_result = []
+
+    @property
+    def multicall(self):
+        """
+        Return whether calls are being queued for a multicall.
+
+        Returns:
+            bool: True if calls are being queued.
+        """
+        return self._multicall
+
+    @multicall.setter
+    def multicall(self, value):
+        """
+        Start or cancel queuing calls for a multicall.
+
+        Args:
+            value (bool): True to start queuing calls.
+        """
+        self._multicall = value
+        self.multicall_result = []
+
+    def multiCall(self, strict=False):
+        """
+        Emulate Koji's multiCall, in a single round trip.
+
+        Args:
+            strict (bool): If True, raise the first fault instead of returning it.
+        Returns:
+            list: The responses of the calls.
+        Raises:
+            koji.GenericError: If strict is True and one of the calls failed.
+        """
+        result = self.multicall_result
+        self.multicall = False
+        self.hub.round_trip()
+        if strict:
+            for response in result:
+                if isinstance(response, dict):
+                    raise koji.GenericError(response['faultString'])
+        return result
+
+    def ssl_login(self, *args, **kw):
+        """Emulate Koji's ssl_login."""
+        return True
+
+    def krb_login(self, *args, **kw):
+        """Emulate Koji's krb_login."""
+        return True
+
+    @_simulated
+    def getAPIVersion(self):
+        """Emulate Koji's getAPIVersion."""
+        return koji.API_VERSION
+
+    @_simulated
+    def getLoggedInUser(self):
+        """Emulate Koji's getLoggedInUser."""
+        return {'id': 1, 'name': 'bodhi', 'status': 0, 'usertype': 0}
+
+    def _build_id(self, build, strict=True):
+        """
+        Return the id of the given build.
+
+        Args:
+            build (int or basestring): The id or the NVR of the build.
+            strict (bool): If True, raise an Exception if there is no such build.
+        Returns:
+            int or None: The id of the build, or None if there is no such build.
+        Raises:
+            koji.GenericError: If strict is True and there is no such build.
+        """
+        build_id = self.hub.lookup(build)
+        if build_id is None and strict:
+            raise koji.GenericError('No such build: %r' % (build,))
+        return build_id
+
+    @_simulated
+    def getBuild(self, buildInfo, strict=False):
+        """Emulate Koji's getBuild."""
+        with self.hub.lock:
+            build_id = self._build_id(buildInfo, strict)
+            return self.hub.build_info(build_id) if build_id else None
+
+    @_simulated
+    def listBuildRPMs(self, buildID, *args, **kw):
+        """Emulate Koji's listBuildRPMs."""
+        with self.hub.lock:
+            build_id = self._build_id(buildID, strict=False)
+            return self.hub.build_rpms(build_id) if build_id else []
+
+    @_simulated
+    def getRPMHeaders(self, rpmID=None, taskID=None, filepath=None, headers=None):
+        """Emulate Koji's getRPMHeaders."""
+        with self.hub.lock:
+            result = self.hub.rpm_headers(rpmID)
+        if result is not None and headers:
+            result = dict((header, result[header]) for header in headers if header in result)
+        return result
+
+    @_simulated
+    def listTags(self, build, *args, **kw):
+        """Emulate Koji's listTags."""
+        with self.hub.lock:
+            build_id = self._build_id(build)
+            return [self.hub.tag_info(tag) for tag in self.hub.tags(build_id)]
+
+    @_simulated
+    def listTagged(self, tag, event=None, inherit=False, prefix=None, latest=False, package=None,
+                   *args, **kw):
+        """Emulate Koji's listTagged."""
+        with self.hub.lock:
+            tag_id = self.hub.tag_info(tag)['id']
+            return [dict(self.hub.build_info(build_id), tag_name=tag, tag_id=tag_id)
+                    for build_id in self.hub.tagged(tag, latest, package)]
+
+    @_simulated
+    def getLatestBuilds(self, tag, event=None, package=None, *args, **kw):
+        """Emulate Koji's getLatestBuilds."""
+        with self.hub.lock:
+            tag_id = self.hub.tag_info(tag)['id']
+            return [dict(self.hub.build_info(build_id), tag_name=tag, tag_id=tag_id)
+                    for build_id in self.hub.tagged(tag, True, package)]
+
+    @_simulated
+    def getTag(self, taginfo, strict=False, **kw):
+        """Emulate Koji's getTag."""
+        with self.hub.lock:
+            result = self.hub.tag_info(taginfo)
+        if result is None and strict:
+            raise koji.GenericError('Invalid tagInfo: %r' % (taginfo,))
+        return result
+
+    @_simulated
+    def listPackages(self, *args, **kw):
+        """Emulate Koji's listPackages."""
+        with self.hub.lock:
+            return self.hub.packages()
+
+    @_simulated
+    def tagBuild(self, tag, build, force=False, fromtag=None):
+        """Emulate Koji's tagBuild, which completes at once."""
+        with self.hub.lock:
+            build_id = self._build_id(build)
+            if tag in self.hub.tags(build_id):
+                raise koji.GenericError('build %s already tagged (%s)' % (build, tag))
+            self.hub.tag(build_id, tag)
+            return self.hub.new_task('tagBuild', [tag, build_id, force, fromtag])
+
+    @_simulated
+    def untagBuild(self, tag, build, strict=True, force=False):
+        """Emulate Koji's untagBuild."""
+        with self.hub.lock:
+            build_id = self._build_id(build)
+            if tag in self.hub.tags(build_id):
+                self.hub.untag(build_id, tag)
+            elif strict:
+                raise koji.GenericError('build %s not in tag %s' % (build, tag))
+
+    @_simulated
+    def moveBuild(self, tag1, tag2, build, force=False):
+        """Emulate Koji's moveBuild, which completes at once."""
+        with self.hub.lock:
+            build_id = self._build_id(build)
+            if tag1 not in self.hub.tags(build_id):
+                raise koji.GenericError('build %s not in tag %s' % (build, tag1))
+            if tag2 in self.hub.tags(build_id):
+                raise koji.GenericError('build %s already tagged (%s)' % (build, tag2))
+            self.hub.untag(build_id, tag1)
+            self.hub.tag(build_id, tag2)
+            return self.hub.new_task('tagBuild', [tag2, build_id, force, tag1])
+
+    @_simulated
+    def taskFinished(self, task):
+        """Emulate Koji's taskFinished."""
+        with self.hub.lock:
+            if self.hub.task_info(task) is None:
+                raise koji.GenericError('No such task: %r' % (task,))
+        return True
+
+    @_simulated
+    def getTaskInfo(self, task, request=False, strict=False):
+        """Emulate Koji's getTaskInfo."""
+        with self.hub.lock:
+            result = self.hub.task_info(task)
+        if result is None and strict:
+            raise koji.GenericError('No such task: %r' % (task,))
+        if result is not None and not request:
+            del result['request']
+        return result
+
+    @_simulated
+    def getTaskRequest(self, task_id):
+        """Emulate Koji's getTaskRequest."""
+        with self.hub.lock:
+            result = self.hub.task_info(task_id)
+        if result is None:
+            raise koji.GenericError('No such task: %r' % (task_id,))
+        return result['request']
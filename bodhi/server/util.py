@@ -29,23 +29,18 @@ import pkg_resources
 import socket
 import subprocess
 import tempfile
+import threading
 import time
 import urllib
 
 from kitchen.iterutils import iterate
 from pyramid.i18n import TranslationStringFactory
-import arrow
-import bleach
 import colander
-import libravatar
-import librepo
-import markdown
 import requests
-import rpm
 from six.moves import map
 import six
 
-from bodhi.server import log, buildsys, Session
+from bodhi.server import log, buildsys, instrumentation, Session
 from bodhi.server.config import config
 from bodhi.server.exceptions import RepodataException
 
@@ -243,17 +238,105 @@ class memoized(object):
         return functools.partial(self.__call__, obj)
 
 
-@memoized
-def get_critpath_components(collection='master', component_type='rpm', components=None):
+class CritpathCache(object):
     """
-    Return a list of critical path packages for a given collection, filtered by components.
+    Keep the critical path components of the most recently used collections in memory.
+
+    The components of each collection and component type are fetched in bulk, and kept for
+    ``critpath.cache_ttl`` seconds. If they can't be fetched again once they expired, the expired
+    components are used until the critpath source is reachable again. Only the ``size`` most
+    recently used collections are kept.
+
+    Attributes:
+        size (int): How many collections and component types to keep components for.
+    """
+
+    def __init__(self, size=50):
+        """
+        Initialize the cache.
+
+        Args:
+            size (int): See the class attributes.
+        """
+        self.size = size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def _lookup(self, key, ttl):
+        """
+        Return the cached entry for the given key, and whether it is still fresh.
+
+        Args:
+            key (tuple): The collection and component type.
+            ttl (int): How many seconds entries stay fresh.
+        Returns:
+            tuple: A 2-tuple of the cached components, or None, and a bool.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None, False
+            self._entries[key] = entry
+            return entry[1], time.time() - entry[0] < ttl
+
+    def get(self, collection, component_type):
+        """
+        Return the critical path components of the given collection and type.
+
+        Args:
+            collection (basestring): The collection/branch to return the components of.
+            component_type (basestring): The component type to return.
+        Returns:
+            tuple: The critpath components, in the order the source returned them.
+        Raises:
+            Exception: If the components can't be fetched, and were never cached.
+        """
+        key = (collection, component_type)
+        ttl = config.get('critpath.cache_ttl')
+        components, fresh = self._lookup(key, ttl)
+        if fresh:
+            return components
+
+        # Only one thread fetches, and the others use what it fetched.
+        with self._fetch_lock:
+            components, fresh = self._lookup(key, ttl)
+            if fresh:
+                return components
+            try:
+                fetched = tuple(collections.OrderedDict.fromkeys(
+                    _fetch_critpath_components(collection, component_type)))
+            except Exception:
+                if components is None:
+                    raise
+                log.exception('Unable to fetch the critpath components of %s, using cached ones',
+                              collection)
+                return components
+
+        if ttl:
+            with self._lock:
+                self._entries[key] = (time.time(), fetched)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return fetched
+
+    def invalidate(self):
+        """Forget all the cached components."""
+        with self._lock:
+            self._entries.clear()
+
+
+critpath_cache = CritpathCache()
+
+
+def _fetch_critpath_components(collection, component_type):
+    """
+    Fetch all the critical path components of a given collection from the configured source.
 
     Args:
-        collection (basestring): The collection/branch to search. Defaults to 'master'.
+        collection (basestring): The collection/branch to search.
         component_type (basestring): The component type to search for. This only affects PDC
-            queries. Defaults to 'rpm'.
-        components (frozenset or None): The list of components we are interested in. If None (the
-            default), all components for the given collection and type are returned.
+            queries.
     Returns:
         list: The critpath components for the given collection and type.
     """
@@ -270,19 +353,36 @@ def get_critpath_components(collection='master', component_type='rpm', component
         if collection in results['pkgs']:
             critpath_components = results['pkgs'][collection]
     elif critpath_type == 'pdc':
-        critpath_components = get_critpath_components_from_pdc(
-            collection, component_type, components)
+        critpath_components = get_critpath_components_from_pdc(collection, component_type)
     else:
         critpath_components = config.get('critpath_pkgs')
 
-    # Filter the list of components down to what was requested, in case the specific path did
-    # not take our request into account.
-    if components is not None:
-        critpath_components = [c for c in critpath_components if c in components]
-
     return critpath_components
 
 
+def get_critpath_components(collection='master', component_type='rpm', components=None):
+    """
+    Return a list of critical path packages for a given collection, filtered by components.
+
+    The critpath components of the collection are read from :data:`critpath_cache`, and the
+    requested components are looked up in them locally.
+
+    Args:
+        collection (basestring): The collection/branch to search. Defaults to 'master'.
+        component_type (basestring): The component type to search for. This only affects PDC
+            queries. Defaults to 'rpm'.
+        components (iterable or None): The components we are interested in. If None (the default),
+            all components for the given collection and type are returned.
+    Returns:
+        list: The critpath components for the given collection and type.
+    """
+    critpath_components = critpath_cache.get(collection, component_type)
+    if components is None:
+        return list(critpath_components)
+    components = frozenset(components)
+    return [c for c in critpath_components if c in components]
+
+
 def sanity_check_repodata(myurl):
     """
     Sanity check the repodata for a given repository.
@@ -292,6 +392,8 @@ def sanity_check_repodata(myurl):
     Raises:
         bodhi.server.exceptions.RepodataException: If the repodata is not valid or does not exist.
     """
+    import librepo
+
     h = librepo.Handle()
     h.setopt(librepo.LRO_REPOTYPE, librepo.LR_YUMREPO)
     h.setopt(librepo.LRO_DESTDIR, tempfile.mkdtemp())
@@ -328,6 +430,8 @@ def age(context, date, nuke_ago=False):
     Returns:
         basestring: A human readable age since the given date.
     """
+    import arrow
+
     humanized = arrow.get(date).humanize()
     if nuke_ago:
         return humanized.replace(' ago', '')
@@ -371,6 +475,7 @@ def avatar(context, username, size):
         openid = "http://%s.id.fedoraproject.org/" % username
         if config.get('libravatar_enabled'):
             if config.get('libravatar_dns'):
+                import libravatar
                 return libravatar.libravatar_url(
                     openid=openid,
                     https=https,
@@ -452,6 +557,13 @@ def markup(context, text):
     Returns:
         basestring: HTML representation of the markdown text.
     """
+    import bleach
+    import markdown
+
+    from bodhi.server import ffmarkdown
+    # TODO -- someday move this externally to "fedora_flavored_markdown"
+    ffmarkdown.inject()
+
     # determine the major component of the bleach version installed.
     # this is similar to the approach that Pagure uses to determine the bleach version
     # https://pagure.io/pagure/pull-request/2269#request_diff
@@ -885,6 +997,7 @@ def bug_link(context, bug, short=False):
         if bug.title:
             # We're good, but we do need to clean the bug title in case it contains malicious
             # tags. See CVE-2017-1002152: https://github.com/fedora-infra/bodhi/issues/1740
+            import bleach
             link = link + " " + bleach.clean(bug.title, tags=[], attributes=[])
         else:
             # Otherwise, the backend is async grabbing the title from rhbz, so
@@ -961,6 +1074,8 @@ def sorted_builds(builds):
     Returns:
         list: A list of Builds sorted by NVR.
     """
+    import rpm
+
     return sorted(builds,
                   cmp=lambda x, y: rpm.labelCompare(get_nvr(x), get_nvr(y)),
                   reverse=True)
@@ -1086,7 +1201,8 @@ def taskotron_results(settings, entity='results/latest', max_queries=10, **kwarg
     try:
         while data and url:
             log.debug("Grabbing %r" % url)
-            response = requests.get(url, timeout=60)
+            with instrumentation.timed('http'):
+                response = requests.get(url, timeout=60)
             if response.status_code != 200:
                 raise IOError("status code was %r" % response.status_code)
             json = response.json()
@@ -1180,21 +1296,17 @@ def severity_updateinfo_str(value):
     return severity_map.get(value, "None")
 
 
-# If we need to know about more components than this constant, we will just get the full
-# list, rather than a query per package. This is because at some point, just going through
-# paging becomes more performant than getting the page for every component.
-PDC_CRITPATH_COMPONENTS_GETALL_LIMIT = 10
+# The number of critpath components to request per page from PDC.
+PDC_CRITPATH_PAGE_SIZE = 1000
 
 
-def get_critpath_components_from_pdc(branch, component_type='rpm', components=None):
+def get_critpath_components_from_pdc(branch, component_type='rpm'):
     """
-    Search PDC for critical path packages based on the specified branch.
+    Search PDC for all the critical path packages of the specified branch, following the pages.
 
     Args:
         branch (basestring): The branch name to search by.
         component_type (basestring): The component type to search by. Defaults to ``rpm``.
-        components (frozenset or None): The list of components we are interested in. If None (the
-            default), all components for the given branch and type are returned.
     Returns:
         list: Critical path package names.
     """
@@ -1204,35 +1316,19 @@ def get_critpath_components_from_pdc(branch, component_type='rpm', components=No
         'active': 'true',
         'critical_path': 'true',
         'name': branch,
-        'page_size': 100,
+        'page_size': PDC_CRITPATH_PAGE_SIZE,
         'type': component_type,
         'fields': 'global_component'
     }
 
     critpath_pkgs_set = set()
-    if components and len(components) < PDC_CRITPATH_COMPONENTS_GETALL_LIMIT:
-        # Do a query for every single component
-        for component in components:
-            query_args['global_component'] = component
-            pdc_api_url_with_args = '{0}?{1}'.format(pdc_api_url, urllib.urlencode(query_args))
-            pdc_request_json = pdc_api_get(pdc_api_url_with_args)
-            for branch_rv in pdc_request_json['results']:
-                critpath_pkgs_set.add(branch_rv['global_component'])
-            if pdc_request_json['next']:
-                raise Exception('We got paging when requesting a single component?!')
-    else:
-        pdc_api_url_with_args = '{0}?{1}'.format(pdc_api_url, urllib.urlencode(query_args))
-        while True:
-            pdc_request_json = pdc_api_get(pdc_api_url_with_args)
-
-            for branch_rv in pdc_request_json['results']:
-                critpath_pkgs_set.add(branch_rv['global_component'])
-
-            if pdc_request_json['next']:
-                pdc_api_url_with_args = pdc_request_json['next']
-            else:
-                # There are no more results to iterate through
-                break
+    pdc_api_url_with_args = '{0}?{1}'.format(pdc_api_url, urllib.urlencode(query_args))
+    while pdc_api_url_with_args:
+        pdc_request_json = pdc_api_get(pdc_api_url_with_args)
+        for branch_rv in pdc_request_json['results']:
+            critpath_pkgs_set.add(branch_rv['global_component'])
+        # This is None once there are no more results to iterate through.
+        pdc_api_url_with_args = pdc_request_json['next']
     return list(critpath_pkgs_set)
 
 
@@ -1264,15 +1360,17 @@ def call_api(api_url, service_name, error_key=None, method='GET', data=None, hea
         base_error_msg = (
             'Bodhi failed to send POST request to {0} at the following URL '
             '"{1}". The status code was "{2}".')
-        rv = http_session.post(api_url,
-                               headers=headers,
-                               data=json.dumps(data),
-                               timeout=60)
+        with instrumentation.timed('http'):
+            rv = http_session.post(api_url,
+                                   headers=headers,
+                                   data=json.dumps(data),
+                                   timeout=60)
     else:
         base_error_msg = (
             'Bodhi failed to get a resource from {0} at the following URL '
             '"{1}". The status code was "{2}".')
-        rv = http_session.get(api_url, timeout=60)
+        with instrumentation.timed('http'):
+            rv = http_session.get(api_url, timeout=60)
     if rv.status_code == 200:
         return rv.json()
     elif retries:
@@ -31,6 +31,9 @@ import rpm
 from six.moves import map
 import six
 
+from . import acls
+from . import build_tags
+from . import buildsys
 from . import captcha
 from . import log
 from .models import (
@@ -149,6 +152,48 @@ def validate_csrf_token(node, value):
         raise colander.Invalid(node, csrf_error_message)
 
 
+def prefetch_builds(request, builds):
+    """
+    Fetch the Koji data the validators need about the given builds, and cache it on the request.
+
+    The getBuild() and listTags() responses of all the builds are retrieved in a few multicalls and
+    stored as the ``info`` and ``tags`` entries of ``request.buildinfo``. The tags of builds Bodhi
+    already knows about are read from the local mirror instead. Builds that are already cached are
+    skipped, and calls that fail are left for the validators to retry and report.
+
+    Args:
+        request (pyramid.util.Request): The current request.
+        builds (list): The NVRs of the builds to prefetch.
+    """
+    for build, tags in build_tags.lookup(request.db, builds).items():
+        request.buildinfo.setdefault(build, {}).setdefault('tags', tags)
+
+    calls = []
+    for build in builds:
+        buildinfo = request.buildinfo.setdefault(build, {})
+        if 'info' not in buildinfo:
+            calls.append(((build, 'info'), 'getBuild', (build,), {}))
+        if 'tags' not in buildinfo:
+            calls.append(((build, 'tags'), 'listTags', (build,), {}))
+    if not calls:
+        return
+
+    try:
+        responses = buildsys.multicall_map(calls, session=request.koji)
+    except Exception:
+        log.exception('Unable to prefetch the Koji data of %r', builds)
+        return
+
+    for (build, key), response in responses.items():
+        if not isinstance(response, list):
+            log.debug('Unable to fetch the %s of %s: %r', key, build, response)
+            continue
+        result = response[0]
+        if key == 'tags':
+            result = [tag['name'] for tag in result]
+        request.buildinfo[build][key] = result
+
+
 def cache_nvrs(request, build):
     """
     Cache the NVR from the given build on the request, and the koji getBuild() response.
@@ -170,7 +215,8 @@ def cache_nvrs(request, build):
 
     request.buildinfo[build]['nvr'] = name, version, release
     # Cram some extra information in there, used later to infer type.
-    request.buildinfo[build]['info'] = request.koji.getBuild(build)
+    if 'info' not in request.buildinfo[build]:
+        request.buildinfo[build]['info'] = request.koji.getBuild(build)
 
 
 def validate_nvrs(request, **kwargs):
@@ -181,7 +227,11 @@ def validate_nvrs(request, **kwargs):
         request (pyramid.util.Request): The current request.
         kwargs (dict): The kwargs of the related service definition. Unused.
     """
-    for build in request.validated.get('builds', []):
+    builds = request.validated.get('builds', [])
+    # Fetch what the following validators need to know from Koji about all the builds at once.
+    prefetch_builds(request, [build for build in builds if '' not in get_nvr(build)])
+
+    for build in builds:
         try:
             cache_nvrs(request, build)
         except ValueError:
@@ -265,14 +315,16 @@ def validate_build_tags(request, **kwargs):
 
     for build in request.validated.get('builds', []):
         valid = False
-        try:
-            tags = request.buildinfo[build]['tags'] = [
-                tag['name'] for tag in request.koji.listTags(build)
-            ]
-        except koji.GenericError:
-            request.errors.add('body', 'builds',
-                               'Invalid koji build: %s' % build)
-            return
+        tags = request.buildinfo[build].get('tags')
+        if tags is None:
+            try:
+                tags = request.buildinfo[build]['tags'] = [
+                    tag['name'] for tag in request.koji.listTags(build)
+                ]
+            except koji.GenericError:
+                request.errors.add('body', 'builds',
+                                   'Invalid koji build: %s' % build)
+                return
 
         # Disallow adding builds for a different release
         if edited:
@@ -316,18 +368,23 @@ def validate_tags(request, **kwargs):
         kwargs (dict): The kwargs of the related service definition. Unused.
     """
     tag_types, tag_rels = Release.get_tags(request.db)
+    tags = [(tag_type, request.validated.get("%s_tag" % tag_type)) for tag_type in tag_types]
+    tags = [(tag_type, tag_name) for tag_type, tag_name in tags if tag_name]
+    if not tags:
+        return
 
-    for tag_type in tag_types:
-        tag_name = request.validated.get("%s_tag" % tag_type)
-
-        if not tag_name:
-            continue
-
-        try:
-            request.koji.getTag(tag_name, strict=True)
+    try:
+        responses = buildsys.multicall_map(
+            [(tag_type, 'getTag', (tag_name,), {'strict': True}) for tag_type, tag_name in tags],
+            session=request.koji)
+    except Exception:
+        log.exception('Unable to look up tags %r', tags)
+        responses = {}
+
+    for tag_type, tag_name in tags:
+        if isinstance(responses.get(tag_type), list):
             request.validated["%s_tag" % tag_type] = tag_name
-
-        except Exception:
+        else:
             request.errors.add('body', "%s_tag" % tag_type,
                                'Invalid tag: %s' % tag_name)
 
@@ -379,15 +436,21 @@ def validate_acls(request, **kwargs):
                            'unable to determine ACLs.')
         return
 
+    packages = {}
+    if 'builds' in request.validated:
+        # Look up the packages of all the builds with a single query.
+        for build in builds:
+            cache_nvrs(request, build)
+        names = set(request.buildinfo[build]['nvr'][0] for build in builds)
+        for package in db.query(Package).filter(Package.name.in_(names)):
+            packages[(type(package), package.name)] = package
+
     for build in builds:
         # The whole point of the blocks inside this conditional is to determine
         # the "release" and "package" associated with the given build.  For raw
         # (new) builds, we have to do that by hand.  For builds that have been
         # previously associated with an update, we can just look it up no prob.
         if 'builds' in request.validated:
-            # Split out NVR data unless its already done.
-            cache_nvrs(request, build)
-
             buildinfo = request.buildinfo[build]
 
             # Figure out what kind of package this should be
@@ -404,11 +467,12 @@ def validate_acls(request, **kwargs):
 
             # Get the Package object
             package_name = buildinfo['nvr'][0]
-            package = package_class.query.filter_by(name=package_name).first()
+            package = packages.get((package_class, package_name))
             if not package:
                 log.debug("Adding package %s, type %r",
                           package_name, package_class)
-                package = package_class(name=package_name)
+                package = packages[(package_class, package_name)] = package_class(
+                    name=package_name)
                 db.add(package)
                 db.flush()
 
@@ -470,8 +534,7 @@ def validate_acls(request, **kwargs):
 
         if acl_system == 'pkgdb':
             try:
-                people, groups = package.get_pkg_pushers(
-                    release.branch, config)
+                people, groups = acls.get_acls(request.db, package, release.branch)
                 committers, watchers = people
                 groups, notify_groups = groups
             except Exception as e:
@@ -483,7 +546,7 @@ def validate_acls(request, **kwargs):
                 return
         elif acl_system == 'pagure':
             try:
-                committers, groups = package.get_pkg_committers_from_pagure()
+                committers, groups = acls.get_acls(request.db, package)
                 people = committers
             except RuntimeError as error:
                 # If it's a RuntimeError, then the error will be logged
@@ -690,10 +753,7 @@ def validate_release(request, **kwargs):
     if releasename is None:
         return
 
-    db = request.db
-    release = db.query(Release).filter(or_(
-        Release.name == releasename, Release.name == releasename.upper(),
-        Release.version == releasename)).first()
+    release = Release.from_name(releasename, request.db)
 
     if release:
         request.validated["release"] = release
@@ -714,13 +774,11 @@ def validate_releases(request, **kwargs):
     if releases is None:
         return
 
-    db = request.db
     bad_releases = []
     validated_releases = []
 
     for r in releases:
-        release = db.query(Release).filter(or_(Release.name == r, Release.name == r.upper(),
-                                               Release.version == r)).first()
+        release = Release.from_name(r, request.db)
 
         if not release:
             bad_releases.append(r)
@@ -1038,8 +1096,7 @@ def _validate_override_build(request, nvr, db):
             tag_types, tag_rels = Release.get_tags(request.db)
             valid_tags = tag_types['candidate'] + tag_types['testing']
 
-            tags = [tag['name'] for tag in request.koji.listTags(nvr)
-                    if tag['name'] in valid_tags]
+            tags = [tag for tag in build.get_tags() if tag in valid_tags]
 
             release = Release.from_tags(tags, db)
 
@@ -16,17 +16,21 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
-"""Define the admin view."""
+"""Define the admin views."""
 
 from cornice import Service
 
 from bodhi.server import log
-from bodhi.server import security
+from bodhi.server import security, slow_queries
+from bodhi.server.config import config
 
 
 admin_service = Service(name='admin', path='/admin/',
                         description='Administrator view',
                         factory=security.AdminACLFactory)
+slow_queries_service = Service(name='admin_slow_queries', path='/admin/slow_queries',
+                               description='The slowest SQL statements',
+                               factory=security.AdminACLFactory)
 
 
 @admin_service.get(permission='admin')
@@ -46,3 +50,27 @@ def admin(request):
     log.info('%s logged into admin panel' % user.name)
     principals = request.effective_principals
     return {'user': user.name, 'principals': principals}
+
+
+@slow_queries_service.get(permission='admin')
+def get_slow_queries(request):
+    """
+    Return the SQL statements recorded in the slow query log that took the longest in total.
+
+    The number of statements can be set with the ``limit`` parameter, which defaults to 20.
+
+    Args:
+        request (pyramid.request): The current request.
+    Returns:
+        dict: A dictionary with the ``threshold`` of the slow query log, the total number of
+            recorded ``records`` and the ``queries``, as returned by
+            :func:`bodhi.server.slow_queries.top_offenders`.
+    """
+    try:
+        limit = int(request.params.get('limit', 20))
+    except ValueError:
+        request.errors.add('querystring', 'limit', 'The limit must be an integer')
+        return
+    records = slow_queries.read()
+    return {'threshold': config.get('slow_queries.threshold'), 'records': len(records),
+            'queries': slow_queries.top_offenders(records, limit)}
@@ -28,7 +28,7 @@ import cornice.errors
 import sqlalchemy as sa
 import six
 
-from bodhi.server import log, models
+from bodhi.server import buildsys, cache, log, models, stats
 from bodhi.server.config import config
 import bodhi.server.util
 
@@ -98,43 +98,6 @@ def get_latest_updates(request, critpath, security):
     return query.limit(5).all()
 
 
-def _get_status_counts(basequery, status):
-    """
-    Return a dictionary with the counts of objects found in the basequery.
-
-    The return data is specified by total count, newpackage count, bugfix count, enhancement count,
-    and security count. The dictionary keys will be named with the
-    template {status}_{type}_total. For example, if status is
-    models.UpdateStatus.stable, a dictionary with the following keys would be
-    returned:
-        stable_updates_total
-        stable_newpackage_total
-        stable_bugfix_total
-        stable_enhancement_total
-        stable_security_total
-
-    Args:
-        basequery (sqlalchemy.orm.query.Query):
-            The basequery of updates we want to count and further filter on.
-        status (bodhi.server.models.UpdateStatus):
-            The update status we want to filter by in basequery
-    Return:
-        dict: A dictionary describing the counts of the updates, as described above.
-    """
-    basequery = basequery.filter(models.Update.status == status)
-    return {
-        '{}_updates_total'.format(status.description): basequery.count(),
-        '{}_newpackage_total'.format(status.description):
-            basequery.filter(models.Update.type == models.UpdateType.newpackage).count(),
-        '{}_bugfix_total'.format(status.description):
-            basequery.filter(models.Update.type == models.UpdateType.bugfix).count(),
-        '{}_enhancement_total'.format(status.description):
-            basequery.filter(models.Update.type == models.UpdateType.enhancement).count(),
-        '{}_security_total'.format(status.description):
-            basequery.filter(models.Update.type == models.UpdateType.security).count(),
-    }
-
-
 def get_update_counts(request, releaseid):
     """
     Return counts for the various states and types of updates in the given release.
@@ -166,13 +129,7 @@ def get_update_counts(request, releaseid):
         dict: A dictionary expressing the counts, as described above.
     """
     release = models.Release.get(releaseid, request.db)
-    basequery = request.db.query(models.Update).filter(models.Update.release == release)
-    counts = {}
-    counts.update(_get_status_counts(basequery, models.UpdateStatus.pending))
-    counts.update(_get_status_counts(basequery, models.UpdateStatus.testing))
-    counts.update(_get_status_counts(basequery, models.UpdateStatus.stable))
-
-    return counts
+    return stats.get_release_stats(request.db, release).status_counts()
 
 
 @view_config(route_name='home', renderer='home.html')
@@ -202,14 +159,18 @@ def home(request):
     """
     r = request
 
-    @request.cache.cache_on_arguments()
+    # Top testers are derived from the comments, and the rest from the updates.
+    @cache.cache_on_tags(('updates', 'comments'), namespace='home')
     def work():
         top_testers = get_top_testers(request)
         critpath_updates = get_latest_updates(request, True, False)
         security_updates = get_latest_updates(request, False, True)
-        release_updates_counts = {}
-        for release in request.releases['current'] + request.releases['pending']:
-            release_updates_counts[release["name"]] = get_update_counts(request, release["name"])
+        names = [release['name'] for release in
+                 request.releases['current'] + request.releases['pending']]
+        releases = request.db.query(models.Release).filter(models.Release.name.in_(names)).all()
+        release_updates_counts = dict(
+            (name, s.status_counts())
+            for name, s in stats.get_stats(request.db, releases).items())
 
         return {
             "release_updates_counts": release_updates_counts,
@@ -266,10 +227,10 @@ def latest_candidates(request):
     koji = request.koji
     db = request.db
 
-    @request.cache.cache_on_arguments()
+    # Koji tags are changed outside of Bodhi too, so these also expire after the configured time.
+    @cache.cache_on_tags(('updates', 'overrides'), namespace='latest_candidates')
     def work(pkg, testing):
         result = []
-        koji.multicall = True
 
         releases = db.query(models.Release) \
                      .filter(
@@ -278,16 +239,20 @@ def latest_candidates(request):
                               models.ReleaseState.current)))
 
         kwargs = dict(package=pkg, latest=True)
+        tags = []
         for release in releases:
-            koji.listTagged(release.candidate_tag, **kwargs)
+            tags.append(release.candidate_tag)
             if testing:
-                koji.listTagged(release.testing_tag, **kwargs)
-                koji.listTagged(release.pending_testing_tag, **kwargs)
-                koji.listTagged(release.pending_signing_tag, **kwargs)
+                tags.extend([release.testing_tag, release.pending_testing_tag,
+                             release.pending_signing_tag])
 
-        response = koji.multiCall() or []  # Protect against None
+        response = buildsys.multicall_map(
+            ((tag, 'listTagged', (tag,), kwargs) for tag in tags), session=koji)
 
-        for taglist in response:
+        for tag, taglist in response.items():
+            if not isinstance(taglist, list):
+                log.error('Unable to list the builds tagged into %s: %r', tag, taglist)
+                continue
             for build in taglist[0]:
                 item = {
                     'nvr': build['nvr'],
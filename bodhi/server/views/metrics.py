@@ -16,12 +16,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
-"""Define the view that presents release metrics in the web UI."""
+"""Define the views that present release metrics, and the runtime metrics of Bodhi."""
 
 import json
 
+from pyramid.httpexceptions import HTTPNotFound
+from pyramid.response import Response
 from pyramid.view import view_config
 
+from bodhi.server import monitoring, stats
+from bodhi.server.config import config
 import bodhi.server.models as m
 
 
@@ -45,15 +49,13 @@ def compute_ticks_and_data(db, releases, update_types):
     for i, release in enumerate(releases):
         ticks.append([i, release.name])
 
+    release_stats = stats.get_stats(db, releases)
+
     for update_type, label in update_types.items():
         d = []
         update_type = m.UpdateType.from_string(update_type)
         for i, release in enumerate(releases):
-            num = db.query(m.Update).filter_by(
-                release=release,
-                type=update_type,
-                status=m.UpdateStatus.stable
-            ).count()
+            num = release_stats[release.name].count(m.UpdateStatus.stable, update_type)
             d.append([i, num])
         data.append(dict(data=d, label=label))
 
@@ -91,3 +93,23 @@ def metrics(request):
         'data': json.dumps(data), 'ticks': json.dumps(ticks),
         'eldata': json.dumps(eldata), 'elticks': json.dumps(elticks),
     }
+
+
+@view_config(route_name='prometheus')
+def prometheus(request):
+    """
+    Return the runtime metrics of this process in the Prometheus text format.
+
+    Args:
+        request (pyramid.util.Request): The current Request.
+    Returns:
+        pyramid.response.Response: The metrics.
+    Raises:
+        pyramid.httpexceptions.HTTPNotFound: If the ``monitoring.enabled`` setting is False.
+    """
+    if not config.get('monitoring.enabled'):
+        raise HTTPNotFound()
+    monitoring.collect_db(request.db)
+    response = Response(body=monitoring.registry.render().encode('utf-8'))
+    response.headers['Content-Type'] = monitoring.CONTENT_TYPE
+    return response
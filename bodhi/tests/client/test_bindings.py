@@ -19,6 +19,10 @@
 """This module contains tests for bodhi.client.bindings."""
 from datetime import datetime, timedelta
 import copy
+import json
+import os
+import subprocess
+import sys
 import unittest
 
 import fedora.client
@@ -1386,9 +1390,10 @@ class TestBodhiClient_testable(unittest.TestCase):
     @mock.patch('__builtin__.open', create=True)
     @mock.patch('bodhi.client.bindings.BodhiClient._load_cookies', mock.MagicMock())
     @mock.patch('bodhi.client.bindings.BodhiClient.get_koji_session')
-    @mock.patch('bodhi.client.bindings.dnf')
-    def test_testable(self, dnf, get_koji_session, mock_open):
+    @mock.patch.dict('sys.modules', {'dnf': mock.MagicMock()})
+    def test_testable(self, get_koji_session, mock_open):
         """Assert correct behavior from the testable() method."""
+        dnf = sys.modules['dnf']
         fill_sack = mock.MagicMock()
         dnf.Base.return_value.fill_sack = fill_sack
         get_koji_session.return_value.listTagged.return_value = [
@@ -1416,9 +1421,9 @@ class TestBodhiClient_testable(unittest.TestCase):
         client.send_request.assert_called_once_with(
             'updates/', params={'builds': 'bodhi-2.9.0-1.fc26'}, verb='GET')
 
-    @mock.patch('bodhi.client.bindings.dnf', None)
+    @mock.patch.dict('sys.modules', {'dnf': None})
     def test_testable_no_dnf(self):
-        """Ensure that testable raises a RuntimeError if dnf is None."""
+        """Ensure that testable raises a RuntimeError if dnf is not installed."""
         client = bindings.BodhiClient()
 
         with self.assertRaises(RuntimeError) as exc:
@@ -1436,7 +1441,7 @@ class TestGetKojiSession(unittest.TestCase):
     @mock.patch("os.path.exists")
     @mock.patch("os.path.expanduser", return_value="/home/dudemcpants/")
     @mock.patch('bodhi.client.bindings.BodhiClient._load_cookies')
-    @mock.patch('bodhi.client.bindings.koji.ClientSession')
+    @mock.patch('koji.ClientSession')
     @mock.patch('bodhi.client.bindings.ConfigParser.get')
     def test_koji_conf_in_home_directory(self, get, koji, cookies,
                                          expanduser, exists, readfp, mock_open):
@@ -1454,7 +1459,7 @@ class TestGetKojiSession(unittest.TestCase):
     @mock.patch("os.path.exists")
     @mock.patch("os.path.expanduser", return_value="/home/dudemcpants/")
     @mock.patch('bodhi.client.bindings.BodhiClient._load_cookies')
-    @mock.patch('bodhi.client.bindings.koji.ClientSession')
+    @mock.patch('koji.ClientSession')
     @mock.patch('bodhi.client.bindings.ConfigParser.get')
     def test_koji_conf_not_in_home_directory(self, get, koji, cookies,
                                              expanduser, exists, readfp, mock_open):
@@ -1466,3 +1471,17 @@ class TestGetKojiSession(unittest.TestCase):
 
         exists.assert_called_once_with("/home/dudemcpants/.koji/config")
         mock_open.assert_called_once_with("/etc/koji.conf")
+
+
+class TestImports(unittest.TestCase):
+    """Ensure that the client doesn't import the dependencies of a few of its commands."""
+
+    def test_deferred_imports(self):
+        """Assert that importing bodhi.client doesn't import dnf or koji."""
+        output = subprocess.check_output(
+            [sys.executable, '-c',
+             'import json, sys; import bodhi.client; '
+             'print(json.dumps([m for m in ("dnf", "koji") if m in sys.modules]))'],
+            cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+
+        self.assertEqual(json.loads(output.decode('utf-8').strip().splitlines()[-1]), [])
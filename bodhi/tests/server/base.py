@@ -25,8 +25,10 @@ from webtest import TestApp
 from sqlalchemy import event
 import mock
 
-from bodhi.server import bugs, buildsys, models, initialize_db, Session, config, main
+from bodhi.server import (bugs, buildsys, counts, models, initialize_db, Session, config, main,
+                          stats, util)
 from bodhi.tests.server import create_update, populate
+import bodhi.server
 
 
 original_config = config.config.copy()
@@ -139,8 +141,11 @@ class BaseTestCase(unittest.TestCase):
     def setUp(self):
         """Set up Bodhi for testing."""
         # Ensure "cached" objects are cleared before each test.
-        models.Release._all_releases = None
-        models.Release._tag_cache = None
+        models.release_registry.invalidate()
+        bodhi.server._cache_region = None
+        counts.clear()
+        stats.invalidate()
+        util.critpath_cache.invalidate()
 
         if engine is None:
             self.engine = _configure_test_db()
@@ -285,8 +290,7 @@ class BaseTestCase(unittest.TestCase):
             override_tag=u'f{}-override'.format(version),
             branch=u'f{}'.format(version), state=models.ReleaseState.current)
         self.db.add(release)
-        models.Release._all_releases = None
-        models.Release._tag_cache = None
+        models.release_registry.invalidate()
         self.db.flush()
         return release
 
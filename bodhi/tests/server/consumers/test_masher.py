@@ -17,6 +17,7 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 from cStringIO import StringIO
+import collections
 import datetime
 import dummy_threading
 import errno
@@ -30,7 +31,9 @@ import urllib2
 import urlparse
 
 from click import testing
+import koji
 import mock
+from sqlalchemy.orm.exc import NoResultFound
 import six
 
 from bodhi.server import buildsys, exceptions, log, push
@@ -41,7 +44,7 @@ from bodhi.server.exceptions import LockedUpdateException
 from bodhi.server.models import (
     Build, BuildrootOverride, Compose, ComposeState, Release, ReleaseState, RpmBuild,
     TestGatingStatus, Update, UpdateRequest, UpdateStatus, UpdateType, User, ModuleBuild,
-    ContentType, Package)
+    ContentType, Package, release_registry)
 from bodhi.server.util import mkmetadatadir
 from bodhi.tests.server import base
 
@@ -172,8 +175,7 @@ class TestMasher(base.BaseTestCase):
         self.masher = Masher(FakeHub(), db_factory=self.db_factory, mash_dir=self.tempdir)
 
         # Reset "cached" objects before each test.
-        Release._all_releases = None
-        Release._tag_cache = None
+        release_registry.invalidate()
 
         self.expected_sems = 0
         self.semmock = mock.MagicMock()
@@ -836,9 +838,6 @@ That was the actual one'''
             update.type = UpdateType.security
             db.add(update)
 
-            # Wipe out the tag cache so it picks up our new release
-            Release._tag_cache = None
-
         self.masher.consume(self._make_msg())
 
         # Ensure that F18 runs before F17
@@ -924,9 +923,6 @@ That was the actual one'''
             update.type = UpdateType.enhancement
             db.add(update)
 
-            # Wipe out the tag cache so it picks up our new release
-            Release._tag_cache = None
-
         self.masher.consume(self._make_msg())
 
         # Ensure that F17 updates-testing runs before F18
@@ -1004,9 +1000,6 @@ That was the actual one'''
             update.type = UpdateType.security
             db.add(update)
 
-            # Wipe out the tag cache so it picks up our new release
-            Release._tag_cache = None
-
         self.masher.consume(self._make_msg())
 
         # Ensure that F18 and F17 run in parallel
@@ -1203,9 +1196,6 @@ That was the actual one'''
             update.type = UpdateType.security
             db.add(update)
 
-            # Wipe out the tag cache so it picks up our new release
-            Release._tag_cache = None
-
         msg = self._make_msg(['--releases', 'F27M'])
         t = ModuleComposerThread(self.semmock, msg['body']['msg']['composes'][0],
                                  'puiterwijk', log, self.db_factory, self.tempdir)
@@ -1517,6 +1507,43 @@ testmodule:master:20172:2
             self.assertEquals(len(updates), 1)
             self.assertEquals(updates[0].title, u.builds[0].nvr)
 
+    @mock.patch('bodhi.server.consumers.masher.Release.from_long_name', return_value=None)
+    def test_get_release_not_in_registry(self, from_long_name):
+        """A release the registry does not know yet should be queried from the database."""
+        msg = self._make_msg()
+        t = ComposerThread(self.semmock, msg['body']['msg']['composes'][0],
+                           'ralph', log, self.db_factory, self.tempdir)
+        with self.db_factory() as session:
+            t.db = session
+            u = session.query(Update).one()
+            u.type = UpdateType.security
+            u.status = UpdateStatus.testing
+            u.request = None
+            u.critpath = True
+            session.commit()
+            release = session.query(Release).one()
+
+            self.assertEqual(t._get_release(release.long_name), release)
+            self.assertEqual(
+                [up.title for up in t.get_security_updates(release.long_name)], [u.title])
+            self.assertEqual(
+                [up.title for up in t.get_unapproved_critpath_updates(release.long_name)],
+                [u.title])
+
+        from_long_name.assert_called_with(release.long_name, t.db)
+
+    def test_get_release_unknown(self):
+        """An unknown release should raise rather than match updates without a release."""
+        msg = self._make_msg()
+        t = ComposerThread(self.semmock, msg['body']['msg']['composes'][0],
+                           'ralph', log, self.db_factory, self.tempdir)
+        with self.db_factory() as session:
+            t.db = session
+
+            self.assertRaises(NoResultFound, t._get_release, u'Fedora 1')
+            self.assertRaises(NoResultFound, t.get_security_updates, u'Fedora 1')
+            self.assertRaises(NoResultFound, t.get_unapproved_critpath_updates, u'Fedora 1')
+
     @mock.patch(**mock_taskotron_results)
     @mock.patch('bodhi.server.consumers.masher.PungiComposerThread._wait_for_pungi')
     @mock.patch('bodhi.server.consumers.masher.PungiComposerThread._sanity_check_repo')
@@ -1931,6 +1958,23 @@ class TestPungiComposerThread__get_master_repomd_url(ComposerThreadBaseTestCase)
 
 class TestComposerThread__perform_tag_actions(ComposerThreadBaseTestCase):
     """This test class contains tests for the ComposerThread._perform_tag_actions() method."""
+    @mock.patch('bodhi.server.consumers.masher.buildsys.wait_for_tasks', return_value=[])
+    def test_mirrors_tags(self, wait_for_tasks):
+        """Assert that the tags of the builds are mirrored as they are added and moved."""
+        msg = self._make_msg()
+        t = ComposerThread(self.semmock, msg['body']['msg']['composes'][0],
+                           'bowlofeggs', log, self.Session, self.tempdir)
+        t.compose = Compose.from_dict(self.db, msg['body']['msg']['composes'][0])
+        build = t.compose.updates[0].builds[0]
+        build.set_tags([u'f17-updates-candidate'])
+        t.add_tags_sync.append((u'f17-override', build.nvr))
+        t.move_tags_async.append((u'f17-updates-candidate', u'f17-updates-testing', build.nvr))
+
+        t._perform_tag_actions()
+
+        self.assertEqual(build.get_tags(), [u'f17-override', u'f17-updates-testing'])
+        self.assert_sems(0)
+
     @mock.patch('bodhi.server.consumers.masher.buildsys.wait_for_tasks')
     def test_with_failed_tasks(self, wait_for_tasks):
         """
@@ -1955,6 +1999,105 @@ class TestComposerThread__perform_tag_actions(ComposerThreadBaseTestCase):
 
         self.assert_sems(0)
 
+    def test_with_fault(self):
+        """
+        Assert that the method raises an Exception when the buildsys refuses to move a build.
+        """
+        msg = self._make_msg()
+        t = ComposerThread(self.semmock, msg['body']['msg']['composes'][0],
+                           'bowlofeggs', log, self.Session, self.tempdir)
+        t.compose = Compose.from_dict(self.db, msg['body']['msg']['composes'][0])
+        t.move_tags_async.append(
+            (u'f26-updates-candidate', u'f26-updates-testing', u'bodhi-2.3.2-1.fc26'))
+        moveBuild = mock.Mock(side_effect=koji.GenericError('Not tagged'))
+
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.moveBuild',
+                        buildsys.multicall_enabled(moveBuild)):
+            with self.assertRaises(Exception) as exc:
+                t._perform_tag_actions()
+
+        self.assertEqual(
+            six.text_type(exc.exception),
+            "Failed to move builds: [((u'f26-updates-candidate', u'f26-updates-testing', "
+            "u'bodhi-2.3.2-1.fc26'), {'faultCode': 1000, 'faultString': 'Not tagged'})]")
+
+        self.assert_sems(0)
+
+    @mock.patch('bodhi.server.consumers.masher.buildsys.wait_for_tasks', return_value=[])
+    @mock.patch('bodhi.server.consumers.masher.buildsys.multicall_map')
+    def test_with_fault_and_queued_tasks(self, multicall_map, wait_for_tasks):
+        """
+        Assert that the tasks queued along with a fault are waited for and mirrored before raising.
+        """
+        msg = self._make_msg()
+        t = ComposerThread(self.semmock, msg['body']['msg']['composes'][0],
+                           'bowlofeggs', log, self.Session, self.tempdir)
+        t.compose = Compose.from_dict(self.db, msg['body']['msg']['composes'][0])
+        build = t.compose.updates[0].builds[0]
+        build.set_tags([u'f17-updates-candidate'])
+        moved = (u'f17-updates-candidate', u'f17-updates-testing', build.nvr)
+        refused = (u'f26-updates-candidate', u'f26-updates-testing', u'bodhi-2.3.2-1.fc26')
+        t.move_tags_async.extend([refused, moved])
+        multicall_map.return_value = collections.OrderedDict([
+            (refused, {'faultCode': 1000, 'faultString': 'Not tagged'}), (moved, [42])])
+
+        with self.assertRaises(Exception) as exc:
+            t._perform_tag_actions()
+
+        self.assertEqual(
+            six.text_type(exc.exception),
+            "Failed to move builds: [((u'f26-updates-candidate', u'f26-updates-testing', "
+            "u'bodhi-2.3.2-1.fc26'), {'faultCode': 1000, 'faultString': 'Not tagged'})]")
+        self.assertEqual(wait_for_tasks.mock_calls, [mock.call([42], mock.ANY, sleep=15)])
+        self.assertEqual(build.get_tags(), [u'f17-updates-testing'])
+        self.assert_sems(0)
+
+
+class TestComposerThread_remove_pending_tags(ComposerThreadBaseTestCase):
+    """Test the ComposerThread.remove_pending_tags() method."""
+    @mock.patch('bodhi.server.consumers.masher.buildsys.multicall_map')
+    def test_mirrors_tags(self, multicall_map):
+        """Assert that the pending tags are removed from the mirror if Koji removed them."""
+        msg = self._make_msg()
+        t = ComposerThread(self.semmock, msg['body']['msg']['composes'][0],
+                           'bowlofeggs', log, self.Session, self.tempdir)
+        t.compose = Compose.from_dict(self.db, msg['body']['msg']['composes'][0])
+        update = t.compose.updates[0]
+        update.request = UpdateRequest.testing
+        build = update.builds[0]
+        build.set_tags([u'f17-updates-candidate', u'f17-updates-testing-pending'])
+        multicall_map.return_value = {(u'f17-updates-testing-pending', build.nvr): [None]}
+
+        t.remove_pending_tags()
+
+        multicall_map.assert_called_once_with(
+            [((u'f17-updates-testing-pending', build.nvr), 'untagBuild',
+              (u'f17-updates-testing-pending', build.nvr), {'force': True})],
+            retries=0)
+        self.assertEqual(build.get_tags(), [u'f17-updates-candidate'])
+        self.assert_sems(0)
+
+    @mock.patch('bodhi.server.consumers.masher.buildsys.multicall_map')
+    def test_fault(self, multicall_map):
+        """Assert that the mirror keeps a pending tag that Koji failed to remove."""
+        msg = self._make_msg()
+        t = ComposerThread(self.semmock, msg['body']['msg']['composes'][0],
+                           'bowlofeggs', log, self.Session, self.tempdir)
+        t.compose = Compose.from_dict(self.db, msg['body']['msg']['composes'][0])
+        update = t.compose.updates[0]
+        update.request = UpdateRequest.testing
+        build = update.builds[0]
+        build.set_tags([u'f17-updates-candidate', u'f17-updates-testing-pending'])
+        multicall_map.return_value = {
+            (u'f17-updates-testing-pending', build.nvr): {'faultCode': 1000,
+                                                          'faultString': 'Not tagged'}}
+
+        t.remove_pending_tags()
+
+        self.assertEqual(build.get_tags(),
+                         [u'f17-updates-candidate', u'f17-updates-testing-pending'])
+        self.assert_sems(0)
+
 
 class TestComposerThread_check_all_karma_thresholds(ComposerThreadBaseTestCase):
     """Test the ComposerThread.check_all_karma_thresholds() method."""
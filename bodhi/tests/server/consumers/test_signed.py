@@ -32,7 +32,8 @@ class TestSignedHandler___init__(unittest.TestCase):
 
         handler = signed.SignedHandler(hub)
 
-        self.assertEqual(handler.topic, ['topic_prefix.environment.buildsys.tag'])
+        self.assertEqual(handler.topic, ['topic_prefix.environment.buildsys.tag',
+                                         'topic_prefix.environment.buildsys.untag'])
 
     @mock.patch('bodhi.server.consumers.signed.fedmsg.consumers.FedmsgConsumer.__init__')
     def test_calls_super(self, __init__):
@@ -42,7 +43,8 @@ class TestSignedHandler___init__(unittest.TestCase):
 
         handler = signed.SignedHandler(hub)
 
-        self.assertEqual(handler.topic, ['topic_prefix.environment.buildsys.tag'])
+        self.assertEqual(handler.topic, ['topic_prefix.environment.buildsys.tag',
+                                         'topic_prefix.environment.buildsys.untag'])
         __init__.assert_called_once_with(hub)
 
 
@@ -74,6 +76,12 @@ class TestSignedHandlerConsume(unittest.TestCase):
         hub = mock.MagicMock()
         hub.config = {'environment': 'environment', 'topic_prefix': 'topic_prefix'}
         self.handler = signed.SignedHandler(hub)
+        get_tags = mock.patch(
+            'bodhi.server.consumers.signed.Release.get_tags',
+            return_value=({'pending_testing': ['f26-updates-testing-pending']},
+                          {'f26-updates-testing-pending': 'F26'}))
+        get_tags.start()
+        self.addCleanup(get_tags.stop)
 
     @mock.patch('bodhi.server.consumers.signed.Build')
     def test_consume(self, mock_build_model):
@@ -83,6 +91,20 @@ class TestSignedHandlerConsume(unittest.TestCase):
 
         self.handler.consume(self.sample_message)
         self.assertTrue(build.signed is True)
+        build.mirror_tag.assert_called_once_with('f26-updates-testing-pending', True)
+
+    @mock.patch('bodhi.server.consumers.signed.Build')
+    def test_consume_untag(self, mock_build_model):
+        """Assert that untagging messages are mirrored, and don't mark the build as signed."""
+        self.sample_message['body']['topic'] = 'org.fedoraproject.prod.buildsys.untag'
+        build = mock_build_model.get.return_value
+        build.signed = False
+        build.release.pending_testing_tag = self.sample_message['body']['msg']['tag']
+
+        self.handler.consume(self.sample_message)
+
+        build.mirror_tag.assert_called_once_with('f26-updates-testing-pending', False)
+        self.assertFalse(build.signed)
 
     @mock.patch('bodhi.server.consumers.signed.Build')
     def test_consume_not_pending_testing_tag(self, mock_build_model):
@@ -95,6 +117,15 @@ class TestSignedHandlerConsume(unittest.TestCase):
         self.handler.consume(self.sample_message)
         self.assertFalse(build.signed is True)
 
+    @mock.patch('bodhi.server.consumers.signed.Build')
+    def test_consume_unknown_tag(self, mock_build_model):
+        """Assert that messages about tags no release uses are skipped without a build lookup."""
+        self.sample_message['body']['msg']['tag'] = 'f26-some-side-tag'
+
+        self.handler.consume(self.sample_message)
+
+        self.assertEqual(mock_build_model.get.call_count, 0)
+
     @mock.patch('bodhi.server.consumers.signed.Build')
     def test_consume_no_release(self, mock_build_model):
         """
@@ -17,8 +17,11 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 import copy
+import json
+import tempfile
 
 from webtest import TestApp
+import mock
 
 from bodhi.server import main
 from bodhi.tests.server import base
@@ -46,3 +49,35 @@ class TestAdminView(base.BaseTestCase):
         res = app.get('/admin/', status=403)
         self.assertIn('<h1>403 <small>Forbidden</small></h1>', res)
         self.assertIn('<p class="lead">Access was denied to this resource.</p>', res)
+
+
+class TestGetSlowQueries(base.BaseTestCase):
+    """Test the get_slow_queries() view."""
+
+    def test_get(self):
+        """The slowest statements should be listed."""
+        with tempfile.NamedTemporaryFile(mode='w') as log_file:
+            for duration in (1.0, 2.0):
+                log_file.write('%s\n' % json.dumps(
+                    {'statement': 'SELECT 1', 'duration': duration, 'caller': 'a',
+                     'entry_point': 'services/updates.py:1 (query_updates)'}))
+            log_file.flush()
+
+            with mock.patch.dict('bodhi.server.config.config',
+                                 {'slow_queries.path': log_file.name,
+                                  'slow_queries.threshold': 0.5}):
+                body = self.app.get('/admin/slow_queries', {'limit': 5}).json_body
+
+        self.assertEqual(body['threshold'], 0.5)
+        self.assertEqual(body['records'], 2)
+        self.assertEqual(len(body['queries']), 1)
+        self.assertEqual(body['queries'][0]['count'], 2)
+        self.assertEqual(body['queries'][0]['max_duration'], 2.0)
+        self.assertEqual(body['queries'][0]['entry_points'],
+                         ['services/updates.py:1 (query_updates)'])
+
+    def test_bad_limit(self):
+        """The limit must be an integer."""
+        res = self.app.get('/admin/slow_queries', {'limit': 'many'}, status=400)
+
+        self.assertEqual(res.json_body['errors'][0]['name'], 'limit')
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This module contains tests for the bodhi.server.scripts.rebuild_release_stats module."""
+
+from click import testing
+import mock
+
+from bodhi.server import models
+from bodhi.server.scripts import rebuild_release_stats
+from bodhi.tests.server.base import BaseTestCase
+
+
+@mock.patch('bodhi.server.scripts.rebuild_release_stats.Session.remove')
+class TestRebuildReleaseStats(BaseTestCase):
+    """This class contains tests for the rebuild_release_stats() function."""
+
+    def test_rebuild(self, remove):
+        """The table should be recomputed and committed."""
+        self.db.query(models.ReleaseStat).delete()
+        self.db.commit()
+
+        result = testing.CliRunner().invoke(rebuild_release_stats.rebuild_release_stats, [])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(self.db.query(models.ReleaseStat.count).all(), [(1,)])
+        remove.assert_called_once_with()
+
+    @mock.patch('bodhi.server.scripts.rebuild_release_stats.stats.rebuild',
+                side_effect=Exception('oh no'))
+    def test_failure(self, rebuild, remove):
+        """Errors should be printed and cause a non-zero exit code."""
+        result = testing.CliRunner().invoke(rebuild_release_stats.rebuild_release_stats, [])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(result.output, 'oh no\n')
+        remove.assert_called_once_with()
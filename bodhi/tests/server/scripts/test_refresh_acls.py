@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This module contains tests for the bodhi.server.scripts.refresh_acls module."""
+
+from click import testing
+import mock
+
+from bodhi.server import models
+from bodhi.server.scripts import refresh_acls
+from bodhi.tests.server.base import BaseTestCase
+
+
+@mock.patch('bodhi.server.scripts.refresh_acls.Session.remove')
+class TestRefreshAcls(BaseTestCase):
+    """This class contains tests for the refresh_acls() function."""
+
+    @mock.patch.dict('bodhi.server.config.config', {'acl_system': 'pagure'})
+    @mock.patch('bodhi.server.models.Package.get_pkg_committers_from_pagure',
+                return_value=(['guest'], []))
+    def test_refresh(self, get_committers, remove):
+        """The ACLs should be refreshed and committed."""
+        result = testing.CliRunner().invoke(refresh_acls.refresh_acls, [])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, 'Refreshed the ACLs of 1 packages\n')
+        self.assertEqual(self.db.query(models.PackageAcl).count(), 1)
+        remove.assert_called_once_with()
+
+    @mock.patch('bodhi.server.scripts.refresh_acls.acls.refresh', side_effect=Exception('oh no'))
+    def test_failure(self, refresh, remove):
+        """Errors should be printed and cause a non-zero exit code."""
+        result = testing.CliRunner().invoke(refresh_acls.refresh_acls,
+                                            ['--days', '2', '--workers', '3'])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(result.output, 'oh no\n')
+        refresh.assert_called_once_with(mock.ANY, 2, 3)
+        remove.assert_called_once_with()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This module contains tests for the bodhi.server.scripts.send_mail module."""
+
+import shutil
+import tempfile
+import unittest
+
+from click import testing
+import mock
+
+from bodhi.server import mail
+from bodhi.server.scripts import send_mail
+
+
+class TestSendMail(unittest.TestCase):
+    """This class contains tests for the send_mail() function."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    @mock.patch('bodhi.server.mail.smtplib.SMTP')
+    def test_once(self, SMTP):
+        """The queued e-mails should be sent over a single connection."""
+        spool = mail.get_spool(self.path)
+        spool.put('bodhi@example.com', ['a@example.com'], 'first')
+        spool.put('bodhi@example.com', ['b@example.com'], 'second')
+
+        with mock.patch.dict('bodhi.server.config.config',
+                             {'mail.spool_dir': self.path, 'smtp_server': 'smtp.example.com'}):
+            result = testing.CliRunner().invoke(send_mail.send_mail, ['--once'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, 'Sent 2 e-mails, 0 will be retried\n')
+        SMTP.assert_called_once_with('smtp.example.com')
+        self.assertEqual(SMTP.return_value.sendmail.call_count, 2)
+        self.assertEqual(len(spool), 0)
+
+    @mock.patch.dict('bodhi.server.config.config', {'mail.spool_dir': None})
+    def test_no_spool(self):
+        """The command should fail if there is no spool."""
+        result = testing.CliRunner().invoke(send_mail.send_mail, ['--once'])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(result.output,
+                         'mail.spool_dir is not set, e-mails are sent as they are generated.\n')
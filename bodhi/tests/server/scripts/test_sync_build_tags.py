@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This module contains tests for the bodhi.server.scripts.sync_build_tags module."""
+
+from click import testing
+import mock
+
+from bodhi.server import models
+from bodhi.server.scripts import sync_build_tags
+from bodhi.tests.server.base import BaseTestCase
+
+
+@mock.patch('bodhi.server.scripts.sync_build_tags.buildsys.setup_buildsystem')
+@mock.patch('bodhi.server.scripts.sync_build_tags.Session.remove')
+class TestSyncBuildTags(BaseTestCase):
+    """This class contains tests for the sync_build_tags() function."""
+
+    def test_sync(self, remove, setup_buildsystem):
+        """The mirrored tags should be synced and committed."""
+        result = testing.CliRunner().invoke(sync_build_tags.sync_build_tags, [])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, 'Synced the tags of 1 builds\n')
+        self.assertEqual(self.db.query(models.BuildTag).count(), 3)
+        remove.assert_called_once_with()
+
+    @mock.patch('bodhi.server.scripts.sync_build_tags.build_tags.reconcile',
+                side_effect=Exception('oh no'))
+    def test_failure(self, reconcile, remove, setup_buildsystem):
+        """Errors should be printed and cause a non-zero exit code."""
+        result = testing.CliRunner().invoke(sync_build_tags.sync_build_tags, ['--chunk-size', '5'])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(result.output, 'oh no\n')
+        reconcile.assert_called_once_with(mock.ANY, 5)
+        remove.assert_called_once_with()
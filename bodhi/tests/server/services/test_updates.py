@@ -29,7 +29,7 @@ import koji
 import mock
 import six
 
-from bodhi.server import main
+from bodhi.server import buildsys, main
 from bodhi.server.config import config
 from bodhi.server.models import (
     BuildrootOverride, Group, RpmPackage, ModulePackage, Release,
@@ -700,8 +700,9 @@ class TestUpdatesService(base.BaseTestCase):
         # This will cause an extra error in the output that we aren't testing here, so delete it.
         del update_json['requirements']
 
+        listTags = mock.Mock(return_value=[{'name': 'f17-updates'}])
         with mock.patch('bodhi.server.buildsys.DevBuildsys.listTags',
-                        return_value=[{'name': 'f17-updates'}]) as listTags:
+                        buildsys.multicall_enabled(listTags)):
             res = self.app.post_json('/updates/', update_json, status=400)
 
         expected_json = {
@@ -712,7 +713,7 @@ class TestUpdatesService(base.BaseTestCase):
                     u"[u'f17-updates-candidate', u'f17-updates-testing']"),
                  u'location': u'body', u'name': u'builds'}]}
         self.assertEqual(res.json, expected_json)
-        listTags.assert_called_once_with('bodhi-2.0-1.fc17')
+        listTags.assert_called_once_with(ANY, 'bodhi-2.0-1.fc17')
 
     def test_edit_koji_error(self):
         """Editing an update that references missing builds should raise an error."""
@@ -724,8 +725,9 @@ class TestUpdatesService(base.BaseTestCase):
         # This will cause an extra error in the output that we aren't testing here, so delete it.
         del update_json['requirements']
 
+        listTags = mock.Mock(side_effect=koji.GenericError())
         with mock.patch('bodhi.server.buildsys.DevBuildsys.listTags',
-                        side_effect=koji.GenericError()) as listTags:
+                        buildsys.multicall_enabled(listTags)):
             res = self.app.post_json('/updates/', update_json, status=400)
 
         expected_json = {
@@ -737,7 +739,8 @@ class TestUpdatesService(base.BaseTestCase):
                                   u'tags: []'),
                  u'location': u'body', u'name': u'builds'}]}
         self.assertEqual(res.json, expected_json)
-        listTags.assert_called_once_with(update.title)
+        # The fault of the prefetching multicall is retried once by validate_build_tags().
+        self.assertEqual(listTags.mock_calls, [mock.call(ANY, update.title)] * 2)
 
     def test_edit_untagged_build(self):
         """Editing an update that references untagged builds should raise an error."""
@@ -749,8 +752,9 @@ class TestUpdatesService(base.BaseTestCase):
         # This will cause an extra error in the output that we aren't testing here, so delete it.
         del update_json['requirements']
 
+        listTags = mock.Mock(return_value=[])
         with mock.patch('bodhi.server.buildsys.DevBuildsys.listTags',
-                        return_value=[]) as listTags:
+                        buildsys.multicall_enabled(listTags)):
             res = self.app.post_json('/updates/', update_json, status=400)
 
         expected_json = {
@@ -763,7 +767,7 @@ class TestUpdatesService(base.BaseTestCase):
                     u"tags: []"),
                  u'location': u'body', u'name': u'builds'}]}
         self.assertEqual(res.json, expected_json)
-        listTags.assert_called_once_with('bodhi-2.0-1.fc17')
+        listTags.assert_called_once_with(ANY, 'bodhi-2.0-1.fc17')
 
     @mock.patch(**mock_taskotron_results)
     @mock.patch(**mock_valid_requirements)
@@ -2396,7 +2400,6 @@ class TestUpdatesService(base.BaseTestCase):
         publish.assert_called_with(topic='update.request.testing', msg=ANY)
 
         # Add another release and package
-        Release._tag_cache = None
         release = Release(
             name=u'F18', long_name=u'Fedora 18',
             id_prefix=u'FEDORA', version=u'18',
@@ -3258,7 +3261,6 @@ class TestUpdatesService(base.BaseTestCase):
     def test_submitting_multi_release_updates(self, publish, *args):
         """ https://github.com/fedora-infra/bodhi/issues/219 """
         # Add another release and package
-        Release._tag_cache = None
         release = Release(
             name=u'F18', long_name=u'Fedora 18',
             id_prefix=u'FEDORA', version=u'18',
@@ -4737,3 +4739,46 @@ class TestWaiveTestResults(base.BaseTestCase):
         self.assertEquals(res.json_body['errors'][0]['description'],
                           u'IOError. oops!')
         log_exception.assert_called_once_with("Unhandled exception in waive_test_results")
+
+
+class TestSetSubscription(base.BaseTestCase):
+    """This class contains tests for the set_subscription() function."""
+
+    def test_subscribe(self):
+        """The current user should be subscribed to the update."""
+        nvr = u'bodhi-2.0-1.fc17'
+        update = self.db.query(Update).filter_by(title=nvr).one()
+        guest = self.db.query(User).filter_by(name=u'guest').one()
+        update.subscribe(self.db, guest, False)
+
+        res = self.app.post_json('/updates/%s/subscription' % str(nvr),
+                                 {'csrf_token': self.get_csrf_token()})
+
+        self.assertEqual(res.json_body, {'subscribed': True})
+        self.assertEqual([u.name for u in update.get_subscribers(self.db)], [u'guest'])
+
+    def test_unsubscribe(self):
+        """The current user should be unsubscribed from the update."""
+        nvr = u'bodhi-2.0-1.fc17'
+
+        res = self.app.post_json('/updates/%s/subscription' % str(nvr),
+                                 {'subscribed': False, 'csrf_token': self.get_csrf_token()})
+
+        self.assertEqual(res.json_body, {'subscribed': False})
+        update = self.db.query(Update).filter_by(title=nvr).one()
+        self.assertEqual(update.get_subscribers(self.db), [])
+
+    def test_anonymous(self):
+        """Anonymous users should not be able to subscribe."""
+        anonymous_settings = copy.copy(self.app_settings)
+        anonymous_settings.update({
+            'authtkt.secret': 'whatever',
+            'authtkt.secure': True,
+        })
+        app = TestApp(main({}, session=self.db, **anonymous_settings))
+
+        res = app.post_json('/updates/bodhi-2.0-1.fc17/subscription',
+                            {'csrf_token': self.get_csrf_token(app)}, status=403)
+
+        self.assertEqual(res.json_body['errors'][0]['description'],
+                         'You must be logged in to subscribe to updates')
@@ -18,9 +18,13 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """This test suite contains tests for bodhi.server.__init__."""
 import collections
+import json
+import subprocess
+import sys
 import unittest
 
 from pyramid import authentication, authorization, testing
+from sqlalchemy import event
 import mock
 import munch
 
@@ -30,6 +34,34 @@ from bodhi.server.config import config
 from bodhi.tests.server import base
 
 
+#: A script that imports the given modules and prints how long that took and the deferred modules
+#: that were imported as well.
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.time()
+for module in sys.argv[2:]:
+    __import__(module)
+print(json.dumps({'seconds': time.time() - start,
+                  'loaded': [m for m in sys.argv[1].split(',') if m in sys.modules]}))
+"""
+
+
+def import_in_subprocess(modules, deferred):
+    """
+    Import modules in a new interpreter, so that the modules the test suite loaded don't count.
+
+    Args:
+        modules (list): The names of the modules to import.
+        deferred (list): The names of the modules that should not be imported along with them.
+    Returns:
+        dict: The ``seconds`` the imports took and the ``loaded`` deferred modules.
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-c', IMPORT_SCRIPT, ','.join(deferred)] + modules,
+        cwd=base.PROJECT_PATH)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
 class TestExceptionFilter(unittest.TestCase):
     """Test the exception_filter() function."""
     @mock.patch('bodhi.server.log.exception')
@@ -55,6 +87,16 @@ class TestExceptionFilter(unittest.TestCase):
         self.assertIs(response, request_response)
         self.assertEqual(exception.call_count, 0)
 
+    def test_services_imported_before_main(self):
+        """The services should have the filter even if they are imported before main() runs."""
+        script = ('from bodhi.server import exception_filter\n'
+                  'from bodhi.server.services import updates\n'
+                  'print(updates.update.filters.index(exception_filter))')
+
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=base.PROJECT_PATH)
+
+        self.assertEqual(output.decode('utf-8').strip().splitlines()[-1], '0')
+
 
 class TestGetBuildinfo(unittest.TestCase):
     """Test get_buildinfo()."""
@@ -71,7 +113,8 @@ class TestGetBuildinfo(unittest.TestCase):
 class TestGetCacheregion(unittest.TestCase):
     """Test get_cacheregion()."""
     @mock.patch.dict('bodhi.server.bodhi_config', {'some': 'config'}, clear=True)
-    @mock.patch('bodhi.server.make_region')
+    @mock.patch('bodhi.server._cache_region', None)
+    @mock.patch('dogpile.cache.make_region')
     def test_get_cacheregion(self, make_region):
         """Test get_cacheregion."""
         # The argument (request) doesn't get used, so we'll just pass None.
@@ -81,6 +124,15 @@ class TestGetCacheregion(unittest.TestCase):
         self.assertEqual(region, make_region.return_value)
         region.configure_from_config.assert_called_once_with({'some': 'config'}, 'dogpile.cache.')
 
+    @mock.patch('bodhi.server._cache_region', None)
+    @mock.patch('dogpile.cache.make_region')
+    def test_get_cacheregion_shared(self, make_region):
+        """The region should only be made once, and then shared by every request."""
+        region = server.get_cacheregion(None)
+
+        self.assertIs(server.get_cacheregion(None), region)
+        make_region.assert_called_once_with()
+
 
 class TestGetKoji(unittest.TestCase):
     """Test get_koji()."""
@@ -171,6 +223,31 @@ class TestGroupfinder(base.BaseTestCase):
         self.assertIsNone(server.groupfinder(None, request))
 
 
+class TestInitializeDb(base.BaseTestCase):
+    """Test the initialize_db() function."""
+
+    @mock.patch('bodhi.server.Session.configure')
+    def test_release_stats(self, configure):
+        """The release_stats table should be maintained by any process that initializes the db."""
+        # Undo the registration done when the test database was set up, so that this test only
+        # relies on initialize_db(), like the masher and the cron scripts do.
+        listeners = sys.modules['bodhi.server.stats']._LISTENERS
+        for target, identifier, fn, kwargs in listeners:
+            event.remove(target, identifier, fn)
+        self.addCleanup(sys.modules['bodhi.server.stats'].listen)
+
+        server.initialize_db({'sqlalchemy.url': 'sqlite://'})
+
+        update = self.db.query(models.Update).one()
+        update.status = models.UpdateStatus.testing
+        self.db.flush()
+        rows = self.db.query(models.ReleaseStat.status, models.ReleaseStat.count)\
+            .filter(models.ReleaseStat.count != 0).populate_existing().all()
+        self.assertEqual(rows, [(models.UpdateStatus.testing, 1)])
+        for target, identifier, fn, kwargs in listeners:
+            self.assertTrue(event.contains(target, identifier, fn))
+
+
 class TestMain(base.BaseTestCase):
     """
     Assert correct behavior from the main() function.
@@ -276,3 +353,30 @@ class TestGetDbSessionForRequest(unittest.TestCase):
         session = server.get_db_session_for_request(mock_request)
         mock_request.registry.sessionmaker.assert_called_once_with()
         self.assertEqual(session, mock_request.registry.sessionmaker.return_value)
+
+
+class TestImportTime(unittest.TestCase):
+    """Ensure that bodhi.server and the cron scripts don't import rarely used dependencies."""
+
+    #: Dependencies that are only needed by a few requests or tasks, and are imported on first use.
+    deferred = ['arrow', 'bleach', 'bugzilla', 'dogpile.cache', 'libravatar', 'librepo', 'markdown',
+                'PIL', 'pkgdb2client', 'rpm', 'simplemediawiki']
+    #: How long the imports may take, which is generous so that slow test machines don't fail.
+    budget = 5
+
+    def test_cron_scripts(self):
+        """Assert that the cron scripts only import what they need, within the budget."""
+        result = import_in_subprocess(
+            ['bodhi.server.scripts.approve_testing', 'bodhi.server.scripts.expire_overrides',
+             'bodhi.server.scripts.dequeue_stable', 'bodhi.server.scripts.check_policies'],
+            self.deferred)
+
+        self.assertEqual(result['loaded'], [])
+        self.assertLess(result['seconds'], self.budget)
+
+    def test_server(self):
+        """Assert that bodhi.server and its models only import what they need, within the budget."""
+        result = import_in_subprocess(['bodhi.server', 'bodhi.server.models'], self.deferred)
+
+        self.assertEqual(result['loaded'], [])
+        self.assertLess(result['seconds'], self.budget)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.acls."""
+from datetime import datetime, timedelta
+import json
+
+import mock
+
+from bodhi.server import acls, models
+from bodhi.tests.server import base
+
+
+@mock.patch('bodhi.server.models.Package.get_pkg_committers_from_pagure',
+            return_value=(['guest'], ['packager']))
+class TestGetAcls(base.BaseTestCase):
+    """Test the get_acls() function."""
+
+    def setUp(self):
+        super(TestGetAcls, self).setUp()
+        self.package = self.db.query(models.Package).filter_by(name=u'bodhi').one()
+
+    def _age(self, seconds):
+        """Make the cached ACLs of the package the given number of seconds old."""
+        row = self.db.query(models.PackageAcl).one()
+        row.fetched = datetime.utcnow() - timedelta(seconds=seconds)
+        self.db.flush()
+
+    def test_cached(self, get_committers):
+        """The ACLs should only be read once."""
+        self.assertEqual(acls.get_acls(self.db, self.package), (['guest'], ['packager']))
+        self.assertEqual(acls.get_acls(self.db, self.package), [['guest'], ['packager']])
+
+        self.assertEqual(get_committers.call_count, 1)
+        row = self.db.query(models.PackageAcl).one()
+        self.assertEqual((row.package_id, row.branch), (self.package.id, u''))
+
+    @mock.patch('bodhi.server.acls._schedule_refresh')
+    def test_stale(self, _schedule_refresh, get_committers):
+        """Stale ACLs should be used while they are refreshed in the background."""
+        acls.get_acls(self.db, self.package)
+        self._age(301)
+
+        self.assertEqual(acls.get_acls(self.db, self.package), [['guest'], ['packager']])
+
+        self.assertEqual(get_committers.call_count, 1)
+        _schedule_refresh.assert_called_once_with(self.package.id, None)
+
+    def test_expired(self, get_committers):
+        """ACLs older than acl_cache.max_stale should be read again."""
+        acls.get_acls(self.db, self.package)
+        self._age(300 + 86400)
+        get_committers.return_value = (['bowlofeggs'], [])
+
+        self.assertEqual(acls.get_acls(self.db, self.package), (['bowlofeggs'], []))
+
+        self.assertEqual(json.loads(self.db.query(models.PackageAcl).one().acls),
+                         [['bowlofeggs'], []])
+
+    def test_unreachable(self, get_committers):
+        """Expired ACLs should be used when the ACL system can't be reached."""
+        acls.get_acls(self.db, self.package)
+        self._age(300 + 86400)
+        get_committers.side_effect = IOError('pagure is down')
+
+        self.assertEqual(acls.get_acls(self.db, self.package), [['guest'], ['packager']])
+
+    def test_unreachable_not_cached(self, get_committers):
+        """Errors should be raised if there are no cached ACLs."""
+        get_committers.side_effect = RuntimeError('no such package')
+
+        with self.assertRaises(RuntimeError):
+            acls.get_acls(self.db, self.package)
+
+    @mock.patch.dict('bodhi.server.config.config', {'acl_cache.ttl': 0})
+    def test_disabled(self, get_committers):
+        """A ttl of 0 should disable the cache."""
+        acls.get_acls(self.db, self.package)
+        acls.get_acls(self.db, self.package)
+
+        self.assertEqual(get_committers.call_count, 2)
+        self.assertEqual(self.db.query(models.PackageAcl).count(), 0)
+
+    @mock.patch('bodhi.server.models.Package.get_pkg_pushers',
+                return_value=((['guest'], []), ([], [])))
+    def test_pkgdb(self, get_pkg_pushers, get_committers):
+        """The pkgdb ACLs should be cached per branch."""
+        acls.get_acls(self.db, self.package, u'f17')
+        acls.get_acls(self.db, self.package, u'f17')
+        acls.get_acls(self.db, self.package, u'f18')
+
+        self.assertEqual(get_pkg_pushers.call_count, 2)
+        self.assertEqual(get_committers.call_count, 0)
+        self.assertEqual(sorted(b for b, in self.db.query(models.PackageAcl.branch)),
+                         [u'f17', u'f18'])
+
+    def test_refresh_in_background(self, get_committers):
+        """The background refresh should store the ACLs in its own transaction."""
+        acls.get_acls(self.db, self.package)
+        self._age(301)
+        get_committers.return_value = (['bowlofeggs'], [])
+        acls._refreshing.add((self.package.id, None))
+
+        with mock.patch('bodhi.server.acls.transactional_session_maker',
+                        return_value=base.TransactionalSessionMaker(self.Session)):
+            acls._refresh_in_background(self.package.id, None)
+
+        self.assertEqual(acls.get_acls(self.db, self.package), [['bowlofeggs'], []])
+        self.assertNotIn((self.package.id, None), acls._refreshing)
+
+
+@mock.patch('bodhi.server.acls.threading.Thread')
+class TestScheduleRefresh(base.BaseTestCase):
+    """Test the _schedule_refresh() function."""
+
+    def tearDown(self):
+        acls._refreshing.clear()
+        super(TestScheduleRefresh, self).tearDown()
+
+    def test_schedule(self, Thread):
+        """A daemon thread should be started."""
+        acls._schedule_refresh(1, u'f17')
+
+        Thread.assert_called_once_with(target=acls._refresh_in_background, args=(1, u'f17'))
+        self.assertTrue(Thread.return_value.daemon)
+        Thread.return_value.start.assert_called_once_with()
+
+    def test_already_refreshing(self, Thread):
+        """Only one thread should refresh the same ACLs."""
+        acls._schedule_refresh(1, None)
+        acls._schedule_refresh(1, None)
+
+        self.assertEqual(Thread.call_count, 1)
+
+
+class TestRefresh(base.BaseTestCase):
+    """Test the refresh() function."""
+
+    @mock.patch.dict('bodhi.server.config.config', {'acl_system': 'pagure'})
+    @mock.patch('bodhi.server.models.Package.get_pkg_committers_from_pagure',
+                return_value=(['guest'], []))
+    def test_pagure(self, get_committers):
+        """The ACLs of the packages of pending updates should be refreshed."""
+        self.assertEqual(acls.refresh(self.db), 1)
+
+        row = self.db.query(models.PackageAcl).one()
+        self.assertEqual(row.branch, u'')
+        self.assertEqual(json.loads(row.acls), [['guest'], []])
+
+    @mock.patch.dict('bodhi.server.config.config', {'acl_system': 'pagure'})
+    @mock.patch('bodhi.server.acls._fetch', return_value=(['guest'], []))
+    def test_plain_values(self, _fetch):
+        """The workers should be given the package's name and type rather than mapped objects."""
+        self.assertEqual(acls.refresh(self.db), 1)
+
+        _fetch.assert_called_once_with(u'bodhi', models.ContentType.rpm, None)
+
+    @mock.patch.dict('bodhi.server.config.config', {'acl_system': 'pkgdb'})
+    @mock.patch('bodhi.server.models.Package.get_pkg_pushers',
+                return_value=((['guest'], []), ([], [])))
+    def test_pkgdb(self, get_pkg_pushers):
+        """pkgdb ACLs should be refreshed for the branches of the updates."""
+        self.assertEqual(acls.refresh(self.db, workers=2), 1)
+
+        get_pkg_pushers.assert_called_once_with(u'f17', mock.ANY)
+        self.assertEqual(self.db.query(models.PackageAcl).one().branch, u'f17')
+
+    @mock.patch.dict('bodhi.server.config.config', {'acl_system': 'pagure'})
+    @mock.patch('bodhi.server.models.Package.get_pkg_committers_from_pagure',
+                side_effect=IOError('pagure is down'))
+    def test_failure(self, get_committers):
+        """Packages whose ACLs can't be read should be skipped."""
+        self.assertEqual(acls.refresh(self.db), 0)
+
+        self.assertEqual(self.db.query(models.PackageAcl).count(), 0)
+
+    @mock.patch.dict('bodhi.server.config.config', {'acl_system': 'pagure'})
+    def test_inactive(self):
+        """Packages without recent updates should be skipped."""
+        update = self.db.query(models.Update).one()
+        update.status = models.UpdateStatus.stable
+        update.date_submitted = update.date_modified = datetime.utcnow() - timedelta(days=30)
+        self.db.flush()
+
+        self.assertEqual(acls.refresh(self.db), 0)
+
+    def test_dummy(self):
+        """The dummy ACL system should not be refreshed."""
+        self.assertEqual(acls.refresh(self.db), 0)
@@ -35,7 +35,7 @@ class TestBugzilla(unittest.TestCase):
 
         self.assertIsNone(bz._bz)
 
-    @mock.patch('bodhi.server.bugs.bugzilla.Bugzilla.__init__', return_value=None)
+    @mock.patch('bugzilla.Bugzilla.__init__', return_value=None)
     def test__connect_with_creds(self, __init__):
         """Test the _connect() method when the config contains credentials."""
         bz = bugs.Bugzilla()
@@ -48,7 +48,7 @@ class TestBugzilla(unittest.TestCase):
         __init__.assert_called_once_with(url='https://example.com/bz', user='bodhi@example.com',
                                          password='bodhi_secret', cookiefile=None, tokenfile=None)
 
-    @mock.patch('bodhi.server.bugs.bugzilla.Bugzilla.__init__', return_value=None)
+    @mock.patch('bugzilla.Bugzilla.__init__', return_value=None)
     def test__connect_without_creds(self, __init__):
         """Test the _connect() method when the config does not contain credentials."""
         bz = bugs.Bugzilla()
@@ -60,7 +60,7 @@ class TestBugzilla(unittest.TestCase):
         __init__.assert_called_once_with(url='https://example.com/bz',
                                          cookiefile=None, tokenfile=None)
 
-    @mock.patch('bodhi.server.bugs.bugzilla.Bugzilla.__init__', return_value=None)
+    @mock.patch('bugzilla.Bugzilla.__init__', return_value=None)
     def test_bz_with__bz_None(self, __init__):
         """
         Assert correct behavior of the bz() method when _bz is None.
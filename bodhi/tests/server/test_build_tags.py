@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.build_tags."""
+from datetime import datetime, timedelta
+
+import koji
+import mock
+
+from bodhi.server import build_tags, buildsys, models
+from bodhi.tests.server import base
+
+
+class TestBuildGetTags(base.BaseTestCase):
+    """Test the mirror behind Build.get_tags()."""
+
+    def setUp(self):
+        super(TestBuildGetTags, self).setUp()
+        self.build = self.db.query(models.Build).filter_by(nvr=u'bodhi-2.0-1.fc17').one()
+
+    def test_populates_mirror(self):
+        """The first lookup should read the tags from koji, and mirror them."""
+        tags = self.build.get_tags()
+
+        self.assertEqual(tags, ['f17-updates-candidate', 'f17', 'f17-updates-testing'])
+        self.assertEqual(sorted(t.name for t in self.build.mirrored_tags), sorted(tags))
+        self.assertIsNotNone(self.build.tags_synced)
+
+    def test_served_from_mirror(self):
+        """Later lookups shouldn't ask koji."""
+        self.build.get_tags()
+
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.listTags') as listTags:
+            tags = self.build.get_tags()
+
+        self.assertEqual(tags, ['f17', 'f17-updates-candidate', 'f17-updates-testing'])
+        self.assertEqual(listTags.call_count, 0)
+
+    def test_stale_mirror(self):
+        """Mirrors older than build_tags.max_age should be ignored."""
+        self.build.set_tags([u'f17-updates-testing'], datetime.utcnow() - timedelta(days=2))
+
+        self.assertEqual(self.build.get_tags(), ['f17-updates-candidate', 'f17',
+                                                 'f17-updates-testing'])
+
+    @mock.patch.dict('bodhi.server.config.config', {'build_tags.max_age': 0})
+    def test_disabled(self):
+        """A max_age of 0 should always read the tags from koji."""
+        self.build.set_tags([u'f17-updates-testing'])
+
+        self.assertEqual(len(self.build.get_tags()), 3)
+
+    def test_mirror_tag(self):
+        """mirror_tag() should add and remove tags from a populated mirror."""
+        self.build.set_tags([u'f17-updates-candidate'])
+
+        self.build.mirror_tag(u'f17-updates-testing')
+        self.build.mirror_tag(u'f17-updates-testing')
+        self.build.mirror_tag(u'f17-updates-candidate', tagged=False)
+        self.db.flush()
+
+        self.assertEqual(self.build.get_tags(), ['f17-updates-testing'])
+
+    def test_mirror_tag_unpopulated(self):
+        """mirror_tag() should ignore builds whose mirror was never populated."""
+        self.build.mirror_tag(u'f17-updates-testing')
+
+        self.assertEqual(self.build.mirrored_tags, [])
+        self.assertIsNone(self.build.tags_synced)
+
+    def test_update_remove_tag(self):
+        """Removing a tag from an update should update the mirror of its builds."""
+        self.build.set_tags([u'f17-updates-candidate', u'f17-updates-testing'])
+
+        self.build.update.remove_tag(u'f17-updates-testing')
+
+        self.assertEqual(self.build.get_tags(), ['f17-updates-candidate'])
+
+
+class TestSync(base.BaseTestCase):
+    """Test the sync() function."""
+
+    def test_sync(self):
+        """The tags of the builds should be read in a multicall."""
+        build = self.db.query(models.Build).one()
+        build.set_tags([u'f17-updates-pending'], datetime.utcnow() - timedelta(days=2))
+
+        self.assertEqual(build_tags.sync([build]), 1)
+
+        self.assertEqual(build.get_tags(), ['f17', 'f17-updates-candidate', 'f17-updates-testing'])
+        self.assertTrue(build.tags_fresh)
+
+    def test_fault(self):
+        """Builds whose tags can't be read should keep their mirror."""
+        build = self.db.query(models.Build).one()
+        build.set_tags([u'f17-updates-pending'])
+        listTags = mock.Mock(side_effect=koji.GenericError('No such build'))
+
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.listTags',
+                        buildsys.multicall_enabled(listTags)):
+            self.assertEqual(build_tags.sync([build]), 0)
+
+        self.assertEqual(build.get_tags(), ['f17-updates-pending'])
+
+    def test_no_builds(self):
+        """Syncing no builds shouldn't call koji."""
+        with mock.patch('bodhi.server.build_tags.buildsys.multicall_map') as multicall_map:
+            self.assertEqual(build_tags.sync([]), 0)
+
+        self.assertEqual(multicall_map.call_count, 0)
+
+
+class TestLookup(base.BaseTestCase):
+    """Test the lookup() function."""
+
+    def test_lookup(self):
+        """Only builds with a fresh mirror should be returned."""
+        build = self.db.query(models.Build).one()
+        build.set_tags([u'f17-updates-testing', u'f17-updates-candidate'])
+        stale = self.create_update([u'bodhi-2.0-2.fc17']).builds[0]
+        stale.set_tags([u'f17-updates-testing'], datetime.utcnow() - timedelta(days=2))
+        self.db.flush()
+
+        tags = build_tags.lookup(self.db, [build.nvr, stale.nvr, u'unknown-1.0-1.fc17'])
+
+        self.assertEqual(tags, {build.nvr: ['f17-updates-candidate', 'f17-updates-testing']})
+
+
+class TestReconcile(base.BaseTestCase):
+    """Test the reconcile() function."""
+
+    def test_reconcile(self):
+        """The builds of releases that aren't archived should be synced."""
+        build = self.db.query(models.Build).one()
+        archived = self.create_release(u'16')
+        archived.state = models.ReleaseState.archived
+        other = self.create_update([u'bodhi-1.0-1.fc16'], u'F16').builds[0]
+        self.db.flush()
+
+        self.assertEqual(build_tags.reconcile(self.db, chunk_size=1), 1)
+
+        self.assertIsNotNone(build.tags_synced)
+        self.assertIsNone(other.tags_synced)
@@ -19,12 +19,13 @@
 """This test suite contains tests for the bodhi.server.buildsys module."""
 
 from threading import Lock
+import threading
 import unittest
 
 import koji
 import mock
 
-from bodhi.server import buildsys
+from bodhi.server import buildsys, synthetic_buildsys
 
 
 class TestBuildsystem(unittest.TestCase):
@@ -57,6 +58,391 @@ class TestBuildsystem(unittest.TestCase):
         self.assertRaises(ValueError, buildsys.setup_buildsystem, {'buildsystem': 'invalid'})
 
 
+class TestDevBuildsysMulticall(unittest.TestCase):
+    """Test the multicall emulation of the DevBuildsys."""
+
+    def test_results(self):
+        """The results of the calls should be returned as 1-element lists."""
+        bs = buildsys.DevBuildsys()
+        bs.multicall = True
+
+        self.assertIsNone(bs.getTag('f17'))
+        self.assertIsNone(bs.listTags('bodhi-2.0-1.fc17'))
+        results = bs.multiCall()
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0]['name'], 'f17')
+        self.assertIn({'name': 'f17-updates-candidate', 'id': 10, 'locked': True, 'perm': None,
+                       'perm_id': None, 'arches': 'i386 x86_64 ppc ppc64'}, results[1][0])
+        self.assertFalse(bs.multicall)
+
+    def test_fault(self):
+        """Koji errors should be returned as faults instead of being raised."""
+        bs = buildsys.DevBuildsys()
+        bs.multicall = True
+
+        bs.getTag('epel7', strict=True)
+        bs.getTag('f17', strict=True)
+        results = bs.multiCall()
+
+        self.assertEqual(results[0], {'faultCode': 1000,
+                                      'faultString': "Invalid tagInfo: 'epel7'"})
+        self.assertEqual(results[1][0]['name'], 'f17')
+
+
+class TestCachingSession(unittest.TestCase):
+    """Test the CachingSession class."""
+
+    def setUp(self):
+        buildsys.configure_cache(2, 30)
+        self.factory = mock.Mock(side_effect=buildsys.DevBuildsys)
+
+    def tearDown(self):
+        buildsys._caches.clear()
+        buildsys._tag_tasks.clear()
+        buildsys.DevBuildsys.clear()
+
+    def test_immutable(self):
+        """Completed builds should be fetched once, without logging in again."""
+        session = buildsys.CachingSession(self.factory)
+        build = session.getBuild('bodhi-2.0-1.fc17')
+        build['nvr'] = 'modified by the caller'
+
+        self.assertEqual(
+            buildsys.CachingSession(self.factory).getBuild('bodhi-2.0-1.fc17')['nvr'],
+            'bodhi-2.0-1.fc17')
+        self.assertEqual(self.factory.call_count, 1)
+        self.assertEqual(buildsys.cache_stats()['getBuild'], {'hits': 1, 'misses': 1, 'size': 1})
+
+    @mock.patch('bodhi.server.buildsys.DevBuildsys.getBuild', return_value={'state': 0})
+    def test_incomplete_build(self, getBuild):
+        """Builds that aren't complete should not be cached."""
+        session = buildsys.CachingSession(self.factory)
+        session.getBuild('bodhi-2.0-1.fc17')
+        session.getBuild('bodhi-2.0-1.fc17')
+
+        self.assertEqual(getBuild.call_count, 2)
+
+    def test_lru(self):
+        """The least recently used responses should be evicted."""
+        session = buildsys.CachingSession(self.factory)
+        for nvr in ('bodhi-2.0-1.fc17', 'bodhi-2.0-2.fc17', 'bodhi-2.0-1.fc17', 'bodhi-2.0-3.fc17'):
+            session.getBuild(nvr)
+
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.getBuild') as getBuild:
+            session.getBuild('bodhi-2.0-1.fc17')
+            session.getBuild('bodhi-2.0-2.fc17')
+
+        getBuild.assert_called_once_with('bodhi-2.0-2.fc17')
+
+    @mock.patch('bodhi.server.buildsys.time.time')
+    def test_tags_ttl(self, time):
+        """The tags of builds should only be cached for koji_cache.tags_ttl seconds."""
+        session = buildsys.CachingSession(self.factory)
+        time.return_value = 1000
+        session.listTags('bodhi-2.0-1.fc17')
+
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.listTags') as listTags:
+            time.return_value = 1029
+            session.listTags('bodhi-2.0-1.fc17')
+            self.assertEqual(listTags.call_count, 0)
+            time.return_value = 1030
+            session.listTags('bodhi-2.0-1.fc17')
+            self.assertEqual(listTags.call_count, 1)
+
+    def test_tagging_invalidates(self):
+        """Tagging a build should invalidate its tags and the builds of the tag."""
+        session = buildsys.CachingSession(self.factory)
+        session.listTags('bodhi-2.0-1.fc17')
+        session.listTags('bodhi-2.0-2.fc17')
+        session.listTagged('f17-updates-testing')
+
+        session.tagBuild('f17-updates-testing', 'bodhi-2.0-1.fc17')
+
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.listTags') as listTags:
+            session.listTags('bodhi-2.0-1.fc17')
+            session.listTags('bodhi-2.0-2.fc17')
+        listTags.assert_called_once_with('bodhi-2.0-1.fc17')
+        self.assertEqual(buildsys.cache_stats()['listTagged']['size'], 0)
+
+    def test_tagging_keyword_arguments(self):
+        """Tagging calls should be understood when their arguments are given by keyword."""
+        koji = mock.Mock(multicall=False)
+        koji.listTags.return_value = koji.listTagged.return_value = []
+        session = buildsys.CachingSession(mock.Mock(return_value=koji))
+        session.listTags('bodhi-2.0-1.fc17')
+        session.listTagged('f17-updates-testing')
+        session.listTagged('f17-updates-candidate')
+
+        session.moveBuild(tag1='f17-updates-candidate', tag2='f17-updates-testing',
+                          build='bodhi-2.0-1.fc17')
+
+        self.assertEqual(buildsys.cache_stats()['listTags']['size'], 0)
+        self.assertEqual(buildsys.cache_stats()['listTagged']['size'], 0)
+        koji.moveBuild.assert_called_once_with(
+            tag1='f17-updates-candidate', tag2='f17-updates-testing', build='bodhi-2.0-1.fc17')
+
+    def test_tagging_fromtag(self):
+        """tagBuild() should invalidate the builds of the tag it moves the build from."""
+        session = buildsys.CachingSession(self.factory)
+        session.listTagged('f17-updates-candidate')
+
+        session.tagBuild('f17-updates-testing', build='bodhi-2.0-1.fc17',
+                         fromtag='f17-updates-candidate')
+
+        self.assertEqual(buildsys.cache_stats()['listTagged']['size'], 0)
+
+    def test_tagging_unknown_arguments(self):
+        """All the tags should be forgotten if the tagged build can't be told."""
+        session = buildsys.CachingSession(self.factory)
+        session.listTags('bodhi-2.0-2.fc17')
+        session.listTagged('f17-updates-candidate')
+
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.untagBuild'):
+            session.untagBuild('f17-updates-testing')
+
+        self.assertEqual(buildsys.cache_stats()['listTags']['size'], 0)
+        self.assertEqual(buildsys.cache_stats()['listTagged']['size'], 0)
+
+    def test_tagging_task(self):
+        """The tags changed by a task should not be cached until the task is seen completing."""
+        koji = mock.Mock(multicall=False)
+        koji.tagBuild.return_value = 42
+        koji.listTags.return_value = [{'name': 'f17-updates-candidate'}]
+        session = buildsys.CachingSession(mock.Mock(return_value=koji))
+
+        session.tagBuild('f17-updates-testing', 'bodhi-2.0-1.fc17')
+        session.listTags('bodhi-2.0-1.fc17')
+        session.listTags('bodhi-2.0-1.fc17')
+        session.listTags('bodhi-2.0-2.fc17')
+
+        self.assertEqual(koji.listTags.call_count, 3)
+        self.assertEqual(buildsys.cache_stats()['listTags']['size'], 1)
+
+        session.taskFinished(42)
+        session.listTags('bodhi-2.0-1.fc17')
+        session.listTags('bodhi-2.0-1.fc17')
+
+        self.assertEqual(koji.listTags.call_count, 4)
+        self.assertEqual(buildsys._tag_tasks, {})
+
+    def test_tagging_task_multicall(self):
+        """Tasks started in multicalls should be tracked until getTaskInfo() says they are done."""
+        koji = mock.Mock(multicall=False)
+        koji.multiCall.return_value = [[42]]
+        koji.listTagged.return_value = []
+        session = buildsys.CachingSession(mock.Mock(return_value=koji))
+        session.multicall = True
+        session.moveBuild('f17-updates-candidate', 'f17-updates-testing', 'bodhi-2.0-1.fc17')
+        session.multiCall()
+
+        session.listTagged('f17-updates-testing')
+        self.assertEqual(buildsys.cache_stats()['listTagged']['size'], 0)
+
+        koji.getTaskInfo.return_value = {'state': buildsys.koji.TASK_STATES['CLOSED']}
+        session.getTaskInfo(42)
+        session.listTagged('f17-updates-testing')
+
+        self.assertEqual(buildsys.cache_stats()['listTagged']['size'], 1)
+
+    @mock.patch('bodhi.server.buildsys.time.time')
+    def test_tagging_task_timeout(self, time):
+        """Tasks that nobody sees completing should be forgotten eventually."""
+        time.return_value = 1000
+        buildsys._tag_task_started(42, ('bodhi-2.0-1.fc17', ['f17-updates-testing']))
+        session = buildsys.CachingSession(self.factory)
+
+        time.return_value = 1000 + buildsys._TAG_TASK_TIMEOUT + 1
+        session.listTags('bodhi-2.0-1.fc17')
+
+        self.assertEqual(buildsys.cache_stats()['listTags']['size'], 1)
+        self.assertEqual(buildsys._tag_tasks, {})
+
+    def test_invalidate_tags(self):
+        """invalidate_tags() without arguments should forget all the tags."""
+        session = buildsys.CachingSession(self.factory)
+        session.listTags('bodhi-2.0-1.fc17')
+        session.listTagged('f17-updates-testing')
+
+        buildsys.invalidate_tags()
+
+        self.assertEqual(buildsys.cache_stats()['listTags']['size'], 0)
+        self.assertEqual(buildsys.cache_stats()['listTagged']['size'], 0)
+
+    def test_multicall(self):
+        """Only the calls that aren't cached should be sent to koji in a multicall."""
+        buildsys.CachingSession(self.factory).getBuild('bodhi-2.0-1.fc17')
+        session = buildsys.CachingSession(self.factory)
+        session.multicall = True
+
+        session.getBuild('bodhi-2.0-1.fc17')
+        session.getTag('epel7', strict=True)
+        session.getBuild('bodhi-2.0-2.fc17')
+        results = session.multiCall()
+
+        self.assertEqual([r[0]['nvr'] for r in (results[0], results[2])],
+                         ['bodhi-2.0-1.fc17', 'bodhi-2.0-2.fc17'])
+        self.assertEqual(results[1]['faultString'], "Invalid tagInfo: 'epel7'")
+        self.assertFalse(session.multicall)
+        self.assertEqual(buildsys.cache_stats()['getBuild']['size'], 2)
+
+    def test_multicall_cached(self):
+        """A multicall that is entirely cached should not need a session."""
+        buildsys.CachingSession(self.factory).getBuild('bodhi-2.0-1.fc17')
+        session = buildsys.CachingSession(self.factory)
+        session.multicall = True
+
+        session.getBuild('bodhi-2.0-1.fc17')
+
+        self.assertEqual(session.multiCall()[0][0]['nvr'], 'bodhi-2.0-1.fc17')
+        self.assertEqual(self.factory.call_count, 1)
+
+    def test_attributes(self):
+        """Other attributes should be read from the wrapped session."""
+        session = buildsys.CachingSession(self.factory)
+
+        self.assertEqual(session.multicall_result, [])
+        self.assertTrue(session.taskFinished(42))
+
+
+class TestSessionPool(unittest.TestCase):
+    """Test the SessionPool class."""
+
+    def setUp(self):
+        self.factory = mock.Mock(side_effect=lambda: mock.Mock(multicall=False))
+        self.pool = buildsys.SessionPool(self.factory, True, check_interval=60, max_age=3600)
+
+    def test_reused(self):
+        """A thread should keep using the same session."""
+        session = self.pool.checkout()
+
+        self.assertTrue(self.pool.checkout() is session)
+        self.assertEqual(self.factory.call_count, 1)
+        self.assertEqual(self.pool.get_stats(), {'created': 1, 'reused': 1, 'checked': 0,
+                                                 'failed': 0, 'expired': 0, 'sessions': 1})
+
+    def test_per_thread(self):
+        """Each thread should get its own session."""
+        session = self.pool.checkout()
+        sessions = []
+
+        thread = threading.Thread(target=lambda: sessions.append(self.pool.checkout()))
+        thread.start()
+        thread.join()
+
+        self.assertFalse(sessions[0] is session)
+        self.assertEqual(self.factory.call_count, 2)
+
+    def test_multicall(self):
+        """Sessions in the middle of a multicall should not be handed out."""
+        session = self.pool.checkout()
+        session.multicall = True
+
+        self.assertFalse(self.pool.checkout() is session)
+        session.multicall = False
+        self.assertTrue(self.pool.checkout() is session)
+
+    @mock.patch('bodhi.server.buildsys.time.time')
+    def test_health_check(self, time):
+        """Sessions that weren't used for a while should be checked, and replaced if expired."""
+        time.return_value = 1000
+        session = self.pool.checkout()
+        session.getLoggedInUser.return_value = {'name': 'bodhi'}
+
+        time.return_value = 1060
+        self.assertTrue(self.pool.checkout() is session)
+        time.return_value = 1100
+        self.assertTrue(self.pool.checkout() is session)
+        session.getLoggedInUser.return_value = None
+        time.return_value = 1120
+        self.assertFalse(self.pool.checkout() is session)
+
+        self.assertEqual(session.getLoggedInUser.call_count, 2)
+        stats = self.pool.get_stats()
+        self.assertEqual((stats['checked'], stats['failed'], stats['created']), (2, 1, 2))
+
+    @mock.patch('bodhi.server.buildsys.time.time')
+    def test_health_check_error(self, time):
+        """Sessions whose check fails should be replaced."""
+        self.pool.authenticate = False
+        time.return_value = 1000
+        session = self.pool.checkout()
+        session.getAPIVersion.side_effect = IOError('Connection reset')
+
+        time.return_value = 1060
+        self.assertFalse(self.pool.checkout() is session)
+        self.assertEqual(self.pool.get_stats()['failed'], 1)
+
+    @mock.patch('bodhi.server.buildsys.time.time')
+    def test_max_age(self, time):
+        """Sessions older than max_age should be replaced."""
+        time.return_value = 1000
+        session = self.pool.checkout()
+
+        time.return_value = 4600
+        self.assertFalse(self.pool.checkout() is session)
+        self.assertEqual(self.pool.get_stats()['expired'], 1)
+
+
+class TestMulticallMap(unittest.TestCase):
+    """Test the multicall_map() function."""
+
+    def test_results_and_faults(self):
+        """The responses should be mapped to the keys of the calls, in order."""
+        results = buildsys.multicall_map(
+            [('f17', 'getTag', ('f17',), {}), ('epel7', 'getTag', ('epel7',), {'strict': True}),
+             ('f18', 'getTag', ('f18',), {})],
+            session=buildsys.DevBuildsys())
+
+        self.assertEqual(list(results.keys()), ['f17', 'epel7', 'f18'])
+        self.assertEqual(results['f17'][0]['name'], 'f17')
+        self.assertEqual(results['epel7']['faultString'], "Invalid tagInfo: 'epel7'")
+
+    @mock.patch('bodhi.server.buildsys.DevBuildsys.multiCall', autospec=True,
+                side_effect=buildsys.DevBuildsys.multiCall)
+    def test_chunked(self, multiCall):
+        """The calls should be split into multicalls of chunk_size calls."""
+        session = buildsys.DevBuildsys()
+
+        results = buildsys.multicall_map(
+            [(i, 'getTag', (i,), {}) for i in range(5)], session=session, chunk_size=2)
+
+        self.assertEqual([r[0]['name'] for r in results.values()],
+                         ['f0', 'f1', 'f2', 'f3', 'f4'])
+        self.assertEqual(multiCall.call_count, 3)
+
+    @mock.patch.dict('bodhi.server.buildsys._multicall_settings', {'chunk_size': 2, 'workers': 3})
+    @mock.patch('bodhi.server.buildsys.get_session', side_effect=buildsys.DevBuildsys)
+    def test_concurrent(self, get_session):
+        """Without a session, each multicall should get its own session."""
+        results = buildsys.multicall_map([(i, 'getTag', (i,), {}) for i in range(5)])
+
+        self.assertEqual([r[0]['name'] for r in results.values()],
+                         ['f0', 'f1', 'f2', 'f3', 'f4'])
+        self.assertEqual(get_session.call_count, 3)
+
+    def test_retried(self):
+        """Multicalls that raise should be retried."""
+        session = mock.Mock()
+        session.multiCall.side_effect = [IOError('Connection reset'), [[{'name': 'f17'}]]]
+
+        results = buildsys.multicall_map([('f17', 'getTag', ('f17',), {})], session=session,
+                                         retries=1)
+
+        self.assertEqual(results, {'f17': [{'name': 'f17'}]})
+        self.assertEqual(session.getTag.mock_calls, [mock.call('f17')] * 2)
+
+    def test_not_retried(self):
+        """The exception should be raised once the retries are exhausted."""
+        session = mock.Mock()
+        session.multiCall.side_effect = IOError('Connection reset')
+
+        with self.assertRaises(IOError):
+            buildsys.multicall_map([('f17', 'getTag', ('f17',), {})], session=session, retries=0)
+
+        session.getTag.assert_called_once_with('f17')
+
+
 class TestGetKrbConf(unittest.TestCase):
     """This class contains tests for the get_krb_conf() function."""
     def test_all_config_items_missing(self):
@@ -247,6 +633,26 @@ class TestSetupBuildsystem(unittest.TestCase):
         buildsys._buildsystem()
         mock_koji_login.assert_called_once_with(authenticate=True, config=config)
 
+    @mock.patch('bodhi.server.buildsys._buildsystem', None)
+    @mock.patch('bodhi.server.buildsys._pool', None)
+    @mock.patch('bodhi.server.buildsys.koji_login')
+    def test_koji_buildsystem_cached(self, mock_koji_login):
+        """The pooled koji sessions should be wrapped in CachingSessions."""
+        buildsys.setup_buildsystem({'buildsystem': 'koji', 'koji_cache.size': 5})
+
+        session = buildsys.get_session()
+
+        self.assertTrue(isinstance(session, buildsys.CachingSession))
+        self.assertEqual(mock_koji_login.call_count, 0)
+        self.assertEqual(buildsys._caches['getBuild'].size, 5)
+        self.assertEqual(buildsys._caches['listTags'].ttl, 30)
+        mock_koji_login.return_value.multicall = False
+        self.assertTrue(session.session is buildsys.get_session().session)
+        mock_koji_login.assert_called_once_with(
+            authenticate=True, config={'buildsystem': 'koji', 'koji_cache.size': 5})
+        self.assertEqual(buildsys.pool_stats()['reused'], 1)
+        buildsys._caches.clear()
+
     @mock.patch('bodhi.server.buildsys._buildsystem', None)
     def test_dev_buildsystem(self):
         """Assert the buildsystem initializes correctly for dev"""
@@ -254,6 +660,22 @@ class TestSetupBuildsystem(unittest.TestCase):
         buildsys.setup_buildsystem({'buildsystem': 'dev'})
         self.assertTrue(buildsys._buildsystem is buildsys.DevBuildsys)
 
+    @mock.patch('bodhi.server.buildsys._buildsystem', None)
+    @mock.patch('bodhi.server.buildsys._pool', None)
+    def test_synthetic_buildsystem(self):
+        """The synthetic buildsystem should be configured, pooled and cached."""
+        buildsys.setup_buildsystem({'buildsystem': 'synthetic', 'synthetic_buildsys.builds': 10,
+                                    'synthetic_buildsys.latency': 0.5})
+
+        session = buildsys.get_session()
+
+        self.assertTrue(isinstance(session, buildsys.CachingSession))
+        self.assertTrue(isinstance(session.session, synthetic_buildsys.SyntheticBuildsys))
+        self.assertEqual(buildsys._synthetic.latency, 0.5)
+        self.assertEqual(len(buildsys._synthetic._builds), 10)
+        buildsys.teardown_buildsystem()
+        self.assertIsNone(buildsys._synthetic)
+
     @mock.patch('bodhi.server.buildsys._buildsystem', None)
     def test_nonsense_buildsystem(self):
         """Assert the buildsystem setup crashes with nonsense values"""
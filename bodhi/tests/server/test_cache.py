@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.cache."""
+
+from dogpile.cache import make_region
+import mock
+
+from bodhi.server import cache, models
+from bodhi.tests.server import base
+
+
+class CacheTestCase(base.BaseTestCase):
+    """Use a memory region that doesn't expire."""
+
+    def setUp(self):
+        super(CacheTestCase, self).setUp()
+        self.region = make_region().configure('dogpile.cache.memory')
+        patcher = mock.patch('bodhi.server._cache_region', self.region)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestCacheOnTags(CacheTestCase):
+    """Test the cache_on_tags() decorator."""
+
+    def setUp(self):
+        super(TestCacheOnTags, self).setUp()
+        self.calls = []
+
+        @cache.cache_on_tags(('updates', 'comments'), namespace='test')
+        def work(arg):
+            self.calls.append(arg)
+            return len(self.calls)
+
+        self.work = work
+
+    def test_cached(self):
+        """Results should be cached per argument."""
+        self.assertEqual(self.work('a'), 1)
+        self.assertEqual(self.work('a'), 1)
+        self.assertEqual(self.work('b'), 2)
+
+        self.assertEqual(self.calls, ['a', 'b'])
+
+    def test_invalidated_by_tag(self):
+        """Invalidating one of the tags should discard the cached results."""
+        self.work('a')
+
+        cache.invalidate_tags('comments')
+
+        self.assertEqual(self.work('a'), 2)
+
+    def test_other_tag(self):
+        """Invalidating an unrelated tag should keep the cached results."""
+        self.work('a')
+
+        cache.invalidate_tags('overrides')
+
+        self.assertEqual(self.work('a'), 1)
+
+
+class TestInvalidationListeners(CacheTestCase):
+    """Test that commits invalidate the tags of what they wrote."""
+
+    def _tokens(self):
+        return cache.get_tokens(self.region, ['updates', 'comments', 'overrides'])
+
+    def test_commit(self):
+        """Committing a comment should only invalidate the comments tag."""
+        before = self._tokens()
+        update = self.db.query(models.Update).one()
+        self.db.add(models.Comment(text=u'Nice', karma=0, update=update,
+                                   user=self.db.query(models.User).one()))
+        self.db.commit()
+
+        after = self._tokens()
+
+        self.assertEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+        self.assertEqual(after[2], before[2])
+
+    def test_rollback(self):
+        """Rolled back writes should not invalidate anything."""
+        before = self._tokens()
+        self.db.query(models.Update).one().notes = u'Other notes'
+        self.db.flush()
+        self.db.rollback()
+
+        self.assertEqual(self._tokens(), before)
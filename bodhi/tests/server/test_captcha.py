@@ -58,8 +58,8 @@ class TestDecrypt(unittest.TestCase):
 
 class TestJPEGGenerator(unittest.TestCase):
     """This test class contains tests for the jpeg_generator() function."""
-    @mock.patch('bodhi.server.captcha.ImageDraw.Draw')
-    @mock.patch('bodhi.server.captcha.ImageFont.truetype')
+    @mock.patch('PIL.ImageDraw.Draw')
+    @mock.patch('PIL.ImageFont.truetype')
     @mock.patch('bodhi.server.captcha.random.randint')
     def test_with_heavy_mocking(self, randint, truetype, Draw):
         """
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.counts."""
+from datetime import datetime
+
+import mock
+
+from bodhi.server import counts, models
+from bodhi.tests.server import base
+
+
+class TestNormalizeFilters(base.BaseTestCase):
+    """Test the normalize_filters() function."""
+
+    def test_ignores_presentation_keys(self):
+        """Pagination, presentation and None values should not be part of the key."""
+        data = {'page': 2, 'rows_per_page': 5, 'chrome': True, 'display_user': True,
+                'user': None, 'status': models.UpdateStatus.testing}
+
+        self.assertEqual(counts.normalize_filters(data), (('status', 'testing'),))
+
+    def test_order_independent(self):
+        """Lists with the same elements should normalize identically."""
+        release = self.db.query(models.Release).one()
+        since = datetime(2018, 1, 2)
+
+        a = counts.normalize_filters({'packages': ['b', 'a'], 'releases': [release],
+                                      'pushed_since': since})
+        b = counts.normalize_filters({'releases': [release], 'packages': ['a', 'b'],
+                                      'pushed_since': since})
+
+        self.assertEqual(a, b)
+        self.assertEqual(
+            a, (('packages', ('a', 'b')), ('pushed_since', '2018-01-02T00:00:00'),
+                ('releases', (('releases', release.id),))))
+
+
+class TestGetTotal(base.BaseTestCase):
+    """Test the get_total() function."""
+
+    def _total(self, filters=None):
+        query = self.db.query(models.Update)
+        return counts.get_total(self.db, query, models.Update.id, 'updates', ('updates',),
+                                filters or {})
+
+    def test_cached(self):
+        """A second call with the same filters should not hit the database."""
+        self.assertEqual(self._total(), (1, True))
+
+        with mock.patch.object(self.db, 'execute') as execute:
+            self.assertEqual(self._total(), (1, True))
+
+        self.assertEqual(execute.call_count, 0)
+
+    @mock.patch.dict('bodhi.server.config.config', {'count_cache.ttl': 0})
+    def test_disabled(self):
+        """A ttl of 0 should disable the cache."""
+        self._total()
+
+        self.assertEqual(len(counts._cache), 0)
+
+    def test_invalidated_by_flush(self):
+        """Writing to the table should invalidate the cached total."""
+        self.assertEqual(self._total(), (1, True))
+        update = self.db.query(models.Update).one()
+        self.db.delete(update)
+        self.db.flush()
+
+        self.assertEqual(self._total(), (0, True))
+
+    def test_invalidated_by_bulk_delete(self):
+        """Bulk deletes should invalidate the cached total."""
+        self.assertEqual(
+            counts.get_total(self.db, self.db.query(models.BuildrootOverride),
+                             models.BuildrootOverride.id, 'overrides', ('buildroot_overrides',),
+                             {}),
+            (1, True))
+        self.db.query(models.BuildrootOverride).delete()
+
+        self.assertEqual(
+            counts.get_total(self.db, self.db.query(models.BuildrootOverride),
+                             models.BuildrootOverride.id, 'overrides', ('buildroot_overrides',),
+                             {}),
+            (0, True))
+
+    def test_other_table_keeps_cache(self):
+        """Writes to unrelated tables should leave the cached total alone."""
+        self._total()
+        counts.invalidate('stacks')
+
+        with mock.patch.object(self.db, 'execute') as execute:
+            self._total()
+
+        self.assertEqual(execute.call_count, 0)
+
+    @mock.patch.dict('bodhi.server.config.config', {'count_cache.estimate': True})
+    @mock.patch('bodhi.server.counts.estimate_rows', return_value=4242)
+    def test_estimate_unfiltered(self, estimate_rows):
+        """Unfiltered listings should use the planner estimate when configured to."""
+        self.assertEqual(self._total(), (4242, False))
+        estimate_rows.assert_called_once_with(self.db, 'updates')
+
+    @mock.patch.dict('bodhi.server.config.config', {'count_cache.estimate': True})
+    @mock.patch('bodhi.server.counts.estimate_rows', return_value=4242)
+    def test_estimate_not_used_with_filters(self, estimate_rows):
+        """Filtered listings should always be counted exactly."""
+        self.assertEqual(self._total({'locked': False}), (1, True))
+        self.assertEqual(estimate_rows.call_count, 0)
+
+    def test_estimate_rows_sqlite(self):
+        """SQLite has no planner statistics, so there is no estimate."""
+        self.assertIsNone(counts.estimate_rows(self.db, 'updates'))
+
+
+class TestListServices(base.BaseTestCase):
+    """Test that the list services report whether their totals are exact."""
+
+    def test_updates(self):
+        """The updates service should report an exact total."""
+        body = self.app.get('/updates/', headers={'Accept': 'application/json'}).json_body
+
+        self.assertEqual(body['total'], 1)
+        self.assertTrue(body['total_exact'])
+
+    @mock.patch.dict('bodhi.server.config.config', {'count_cache.estimate': True})
+    @mock.patch('bodhi.server.counts.estimate_rows', return_value=100)
+    def test_overrides_estimated(self, estimate_rows):
+        """An unfiltered override listing may report an estimate."""
+        body = self.app.get('/overrides/', headers={'Accept': 'application/json'}).json_body
+
+        self.assertEqual(body['total'], 100)
+        self.assertEqual(body['pages'], 5)
+        self.assertFalse(body['total_exact'])
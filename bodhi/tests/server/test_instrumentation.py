@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.instrumentation."""
+import copy
+import json
+import unittest
+
+from webtest import TestApp
+import mock
+
+from bodhi.server import buildsys, instrumentation, main
+from bodhi.tests.server import base
+
+
+class TestTimed(unittest.TestCase):
+    """Test the timed class."""
+
+    def setUp(self):
+        self.timings = instrumentation._local.timings = instrumentation.RequestTimings()
+        self.addCleanup(setattr, instrumentation._local, 'timings', None)
+
+    def test_context_manager(self):
+        """Operations should be counted per category."""
+        with instrumentation.timed('http'):
+            pass
+        with instrumentation.timed('http'):
+            pass
+
+        self.assertEqual(self.timings.counts['http'], 2)
+        self.assertTrue(self.timings.durations['http'] >= 0)
+
+    def test_nested(self):
+        """Nested operations of the same category should only be counted once."""
+        @instrumentation.timed('bugzilla')
+        def outer():
+            inner()
+
+        @instrumentation.timed('bugzilla')
+        def inner():
+            with instrumentation.timed('http'):
+                pass
+
+        outer()
+
+        self.assertEqual(self.timings.counts['bugzilla'], 1)
+        self.assertEqual(self.timings.counts['http'], 1)
+
+    def test_outside_request(self):
+        """Nothing should be recorded outside of requests."""
+        instrumentation._local.timings = None
+
+        with instrumentation.timed('smtp'):
+            pass
+
+        self.assertEqual(self.timings.counts['smtp'], 0)
+
+    def test_koji(self):
+        """Koji calls and multicalls made through the CachingSession should be timed."""
+        koji = mock.MagicMock()
+        koji.multiCall.return_value = [[{}], [{}]]
+        session = buildsys.CachingSession(lambda: koji)
+
+        session.getBuild('bodhi-2.0-1.fc17')
+        session.multicall = True
+        session.getBuild('bodhi-2.0-2.fc17')
+        session.getBuild('bodhi-2.0-3.fc17')
+        session.multiCall()
+
+        self.assertEqual(self.timings.counts['koji'], 1)
+        self.assertEqual(self.timings.counts['koji_multicall'], 1)
+
+    def test_server_timing(self):
+        """The header should list the categories that had operations, and the total."""
+        self.timings.add('sql', 0.0125)
+        self.timings.add('sql', 0.0025)
+
+        self.assertEqual(self.timings.server_timing(0.1),
+                         'sql;dur=15.0;desc="2 calls", total;dur=100.0')
+
+
+class TestTween(base.BaseTestCase):
+    """Test the tween_factory() function."""
+
+    def setUp(self):
+        super(TestTween, self).setUp()
+        instrumentation.reset()
+
+    def _app(self, **settings):
+        """
+        Return an app with the given instrumentation settings.
+
+        Args:
+            settings (dict): The settings to add to the test settings.
+        Returns:
+            webtest.TestApp: The app.
+        """
+        app_settings = copy.copy(self.app_settings)
+        app_settings.update(settings)
+        # main() loads the settings into the global config, which must not leak into other tests.
+        with mock.patch.dict('bodhi.server.config.config'):
+            return TestApp(main({}, testing=u'guest', session=self.db, **app_settings))
+
+    @mock.patch('bodhi.server.instrumentation.log.info')
+    def test_disabled(self, info):
+        """Requests should not be instrumented by default."""
+        res = self.app.get('/updates/bodhi-2.0-1.fc17', headers={'Accept': 'application/json'})
+
+        self.assertNotIn('Server-Timing', res.headers)
+        self.assertEqual(instrumentation.route_stats(), {})
+
+    @mock.patch('bodhi.server.instrumentation.log.info')
+    def test_no_server_timing(self, info):
+        """The timings should only be sent to the clients if server_timing is set."""
+        app = self._app(**{'instrumentation.enabled': True})
+
+        res = app.get('/updates/bodhi-2.0-1.fc17', headers={'Accept': 'application/json'})
+
+        self.assertNotIn('Server-Timing', res.headers)
+        self.assertEqual(instrumentation.route_stats()['update']['requests'], 1)
+
+    @mock.patch('bodhi.server.instrumentation.log.info')
+    def test_request(self, info):
+        """The timings should be sent, logged and aggregated."""
+        app = self._app(**{'instrumentation.enabled': True, 'instrumentation.server_timing': True})
+
+        res = app.get('/updates/bodhi-2.0-1.fc17', headers={'Accept': 'application/json'})
+
+        self.assertIn('sql;dur=', res.headers['Server-Timing'])
+        self.assertIn('total;dur=', res.headers['Server-Timing'])
+        summary = json.loads(info.mock_calls[-1][1][1])
+        self.assertEqual(summary['route'], 'update')
+        self.assertEqual(summary['status'], 200)
+        self.assertTrue(summary['sql_count'] > 0)
+        stats = instrumentation.route_stats()['update']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['sql_count'], summary['sql_count'])
+        self.assertIsNone(instrumentation.current())
@@ -17,6 +17,12 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """Tests for bodhi.server.mail."""
+import os
+import shutil
+import smtplib
+import tempfile
+import unittest
+
 import mock
 
 from bodhi.server import mail, models
@@ -54,3 +60,165 @@ class TestSend(base.BaseTestCase):
         exception_log.assert_called_once_with('Unable to send mail')
         sendmail = SMTP.return_value.sendmail
         self.assertEqual(sendmail.call_count, 0)
+
+    @mock.patch.dict('bodhi.server.mail.config', {'smtp_server': 'smtp.example.com'})
+    @mock.patch('bodhi.server.mail.smtplib.SMTP')
+    def test_spool(self, SMTP):
+        """With a spool, e-mails should be queued rather than sent."""
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir)
+        update = models.Update.query.all()[0]
+
+        with mock.patch.dict('bodhi.server.mail.config', {'mail.spool_dir': spool_dir}):
+            mail.send(['fake@news.com', 'other@news.com'], 'comment', update, agent='bowlofeggs')
+
+        self.assertEqual(SMTP.call_count, 0)
+        messages = [m for n, m in mail.get_spool(spool_dir).claim()]
+        self.assertEqual(sorted(m['to'] for m in messages),
+                         [[u'fake@news.com'], [u'other@news.com']])
+        self.assertIn(u'To: other@news.com', [m for m in messages
+                                              if m['to'] == [u'other@news.com']][0]['body'])
+
+
+class TestMailSpool(unittest.TestCase):
+    """Test the MailSpool class."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.spool = mail.MailSpool(self.path)
+
+    def test_put_and_claim(self):
+        """Messages should be claimed in the order they were queued, and only once."""
+        first = self.spool.put('bodhi@example.com', ['a@example.com'], 'first')
+        self.spool.put('bodhi@example.com', ['b@example.com'], 'second')
+
+        self.assertEqual(len(self.spool), 2)
+        claimed = list(self.spool.claim())
+
+        self.assertEqual([m['body'] for n, m in claimed], [u'first', u'second'])
+        self.assertEqual(claimed[0][0], first)
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(list(self.spool.claim()), [])
+
+    def test_claim_limit(self):
+        """No more than limit messages should be claimed."""
+        for i in range(3):
+            self.spool.put('bodhi@example.com', ['a@example.com'], str(i))
+
+        self.assertEqual(len(list(self.spool.claim(2))), 2)
+        self.assertEqual(len(self.spool), 1)
+
+    def test_done(self):
+        """Sent messages should be removed from the spool."""
+        self.spool.put('bodhi@example.com', ['a@example.com'], 'body')
+        name, message = next(self.spool.claim())
+
+        self.spool.done(name)
+
+        self.assertEqual(os.listdir(os.path.join(self.path, 'cur')), [])
+
+    @mock.patch.dict('bodhi.server.mail.config', {'mail.retry_delay': 60, 'mail.max_attempts': 2})
+    def test_retry(self):
+        """Messages should be delayed before being retried, then given up on."""
+        self.spool.put('bodhi@example.com', ['a@example.com', 'b@example.com'], 'body')
+        name, message = next(self.spool.claim())
+
+        self.spool.retry(name, message, [u'b@example.com'])
+
+        self.assertEqual(len(self.spool), 1)
+        self.assertEqual(list(self.spool.claim()), [])
+        with mock.patch('bodhi.server.mail.time.time', return_value=mail.time.time() + 61):
+            name, message = next(self.spool.claim())
+        self.assertEqual(message['to'], [u'b@example.com'])
+        self.assertEqual(message['attempts'], 1)
+
+        self.spool.retry(name, message, message['to'])
+
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(len(os.listdir(os.path.join(self.path, 'failed'))), 1)
+
+    def test_recover(self):
+        """Messages claimed long ago should be queued again."""
+        self.spool.put('bodhi@example.com', ['a@example.com'], 'body')
+        list(self.spool.claim())
+
+        self.assertEqual(self.spool.recover(), 0)
+        self.assertEqual(self.spool.recover(age=-1), 1)
+        self.assertEqual(len(self.spool), 1)
+
+
+class TestSMTPPool(unittest.TestCase):
+    """Test the SMTPPool class."""
+
+    @mock.patch('bodhi.server.mail.smtplib.SMTP')
+    def test_reuse(self, SMTP):
+        """The connection should be reused until max_messages were sent."""
+        pool = mail.SMTPPool('smtp.example.com', max_messages=2)
+
+        for i in range(3):
+            pool.sendmail('bodhi@example.com', ['a@example.com'], 'body')
+
+        self.assertEqual(SMTP.call_count, 2)
+        self.assertEqual(SMTP.return_value.sendmail.call_count, 3)
+        self.assertEqual(SMTP.return_value.quit.call_count, 1)
+
+    @mock.patch('bodhi.server.mail.smtplib.SMTP')
+    def test_error(self, SMTP):
+        """The connection should be closed after an error."""
+        SMTP.return_value.sendmail.side_effect = [smtplib.SMTPServerDisconnected(), {}]
+        pool = mail.SMTPPool('smtp.example.com')
+
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            pool.sendmail('bodhi@example.com', ['a@example.com'], 'body')
+        pool.sendmail('bodhi@example.com', ['a@example.com'], 'body')
+
+        self.assertEqual(SMTP.call_count, 2)
+
+
+class TestDeliver(unittest.TestCase):
+    """Test the deliver() function."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.spool = mail.MailSpool(self.path)
+        self.pool = mock.MagicMock()
+
+    def test_deliver(self):
+        """The messages should be sent and removed from the spool."""
+        self.spool.put('bodhi@example.com', ['a@example.com'], 'first')
+        self.spool.put('bodhi@example.com', ['b@example.com'], 'second')
+
+        self.assertEqual(mail.deliver(self.spool, self.pool), (2, 0))
+
+        self.assertEqual(
+            self.pool.sendmail.mock_calls,
+            [mock.call('bodhi@example.com', ['a@example.com'], 'first'),
+             mock.call('bodhi@example.com', ['b@example.com'], 'second')])
+        self.assertEqual(os.listdir(os.path.join(self.path, 'cur')), [])
+
+    @mock.patch('bodhi.server.mail.log.warn')
+    def test_refused(self, warn):
+        """Messages whose recipients are refused should not be retried."""
+        self.pool.sendmail.side_effect = smtplib.SMTPRecipientsRefused({})
+        self.spool.put('bodhi@example.com', ['a@example.com'], 'body')
+
+        self.assertEqual(mail.deliver(self.spool, self.pool), (0, 0))
+
+        self.assertEqual(warn.call_count, 1)
+        self.assertEqual(len(self.spool), 0)
+
+    @mock.patch.dict('bodhi.server.mail.config', {'mail.retry_delay': 60, 'mail.max_attempts': 5})
+    @mock.patch('bodhi.server.mail.log.exception')
+    def test_server_down(self, exception):
+        """The remaining messages should be retried without trying to send them."""
+        self.pool.sendmail.side_effect = smtplib.SMTPConnectError(421, 'go away')
+        for i in range(3):
+            self.spool.put('bodhi@example.com', ['a@example.com'], str(i))
+
+        self.assertEqual(mail.deliver(self.spool, self.pool), (0, 3))
+
+        self.assertEqual(self.pool.sendmail.call_count, 1)
+        exception.assert_called_once_with('Unable to send mail')
+        self.assertEqual(len(self.spool), 3)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.mmap_cache."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from dogpile.cache import make_region
+from dogpile.cache.api import CachedValue, NO_VALUE
+
+from bodhi.server import mmap_cache
+
+
+class MmapBackendTestCase(unittest.TestCase):
+    """Create backends in a temporary directory."""
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _backend(self, sets=1, slot_size=4096):
+        size = mmap_cache.mmap.PAGESIZE + sets * mmap_cache.WAYS * slot_size
+        return mmap_cache.MmapBackend(
+            {'filename': self.filename, 'size': str(size), 'slot_size': str(slot_size)})
+
+
+class TestMmapBackend(MmapBackendTestCase):
+    """Test the MmapBackend class."""
+
+    def test_set_get_delete(self):
+        """Values should be stored, shared with other instances, and deleted."""
+        backend = self._backend()
+        other = self._backend()
+        value = CachedValue(u'payload', {'ct': 1, 'v': 1})
+
+        backend.set('key', value)
+
+        self.assertEqual(other.get('key'), value)
+        other.delete('key')
+        self.assertIs(backend.get('key'), NO_VALUE)
+
+    def test_multi(self):
+        """The multi methods should handle each key."""
+        backend = self._backend()
+
+        backend.set_multi({'a': 1, 'b': 2})
+
+        self.assertEqual(backend.get_multi(['a', 'b', 'c']), [1, 2, NO_VALUE])
+        backend.delete_multi(['a', 'b'])
+        self.assertEqual(backend.get_multi(['a', 'b']), [NO_VALUE, NO_VALUE])
+
+    def test_lru_eviction(self):
+        """A full set should evict its least recently used value."""
+        backend = self._backend()
+        for i in range(mmap_cache.WAYS):
+            backend.set('key%d' % i, i)
+        # Reading key0 makes key1 the least recently used value.
+        backend.get('key0')
+
+        backend.set('new', 'value')
+
+        self.assertEqual(backend.get('key0'), 0)
+        self.assertIs(backend.get('key1'), NO_VALUE)
+        self.assertEqual(backend.get('new'), 'value')
+
+    def test_too_large(self):
+        """Values that don't fit in a slot should not be cached."""
+        backend = self._backend()
+
+        backend.set('key', 'x' * 5000)
+
+        self.assertIs(backend.get('key'), NO_VALUE)
+
+    def test_torn_read(self):
+        """A slot that is being written should read as a miss."""
+        backend = self._backend()
+        backend.set('key', 'value')
+        offset = [o for o in backend._offsets(0)
+                  if backend._read(o, b'key', mmap_cache._digest('key')[1]) is not None][0]
+        mmap_cache._SEQUENCE.pack_into(backend._map, offset, 1)
+
+        self.assertIs(backend.get('key'), NO_VALUE)
+
+    def test_other_sizes(self):
+        """A file made with other sizes should be replaced, without disturbing its users."""
+        backend = self._backend()
+        backend.set('key', 'value')
+
+        other = self._backend(sets=2)
+
+        self.assertIs(other.get('key'), NO_VALUE)
+        self.assertEqual(backend.get('key'), 'value')
+
+    def test_mutex(self):
+        """The creation mutex should be exclusive."""
+        backend = self._backend()
+        mutex = backend.get_mutex('key')
+
+        self.assertTrue(mutex.acquire(wait=False))
+        self.assertFalse(backend.get_mutex('key').acquire(wait=False))
+        mutex.release()
+        self.assertTrue(backend.get_mutex('key').acquire(wait=False))
+
+    def test_region(self):
+        """The backend should be usable through its registered name."""
+        region = make_region().configure('bodhi.server.mmap',
+                                         arguments={'filename': self.filename})
+
+        self.assertEqual(region.get_or_create('key', lambda: 42), 42)
+        self.assertEqual(region.get('key'), 42)
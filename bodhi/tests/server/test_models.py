@@ -546,6 +546,68 @@ class TestRelease(ModelTest):
         assert releases is model.Release.all_releases(self.db)
 
 
+class TestReleaseRegistry(BaseTestCase):
+    """Test the release registry behind Release.get_tags() and Release.from_tags()."""
+
+    def test_from_tags(self):
+        """from_tags() should return the session's instance of the release."""
+        release = self.db.query(model.Release).one()
+
+        self.assertIs(model.Release.from_tags([u'f17-updates-testing'], self.db), release)
+        self.assertIs(model.Release.from_name(u'F17', self.db), release)
+        self.assertIsNone(model.Release.from_name(u'F42', self.db))
+        with self.assertRaises(KeyError):
+            model.Release.from_tags([u'some-other-tag'], self.db)
+
+    def test_lookups(self):
+        """Releases should be found by name, upper-cased name, version and long name."""
+        release = self.db.query(model.Release).one()
+
+        self.assertIs(model.Release.from_name(u'f17', self.db), release)
+        self.assertIs(model.Release.from_name(u'17', self.db), release)
+        self.assertIs(model.Release.from_long_name(u'Fedora 17', self.db), release)
+        self.assertIsNone(model.Release.from_long_name(u'Fedora 42', self.db))
+
+    def test_local_change_invalidates(self):
+        """Changing a release should be reflected right away, and bump the version."""
+        model.Release.get_tags(self.db)
+        version = model.CacheVersion.current(u'releases', self.db)
+
+        self.db.query(model.Release).one().testing_tag = u'f17-testing'
+        self.db.flush()
+
+        self.assertIn(u'f17-testing', model.Release.get_tags(self.db)[1])
+        self.assertEqual(model.CacheVersion.current(u'releases', self.db), version + 1)
+
+    def test_unrelated_flush_keeps_version(self):
+        """Flushes that don't change releases should not bump the version."""
+        version = model.CacheVersion.current(u'releases', self.db)
+
+        self.db.query(model.Update).one().notes = u'Some other notes'
+        self.db.flush()
+
+        self.assertEqual(model.CacheVersion.current(u'releases', self.db), version)
+
+    @mock.patch.dict(config, {'release_registry.check_interval': 0})
+    def test_remote_change(self):
+        """A version bumped by another process should cause the releases to be reloaded."""
+        snapshot = model.release_registry.snapshot(self.db)
+        self.assertIs(model.release_registry.snapshot(self.db), snapshot)
+
+        model.CacheVersion.bump(u'releases', self.db)
+
+        self.assertIsNot(model.release_registry.snapshot(self.db), snapshot)
+
+    def test_check_interval(self):
+        """The version should not be checked again within the check interval."""
+        model.release_registry.snapshot(self.db)
+
+        with mock.patch.object(model.CacheVersion, 'current') as current:
+            model.Release.get_tags(self.db)
+
+        self.assertEqual(current.call_count, 0)
+
+
 class MockWiki(object):
     """ Mocked simplemediawiki.MediaWiki class. """
     def __init__(self, response):
@@ -701,7 +763,7 @@ class TestRpmPackage(ModelTest, unittest.TestCase):
         }
 
         # Now, our actual test.
-        with mock.patch('bodhi.server.models.MediaWiki', MockWiki(response)):
+        with mock.patch('simplemediawiki.MediaWiki', MockWiki(response)):
             config['query_wiki_test_cases'] = True
             pkg = model.RpmPackage(name=u'gnome-shell')
             pkg.fetch_test_cases(self.db)
@@ -2711,3 +2773,58 @@ class TestBuildrootOverride(ModelTest):
                 nvr=u'TurboGears-1.0.8-3.fc11', package=model.RpmPackage(**TestRpmPackage.attrs),
                 release=model.Release(**TestRelease.attrs)),
             submitter=model.User(name=u'lmacken'))
+
+
+class TestUpdateSubscriptions(BaseTestCase):
+    """Test the subscriptions of users to the notifications about updates."""
+
+    def setUp(self):
+        super(TestUpdateSubscriptions, self).setUp()
+        self.update = self.db.query(model.Update).one()
+
+    def _subscribers(self):
+        return [u.name for u in self.update.get_subscribers(self.db)]
+
+    def test_submitter(self):
+        """The submitter should be notified without subscribing."""
+        self.assertEqual(self._subscribers(), [u'guest'])
+
+    def test_committers(self):
+        """The committers of the packages should be notified."""
+        self.update.builds[0].package.committers.append(model.User(name=u'packager'))
+        self.db.flush()
+
+        self.assertEqual(self._subscribers(), [u'guest', u'packager'])
+
+    @mock.patch('bodhi.server.models.mail.send')
+    def test_comment(self, send):
+        """Commenters should be subscribed, and the subscribers notified."""
+        self.update.comment(self.db, u'Works for me', author=u'tester')
+        self.update.comment(self.db, u'Works for me too', author=u'tester2')
+
+        self.assertEqual(self._subscribers(), [u'guest', u'tester', u'tester2'])
+        self.assertEqual(send.mock_calls[-1][1][0], set([u'guest', u'tester', u'tester2']))
+
+    @mock.patch('bodhi.server.models.mail.send')
+    def test_anonymous_comment(self, send):
+        """Anonymous and bodhi comments should not subscribe anyone."""
+        self.update.comment(self.db, u'Works for me', author=u'me@example.com', anonymous=True)
+        self.update.comment(self.db, u'Pushed', author=u'bodhi')
+
+        self.assertEqual(self._subscribers(), [u'guest'])
+        self.assertEqual(self.update.subscriptions.count(), 0)
+
+    @mock.patch('bodhi.server.models.mail.send')
+    def test_unsubscribe(self, send):
+        """Unsubscribed users should not be subscribed again by commenting."""
+        guest = self.db.query(model.User).filter_by(name=u'guest').one()
+
+        self.update.subscribe(self.db, guest, False)
+        self.update.comment(self.db, u'Nevermind', author=u'guest')
+
+        self.assertEqual(self._subscribers(), [])
+        self.assertEqual(send.mock_calls[-1][1][0], set())
+
+        self.update.subscribe(self.db, guest)
+
+        self.assertEqual(self._subscribers(), [u'guest'])
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.monitoring."""
+import unittest
+
+import mock
+
+from bodhi.server import models, monitoring
+from bodhi.tests.server import base
+
+
+class TestMetrics(unittest.TestCase):
+    """Test the Metric classes."""
+
+    def test_gauge(self):
+        """Gauges should render one sample per label value."""
+        gauge = monitoring.Gauge('test_gauge', 'A test\ngauge.', ('name',))
+        gauge.set(2, name=u'b')
+        gauge.set(1.5, name=u'a"\\')
+
+        self.assertEqual(
+            gauge.render(),
+            ['# HELP test_gauge A test gauge.', '# TYPE test_gauge gauge',
+             'test_gauge{name="a\\"\\\\"} 1.5', 'test_gauge{name="b"} 2.0'])
+
+    def test_counter(self):
+        """Counters should add up increments."""
+        counter = monitoring.Counter('test_total', 'A counter.')
+        counter.inc()
+        counter.inc(2)
+
+        self.assertEqual(counter.render()[2], 'test_total 3.0')
+
+    def test_wrong_labels(self):
+        """Samples must be given every label of the metric."""
+        counter = monitoring.Counter('test_total', 'A counter.', ('a',))
+
+        with self.assertRaises(ValueError):
+            counter.inc(b=1)
+
+    def test_histogram(self):
+        """Histograms should render cumulative buckets, the sum and the count."""
+        histogram = monitoring.Histogram('test_seconds', 'A histogram.', ('phase',),
+                                         buckets=(1, 5))
+        histogram.observe(0.5, phase='a')
+        histogram.observe(3, phase='a')
+        histogram.observe(10, phase='a')
+
+        self.assertEqual(
+            histogram.render()[2:],
+            ['test_seconds_bucket{phase="a",le="1.0"} 1.0',
+             'test_seconds_bucket{phase="a",le="5.0"} 2.0',
+             'test_seconds_bucket{phase="a",le="+Inf"} 3.0',
+             'test_seconds_sum{phase="a"} 13.5', 'test_seconds_count{phase="a"} 3.0'])
+
+    def test_histogram_time(self):
+        """time() should observe calls, even when they raise."""
+        histogram = monitoring.Histogram('test_seconds', 'A histogram.')
+
+        @histogram.time()
+        def fail():
+            raise ValueError()
+
+        self.assertRaises(ValueError, fail)
+        self.assertEqual(histogram.samples()[-1][3], 1)
+
+
+class TestRegistry(unittest.TestCase):
+    """Test the Registry class."""
+
+    def test_duplicate(self):
+        """Two metrics can't have the same name."""
+        registry = monitoring.Registry()
+        registry.register(monitoring.Gauge('test', 'A gauge.'))
+
+        with self.assertRaises(ValueError):
+            registry.register(monitoring.Gauge('test', 'Another gauge.'))
+
+    def test_collectors(self):
+        """Collectors should run before rendering, and their failures should be logged."""
+        registry = monitoring.Registry()
+        gauge = registry.register(monitoring.Gauge('test', 'A gauge.'))
+        registry.collector(lambda: gauge.set(4))
+        registry.collector(lambda: 1 / 0)
+
+        with mock.patch.object(monitoring.log, 'exception') as exception:
+            text = registry.render()
+
+        self.assertEqual(text, '# HELP test A gauge.\n# TYPE test gauge\ntest 4.0\n')
+        self.assertEqual(exception.call_count, 1)
+
+
+class TestConsumer(unittest.TestCase):
+    """Test the consumer() decorator."""
+
+    def setUp(self):
+        for metric in (monitoring.consumer_lag, monitoring.consumer_duration,
+                       monitoring.consumer_errors):
+            metric.clear()
+
+    @mock.patch('bodhi.server.monitoring.time.time', return_value=1000.0)
+    def test_lag(self, time):
+        """The lag should be measured from the timestamp of the message."""
+        consume = monitoring.consumer('test')(lambda self, message: 'ok')
+
+        self.assertEqual(consume(None, {'body': {'timestamp': 990.0}}), 'ok')
+
+        self.assertEqual(monitoring.consumer_lag._values[('test',)][1], 10.0)
+        self.assertEqual(monitoring.consumer_duration._values[('test',)][0][-1], 1)
+
+    def test_errors(self):
+        """Failures should be counted, and messages without timestamps should have no lag."""
+        def consume(self, message):
+            raise ValueError()
+
+        self.assertRaises(ValueError, monitoring.consumer('test')(consume), None, {'body': {}})
+
+        self.assertEqual(monitoring.consumer_errors._values, {('test',): 1})
+        self.assertEqual(monitoring.consumer_lag._values, {})
+
+
+@mock.patch('bodhi.server.monitoring._server', None)
+@mock.patch('bodhi.server.monitoring.threading.Thread')
+@mock.patch('bodhi.server.monitoring.make_server')
+class TestStartHttpServer(unittest.TestCase):
+    """Test the start_http_server() function."""
+
+    def test_localhost(self, make_server, Thread):
+        """The metrics should only be served on the loopback interface by default."""
+        server = monitoring.start_http_server(9090)
+
+        self.assertIs(server, make_server.return_value)
+        make_server.assert_called_once_with('127.0.0.1', 9090, monitoring._app,
+                                            handler_class=monitoring._QuietHandler)
+        Thread.return_value.start.assert_called_once_with()
+
+    def test_once(self, make_server, Thread):
+        """The metrics should only be served once per process."""
+        monitoring.start_http_server(9090, '0.0.0.0')
+        monitoring.start_http_server(9091)
+
+        make_server.assert_called_once_with('0.0.0.0', 9090, monitoring._app,
+                                            handler_class=monitoring._QuietHandler)
+
+
+class TestCollectors(unittest.TestCase):
+    """Test the collectors of the global registry."""
+
+    @mock.patch('bodhi.server.buildsys.pool_stats', return_value=None)
+    @mock.patch('bodhi.server.buildsys.cache_stats',
+                return_value={'getTag': {'hits': 3, 'misses': 1, 'size': 1}})
+    def test_buildsys(self, cache_stats, pool_stats):
+        """The hits and misses of the Koji caches should be exposed."""
+        text = monitoring.registry.render()
+
+        self.assertIn('bodhi_koji_cache_hits_total{method="getTag"} 3.0', text)
+        self.assertIn('bodhi_koji_cache_misses_total{method="getTag"} 1.0', text)
+
+    @mock.patch.dict('bodhi.server.config.config', {'mail.spool_dir': None})
+    @mock.patch('bodhi.server.notifications.publisher_stats')
+    def test_queues(self, publisher_stats):
+        """The depth of the fedmsg queue should be exposed."""
+        publisher_stats.return_value = {'depth': 7, 'published': 2, 'dropped': 0, 'errors': 1,
+                                        'latency_sum': 0.5}
+
+        text = monitoring.registry.render()
+
+        self.assertIn('bodhi_fedmsg_queue_depth 7.0', text)
+        self.assertIn('bodhi_fedmsg_messages_total{outcome="errors"} 1.0', text)
+
+
+class TestPrometheusView(base.BaseTestCase):
+    """Test the prometheus() view."""
+
+    @mock.patch.dict('bodhi.server.config.config', {'monitoring.enabled': True})
+    def test_get(self):
+        """The metrics should be served in the Prometheus text format."""
+        self.db.add(models.Compose(release=self.db.query(models.Release).one(),
+                                   request=models.UpdateRequest.testing))
+        self.db.flush()
+        monitoring.request_duration.observe(0.1, service='updates', method='GET')
+
+        res = self.app.get('/metrics/prometheus')
+
+        self.assertEqual(res.headers['Content-Type'], monitoring.CONTENT_TYPE)
+        self.assertIn('bodhi_composes{state="requested"} 1.0', res.text)
+        self.assertIn('bodhi_composes{state="failed"} 0.0', res.text)
+        self.assertIn('bodhi_request_duration_seconds_count{service="updates",method="GET"}',
+                      res.text)
+
+    def test_disabled(self):
+        """The view should 404 unless monitoring is enabled, which it isn't by default."""
+        self.app.get('/metrics/prometheus', status=404)
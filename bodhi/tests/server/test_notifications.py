@@ -18,6 +18,8 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """This test module contains tests for bodhi.server.notifications."""
 
+import json
+import threading
 import unittest
 
 from sqlalchemy import exc
@@ -140,7 +142,8 @@ class TestPublish(base.BaseTestCase):
         notifications.publish('demo.topic', {'such': 'important'})
         session = Session()
         self.assertIn('fedmsg', session.info)
-        self.assertEqual(session.info['fedmsg']['demo.topic'], [{'such': 'important'}])
+        self.assertEqual([json.loads(m) for m in session.info['fedmsg']['demo.topic']],
+                         [{'such': 'important'}])
 
     @mock.patch.dict('bodhi.server.config.config', {'fedmsg_enabled': True})
     @mock.patch('bodhi.server.notifications.fedmsg_is_initialized', mock.Mock(return_value=False))
@@ -160,9 +163,39 @@ class TestPublish(base.BaseTestCase):
         notifications.publish('demo.topic', {'some_package': package})
         session = Session()
         self.assertIn('fedmsg', session.info)
-        self.assertEqual(session.info['fedmsg']['demo.topic'], [expected_msg])
+        self.assertEqual([json.loads(m) for m in session.info['fedmsg']['demo.topic']],
+                         [expected_msg])
         mock_init.assert_called_once_with()
 
+    @mock.patch.dict('bodhi.server.config.config', {'fedmsg_enabled': True})
+    def test_publish_serializes_once(self, mock_init):
+        """An object published twice in a transaction should only be serialized once."""
+        update = self.db.query(models.Update).one()
+        self.db.flush()
+
+        with mock.patch.object(models.Update, '__json__', return_value={'title': 'x'}) as to_json:
+            notifications.publish('demo.topic', {'update': update})
+            notifications.publish('other.topic', {'update': update, 'agent': 'bodhi'})
+
+        self.assertEqual(to_json.call_count, 1)
+        self.assertEqual(json.loads(Session().info['fedmsg']['other.topic'][0]),
+                         {'update': {'title': 'x'}, 'agent': 'bodhi'})
+
+    @mock.patch.dict('bodhi.server.config.config', {'fedmsg_enabled': True})
+    def test_publish_serializes_changed_objects(self, mock_init):
+        """Objects should be serialized again once they changed."""
+        update = self.db.query(models.Update).one()
+        self.db.flush()
+        notifications.publish('demo.topic', {'update': update})
+
+        update.notes = u'Some new notes'
+        notifications.publish('demo.topic', {'update': update})
+        self.db.flush()
+        notifications.publish('demo.topic', {'update': update})
+
+        notes = [json.loads(m)['update']['notes'] for m in Session().info['fedmsg']['demo.topic']]
+        self.assertEqual(notes, [u'Useful details!', u'Some new notes', u'Some new notes'])
+
     @mock.patch('bodhi.server.notifications.fedmsg_is_initialized', mock.Mock(return_value=False))
     @mock.patch.dict('bodhi.server.config.config', {'fedmsg_enabled': True})
     @mock.patch('bodhi.server.notifications.fedmsg.publish')
@@ -251,3 +284,105 @@ class TestSendFedmsgsAfterCommit(base.BaseTestCase):
             topic='demo.topic', msg={'new': 'package'})
         mock_fedmsg_publish.assert_any_call(
             topic='other.topic', msg={'newer': 'packager'})
+
+    @mock.patch.dict('bodhi.server.config.config', {'fedmsg_publisher.queue_size': 10})
+    def test_publisher_force_serializes(self, mock_fedmsg_publish):
+        """Forced messages should be serialized before they are handed to the publisher thread."""
+        self.addCleanup(notifications.stop_publisher)
+        update = self.db.query(models.Update).one()
+
+        with mock.patch.object(models.Update, '__json__', return_value={'title': 'x'}) as to_json:
+            notifications.publish('demo.topic', {'update': update}, force=True)
+            self.assertEqual(to_json.call_count, 1)
+        notifications.stop_publisher()
+
+        mock_fedmsg_publish.assert_called_once_with(
+            topic='demo.topic', msg={'update': {'title': 'x'}})
+
+    @mock.patch.dict('bodhi.server.config.config', {'fedmsg_publisher.queue_size': 10})
+    @mock.patch('bodhi.server.notifications._log.debug')
+    def test_publisher_dropped(self, debug, mock_fedmsg_publish):
+        """Messages the publisher drops should be logged as dropped rather than emitted."""
+        self.addCleanup(notifications.stop_publisher)
+        session = Session()
+        notifications.publish('demo.topic', {'new': 'package'})
+
+        with mock.patch('bodhi.server.notifications.Publisher.put', return_value=False):
+            session.commit()
+
+        debug.assert_any_call('Dropped a fedmsg, %r, on the "%s" topic, queued by %r',
+                              {'new': 'package'}, 'demo.topic', session)
+        self.assertNotIn('Emitted a fedmsg, %r, on the "%s" topic, queued by %r',
+                         [c[1][0] for c in debug.mock_calls])
+
+
+@mock.patch('bodhi.server.notifications.init')
+@mock.patch('bodhi.server.notifications.fedmsg.publish')
+class TestPublisher(unittest.TestCase):
+    """Tests for :class:`bodhi.server.notifications.Publisher`."""
+
+    def test_stop_flushes(self, fedmsg_publish, init):
+        """stop() should publish the queued messages, in order."""
+        publisher = notifications.Publisher(10, init_kwargs={'active': True})
+
+        self.assertTrue(publisher.put('demo.topic', {'new': 'package'}))
+        self.assertTrue(publisher.put('other.topic', {'newer': 'packager'}))
+        self.assertTrue(publisher.stop(5))
+
+        init.assert_called_once_with(active=True)
+        self.assertEqual(
+            fedmsg_publish.mock_calls,
+            [mock.call(topic='demo.topic', msg={'new': 'package'}),
+             mock.call(topic='other.topic', msg={'newer': 'packager'})])
+        stats = publisher.get_stats()
+        self.assertEqual((stats['published'], stats['dropped'], stats['depth']), (2, 0, 0))
+        self.assertTrue(stats['latency_max'] >= 0)
+
+    def test_drop_when_full(self, fedmsg_publish, init):
+        """Messages that don't fit in the queue should be dropped."""
+        publishing = threading.Event()
+        release = threading.Event()
+
+        def slow_publish(**kwargs):
+            publishing.set()
+            release.wait(5)
+
+        fedmsg_publish.side_effect = slow_publish
+        publisher = notifications.Publisher(1, drop=True)
+        publisher.put('demo.topic', {'n': 1})
+        publishing.wait(5)
+
+        self.assertTrue(publisher.put('demo.topic', {'n': 2}))
+        self.assertFalse(publisher.put('demo.topic', {'n': 3}))
+
+        release.set()
+        self.assertTrue(publisher.stop(5))
+        stats = publisher.get_stats()
+        self.assertEqual((stats['published'], stats['dropped']), (2, 1))
+
+    @mock.patch('bodhi.server.notifications._log.exception')
+    def test_errors(self, exception, fedmsg_publish, init):
+        """Failures to publish should be counted, and not stop the thread."""
+        fedmsg_publish.side_effect = [IOError('oops'), None]
+        publisher = notifications.Publisher(10)
+
+        publisher.put('demo.topic', {'n': 1})
+        publisher.put('demo.topic', {'n': 2})
+        publisher.stop(5)
+
+        stats = publisher.get_stats()
+        self.assertEqual((stats['published'], stats['errors']), (1, 1))
+        exception.assert_called_once_with(
+            'Unable to publish a message to the "%s" topic', 'demo.topic')
+
+    @mock.patch.dict('bodhi.server.config.config',
+                     {'fedmsg_enabled': True, 'fedmsg_publisher.queue_size': 10})
+    def test_publish_force(self, fedmsg_publish, init):
+        """Forced messages should be handed to the publisher when it is enabled."""
+        self.addCleanup(notifications.stop_publisher)
+
+        notifications.publish('demo.topic', {'such': 'important'}, force=True)
+        notifications.stop_publisher()
+
+        fedmsg_publish.assert_called_once_with(topic='demo.topic', msg={'such': 'important'})
+        self.assertIsNone(notifications.publisher_stats())
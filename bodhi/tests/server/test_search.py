@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.search."""
+
+from bodhi.server import models, search
+from bodhi.tests.server import base, create_update
+
+
+class TestSearchUpdates(base.BaseTestCase):
+    """Test the search_updates() function."""
+
+    def _search(self, term):
+        return search.search_updates(self.db.query(models.Update), term).all()
+
+    def test_fields(self):
+        """Each of the indexed fields should find the update."""
+        update = self.db.query(models.Update).one()
+
+        for term in (u'BODHI-2.0', update.alias, u'useful details', u'fc17', u'1985-0110',
+                     u'12345'):
+            self.assertEqual(self._search(term), [update], term)
+
+    def test_package_name(self):
+        """Updates should be found by the names of their packages."""
+        update = create_update(self.db, [u'python-librepo-1.0-1.fc17'])
+        update.title = u'A nicer title'
+        self.db.flush()
+
+        self.assertEqual(self._search(u'librepo'), [update])
+
+    def test_no_match(self):
+        """A term that matches nothing should return nothing."""
+        self.assertEqual(self._search(u'nethack'), [])
+
+    def test_partial_bug_id(self):
+        """Bug IDs are only matched exactly."""
+        self.assertEqual(self._search(u'1234'), [])
+
+    def test_exact_title_ranked_first(self):
+        """An update whose title is the search term should come before partial matches."""
+        other = create_update(self.db, [u'bodhi-2.0-10.fc17'])
+        other.title = u'bodhi'
+        other.date_submitted = other.date_submitted.replace(year=1980)
+        self.db.flush()
+
+        results = self._search(u'bodhi')
+
+        self.assertEqual([u.title for u in results], [u'bodhi', u'bodhi-2.0-1.fc17'])
+
+
+class TestSearchOverrides(base.BaseTestCase):
+    """Test the search_overrides() function."""
+
+    def test_notes_and_package(self):
+        """Overrides should be found by their notes and by package name."""
+        override = self.db.query(models.BuildrootOverride).one()
+
+        for term in (u'BLAH', u'bodhi', u'2.0-1'):
+            self.assertEqual(
+                search.search_overrides(self.db.query(models.BuildrootOverride), term).all(),
+                [override])
+
+        self.assertEqual(
+            search.search_overrides(self.db.query(models.BuildrootOverride), u'nope').all(), [])
+
+
+class TestSearchStacks(base.BaseTestCase):
+    """Test the search_stacks() function."""
+
+    def test_name_description_and_package(self):
+        """Stacks should be found by name, description and package names."""
+        package = self.db.query(models.Package).one()
+        stack = models.Stack(name=u'GNOME', description=u'The desktop', packages=[package])
+        self.db.add(stack)
+        self.db.flush()
+
+        for term in (u'gno', u'DESKTOP', u'odh'):
+            self.assertEqual(
+                search.search_stacks(self.db.query(models.Stack), term).all(), [stack])
+
+    def test_service(self):
+        """The stacks service should honor the search parameter."""
+        self.db.add(models.Stack(name=u'KDE'))
+        self.db.add(models.Stack(name=u'GNOME'))
+        self.db.flush()
+
+        body = self.app.get('/stacks/', {'search': 'kd'},
+                            headers={'Accept': 'application/json'}).json_body
+
+        self.assertEqual([s['name'] for s in body['stacks']], [u'KDE'])
+
+
+class TestSearchUsers(base.BaseTestCase):
+    """Test the search_users() function."""
+
+    def test_name(self):
+        """Users should be found by partial, case insensitive names, exact matches first."""
+        self.db.add(models.User(name=u'bowlofeggs'))
+        self.db.add(models.User(name=u'eggs'))
+        self.db.flush()
+
+        users = search.search_users(self.db.query(models.User), u'EGGS').all()
+
+        self.assertEqual([u.name for u in users], [u'eggs', u'bowlofeggs'])
+        self.assertEqual(search.search_users(self.db.query(models.User), u'nope').all(), [])
+
+    def test_service(self):
+        """The users service should honor the search parameter."""
+        self.db.add(models.User(name=u'bowlofeggs'))
+        self.db.flush()
+
+        body = self.app.get('/users/', {'search': 'ofegg'},
+                            headers={'Accept': 'application/json'}).json_body
+
+        self.assertEqual([u['name'] for u in body['users']], [u'bowlofeggs'])
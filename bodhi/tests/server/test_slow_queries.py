@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.slow_queries."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import event
+import mock
+
+from bodhi.server import models, slow_queries
+from bodhi.tests.server import base
+
+
+class TestListen(base.BaseTestCase):
+    """Test the recording of slow statements."""
+
+    def setUp(self):
+        super(TestListen, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.path = os.path.join(self.tempdir, 'slow.jsonl')
+        slow_queries.listen(self.engine)
+        self.addCleanup(event.remove, self.engine, 'before_cursor_execute',
+                        slow_queries._before_cursor_execute)
+        self.addCleanup(event.remove, self.engine, 'after_cursor_execute',
+                        slow_queries._after_cursor_execute)
+        self.addCleanup(self._close_handlers)
+
+    def _close_handlers(self):
+        """Close and forget the handlers of the logs written by the tests."""
+        for handler in slow_queries._handlers.values():
+            handler.close()
+        slow_queries._handlers.clear()
+
+    def test_listen_twice(self):
+        """Listening to an engine twice should not record statements twice."""
+        slow_queries.listen(self.engine)
+
+        with mock.patch.dict('bodhi.server.config.config',
+                             {'slow_queries.threshold': 0.0, 'slow_queries.path': None}):
+            with mock.patch('bodhi.server.slow_queries._locate',
+                            return_value=(None, None)) as _locate:
+                self.db.query(models.User).count()
+
+        self.assertEqual(_locate.call_count, 1)
+
+    def test_fast(self):
+        """Statements under the threshold should not be recorded."""
+        with mock.patch.dict('bodhi.server.config.config',
+                             {'slow_queries.threshold': 60.0, 'slow_queries.path': self.path}):
+            self.db.query(models.User).all()
+
+        self.assertEqual(slow_queries.read(self.path), [])
+
+    def test_slow(self):
+        """Slow statements should be recorded with their parameters, caller and plan."""
+        with mock.patch.dict('bodhi.server.config.config',
+                             {'slow_queries.threshold': 0.0, 'slow_queries.path': self.path}):
+            self.db.query(models.User).filter_by(name=u'guest').all()
+
+        records = slow_queries.read(self.path)
+        self.assertEqual(len(records), 1)
+        self.assertIn('FROM users', records[0]['statement'])
+        self.assertIn('guest', records[0]['parameters'])
+        self.assertTrue(records[0]['caller'].startswith('tests/server/test_slow_queries.py:'))
+        self.assertIsNone(records[0]['entry_point'])
+        self.assertTrue(records[0]['explain'])
+
+    def test_no_explain(self):
+        """Plans should not be captured if slow_queries.explain is False."""
+        with mock.patch.dict('bodhi.server.config.config',
+                             {'slow_queries.threshold': 0.0, 'slow_queries.path': self.path,
+                              'slow_queries.explain': False}):
+            self.db.query(models.User).all()
+
+        self.assertIsNone(slow_queries.read(self.path)[0]['explain'])
+
+    def test_rotation(self):
+        """The log should be rotated, and read back across its rotated files."""
+        with mock.patch.dict('bodhi.server.config.config',
+                             {'slow_queries.threshold': 0.0, 'slow_queries.path': self.path,
+                              'slow_queries.max_bytes': 1, 'slow_queries.backup_count': 2}):
+            for i in range(4):
+                self.db.query(models.User).filter_by(id=i).all()
+
+            records = slow_queries.read(self.path)
+
+        self.assertEqual(sorted(os.listdir(self.tempdir)),
+                         ['slow.jsonl', 'slow.jsonl.1', 'slow.jsonl.2'])
+        self.assertEqual(len(records), 3)
+
+
+class TestExplain(base.BaseTestCase):
+    """Test the explain() function."""
+
+    def test_select(self):
+        """The plan of SELECT statements should be returned."""
+        plan = slow_queries.explain(self.db.connection(), 'SELECT * FROM users WHERE id = ?', (1, ))
+
+        self.assertEqual(len(plan), 1)
+
+    def test_not_select(self):
+        """Only SELECT statements should be explained."""
+        self.assertIsNone(slow_queries.explain(None, 'DELETE FROM users', ()))
+
+    def test_error(self):
+        """Statements that can't be explained should have no plan."""
+        self.assertIsNone(slow_queries.explain(self.db.connection(), 'SELECT * FROM nothing', ()))
+
+
+class TestTopOffenders(unittest.TestCase):
+    """Test the top_offenders() function."""
+
+    def test_aggregate(self):
+        """Records should be aggregated per statement, slowest in total first."""
+        records = [
+            {'statement': 'a', 'duration': 1.0, 'caller': 'x', 'entry_point': None},
+            {'statement': 'b', 'duration': 3.0, 'caller': 'y', 'entry_point': 'e'},
+            {'statement': 'a', 'duration': 2.5, 'caller': 'z', 'entry_point': None}]
+
+        offenders = slow_queries.top_offenders(records)
+
+        self.assertEqual([(o['statement'], o['count'], o['total_duration']) for o in offenders],
+                         [('a', 2, 3.5), ('b', 1, 3.0)])
+        self.assertEqual(offenders[0]['callers'], ['x', 'z'])
+        self.assertEqual(offenders[0]['entry_points'], [])
+        self.assertIs(offenders[0]['slowest'], records[2])
+
+    def test_limit(self):
+        """Only the given number of statements should be returned."""
+        records = [{'statement': s, 'duration': 1.0, 'caller': None, 'entry_point': None}
+                   for s in 'abc']
+
+        self.assertEqual(len(slow_queries.top_offenders(records, limit=2)), 2)
+
+
+class TestRead(unittest.TestCase):
+    """Test the read() function."""
+
+    @mock.patch.dict('bodhi.server.config.config', {'slow_queries.path': None})
+    def test_no_path(self):
+        """Nothing should be read if there is no log."""
+        self.assertEqual(slow_queries.read(), [])
+
+    def test_partial_line(self):
+        """Lines that aren't valid JSON should be skipped."""
+        with tempfile.NamedTemporaryFile(mode='w', delete=False) as log_file:
+            log_file.write('%s\n{"statement": \n' % json.dumps({'statement': 'a'}))
+        self.addCleanup(os.unlink, log_file.name)
+
+        self.assertEqual(slow_queries.read(log_file.name), [{'statement': 'a'}])
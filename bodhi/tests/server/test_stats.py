@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test module contains tests for bodhi.server.stats."""
+from datetime import datetime
+import unittest
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import expression
+import mock
+
+from bodhi.server import models, stats
+from bodhi.server.views import generic, metrics
+from bodhi.tests.server import base, create_update
+
+
+class TestReleaseStats(unittest.TestCase):
+    """Test the ReleaseStats class."""
+
+    def setUp(self):
+        self.stats = stats.ReleaseStats({
+            (models.UpdateStatus.stable, models.UpdateType.bugfix, '2018/01'): 3,
+            (models.UpdateStatus.stable, models.UpdateType.security, '2018/03'): 1,
+            (models.UpdateStatus.testing, models.UpdateType.bugfix, '2018/03'): 2,
+        })
+
+    def test_count(self):
+        """count() should filter by status and type."""
+        self.assertEqual(self.stats.total, 6)
+        self.assertEqual(self.stats.count(models.UpdateStatus.stable), 4)
+        self.assertEqual(self.stats.count(type=models.UpdateType.bugfix), 5)
+        self.assertEqual(
+            self.stats.count(models.UpdateStatus.testing, models.UpdateType.security), 0)
+
+    def test_status_counts(self):
+        """status_counts() should return every key the home page uses."""
+        counts = self.stats.status_counts()
+
+        self.assertEqual(len(counts), 15)
+        self.assertEqual(counts['stable_updates_total'], 4)
+        self.assertEqual(counts['stable_security_total'], 1)
+        self.assertEqual(counts['testing_bugfix_total'], 2)
+        self.assertEqual(counts['pending_newpackage_total'], 0)
+
+    def test_by_month(self):
+        """Every type should have a value for every month, in order."""
+        months, by_month = self.stats.by_month()
+
+        self.assertEqual(months, ['2018/01', '2018/03'])
+        self.assertEqual(list(by_month['bugfix'].items()), [('2018/01', 3), ('2018/03', 2)])
+        self.assertEqual(list(by_month['security'].items()), [('2018/01', 0), ('2018/03', 1)])
+
+
+class TestGetStats(base.BaseTestCase):
+    """Test the get_stats() function."""
+
+    def test_compute(self):
+        """The statistics should reflect the updates in the database."""
+        release = self.db.query(models.Release).one()
+        update = create_update(self.db, [u'bodhi-2.0-2.fc17'])
+        update.type = models.UpdateType.security
+        update.status = models.UpdateStatus.stable
+        update.date_submitted = datetime(2018, 2, 3)
+        self.db.flush()
+
+        release_stats = stats.get_release_stats(self.db, release)
+
+        self.assertEqual(release_stats.total, 2)
+        self.assertEqual(
+            release_stats.count(models.UpdateStatus.stable, models.UpdateType.security), 1)
+        self.assertEqual(release_stats.by_month()[0], ['1984/11', '2018/02'])
+
+    def test_cached(self):
+        """A second call should not query the database."""
+        release = self.db.query(models.Release).one()
+        stats.get_release_stats(self.db, release)
+
+        with mock.patch('bodhi.server.stats.compute') as compute:
+            self.assertEqual(stats.get_release_stats(self.db, release).total, 1)
+
+        self.assertEqual(compute.call_count, 0)
+
+    @mock.patch.dict('bodhi.server.config.config', {'release_stats.ttl': 0})
+    def test_disabled(self):
+        """A ttl of 0 should disable the cache."""
+        stats.get_release_stats(self.db, self.db.query(models.Release).one())
+
+        self.assertEqual(stats._cache, {})
+
+    def test_invalidated_by_status_change(self):
+        """Changing the status of an update should invalidate its release."""
+        release = self.db.query(models.Release).one()
+        self.assertEqual(
+            stats.get_release_stats(self.db, release).count(models.UpdateStatus.stable), 0)
+
+        self.db.query(models.Update).one().status = models.UpdateStatus.stable
+
+        self.assertNotIn(release.id, stats._cache)
+        self.db.flush()
+        self.assertEqual(
+            stats.get_release_stats(self.db, release).count(models.UpdateStatus.stable), 1)
+
+    def test_invalidated_by_delete(self):
+        """Deleting an update should invalidate its release."""
+        release = self.db.query(models.Release).one()
+        stats.get_release_stats(self.db, release)
+
+        self.db.delete(self.db.query(models.Update).one())
+        self.db.flush()
+
+        self.assertEqual(stats.get_release_stats(self.db, release).total, 0)
+
+    def test_get_update_counts(self):
+        """The home page counts should come from the statistics."""
+        request = mock.MagicMock(db=self.db)
+
+        counts = generic.get_update_counts(request, u'F17')
+
+        self.assertEqual(counts['testing_updates_total'], 0)
+        self.assertEqual(counts['pending_updates_total'], 1)
+        self.assertEqual(counts['pending_bugfix_total'], 1)
+
+    def test_metrics(self):
+        """The metrics page should count stable updates per type."""
+        self.db.query(models.Update).one().status = models.UpdateStatus.stable
+        self.db.flush()
+        releases = self.db.query(models.Release).all()
+
+        data, ticks = metrics.compute_ticks_and_data(
+            self.db, releases, {'bugfix': 'Bug fixes', 'security': 'Security updates'})
+
+        self.assertEqual(ticks, [[0, u'F17']])
+        self.assertEqual(sorted(data, key=lambda d: d['label']),
+                         [{'data': [[0, 1]], 'label': 'Bug fixes'},
+                          {'data': [[0, 0]], 'label': 'Security updates'}])
+
+
+class TestReleaseStatsTable(base.BaseTestCase):
+    """Test that the release_stats table is maintained."""
+
+    def _rows(self):
+        return sorted(
+            (r.status.value, r.type.value, r.month, r.count)
+            for r in self.db.query(models.ReleaseStat).populate_existing())
+
+    def test_populated(self):
+        """The rows should be written when updates are created."""
+        self.assertEqual(self._rows(), [('pending', 'bugfix', '1984/11', 1)])
+
+    def test_status_change(self):
+        """Changing the status of an update should move it to another row."""
+        update = self.db.query(models.Update).one()
+        update.status = models.UpdateStatus.testing
+        self.db.flush()
+
+        self.assertEqual(
+            self._rows(),
+            [('pending', 'bugfix', '1984/11', 0), ('testing', 'bugfix', '1984/11', 1)])
+
+    def test_new_update(self):
+        """New updates should be counted."""
+        update = create_update(self.db, [u'bodhi-2.0-2.fc17'])
+        update.type = models.UpdateType.security
+        update.date_submitted = datetime(2018, 2, 3)
+        self.db.flush()
+
+        self.assertEqual(
+            self._rows(),
+            [('pending', 'bugfix', '1984/11', 1), ('pending', 'security', '2018/02', 1)])
+
+    @mock.patch('bodhi.server.stats.rebuild')
+    def test_changes_in_one_flush(self, rebuild):
+        """Several changes to an update should only move it once, without rebuilding the table."""
+        update = self.db.query(models.Update).one()
+        update.status = models.UpdateStatus.testing
+        update.type = models.UpdateType.security
+        update.date_submitted = datetime(2018, 2, 3)
+        self.db.flush()
+
+        self.assertEqual(
+            self._rows(),
+            [('pending', 'bugfix', '1984/11', 0), ('testing', 'security', '2018/02', 1)])
+        self.assertEqual(rebuild.call_count, 0)
+
+    def test_changes_back(self):
+        """Changing an update and back again in separate flushes should restore the rows."""
+        update = self.db.query(models.Update).one()
+        update.status = models.UpdateStatus.testing
+        self.db.flush()
+        update.status = models.UpdateStatus.pending
+        self.db.flush()
+
+        self.assertEqual(
+            self._rows(),
+            [('pending', 'bugfix', '1984/11', 1), ('testing', 'bugfix', '1984/11', 0)])
+
+    def test_release_change(self):
+        """Moving an update to another release should move it between the releases' rows."""
+        release = self.create_release(u'18')
+        update = self.db.query(models.Update).one()
+        old_release_id = update.release_id
+        update.release = release
+        self.db.flush()
+
+        rows = self.db.query(models.ReleaseStat.release_id, models.ReleaseStat.count).all()
+        self.assertEqual(sorted(rows), [(old_release_id, 0), (release.id, 1)])
+
+    def test_deleted_update(self):
+        """Deleting an update should remove it from its row."""
+        self.db.delete(self.db.query(models.Update).one())
+        self.db.flush()
+
+        self.assertEqual(self._rows(), [('pending', 'bugfix', '1984/11', 0)])
+
+    def test_concurrent_insert(self):
+        """A row created by another transaction after the UPDATE missed it should be updated."""
+        release = self.db.query(models.Release).one()
+        key = (release.id, models.UpdateStatus.testing, models.UpdateType.security, u'2018/02')
+        # This stands for the row committed by the other transaction.
+        self.db.add(models.ReleaseStat(release_id=release.id, status=key[1], type=key[2],
+                                       month=key[3], count=2))
+        self.db.flush()
+        execute = Connection.execute
+        missed = []
+
+        def miss_first_update(connection, statement, *args, **kwargs):
+            if isinstance(statement, expression.Update) and not missed:
+                missed.append(statement)
+                return mock.Mock(rowcount=0)
+            return execute(connection, statement, *args, **kwargs)
+
+        with mock.patch.object(Connection, 'execute', miss_first_update):
+            stats._apply(self.db, {key: 1})
+
+        self.assertEqual(len(missed), 1)
+        self.assertEqual(
+            self._rows(),
+            [('pending', 'bugfix', '1984/11', 1), ('testing', 'security', '2018/02', 3)])
+
+    def test_zero_rows_not_reported(self):
+        """Rows that dropped to 0 should not show up in the statistics."""
+        update = self.db.query(models.Update).one()
+        update.status = models.UpdateStatus.testing
+        self.db.flush()
+
+        counts = stats.compute(self.db, [update.release_id])[update.release_id].counts
+
+        self.assertEqual(
+            counts, {(models.UpdateStatus.testing, models.UpdateType.bugfix, u'1984/11'): 1})
+
+    def test_rebuild(self):
+        """rebuild() should recompute the table from scratch."""
+        self.db.query(models.ReleaseStat).delete()
+        self.db.query(models.Update).update({'type': models.UpdateType.enhancement})
+
+        stats.rebuild(self.db)
+
+        self.assertEqual(self._rows(), [('pending', 'enhancement', '1984/11', 1)])
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test suite contains tests for the bodhi.server.synthetic_buildsys module."""
+import unittest
+
+import koji
+import mock
+
+from bodhi.server import synthetic_buildsys
+
+
+class TestSyntheticBuildsys(unittest.TestCase):
+    """Test the SyntheticKoji and SyntheticBuildsys classes."""
+
+    def setUp(self):
+        self.hub = synthetic_buildsys.SyntheticKoji(seed=1, builds=1000, packages=50)
+        self.session = synthetic_buildsys.SyntheticBuildsys(self.hub)
+
+    def test_reproducible(self):
+        """The same seed should generate the same catalog."""
+        other = synthetic_buildsys.SyntheticBuildsys(
+            synthetic_buildsys.SyntheticKoji(seed=1, builds=1000, packages=50))
+        different = synthetic_buildsys.SyntheticBuildsys(
+            synthetic_buildsys.SyntheticKoji(seed=2, builds=1000))
+
+        self.assertEqual(self.session.listTagged('f27'), other.listTagged('f27'))
+        self.assertNotEqual(self.session.listTagged('f27'), different.listTagged('f27'))
+
+    def test_consistent(self):
+        """The builds, their RPMs and their tags should agree with each other."""
+        build = self.session.getBuild(42)
+
+        self.assertEqual(self.session.getBuild(build['nvr']), build)
+        rpms = self.session.listBuildRPMs(build['nvr'])
+        self.assertEqual(set(rpm['nvr'] for rpm in rpms), set([build['nvr']]))
+        self.assertEqual(rpms[0]['arch'], 'src')
+        tags = [tag['name'] for tag in self.session.listTags(build['nvr'])]
+        self.assertEqual(len(tags), 1)
+        self.assertIn(build['nvr'], [b['nvr'] for b in self.session.listTagged(tags[0])])
+        self.assertEqual(
+            self.session.getRPMHeaders(rpmID='%s.src' % build['nvr'], headers=['name']),
+            {'name': build['name']})
+
+    def test_latest(self):
+        """Only the newest build of each package should be listed as the latest."""
+        tagged = self.session.listTagged('f26')
+        latest = self.session.listTagged('f26', latest=True)
+
+        self.assertEqual(len(latest), len(set(b['package_name'] for b in tagged)))
+        newest = max((b for b in tagged if b['package_name'] == latest[0]['package_name']),
+                     key=lambda b: b['id'])
+        self.assertEqual(latest[0], newest)
+        self.assertEqual(self.session.getLatestBuilds('f26', package=newest['package_name']),
+                         [newest])
+
+    def test_unknown_build(self):
+        """Unknown builds should be added to the candidate tag of their release."""
+        build = self.session.getBuild('bodhi-2.0-1.fc28')
+
+        self.assertEqual(build['id'], 1001)
+        self.assertEqual([tag['name'] for tag in self.session.listTags('bodhi-2.0-1.fc28')],
+                         ['f28-updates-candidate'])
+        self.assertIsNone(self.session.getBuild('bodhi-2.0-1'))
+        self.assertRaises(koji.GenericError, self.session.getBuild, 'bodhi-2.0-1', strict=True)
+
+    def test_tagging(self):
+        """Tagging builds should change their tags, and create completed tasks."""
+        nvr = 'bodhi-2.0-1.fc28'
+
+        task = self.session.moveBuild('f28-updates-candidate', 'f28-updates-testing', nvr)
+        self.session.tagBuild('f28-updates-testing-signing', nvr)
+        self.session.untagBuild('f28-updates-testing-signing', nvr)
+
+        self.assertEqual([tag['name'] for tag in self.session.listTags(nvr)],
+                         ['f28-updates-testing'])
+        self.assertEqual([b['nvr'] for b in self.session.listTagged('f28-updates-testing')][-1],
+                         nvr)
+        self.assertTrue(self.session.taskFinished(task))
+        self.assertEqual(self.session.getTaskInfo(task)['state'], koji.TASK_STATES['CLOSED'])
+        self.assertRaises(koji.GenericError, self.session.moveBuild, 'f28-updates-candidate',
+                          'f28-updates-testing', nvr)
+        self.assertRaises(koji.GenericError, self.session.untagBuild, 'f28', nvr)
+
+    def test_multicall(self):
+        """A multicall should be a single round trip."""
+        self.session.multicall = True
+
+        self.assertIsNone(self.session.getBuild(1))
+        self.assertIsNone(self.session.getBuild('nonsense', strict=True))
+        results = self.session.multiCall()
+
+        self.assertEqual(results[0][0]['id'], 1)
+        self.assertEqual(results[1]['faultCode'], 1000)
+        self.assertEqual(self.hub.round_trips, 1)
+        self.assertEqual(self.hub.calls['getBuild'], 2)
+        self.assertFalse(self.session.multicall)
+
+    def test_failures(self):
+        """The failing methods should raise, or return faults in multicalls."""
+        self.hub.failure_rate = 1.0
+        self.hub.failing_methods = set(['listTags'])
+
+        self.assertRaises(koji.GenericError, self.session.listTags, 1)
+        self.session.multicall = True
+        self.session.listTags(1)
+        self.session.getBuild(1)
+        results = self.session.multiCall()
+
+        self.assertEqual(results[0]['faultString'], 'Synthetic failure of listTags()')
+        self.assertEqual(results[1][0]['id'], 1)
+
+    @mock.patch('bodhi.server.synthetic_buildsys.time.sleep')
+    def test_latency(self, sleep):
+        """Each round trip and each call should be delayed."""
+        self.hub.latency = 0.1
+        self.hub.call_latency = 0.01
+
+        self.session.getBuild(1)
+        self.session.multicall = True
+        self.session.getBuild(1)
+        self.session.getBuild(2)
+        self.session.multiCall()
+
+        self.assertEqual(sorted(c[1][0] for c in sleep.mock_calls), [0.01] * 3 + [0.1] * 2)
@@ -330,10 +330,75 @@ class TestCanWaiveTestResults(base.BaseTestCase):
         self.assertFalse(util.can_waive_test_results(None, u))
 
 
+class TestCritpathCache(unittest.TestCase):
+    """Test the CritpathCache class."""
+
+    def setUp(self):
+        self.cache = util.CritpathCache(size=2)
+        fetch = mock.patch('bodhi.server.util._fetch_critpath_components',
+                           side_effect=lambda collection, type_: ['gcc', collection, 'gcc'])
+        self.fetch = fetch.start()
+        self.addCleanup(fetch.stop)
+
+    def test_get(self):
+        """The fetched components should be deduplicated and cached."""
+        self.assertEqual(self.cache.get('f26', 'rpm'), ('gcc', 'f26'))
+        self.assertEqual(self.cache.get('f26', 'rpm'), ('gcc', 'f26'))
+
+        self.fetch.assert_called_once_with('f26', 'rpm')
+
+    @mock.patch('bodhi.server.util.time.time')
+    def test_expired(self, time):
+        """Components older than critpath.cache_ttl should be fetched again."""
+        time.return_value = 1000
+        self.cache.get('f26', 'rpm')
+        time.return_value = 1000 + 3600
+
+        self.cache.get('f26', 'rpm')
+
+        self.assertEqual(self.fetch.call_count, 2)
+
+    @mock.patch('bodhi.server.util.time.time')
+    def test_expired_unreachable(self, time):
+        """Expired components should be used if they can't be fetched again."""
+        time.return_value = 1000
+        self.cache.get('f26', 'rpm')
+        time.return_value = 1000 + 3600
+        self.fetch.side_effect = IOError('PDC is down')
+
+        self.assertEqual(self.cache.get('f26', 'rpm'), ('gcc', 'f26'))
+
+    def test_unreachable(self):
+        """Errors should be raised if the components were never fetched."""
+        self.fetch.side_effect = IOError('PDC is down')
+
+        with self.assertRaises(IOError):
+            self.cache.get('f26', 'rpm')
+
+    def test_bounded(self):
+        """Only the most recently used collections should be kept."""
+        self.cache.get('f26', 'rpm')
+        self.cache.get('f27', 'rpm')
+        self.cache.get('f26', 'rpm')
+        self.cache.get('f26', 'module')
+
+        self.assertEqual(list(self.cache._entries), [('f26', 'rpm'), ('f26', 'module')])
+
+    @mock.patch.dict(util.config, {'critpath.cache_ttl': 0})
+    def test_disabled(self):
+        """A ttl of 0 should disable the cache."""
+        self.cache.get('f26', 'rpm')
+        self.cache.get('f26', 'rpm')
+
+        self.assertEqual(self.fetch.call_count, 2)
+        self.assertEqual(len(self.cache._entries), 0)
+
+
 class TestUtils(base.BaseTestCase):
 
     def setUp(self):
         setup_buildsystem({'buildsystem': 'dev'})
+        util.critpath_cache.invalidate()
 
     def tearDown(self):
         teardown_buildsystem()
@@ -408,69 +473,36 @@ class TestUtils(base.BaseTestCase):
 
     @mock.patch('bodhi.server.util.http_session')
     @mock.patch.dict(util.config, {'critpath.type': 'pdc', 'pdc_url': 'http://domain.local'})
-    def test_get_critpath_components_pdc_paging_exception(self, session):
-        """Ensure that an Exception is raised if components are used and the response is paged."""
-        pdc_url = 'http://domain.local/rest_api/v1/component-branches/?page_size=1'
-        pdc_next_url = '{0}&page=2'.format(pdc_url)
+    def test_get_critpath_pdc_with_components(self, session):
+        """The components should be looked up in all the critpath components of the branch."""
         session.get.return_value.status_code = 200
-        session.get.return_value.json.side_effect = [
-            {
-                'count': 2,
-                'next': pdc_next_url,
-                'previous': None,
-                'results': [
-                    {
-                        'active': True,
-                        'critical_path': True,
-                        'global_component': 'gcc',
-                        'id': 6,
-                        'name': 'f26',
-                        'slas': [],
-                        'type': 'rpm'
-                    }]}]
+        session.get.return_value.json.return_value = {
+            'count': 2,
+            'next': None,
+            'previous': None,
+            'results': [{'global_component': 'gcc'}, {'global_component': 'python'}]}
 
-        with self.assertRaises(Exception) as exc:
-            util.get_critpath_components('f26', 'rpm', frozenset(['gcc']))
+        pkgs = util.get_critpath_components('f26', 'rpm', frozenset(['gcc', 'bodhi']))
 
-        self.assertEqual(str(exc.exception), 'We got paging when requesting a single component?!')
-        self.assertEqual(
-            session.get.mock_calls,
-            [mock.call(
-                ('http://domain.local/rest_api/v1/component-branches/?name=f26'
-                 '&fields=global_component&global_component=gcc&page_size=100&critical_path=true'
-                 '&active=true&type=rpm'),
-                timeout=60),
-             mock.call().json()])
+        self.assertEqual(pkgs, ['gcc'])
+        self.assertEqual(session.get.call_count, 1)
+        url = session.get.mock_calls[0][1][0]
+        self.assertIn('page_size=1000', url)
+        self.assertNotIn('global_component=', url)
 
     @mock.patch('bodhi.server.util.http_session')
     @mock.patch.dict(util.config, {'critpath.type': 'pdc', 'pdc_url': 'http://domain.local'})
-    def test_get_critpath_pdc_with_components(self, session):
-        """Test the components argument to get_critpath_components()."""
+    def test_get_critpath_components_cached(self, session):
+        """The components of a branch should only be fetched once."""
         session.get.return_value.status_code = 200
         session.get.return_value.json.return_value = {
-            'count': 1,
-            'next': None,
-            'previous': None,
-            'results': [{
-                'active': True,
-                'critical_path': True,
-                'global_component': 'gcc',
-                'id': 6,
-                'name': 'f26',
-                'slas': [],
-                'type': 'rpm'}]}
+            'count': 1, 'next': None, 'previous': None, 'results': [{'global_component': 'gcc'}]}
 
-        pkgs = util.get_critpath_components('f26', 'rpm', frozenset(['gcc']))
+        self.assertEqual(util.get_critpath_components('f26', 'rpm', frozenset(['gcc'])), ['gcc'])
+        self.assertEqual(util.get_critpath_components('f26', 'rpm', frozenset(['bodhi'])), [])
+        self.assertEqual(util.get_critpath_components('f26'), ['gcc'])
 
-        self.assertEqual(pkgs, ['gcc'])
-        self.assertEqual(
-            session.get.mock_calls,
-            [mock.call(
-                ('http://domain.local/rest_api/v1/component-branches/?name=f26'
-                 '&fields=global_component&global_component=gcc&page_size=100&critical_path=true'
-                 '&active=true&type=rpm'),
-                timeout=60),
-             mock.call().json()])
+        self.assertEqual(session.get.call_count, 1)
 
     @mock.patch('bodhi.server.util.http_session')
     @mock.patch.dict(util.config, {
@@ -868,8 +900,8 @@ class TestUtils(base.BaseTestCase):
             '&lt;script&gt;alert("pants")&lt;/script&gt;</p></div>'
         ), html
 
-    @mock.patch('bodhi.server.util.bleach.clean', return_value='cleaned text')
-    @mock.patch.object(util.bleach, '__version__', u'1.4.3')
+    @mock.patch('bleach.clean', return_value='cleaned text')
+    @mock.patch('bleach.__version__', u'1.4.3')
     def test_markup_with_bleach_1(self, clean):
         """Use mocking to ensure we correctly use the bleach 1 API."""
         text = '# this is a header\nthis is some **text**'
@@ -887,8 +919,8 @@ class TestUtils(base.BaseTestCase):
         clean.assert_called_once_with(expected_text, tags=expected_tags,
                                       attributes=["src", "href", "alt", "title", "class"])
 
-    @mock.patch('bodhi.server.util.bleach.clean', return_value='cleaned text')
-    @mock.patch.object(util.bleach, '__version__', u'2.0')
+    @mock.patch('bleach.clean', return_value='cleaned text')
+    @mock.patch('bleach.__version__', u'2.0')
     def test_markup_with_bleach_2(self, clean):
         """Use mocking to ensure we correctly use the bleach 2 API."""
         text = '# this is a header\nthis is some **text**'
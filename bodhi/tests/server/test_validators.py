@@ -15,15 +15,17 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """This module contains tests for bodhi.server.validators."""
+from collections import defaultdict
 import unittest
 
+import koji
 import mock
 from cornice.errors import Errors
 from pyramid import exceptions
 
 from bodhi.server import validators
 from bodhi.tests.server.base import BaseTestCase
-from bodhi.server import captcha, models
+from bodhi.server import buildsys, captcha, models
 
 
 class TestValidateCSRFToken(BaseTestCase):
@@ -242,6 +244,92 @@ class TestValidateAcls(BaseTestCase):
         assert mock_request.errors == error, mock_request.errors
 
 
+class TestPrefetchBuilds(BaseTestCase):
+    """Test the prefetch_builds() function."""
+
+    def setUp(self):
+        super(TestPrefetchBuilds, self).setUp()
+        self.request = mock.Mock(db=self.db, buildinfo=defaultdict(dict),
+                                 koji=buildsys.DevBuildsys())
+
+    @mock.patch.dict('bodhi.server.buildsys._multicall_settings', {'chunk_size': 3})
+    @mock.patch('bodhi.server.buildsys.DevBuildsys.multiCall', autospec=True,
+                side_effect=buildsys.DevBuildsys.multiCall)
+    def test_chunked(self, multiCall):
+        """The builds should be fetched in multicalls of koji_multicall_chunk_size calls."""
+        validators.prefetch_builds(self.request, ['bodhi-2.0-1.fc17', 'python-nose-1.3.7-11.fc17'])
+
+        self.assertEqual(multiCall.call_count, 2)
+        for build in ('bodhi-2.0-1.fc17', 'python-nose-1.3.7-11.fc17'):
+            self.assertEqual(self.request.buildinfo[build]['info']['nvr'], build)
+            self.assertEqual(self.request.buildinfo[build]['tags'],
+                             ['f17-updates-candidate', 'f17', 'f17-updates-testing'])
+
+    @mock.patch('bodhi.server.buildsys.DevBuildsys.multiCall')
+    def test_cached(self, multiCall):
+        """Builds that are already cached should not be fetched again."""
+        self.request.buildinfo['bodhi-2.0-1.fc17'] = {'info': {}, 'tags': []}
+
+        validators.prefetch_builds(self.request, ['bodhi-2.0-1.fc17'])
+
+        self.assertEqual(multiCall.call_count, 0)
+        self.assertEqual(self.request.buildinfo['bodhi-2.0-1.fc17'], {'info': {}, 'tags': []})
+
+    def test_mirrored_tags(self):
+        """The tags of known builds should be read from the mirror."""
+        self.db.query(models.Build).filter_by(nvr=u'bodhi-2.0-1.fc17').one().set_tags(
+            [u'f17-updates-testing'])
+        self.db.flush()
+        listTags = mock.Mock()
+
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.listTags',
+                        buildsys.multicall_enabled(listTags)):
+            validators.prefetch_builds(self.request, ['bodhi-2.0-1.fc17'])
+
+        self.assertEqual(listTags.call_count, 0)
+        self.assertEqual(self.request.buildinfo['bodhi-2.0-1.fc17']['tags'],
+                         ['f17-updates-testing'])
+        self.assertEqual(self.request.buildinfo['bodhi-2.0-1.fc17']['info']['nvr'],
+                         'bodhi-2.0-1.fc17')
+
+    def test_fault(self):
+        """The results of failed calls should not be cached."""
+        listTags = mock.Mock(side_effect=koji.GenericError('No such build'))
+
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.listTags',
+                        buildsys.multicall_enabled(listTags)):
+            validators.prefetch_builds(self.request, ['bodhi-2.0-1.fc17'])
+
+        self.assertEqual(self.request.buildinfo['bodhi-2.0-1.fc17'].keys(), ['info'])
+
+    def test_validate_nvrs(self):
+        """validate_nvrs() should prefetch the builds rather than fetch them one by one."""
+        self.request.validated = {'builds': ['bodhi-2.0-1.fc17', 'python-nose-1.3.7-11.fc17']}
+
+        with mock.patch.object(self.request.koji, 'getBuild',
+                               wraps=self.request.koji.getBuild) as getBuild:
+            validators.validate_nvrs(self.request)
+
+        self.assertEqual(getBuild.call_count, 2)
+        self.assertEqual(self.request.buildinfo['bodhi-2.0-1.fc17']['nvr'],
+                         ('bodhi', '2.0', '1.fc17'))
+        self.assertIn('tags', self.request.buildinfo['python-nose-1.3.7-11.fc17'])
+
+
+class TestValidateTags(BaseTestCase):
+    """Test the validate_tags() function."""
+
+    def test_tags(self):
+        """Invalid tags should be reported."""
+        request = mock.Mock(db=self.db, errors=Errors(), koji=buildsys.DevBuildsys())
+        request.validated = {'stable_tag': 'f27', 'testing_tag': 'epel7-testing'}
+
+        validators.validate_tags(request)
+
+        self.assertEqual(request.errors, [{'location': 'body', 'name': 'testing_tag',
+                                           'description': 'Invalid tag: epel7-testing'}])
+
+
 class TestValidateCaptcha(BaseTestCase):
     """Test the validate_captcha() function."""
 
@@ -50,6 +50,19 @@ class TestGenericViews(base.BaseTestCase):
         self.assertIn('Log out', res)
         self.assertIn('Fedora Update System', res)
 
+    def test_home_top_testers_and_latest_updates(self):
+        """Assert that the home page lists the top testers and the latest security updates."""
+        update = self.db.query(Update).one()
+        update.type = UpdateType.security
+        update.status = UpdateStatus.testing
+        update.comment(self.db, u'Works for me.', karma=1, author=u'bowlofeggs')
+        self.db.commit()
+
+        res = self.app.get('/', status=200)
+
+        self.assertIn('http://localhost/users/bowlofeggs', res)
+        self.assertIn('Latest Security Updates in Need of Testing', res)
+
     def test_markdown(self):
         res = self.app.get('/markdown', {'text': 'wat'}, status=200)
         self.assertEquals(
@@ -480,7 +493,6 @@ class TestFrontpageView(base.BaseTestCase):
                            [UpdateType.newpackage, 4]]]]
         _add_updates(addedupdates2, user2, pendingrelease, "fc18")
         self.db.flush()
-        Release._tag_cache = None
 
     def test_home_counts(self):
         """Test the frontpage update counts"""
@@ -258,6 +258,14 @@ man_pages = [
     ('user/man_pages/bodhi-monitor-composes', 'bodhi-monitor-composes', u'display a compose report',
      ['Randy Barlow'], 1),
     ('user/man_pages/bodhi-push', 'bodhi-push', u'push Fedora updates', ['Randy Barlow'], 1),
+    ('user/man_pages/bodhi-rebuild-release-stats', 'bodhi-rebuild-release-stats',
+     u'recompute the release statistics', ['Bodhi developers'], 1),
+    ('user/man_pages/bodhi-refresh-acls', 'bodhi-refresh-acls',
+     u'refresh the cached package ACLs', ['Bodhi developers'], 1),
+    ('user/man_pages/bodhi-send-mail', 'bodhi-send-mail',
+     u'send the queued e-mails', ['Bodhi developers'], 1),
+    ('user/man_pages/bodhi-sync-build-tags', 'bodhi-sync-build-tags',
+     u'sync the mirrored koji tags of builds', ['Bodhi developers'], 1),
     ('user/man_pages/initialize_bodhi_db', 'initialize_bodhi_db', u'intialize bodhi\'s database',
      ['Randy Barlow'], 1),
     ('user/man_pages/bodhi-expire-overrides', 'bodhi-expire-overrides',
@@ -162,6 +162,10 @@ setup(
     bodhi-approve-testing = bodhi.server.scripts.approve_testing:main
     bodhi-manage-releases = bodhi.server.scripts.manage_releases:main
     bodhi-check-policies = bodhi.server.scripts.check_policies:check
+    bodhi-rebuild-release-stats = bodhi.server.scripts.rebuild_release_stats:rebuild_release_stats
+    bodhi-refresh-acls = bodhi.server.scripts.refresh_acls:refresh_acls
+    bodhi-send-mail = bodhi.server.scripts.send_mail:send_mail
+    bodhi-sync-build-tags = bodhi.server.scripts.sync_build_tags:sync_build_tags
     [moksha.consumer]
     masher = bodhi.server.consumers.masher:Masher
     updates = bodhi.server.consumers.updates:UpdatesHandler
@@ -0,0 +1,1110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Benchmark Bodhi against a reproducible, synthetic dataset.
+
+The dataset is generated from a seed, so two runs with the same options benchmark the same data.
+Update counts per package, builds and bugs per update, comments per update and the statuses and
+types of updates follow skewed distributions similar to Fedora's. Koji is emulated by the
+synthetic buildsystem, which serves a catalog of ``--koji-builds`` builds through the same session
+pool and caches as Koji, and can be made slow or unreliable with ``--koji-latency``,
+``--koji-call-latency`` and ``--koji-failure-rate``. ``--buildsystem dev`` uses the DevBuildsys
+instead.
+
+The benchmarks are split in groups that can be selected with ``--only``:
+
+    services       GET requests on the main REST services and web pages.
+    validators     POST requests creating updates and comments, which run the validators.
+    serialization  The JSON serialization of updates and comments.
+    metadata       The generation of updateinfo.xml by UpdateInfoMetadata.
+    masher         The phases of composes of pending updates, without Pungi.
+    compose        The phases and memory of RPM and module composes, from the tagging of the
+                   builds to the sync of the repositories, with a fake Pungi.
+
+The ``compose`` group runs the RPMComposerThread and the ModuleComposerThread against the synthetic
+buildsystem, with ``tools/fake-pungi.py`` as Pungi. It writes composes of ``--compose-packages``
+packages for each of the ``--compose-arches`` with createrepo_c, so it needs createrepo_c and
+librepo, but no network. The peak memory of the composes is reported as well as their phases.
+
+The results are written as JSON, and can be compared to the results of another commit::
+
+    $ git checkout develop && python tools/benchmark.py --output develop.json
+    $ git checkout my-branch && python tools/benchmark.py --compare develop.json
+
+By default the dataset is written to a temporary SQLite database. Use ``--db`` to benchmark
+PostgreSQL, and ``--skip-seed`` to reuse a database seeded by a previous run.
+"""
+from __future__ import print_function
+
+from datetime import datetime, timedelta
+import collections
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+
+import click
+
+
+#: The settings of the web application that is benchmarked.
+APP_SETTINGS = {
+    'acl_system': 'dummy',
+    'admin_groups': 'bodhiadmin releng',
+    'admin_packager_groups': 'provenpackager',
+    'authtkt.secret': 'benchmark',
+    'authtkt.secure': False,
+    'base_address': 'http://0.0.0.0:6543',
+    'bugtracker': 'dummy',
+    'cache.regions': 'default_term, second, short_term, long_term',
+    'cache.type': 'memory',
+    'cors_connect_src': 'http://0.0.0.0:6543',
+    'cors_origins_ro': 'http://0.0.0.0:6543',
+    'cors_origins_rw': 'http://0.0.0.0:6543',
+    'critpath.num_admin_approvals': 0,
+    'critpath_pkgs': 'kernel',
+    'dogpile.cache.backend': 'dogpile.cache.memory',
+    'fedmsg_enabled': False,
+    'important_groups': 'proventesters provenpackager releng',
+    'mako.directories': 'bodhi:server/templates',
+    'mandatory_packager_groups': 'packager',
+    'openid.provider': 'https://id.stg.fedoraproject.org/openid/',
+    'openid.url': 'https://id.stg.fedoraproject.org',
+    'openid_template': '{username}.id.fedoraproject.org',
+    'resultsdb_api_url': 'whatever',
+    'session.secret': 'benchmark',
+    'site_requirements': u'',
+    'stats_blacklist': 'bodhi autoqa',
+    'system_users': 'bodhi autoqa',
+    'test_case_base_url': 'https://fedoraproject.org/wiki/',
+}
+#: The script that stands in for pungi-koji, and the templates of its configs.
+FAKE_PUNGI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake-pungi.py')
+FAKE_PUNGI_BASEPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                   'fake-pungi.basepath')
+#: The name of the user the benchmarks are run as.
+USER = u'bench'
+#: How many updates are inserted at once while seeding, with their builds, bugs and comments.
+BATCH_SIZE = 1000
+WORDS = (u'fix crash when the update is pushed to stable with no builds and the package has '
+         u'security issue regression in the new upstream release rebase memory leak on startup '
+         u'works for me karma thanks tested on x86_64 and aarch64 please push').split()
+
+log = logging.getLogger('bodhi.benchmark')
+
+
+def _weighted(rng, choices):
+    """
+    Return a random value from weighted choices.
+
+    Args:
+        rng (random.Random): The random number generator.
+        choices (tuple): (value, weight) 2-tuples.
+    Returns:
+        object: One of the values.
+    """
+    point = rng.random() * sum(w for v, w in choices)
+    for value, weight in choices:
+        point -= weight
+        if point < 0:
+            return value
+    return choices[-1][0]
+
+
+def _skewed(rng, n, exponent=3):
+    """
+    Return a random index in [0, n), heavily skewed towards the lower indices.
+
+    This gives some packages, users and bugs many more updates or comments than others.
+
+    Args:
+        rng (random.Random): The random number generator.
+        n (int): The number of indices.
+        exponent (int): The higher, the more skewed the distribution is.
+    Returns:
+        int: The index.
+    """
+    return min(int(n * rng.random() ** exponent), n - 1)
+
+
+def _text(rng, mean_words):
+    """
+    Return random text with a log-normal number of words.
+
+    Args:
+        rng (random.Random): The random number generator.
+        mean_words (int): The median number of words.
+    Returns:
+        unicode: The text.
+    """
+    words = max(1, int(rng.lognormvariate(0, 0.8) * mean_words))
+    return u' '.join(rng.choice(WORDS) for i in range(words))
+
+
+class Dataset(object):
+    """
+    A synthetic dataset, generated from a seed.
+
+    Attributes:
+        seed (int): The seed of the random number generator.
+        releases (int): The number of releases.
+        updates (int): The number of updates.
+        comments (int): The total number of comments.
+        overrides (int): The number of buildroot overrides.
+        counts (dict): The number of rows inserted in each table, once :meth:`seed_db` has run.
+    """
+
+    def __init__(self, seed=0, releases=4, updates=100000, comments=2000000, overrides=2000):
+        """
+        Initialize the dataset.
+
+        Args:
+            seed (int): See the class attributes.
+            releases (int): See the class attributes.
+            updates (int): See the class attributes.
+            comments (int): See the class attributes.
+            overrides (int): See the class attributes.
+        """
+        self.seed = seed
+        self.releases = releases
+        self.updates = updates
+        self.comments = comments
+        self.overrides = overrides
+        self.counts = collections.Counter()
+        self._rows = collections.defaultdict(list)
+
+    @property
+    def params(self):
+        """
+        Return the parameters of the dataset.
+
+        Returns:
+            dict: The parameters, suitable for the results.
+        """
+        return {'seed': self.seed, 'releases': self.releases, 'updates': self.updates,
+                'comments': self.comments, 'overrides': self.overrides}
+
+    def _add(self, table, row):
+        """
+        Queue a row to be inserted by the next :meth:`_flush` of its table.
+
+        Args:
+            table (sqlalchemy.Table): The table.
+            row (dict): The row.
+        """
+        self._rows[table].append(row)
+
+    def _flush(self, db, *tables):
+        """
+        Insert the queued rows of the given tables, in order.
+
+        Tables must be flushed after the tables they reference.
+
+        Args:
+            db (sqlalchemy.orm.session.Session): The database session.
+            tables (list): The tables.
+        """
+        for table in tables:
+            rows = self._rows.pop(table, None)
+            if rows:
+                db.execute(table.insert(), rows)
+                self.counts[table.name] += len(rows)
+
+    def seed_db(self, db):
+        """
+        Insert the dataset in an empty database.
+
+        Primary keys are assigned here rather than by the database, so that the rows can be
+        inserted in bulk.
+
+        Args:
+            db (sqlalchemy.orm.session.Session): The database session.
+        """
+        from bodhi.server import models, stats
+
+        rng = random.Random(self.seed)
+        tables = dict((name, models.Base.metadata.tables[name]) for name in (
+            'releases', 'users', 'groups', 'user_group_table', 'packages', 'user_package_table',
+            'updates', 'builds', 'bugs', 'update_bug_table', 'comments', 'buildroot_overrides'))
+
+        releases = []
+        for i in range(self.releases):
+            version = 25 + i
+            state = models.ReleaseState.current
+            if i == self.releases - 1 and self.releases > 1:
+                state = models.ReleaseState.pending
+            elif i < self.releases - 3:
+                state = models.ReleaseState.archived
+            releases.append({
+                'id': i + 1, 'name': u'F%d' % version, 'long_name': u'Fedora %d' % version,
+                'version': u'%d' % version, 'id_prefix': u'FEDORA', 'branch': u'f%d' % version,
+                'dist_tag': u'f%d' % version, 'stable_tag': u'f%d-updates' % version,
+                'testing_tag': u'f%d-updates-testing' % version,
+                'candidate_tag': u'f%d-updates-candidate' % version,
+                'pending_signing_tag': u'f%d-updates-testing-signing' % version,
+                'pending_testing_tag': u'f%d-updates-testing-pending' % version,
+                'pending_stable_tag': u'f%d-updates-pending' % version,
+                'override_tag': u'f%d-override' % version, 'state': state})
+        db.execute(tables['releases'].insert(), releases)
+        self.counts['releases'] = len(releases)
+
+        groups = [u'packager', u'provenpackager', u'proventesters']
+        db.execute(tables['groups'].insert(),
+                   [{'id': i + 1, 'name': name} for i, name in enumerate(groups)])
+        self.counts['groups'] = len(groups)
+
+        n_users = max(100, self.updates // 50)
+        users = [u'bodhi', USER] + [u'user%05d' % i for i in range(n_users - 2)]
+        for i, name in enumerate(users):
+            self._add(tables['users'],
+                      {'id': i + 1, 'name': name, 'email': u'%s@example.com' % name})
+        self._flush(db, tables['users'])
+        for i in range(len(users)):
+            self._add(tables['user_group_table'], {'user_id': i + 1, 'group_id': 1})
+        self._add(tables['user_group_table'], {'user_id': 2, 'group_id': 2})
+        self._flush(db, tables['user_group_table'])
+
+        n_packages = max(50, self.updates // 5)
+        for i in range(n_packages):
+            self._add(tables['packages'],
+                      {'id': i + 1, 'name': u'package%05d' % i, 'type': models.ContentType.rpm})
+            for j in set(3 + _skewed(rng, n_users - 2, 2) for k in range(1 + _skewed(rng, 4))):
+                self._add(tables['user_package_table'], {'user_id': j, 'package_id': i + 1})
+        self._flush(db, tables['packages'], tables['user_package_table'])
+
+        n_bugs = max(10, self.updates // 3)
+        bugs = set()
+        build_ids = []
+        start = datetime(2013, 1, 1)
+        span = timedelta(days=5 * 365).total_seconds()
+        comments_per_update = float(self.comments) / max(self.updates, 1)
+        build_id = comment_id = 0
+
+        for i in range(self.updates):
+            update_id = i + 1
+            release_index = min(self.releases - 1, i * self.releases // self.updates)
+            if release_index and rng.random() < 0.2:
+                release_index -= 1
+            release = releases[release_index]
+            if release['state'] is models.ReleaseState.pending:
+                status = _weighted(rng, ((models.UpdateStatus.stable, 30),
+                                         (models.UpdateStatus.testing, 40),
+                                         (models.UpdateStatus.pending, 20),
+                                         (models.UpdateStatus.obsolete, 5),
+                                         (models.UpdateStatus.unpushed, 5)))
+            else:
+                status = _weighted(rng, ((models.UpdateStatus.stable, 70),
+                                         (models.UpdateStatus.testing, 12),
+                                         (models.UpdateStatus.pending, 5),
+                                         (models.UpdateStatus.obsolete, 8),
+                                         (models.UpdateStatus.unpushed, 5)))
+            type_ = _weighted(rng, ((models.UpdateType.bugfix, 55),
+                                    (models.UpdateType.enhancement, 25),
+                                    (models.UpdateType.security, 10),
+                                    (models.UpdateType.newpackage, 10)))
+            request = None
+            if status is models.UpdateStatus.pending:
+                request = models.UpdateRequest.testing
+            elif status is models.UpdateStatus.testing and rng.random() < 0.1:
+                request = models.UpdateRequest.stable
+            submitted = start + timedelta(seconds=span * i / self.updates)
+            date_testing = date_stable = None
+            if status in (models.UpdateStatus.testing, models.UpdateStatus.stable,
+                          models.UpdateStatus.obsolete):
+                date_testing = submitted + timedelta(hours=rng.randint(1, 48))
+            if status is models.UpdateStatus.stable:
+                date_stable = date_testing + timedelta(days=rng.randint(1, 14))
+
+            nvrs = []
+            packages = set(1 + _skewed(rng, n_packages) for j in range(
+                min(20, 1 + int(rng.expovariate(1.5)))))
+            for package_id in sorted(packages):
+                build_id += 1
+                nvr = u'package%05d-1.%d-1.fc%s' % (package_id - 1, update_id, release['version'])
+                nvrs.append(nvr)
+                build_ids.append(build_id)
+                self._add(tables['builds'], {
+                    'id': build_id, 'nvr': nvr, 'package_id': package_id,
+                    'release_id': release['id'], 'signed': True, 'update_id': update_id,
+                    'type': models.ContentType.rpm, 'epoch': 0})
+
+            self._add(tables['updates'], {
+                'id': update_id, 'title': u' '.join(nvrs),
+                'alias': u'FEDORA-%d-%010x' % (submitted.year, update_id),
+                'autokarma': rng.random() < 0.7, 'stable_karma': 3, 'unstable_karma': -3,
+                'notes': _text(rng, 30), 'type': type_, 'status': status, 'request': request,
+                'severity': (models.UpdateSeverity.medium if type_ is models.UpdateType.security
+                             else models.UpdateSeverity.unspecified),
+                'critpath': rng.random() < 0.05, 'locked': False,
+                'pushed': status is not models.UpdateStatus.pending,
+                'date_submitted': submitted, 'date_modified': None, 'date_testing': date_testing,
+                'date_stable': date_stable, 'date_pushed': date_stable or date_testing,
+                'release_id': release['id'], 'user_id': 3 + _skewed(rng, n_users - 2, 2)})
+
+            if rng.random() < 0.35:
+                for bug_id in set(1000000 + _skewed(rng, n_bugs, 2)
+                                  for j in range(1 + int(rng.expovariate(1)))):
+                    if bug_id not in bugs:
+                        bugs.add(bug_id)
+                        self._add(tables['bugs'], {
+                            'id': bug_id, 'bug_id': bug_id, 'title': _text(rng, 8)[:255],
+                            'security': type_ is models.UpdateType.security, 'parent': False})
+                    self._add(tables['update_bug_table'],
+                              {'update_id': update_id, 'bug_id': bug_id})
+
+            karma_date = date_testing or submitted
+            for j in range(int(rng.expovariate(1.0 / comments_per_update))
+                           if comments_per_update else 0):
+                comment_id += 1
+                self._add(tables['comments'], {
+                    'id': comment_id, 'update_id': update_id,
+                    'user_id': 3 + _skewed(rng, n_users - 2),
+                    'karma': _weighted(rng, ((0, 80), (1, 15), (-1, 5))), 'karma_critpath': 0,
+                    'text': _text(rng, 15), 'anonymous': False,
+                    'timestamp': karma_date + timedelta(minutes=j)})
+
+            if update_id % BATCH_SIZE == 0:
+                self._flush(db, tables['updates'], tables['builds'], tables['bugs'],
+                            tables['update_bug_table'], tables['comments'])
+
+        self._flush(db, tables['updates'], tables['builds'], tables['bugs'],
+                    tables['update_bug_table'], tables['comments'])
+
+        now = datetime.utcnow()
+        for i, build in enumerate(rng.sample(build_ids, min(self.overrides, len(build_ids)))):
+            expired = rng.random() < 0.8
+            self._add(tables['buildroot_overrides'], {
+                'id': i + 1, 'build_id': build, 'submitter_id': 3 + _skewed(rng, n_users - 2),
+                'notes': _text(rng, 10), 'submission_date': now - timedelta(days=30),
+                'expiration_date': now + timedelta(days=-7 if expired else 7),
+                'expired_date': now - timedelta(days=7) if expired else None})
+        self._flush(db, tables['buildroot_overrides'])
+
+        if db.bind.dialect.name == 'postgresql':
+            for name, table in tables.items():
+                if 'id' in table.c:
+                    db.execute("SELECT setval(pg_get_serial_sequence('%s', 'id'), "
+                               "(SELECT MAX(id) FROM %s))" % (name, name))
+        stats.rebuild(db)
+        db.commit()
+
+
+class PeakMemory(object):
+    """
+    Measure the peak resident memory of this process while a block of code runs.
+
+    The resident set size is sampled from ``/proc/self/statm`` by a thread. Where there is no
+    ``/proc``, the peak since the process started is used instead.
+
+    Attributes:
+        interval (float): How many seconds pass between two samples.
+        baseline (float): The usage when the block started, in MiB.
+        peak (float): The highest usage while the block ran, in MiB.
+    """
+
+    def __init__(self, interval=0.01):
+        """
+        Initialize the measure.
+
+        Args:
+            interval (float): See the class attributes.
+        """
+        self.interval = interval
+        self.baseline = self.peak = 0.0
+        self._done = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def usage():
+        """
+        Return the resident memory of this process.
+
+        Returns:
+            float: The usage, in MiB.
+        """
+        try:
+            with open('/proc/self/statm') as statm:
+                pages = int(statm.read().split()[1])
+            return pages * resource.getpagesize() / 1024.0 ** 2
+        except IOError:
+            # ru_maxrss is in KiB on Linux, and in bytes on macOS.
+            scale = 1024.0 ** 2 if sys.platform == 'darwin' else 1024.0
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+    @staticmethod
+    def children():
+        """
+        Return the peak resident memory of the largest child process that has exited.
+
+        Returns:
+            float: The peak, in MiB.
+        """
+        scale = 1024.0 ** 2 if sys.platform == 'darwin' else 1024.0
+        return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+
+    def _sample(self):
+        """Sample the usage until the block is done."""
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, self.usage())
+
+    def __enter__(self):
+        """
+        Start sampling.
+
+        Returns:
+            PeakMemory: This measure.
+        """
+        self.baseline = self.peak = self.usage()
+        self._thread = threading.Thread(target=self._sample)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Stop sampling.
+
+        Args:
+            exc_info (tuple): The exception raised by the block, if any.
+        """
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.usage())
+
+    @property
+    def growth(self):
+        """
+        Return how much the peak exceeds the usage when the block started.
+
+        Returns:
+            float: The growth, in MiB.
+        """
+        return self.peak - self.baseline
+
+
+class Runner(object):
+    """
+    Time benchmarks and collect their results.
+
+    Attributes:
+        repeat (int): How many times each benchmark is timed.
+        results (collections.OrderedDict): Maps the names of the benchmarks to their statistics.
+        memory (collections.OrderedDict): Maps the names of the benchmarks that measure memory to
+            their peak usage, in MiB.
+    """
+
+    def __init__(self, repeat):
+        """
+        Initialize the runner.
+
+        Args:
+            repeat (int): See the class attributes.
+        """
+        self.repeat = repeat
+        self.results = collections.OrderedDict()
+        self.memory = collections.OrderedDict()
+
+    def record(self, name, durations):
+        """
+        Record the durations of a benchmark.
+
+        Args:
+            name (basestring): The name of the benchmark.
+            durations (list): How many seconds each run took.
+        """
+        durations = sorted(durations)
+        middle = len(durations) // 2
+        median = durations[middle] if len(durations) % 2 else \
+            (durations[middle - 1] + durations[middle]) / 2
+        self.results[name] = {
+            'runs': len(durations), 'min': durations[0], 'max': durations[-1],
+            'mean': sum(durations) / len(durations), 'median': median}
+        click.echo('%-45s %10.4fs (min %.4fs, max %.4fs)' % (
+            name, median, durations[0], durations[-1]))
+
+    def record_memory(self, name, peaks, growths=()):
+        """
+        Record the peak memory usage of the runs of a benchmark.
+
+        Args:
+            name (basestring): The name of the benchmark.
+            peaks (list): The peak usage of each run, in MiB.
+            growths (list): How much the peak of each run exceeded the usage before the run, in
+                MiB, if known.
+        """
+        self.memory[name] = {'runs': len(peaks), 'peak': max(peaks)}
+        line = '%-45s %9.1fMiB' % (name, max(peaks))
+        if growths:
+            self.memory[name]['growth'] = max(growths)
+            line += ' (growth %.1fMiB)' % max(growths)
+        click.echo(line)
+
+    def time(self, name, func, warmup=1):
+        """
+        Time a function after warming it up, and record its durations.
+
+        Args:
+            name (basestring): The name of the benchmark.
+            func (callable): The function to time. It is called without arguments.
+            warmup (int): How many times to call the function before timing it.
+        """
+        for i in range(warmup):
+            func()
+        durations = []
+        for i in range(self.repeat):
+            start = timeit.default_timer()
+            func()
+            durations.append(timeit.default_timer() - start)
+        self.record(name, durations)
+
+
+def _rpm_release(db):
+    """
+    Return the newest release of the dataset.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): The database session.
+    Returns:
+        bodhi.server.models.Release: The release.
+    """
+    from bodhi.server import models
+
+    return db.query(models.Release).filter_by(id_prefix=u'FEDORA').order_by(
+        models.Release.id.desc()).first()
+
+
+def bench_services(runner, app, db):
+    """
+    Time GET requests on the main services and pages.
+
+    Args:
+        runner (Runner): The runner.
+        app (webtest.TestApp): The web application.
+        db (sqlalchemy.orm.session.Session): The database session.
+    """
+    from bodhi.server import models
+
+    release = _rpm_release(db)
+    update = db.query(models.Update).get(max(1, db.query(models.Update).count() // 2))
+    package = db.query(models.Package).order_by(models.Package.id).first()
+    comment = db.query(models.Comment).order_by(models.Comment.id.desc()).first()
+    user = db.query(models.User).filter_by(id=3).one()
+    json_headers = {'Accept': 'application/json'}
+
+    urls = [
+        ('home', '/', {}),
+        ('updates_list', '/updates/', json_headers),
+        ('updates_list_html', '/updates/', {}),
+        ('updates_by_package', '/updates/?packages=%s' % package.name, json_headers),
+        ('updates_testing_release', '/updates/?status=testing&release=%s&rows_per_page=100'
+         % release.name, json_headers),
+        ('updates_search', '/updates/?like=package0001', json_headers),
+        ('update_view', '/updates/%s' % update.alias, json_headers),
+        ('update_view_html', '/updates/%s' % update.alias, {}),
+        ('releases_list', '/releases/', json_headers),
+        ('release_view', '/releases/%s' % release.name, json_headers),
+        ('comments_list', '/comments/', json_headers),
+        ('comments_by_update', '/comments/?updates=%s' % update.alias, json_headers),
+        ('comment_view', '/comments/%d' % comment.id if comment else '/comments/', json_headers),
+        ('users_list', '/users/', json_headers),
+        ('user_view', '/users/%s' % user.name, json_headers),
+        ('overrides_list', '/overrides/', json_headers),
+        ('builds_list', '/builds/?packages=%s' % package.name, json_headers),
+    ]
+    for name, url, headers in urls:
+        runner.time('services.%s' % name, lambda: app.get(url, headers=headers, status=200))
+
+
+def bench_validators(runner, app, db):
+    """
+    Time the creation of updates and comments, which goes through the validators.
+
+    Args:
+        runner (Runner): The runner.
+        app (webtest.TestApp): The web application.
+        db (sqlalchemy.orm.session.Session): The database session.
+    """
+    from bodhi.server import models
+
+    release = _rpm_release(db)
+    update = db.query(models.Update).filter_by(
+        release=release, status=models.UpdateStatus.testing).first()
+    csrf_token = app.get('/csrf').json_body['csrf_token']
+    counter = iter(range(1, sys.maxsize))
+
+    def new_update():
+        nvr = u'benchmark-1.0-%d.fc%s' % (next(counter), release.version)
+        app.post_json('/updates/', {
+            'builds': nvr, 'bugs': u'', 'notes': u'A benchmark update', 'type': u'bugfix',
+            'autokarma': True, 'stable_karma': 3, 'unstable_karma': -3, 'requirements': u'',
+            'require_bugs': False, 'require_testcases': False, 'csrf_token': csrf_token},
+            status=200)
+
+    def new_comment():
+        app.post_json('/comments/', {'update': update.alias, 'text': u'Works for me',
+                                     'karma': 0, 'csrf_token': csrf_token}, status=200)
+
+    runner.time('validators.new_update', new_update)
+    if update is not None:
+        runner.time('validators.new_comment', new_comment)
+
+
+def bench_serialization(runner, app, db):
+    """
+    Time the JSON serialization of updates and comments.
+
+    Args:
+        runner (Runner): The runner.
+        app (webtest.TestApp): Unused.
+        db (sqlalchemy.orm.session.Session): The database session.
+    """
+    from bodhi.server import models
+
+    updates = db.query(models.Update).order_by(models.Update.id.desc()).limit(100).all()
+    comments = db.query(models.Comment).order_by(models.Comment.id.desc()).limit(1000).all()
+
+    runner.time('serialization.updates', lambda: [u.__json__() for u in updates])
+    runner.time('serialization.comments', lambda: [c.__json__() for c in comments])
+
+
+def _tag_builds(updates, tag):
+    """
+    Tag the builds of the given updates.
+
+    Args:
+        updates (list): The updates.
+        tag (basestring): The tag.
+    """
+    from bodhi.server import buildsys
+
+    nvrs = [build.nvr for update in updates for build in update.builds]
+    if buildsys._synthetic is None:
+        for nvr in nvrs:
+            buildsys.DevBuildsys.__tagged__.setdefault(nvr, []).append(tag)
+        return
+    # Builds that are already tagged are reported as faults, which are ignored.
+    buildsys.multicall_map([(nvr, 'tagBuild', (tag, nvr), {}) for nvr in nvrs], retries=0)
+
+
+def bench_metadata(runner, app, db, size=200):
+    """
+    Time the generation of the updateinfo.xml of a compose.
+
+    Args:
+        runner (Runner): The runner.
+        app (webtest.TestApp): Unused.
+        db (sqlalchemy.orm.session.Session): The database session.
+        size (int): The number of updates in the repository.
+    """
+    from bodhi.server import models
+    from bodhi.server.metadata import UpdateInfoMetadata
+
+    release = _rpm_release(db)
+    updates = db.query(models.Update).filter_by(
+        release=release, status=models.UpdateStatus.testing).limit(size).all()
+    _tag_builds(updates, release.testing_tag)
+    mashdir = tempfile.mkdtemp(prefix='bodhi-benchmark-')
+    try:
+        runner.time('metadata.updateinfo', lambda: UpdateInfoMetadata(
+            release, models.UpdateRequest.testing, db, mashdir))
+    finally:
+        shutil.rmtree(mashdir)
+
+
+def _pending_compose(db, release, size):
+    """
+    Lock a batch of pending updates of the given release in a new testing compose.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): The database session.
+        release (bodhi.server.models.Release): The release.
+        size (int): The maximum number of updates in the compose.
+    Returns:
+        dict or None: The compose, serialized as the masher expects it, or None if there are no
+            more pending updates.
+    """
+    from bodhi.server import models
+
+    updates = db.query(models.Update).filter_by(
+        release=release, status=models.UpdateStatus.pending,
+        request=models.UpdateRequest.testing, locked=False).limit(size).all()
+    if not updates:
+        return None
+    for update in updates:
+        update.locked = True
+    compose = models.Compose(release=release, request=models.UpdateRequest.testing)
+    db.add(compose)
+    db.flush()
+    # Load the updates of the compose, which its serialization includes.
+    db.refresh(compose)
+    serialized = compose.__json__()
+    db.commit()
+    return serialized
+
+
+def _phase_totals():
+    """
+    Return the total time spent in each masher phase so far, as recorded by the metrics.
+
+    Returns:
+        dict: Maps phase names to seconds.
+    """
+    from bodhi.server import monitoring
+
+    return dict((labels[0], value)
+                for suffix, names, labels, value in monitoring.masher_phase_duration.samples()
+                if suffix == '_sum')
+
+
+def run_composes(runner, db, thread_class, release, size, mash_dir, prefix):
+    """
+    Run a compose per repetition with the given thread class, and record its phases and memory.
+
+    Args:
+        runner (Runner): The runner.
+        db (sqlalchemy.orm.session.Session): The database session.
+        thread_class (type): The :class:`bodhi.server.consumers.masher.ComposerThread` subclass
+            that runs the composes.
+        release (bodhi.server.models.Release): The release the updates are composed for.
+        size (int): The maximum number of updates in each compose.
+        mash_dir (basestring): The directory the composes are written to.
+        prefix (basestring): The prefix of the names of the benchmarks.
+    """
+    from bodhi.server.util import transactional_session_maker
+
+    durations = collections.defaultdict(list)
+    peaks = []
+    growths = []
+    for i in range(runner.repeat):
+        compose = _pending_compose(db, release, size)
+        if compose is None:
+            click.echo('Not enough pending updates for another compose', err=True)
+            break
+        before = _phase_totals()
+        start = timeit.default_timer()
+        thread = thread_class(threading.BoundedSemaphore(1), compose, USER, log,
+                              transactional_session_maker(), mash_dir)
+        with PeakMemory() as memory:
+            thread.run()
+        if not thread.success:
+            click.echo('The %s compose failed, see the log above' % release.name, err=True)
+            break
+        durations['total'].append(timeit.default_timer() - start)
+        for phase, total in _phase_totals().items():
+            durations[phase].append(total - before.get(phase, 0))
+        peaks.append(memory.peak)
+        growths.append(memory.growth)
+    for phase in sorted(durations):
+        runner.record('%s.%s' % (prefix, phase), durations[phase])
+    if peaks:
+        runner.record_memory('%s.memory' % prefix, peaks, growths)
+
+
+def bench_masher(runner, app, db, size=50):
+    """
+    Time the phases of composes of pending updates, without running Pungi.
+
+    Args:
+        runner (Runner): The runner.
+        app (webtest.TestApp): Unused.
+        db (sqlalchemy.orm.session.Session): The database session.
+        size (int): The maximum number of updates in each compose.
+    """
+    from bodhi.server.consumers.masher import RPMComposerThread
+
+    class ComposerThread(RPMComposerThread):
+        """An RPM compose thread that skips Pungi and the mirrors."""
+
+        def _compose_updates(self):
+            """Only generate the testing digest."""
+            self.generate_testing_digest()
+
+    mash_dir = tempfile.mkdtemp(prefix='bodhi-benchmark-')
+    try:
+        run_composes(runner, db, ComposerThread, _rpm_release(db), size, mash_dir, 'masher')
+    finally:
+        shutil.rmtree(mash_dir)
+
+
+def _module_release(db, count):
+    """
+    Return the modular release of the newest release, with ``count`` more pending module updates.
+
+    The release is created the first time. The builds of the updates are added to the candidate
+    tag of the release, in the catalog of the synthetic buildsystem.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): The database session.
+        count (int): The number of pending updates to create.
+    Returns:
+        bodhi.server.models.Release: The modular release.
+    """
+    from bodhi.server import buildsys, models
+
+    version = _rpm_release(db).version
+    release = db.query(models.Release).filter_by(name=u'F%sM' % version).first()
+    if release is None:
+        release = models.Release(
+            name=u'F%sM' % version, long_name=u'Fedora %s Modular' % version,
+            version=version, id_prefix=u'FEDORA-MODULAR', branch=u'f%sm' % version,
+            dist_tag=u'f%sM' % version, stable_tag=u'f%sM-updates' % version,
+            testing_tag=u'f%sM-updates-testing' % version,
+            candidate_tag=u'f%sM-updates-candidate' % version,
+            pending_signing_tag=u'f%sM-updates-testing-signing' % version,
+            pending_testing_tag=u'f%sM-updates-testing-pending' % version,
+            pending_stable_tag=u'f%sM-updates-pending' % version,
+            override_tag=u'f%sM-override' % version, state=models.ReleaseState.current)
+        db.add(release)
+        db.flush()
+
+    user = db.query(models.User).filter_by(name=USER).one()
+    first = db.query(models.ModuleBuild).count()
+    for i in range(first, first + count):
+        package = models.ModulePackage(name=u'module%05d' % i)
+        nvr = u'module%05d-master-%d.%08x' % (i, 20180101000000 + i, i)
+        build = models.ModuleBuild(nvr=nvr, release=release, signed=True, package=package)
+        update = models.Update(
+            title=nvr, builds=[build], user=user, release=release, notes=u'A benchmark update',
+            type=models.UpdateType.enhancement, status=models.UpdateStatus.pending,
+            request=models.UpdateRequest.testing)
+        update.assign_alias()
+        db.add(update)
+        with buildsys._synthetic.lock:
+            buildsys._synthetic.add(nvr, [release.candidate_tag])
+    models.release_registry.invalidate()
+    db.commit()
+    return release
+
+
+def bench_compose(runner, app, db, size=50):
+    """
+    Time the phases of RPM and module composes from end to end, with a fake Pungi.
+
+    Args:
+        runner (Runner): The runner.
+        app (webtest.TestApp): Unused.
+        db (sqlalchemy.orm.session.Session): The database session.
+        size (int): The maximum number of updates in each compose.
+    """
+    from bodhi.server import buildsys
+    from bodhi.server.config import config
+    from bodhi.server.consumers.masher import ModuleComposerThread, RPMComposerThread
+
+    if buildsys._synthetic is None:
+        click.echo('The compose benchmarks need the synthetic buildsystem', err=True)
+        return
+
+    run_composes(runner, db, RPMComposerThread, _rpm_release(db), size, config['mash_dir'],
+                 'compose.rpm')
+    release = _module_release(db, size * runner.repeat)
+    run_composes(runner, db, ModuleComposerThread, release, size, config['mash_dir'],
+                 'compose.module')
+    # Only the peak of the largest child is known, which is the largest Pungi run.
+    runner.record_memory('compose.pungi.memory', [PeakMemory.children()])
+
+
+def _compose_settings(workdir, arches, packages, seed):
+    """
+    Return the settings that make the masher run the fake Pungi and mirror composes locally.
+
+    The master mirror is emulated by the staging directory, so that the masher finds the
+    repositories it waits for as soon as it stages them.
+
+    Args:
+        workdir (basestring): The directory the composes are written and staged in.
+        arches (basestring): A comma-separated list of the architectures of the composes.
+        packages (int): The number of packages in the composes besides their updates.
+        seed (int): The seed of the packages in the composes besides their updates.
+    Returns:
+        dict: The settings.
+    """
+    mash_dir = os.path.join(workdir, 'mash')
+    stage_dir = os.path.join(workdir, 'stage')
+    for path in (mash_dir, stage_dir):
+        os.mkdir(path)
+    repomd = 'file://%s/%%s/compose/Everything/%%%%s/os/repodata/repomd.xml' % stage_dir
+    return {
+        'mash_dir': mash_dir, 'mash_stage_dir': stage_dir,
+        'pungi.cmd': FAKE_PUNGI, 'pungi.basepath': FAKE_PUNGI_BASEPATH,
+        'pungi.extracmdline': ['--arches', arches, '--packages', str(packages),
+                               '--seed', str(seed)],
+        'fedora_testing_master_repomd': repomd % 'f%s-updates-testing',
+        'fedora_stable_master_repomd': repomd % 'f%s-updates',
+        'fedora_modular_testing_master_repomd': repomd % 'f%sM-updates-testing',
+        'fedora_modular_stable_master_repomd': repomd % 'f%sM-updates'}
+
+
+def _git(*args):
+    """
+    Run a git command in the directory of this script.
+
+    Args:
+        args (list): The arguments of the command.
+    Returns:
+        unicode or None: The output of the command, or None if it failed.
+    """
+    try:
+        return subprocess.check_output(
+            ('git',) + args, cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.STDOUT).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base, results):
+    """
+    Print how the medians of the benchmarks changed since a previous run.
+
+    Args:
+        base (dict): The results of the previous run.
+        results (dict): The results of this run.
+    """
+    click.echo('\n%-45s %10s %10s %8s' % ('benchmark', 'base', 'new', 'change'))
+    for name, stats in results['results'].items():
+        before = base['results'].get(name)
+        if before is None:
+            click.echo('%-45s %10s %9.4fs' % (name, '-', stats['median']))
+            continue
+        change = (stats['median'] - before['median']) / before['median'] * 100 \
+            if before['median'] else 0
+        click.echo('%-45s %9.4fs %9.4fs %+7.1f%%' % (
+            name, before['median'], stats['median'], change))
+
+
+#: The groups of benchmarks, in the order they run in.
+BENCHMARKS = collections.OrderedDict([
+    ('services', bench_services), ('validators', bench_validators),
+    ('serialization', bench_serialization), ('metadata', bench_metadata),
+    ('masher', bench_masher), ('compose', bench_compose)])
+
+
+@click.command()
+@click.option('--db', 'db_url', help='The database URL. Defaults to a temporary SQLite database.')
+@click.option('--skip-seed', is_flag=True, help='Reuse a database seeded by a previous run.')
+@click.option('--seed', default=0, help='The seed of the dataset.')
+@click.option('--releases', default=4, help='The number of releases.')
+@click.option('--updates', default=100000, help='The number of updates.')
+@click.option('--comments', default=2000000, help='The total number of comments.')
+@click.option('--overrides', default=2000, help='The number of buildroot overrides.')
+@click.option('--buildsystem', type=click.Choice(['synthetic', 'dev']), default='synthetic',
+              help='The buildsystem that emulates Koji.')
+@click.option('--koji-builds', default=100000,
+              help='The number of builds in the catalog of the synthetic buildsystem.')
+@click.option('--koji-latency', default=0.0,
+              help='How many seconds each round trip to the synthetic buildsystem takes.')
+@click.option('--koji-call-latency', default=0.0,
+              help='How many more seconds each call to the synthetic buildsystem takes.')
+@click.option('--koji-failure-rate', default=0.0,
+              help='The probability of each call to the synthetic buildsystem to fail.')
+@click.option('--compose-arches', default='x86_64,aarch64,ppc64le,s390x',
+              help='A comma-separated list of the architectures of the fake Pungi composes.')
+@click.option('--compose-packages', default=1000,
+              help='The number of packages in the fake Pungi composes besides their updates.')
+@click.option('--repeat', default=5, help='How many times each benchmark is timed.')
+@click.option('--only', help='A comma-separated list of the groups of benchmarks to run.')
+@click.option('--output', type=click.File('w'), help='Write the results to this JSON file.')
+@click.option('--compare', 'base', type=click.File('r'),
+              help='Compare the results with those of a previous run.')
+def main(db_url, skip_seed, seed, releases, updates, comments, overrides, buildsystem,
+         koji_builds, koji_latency, koji_call_latency, koji_failure_rate, compose_arches,
+         compose_packages, repeat, only, output, base):
+    """Benchmark Bodhi against a reproducible, synthetic dataset."""
+    import webtest
+
+    from bodhi.server import Session, buildsys, initialize_db, main as make_app, models
+    from bodhi.server.config import config
+
+    logging.basicConfig(level=logging.WARNING)
+    groups = only.split(',') if only else list(BENCHMARKS)
+    unknown = set(groups) - set(BENCHMARKS)
+    if unknown:
+        raise click.BadParameter('Unknown groups: %s' % ', '.join(sorted(unknown)),
+                                 param_hint='--only')
+
+    tempdir = tempfile.mkdtemp(prefix='bodhi-benchmark-')
+    if not db_url:
+        db_url = 'sqlite:///%s' % os.path.join(tempdir, 'bodhi.sqlite')
+    koji = {'buildsystem': buildsystem}
+    if buildsystem == 'synthetic':
+        koji.update({
+            'synthetic_buildsys.seed': seed, 'synthetic_buildsys.builds': koji_builds,
+            'synthetic_buildsys.releases': [u'%d' % (25 + i) for i in range(releases)],
+            'synthetic_buildsys.latency': koji_latency,
+            'synthetic_buildsys.call_latency': koji_call_latency,
+            'synthetic_buildsys.failure_rate': koji_failure_rate})
+    settings = dict(APP_SETTINGS, **koji)
+    settings.update(_compose_settings(tempdir, compose_arches, compose_packages, seed))
+    settings['sqlalchemy.url'] = db_url
+
+    try:
+        config.load_config(settings)
+        engine = initialize_db(config)
+        dataset = Dataset(seed, releases, updates, comments, overrides)
+        if not skip_seed:
+            click.echo('Seeding %s...' % db_url)
+            models.Base.metadata.create_all(bind=engine)
+            start = timeit.default_timer()
+            dataset.seed_db(Session())
+            click.echo('Seeded %s in %.1fs' % (dict(dataset.counts),
+                                               timeit.default_timer() - start))
+        Session.remove()
+
+        app = webtest.TestApp(make_app({}, testing=USER, **settings))
+        runner = Runner(repeat)
+        db = Session()
+        for group, benchmark in BENCHMARKS.items():
+            if group in groups:
+                benchmark(runner, app, db)
+                Session.remove()
+                db = Session()
+    finally:
+        shutil.rmtree(tempdir)
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': engine.dialect.name,
+        'dataset': dict(dataset.params, counts=dict(dataset.counts)),
+        'koji': koji,
+        'repeat': repeat,
+        'results': runner.results,
+        'memory': runner.memory,
+    }
+    if buildsys._synthetic is not None:
+        results['koji'].update(calls=dict(buildsys._synthetic.calls),
+                               round_trips=buildsys._synthetic.round_trips)
+    if output:
+        json.dump(results, output, indent=2, sort_keys=True)
+    if base:
+        compare(json.load(base), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Red Hat, Inc. and others.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Stand in for pungi-koji, so that composes can be benchmarked without Koji and Pungi.
+
+Set ``pungi.cmd`` to the path of this script and ``pungi.basepath`` to
+``tools/fake-pungi.basepath``, whose templates render the compose in a format this script reads.
+It writes a compose laid out like Pungi's: an ``Everything`` variant with an ``os`` and a ``debug``
+repository for each of the ``--arches``, and a ``source`` repository. The repositories hold the
+builds of the compose and ``--packages`` other packages, and their repodata is generated with
+createrepo_c. Module composes get a ``modules`` record as well. The RPMs are placeholder files,
+which the repodata describes but which can't be installed.
+
+The options of this script that Pungi doesn't have can be set with ``pungi.extracmdline``.
+"""
+from __future__ import print_function
+
+from datetime import datetime
+import hashlib
+import json
+import os
+import random
+
+import click
+import createrepo_c as cr
+
+
+#: The magic number RPM files start with.
+RPM_MAGIC = b'\xed\xab\xee\xdb'
+
+
+def read_config(path):
+    """
+    Read a pungi config rendered from the templates in ``tools/fake-pungi.basepath``.
+
+    The configs hold ``key = value`` lines. The ``build`` and ``module`` keys can be repeated, and
+    the ``modules`` key names a file holding ``module`` lines, relative to the config.
+
+    Args:
+        path (basestring): The path to the config.
+    Returns:
+        dict: The values of the keys, with lists of the ``builds`` and ``modules``.
+    """
+    values = {'builds': [], 'modules': []}
+    with open(path) as config_file:
+        for line in config_file:
+            key, sep, value = line.partition('=')
+            key, value = key.strip(), value.strip()
+            if not sep or key.startswith('#'):
+                continue
+            if key == 'build':
+                values['builds'].append(value)
+            elif key == 'module':
+                values['modules'].append(value.split(':'))
+            elif key == 'modules':
+                values['modules'].extend(
+                    read_config(os.path.join(os.path.dirname(path), value))['modules'])
+            else:
+                values[key] = value
+    return values
+
+
+def packages(config, count, seed):
+    """
+    Return the packages of a compose.
+
+    Args:
+        config (dict): The config of the compose.
+        count (int): The number of packages that aren't built by the compose.
+        seed (int): The seed of the packages that aren't built by the compose.
+    Returns:
+        list: (name, version, release, noarch) 4-tuples.
+    """
+    rng = random.Random(seed)
+    dist = 'fc%s' % config['release_version']
+    result = [('package%05d' % i, '0.%d' % (1 + int(rng.random() * 20)), '1.%s' % dist,
+               rng.random() < 0.2)
+              for i in range(count)]
+    for nvr in config['builds']:
+        name, version, release = nvr.rsplit('-', 2)
+        if config['modules']:
+            # The builds of module composes are modules, whose RPMs are named after them.
+            release = '1.module_%s+%s' % (dist, release.replace('.', '+'))
+        result.append((name, version, release, False))
+    return result
+
+
+class Repository(object):
+    """
+    Write the packages and the repodata of a repository.
+
+    Attributes:
+        path (basestring): The path to the repository.
+    """
+
+    def __init__(self, path, count):
+        """
+        Create the repository and start its repodata.
+
+        Args:
+            path (basestring): See the class attributes.
+            count (int): The number of packages that will be added.
+        """
+        self.path = path
+        self._repodata = os.path.join(path, 'repodata')
+        os.makedirs(self._repodata)
+        self._files = [
+            ('primary', cr.PrimaryXmlFile(os.path.join(self._repodata, 'primary.xml.gz'))),
+            ('filelists', cr.FilelistsXmlFile(os.path.join(self._repodata, 'filelists.xml.gz'))),
+            ('other', cr.OtherXmlFile(os.path.join(self._repodata, 'other.xml.gz')))]
+        for name, xml_file in self._files:
+            xml_file.set_num_of_pkgs(count)
+
+    def add(self, name, version, release, arch, links):
+        """
+        Add a package to the repository.
+
+        Args:
+            name (basestring): The name of the package.
+            version (basestring): The version of the package.
+            release (basestring): The release of the package.
+            arch (basestring): The architecture of the package.
+            links (dict): Maps file names to the placeholders already written for other
+                repositories, which are hard linked rather than written again, as Pungi does.
+        """
+        filename = '%s-%s-%s.%s.rpm' % (name, version, release, arch)
+        href = os.path.join('Packages', filename[0].lower(), filename)
+        path = os.path.join(self.path, href)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        content = RPM_MAGIC + filename.encode('utf-8') * 16
+        if filename in links:
+            os.link(links[filename], path)
+        else:
+            with open(path, 'wb') as rpm:
+                rpm.write(content)
+            links[filename] = path
+
+        timestamp = 1514764800 + int(hashlib.md5(filename.encode('utf-8')).hexdigest()[:6], 16)
+        package = cr.Package()
+        package.pkgId = hashlib.sha256(content).hexdigest()
+        package.checksum_type = 'sha256'
+        package.name = name
+        package.arch = arch
+        package.version = version
+        package.epoch = '0'
+        package.release = release
+        package.summary = 'The %s package' % name
+        package.description = 'A placeholder for the %s package.' % name
+        package.url = 'https://example.com/%s' % name
+        package.time_file = package.time_build = timestamp
+        package.rpm_license = 'MIT'
+        package.rpm_group = 'Unspecified'
+        package.rpm_buildhost = 'buildvm.example.com'
+        if arch != 'src':
+            package.rpm_sourcerpm = '%s-%s-%s.src.rpm' % (name, version, release)
+        package.size_package = len(content)
+        package.size_installed = package.size_archive = len(content) * 4
+        package.location_href = href
+        package.provides = [(name, 'EQ', '0', version, release, False)]
+        package.files = [('', '/usr/share/doc/%s/' % name, 'README')]
+        package.changelogs = [('Packager <packager@example.com> - %s-%s' % (version, release),
+                               timestamp, '- Update to %s' % version)]
+        for name, xml_file in self._files:
+            xml_file.add_pkg(package)
+
+    def close(self, modules=None):
+        """
+        Finish the repodata of the repository.
+
+        Args:
+            modules (list or None): The (name, stream, version, context) of the modules of the
+                repository, if any.
+        """
+        repomd = cr.Repomd()
+        for name, xml_file in self._files:
+            xml_file.close()
+            record = cr.RepomdRecord(name, os.path.join(self._repodata, '%s.xml.gz' % name))
+            record.fill(cr.SHA256)
+            record.rename_file()
+            repomd.set_record(record)
+        if modules:
+            path = os.path.join(self._repodata, 'modules.yaml')
+            with open(path, 'w') as modules_file:
+                for name, stream, version, context in modules:
+                    modules_file.write(
+                        '---\ndocument: modulemd\nversion: 2\ndata:\n  name: %s\n  stream: %s\n'
+                        '  version: %s\n  context: %s\n  summary: The %s module\n'
+                        '  description: A placeholder for the %s module.\n'
+                        '  license:\n    module: [MIT]\n...\n' % (
+                            name, stream, version, context, name, name))
+            record = cr.RepomdRecord('modules', path).compress_and_fill(cr.SHA256, cr.GZ)
+            record.rename_file()
+            record.type = 'modules'
+            repomd.set_record(record)
+            os.unlink(path)
+        with open(os.path.join(self._repodata, 'repomd.xml'), 'w') as repomd_file:
+            repomd_file.write(repomd.xml_dump())
+
+
+def write_compose(compose_dir, config, arches, count, seed):
+    """
+    Write the repositories and the metadata of a compose.
+
+    Args:
+        compose_dir (basestring): The path to the compose.
+        config (dict): The config of the compose.
+        arches (list): The architectures of the compose.
+        count (int): The number of packages that aren't built by the compose.
+        seed (int): The seed of the packages that aren't built by the compose.
+    """
+    everything = os.path.join(compose_dir, 'compose', 'Everything')
+    content = packages(config, count, seed)
+    links = {}
+
+    source = Repository(os.path.join(everything, 'source', 'tree'), len(content))
+    for name, version, release, noarch in content:
+        source.add(name, version, release, 'src', links)
+    source.close(config['modules'])
+
+    for arch in arches:
+        os_repo = Repository(os.path.join(everything, arch, 'os'), len(content))
+        debug = Repository(os.path.join(everything, arch, 'debug', 'tree'),
+                           len([p for p in content if not p[3]]))
+        for name, version, release, noarch in content:
+            os_repo.add(name, version, release, 'noarch' if noarch else arch, links)
+            if not noarch:
+                debug.add('%s-debuginfo' % name, version, release, arch, links)
+        os_repo.close(config['modules'])
+        debug.close()
+
+
+@click.command()
+@click.option('--config', 'config_path', required=True, type=click.Path(exists=True),
+              help='The rendered pungi config.')
+@click.option('--target-dir', required=True, type=click.Path(exists=True, file_okay=False),
+              help='The directory the compose is written in.')
+@click.option('--label', default='Update-0.0', help='The label of the compose.')
+@click.option('--quiet', is_flag=True, help='Ignored.')
+@click.option('--print-output-dir', is_flag=True, help='Print the path to the compose.')
+@click.option('--old-composes', help='Ignored.')
+@click.option('--no-latest-link', is_flag=True, help='Ignored.')
+@click.option('--arches', default='x86_64,aarch64,ppc64le,s390x',
+              help='A comma-separated list of the architectures of the compose.')
+@click.option('--packages', 'count', default=1000,
+              help='The number of packages that are not built by the compose.')
+@click.option('--seed', default=0,
+              help='The seed of the packages that are not built by the compose.')
+def main(config_path, target_dir, label, quiet, print_output_dir, old_composes, no_latest_link,
+         arches, count, seed):
+    """Stand in for pungi-koji, writing a compose of placeholder packages."""
+    config = read_config(config_path)
+    date = datetime.utcnow().strftime('%Y%m%d')
+    prefix = '%s-%s-%s-%s.' % (config['release_short'], config['release_version'],
+                               config['release_type'], date)
+    respin = len([d for d in os.listdir(target_dir) if d.startswith(prefix)])
+    compose_id = '%s%d' % (prefix, respin)
+    compose_dir = os.path.join(os.path.abspath(target_dir), compose_id)
+    arches = arches.split(',')
+
+    write_compose(compose_dir, config, arches, count, seed)
+
+    metadata = os.path.join(compose_dir, 'compose', 'metadata')
+    os.makedirs(metadata)
+    variant = {
+        'id': 'Everything', 'uid': 'Everything', 'name': 'Everything', 'type': 'variant',
+        'arches': sorted(arches),
+        'paths': {
+            'os_tree': dict((arch, 'Everything/%s/os' % arch) for arch in arches),
+            'repository': dict((arch, 'Everything/%s/os' % arch) for arch in arches),
+            'debug_repository': dict((arch, 'Everything/%s/debug/tree' % arch) for arch in arches),
+            'source_repository': dict((arch, 'Everything/source/tree') for arch in arches)}}
+    with open(os.path.join(metadata, 'composeinfo.json'), 'w') as composeinfo:
+        json.dump({
+            'header': {'type': 'productmd.composeinfo', 'version': '1.2'},
+            'payload': {
+                'compose': {'id': compose_id, 'date': date, 'respin': respin,
+                            'type': 'production', 'label': label},
+                'release': {'name': 'Fedora Updates', 'short': config['release_short'],
+                            'version': config['release_version'], 'type': 'updates',
+                            'is_layered': False},
+                'variants': {'Everything': variant}}}, composeinfo, indent=4, sort_keys=True)
+    with open(os.path.join(compose_dir, 'COMPOSE_ID'), 'w') as compose_id_file:
+        compose_id_file.write(compose_id)
+    with open(os.path.join(compose_dir, 'STATUS'), 'w') as status:
+        status.write('FINISHED\n')
+
+    if print_output_dir:
+        print('Compose dir: %s' % compose_dir)
+
+
+if __name__ == '__main__':
+    main()